@@ -1,7 +1,8 @@
 const API = "http://127.0.0.1:8000";
 
 async function apiGet(url) {
-    const res = await fetch(API + url);
+    // "no-cache": el navegador reusa su copia pero revalida con ETag (304 si no cambió)
+    const res = await fetch(API + url, { cache: "no-cache" });
 
     let body = null;
     try {
@@ -44,6 +45,42 @@ async function apiPost(url, data) {
     return body;
 }
 
+// Alta masiva: manda la lista en bloques (un request por bloque, no por registro).
+// Regresa los resultados por elemento con el índice original de `items`.
+async function apiPostBulk(url, items, chunkSize = 500) {
+    const results = [];
+
+    for (let start = 0; start < items.length; start += chunkSize) {
+        const chunk = items.slice(start, start + chunkSize);
+        const res = await fetch(API + url, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify(chunk),
+        });
+
+        let body = null;
+        try {
+            body = await res.json();
+        } catch (_) {
+            body = null;
+        }
+
+        // 207 = alta parcial; los errores vienen por elemento
+        if (!body || !Array.isArray(body.results)) {
+            const err = new Error("API BULK error");
+            err.status = res.status;
+            err.data = body;
+            throw err;
+        }
+
+        for (const r of body.results) {
+            results.push({ ...r, index: r.index + start });
+        }
+    }
+
+    return results;
+}
+
 async function apiPut(url, data) {
     const res = await fetch(API + url, {
         method: "PUT",
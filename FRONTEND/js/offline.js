@@ -0,0 +1,257 @@
+// Modo sin conexión del POS: catálogo en caché, tickets en cola local y envío
+// por lotes a /ventas/offline/sync/ (ver sales/offline.py).
+(() => {
+  const $ = (id) => document.getElementById(id);
+
+  const catalogUrl = $("offline_catalog_url")?.value;
+  const syncUrl = $("offline_sync_url")?.value;
+  if (!catalogUrl || !syncUrl) return;
+
+  const KEY_CATALOG = "pos_offline_catalog";
+  const KEY_QUEUE = "pos_offline_queue";
+  const KEY_REJECTED = "pos_offline_rejected";
+  const SYNC_BATCH = 50;
+  const CATALOG_EVERY_MS = 60_000;
+  const SYNC_EVERY_MS = 30_000;
+
+  const panel = $("offline_panel");
+  const badge = $("offline_badge");
+  const inpSearch = $("offline_search");
+  const results = $("offline_results");
+  const cartEl = $("offline_cart");
+  const totalEl = $("offline_total");
+  const inpName = $("offline_client_name");
+  const inpPhone = $("offline_client_phone");
+  const selMetodo = $("offline_metodo_pago");
+  const inpPagado = $("offline_pagado");
+  const btnCobrar = $("offline_cobrar");
+  const msgEl = $("offline_msg");
+
+  let offline = !navigator.onLine;
+  let cart = {}; // id -> qty
+
+  function getCookie(name) {
+    const v = `; ${document.cookie}`;
+    const parts = v.split(`; ${name}=`);
+    if (parts.length === 2) return parts.pop().split(";").shift();
+    return "";
+  }
+
+  function load(key, fallback) {
+    try {
+      return JSON.parse(localStorage.getItem(key)) ?? fallback;
+    } catch (_) {
+      return fallback;
+    }
+  }
+
+  function save(key, value) {
+    localStorage.setItem(key, JSON.stringify(value));
+  }
+
+  function newKey() {
+    if (window.crypto?.randomUUID) return window.crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+  }
+
+  function escapeHtml(v) {
+    const div = document.createElement("div");
+    div.textContent = v ?? "";
+    return div.innerHTML;
+  }
+
+  // Catálogo
+
+  async function refreshCatalog() {
+    const cache = load(KEY_CATALOG, { cursor: null, products: {} });
+    const url = cache.cursor ? `${catalogUrl}?since=${encodeURIComponent(cache.cursor)}` : catalogUrl;
+    try {
+      const res = await fetch(url, { headers: { "X-Requested-With": "XMLHttpRequest" } });
+      if (!res.ok) throw new Error(String(res.status));
+      const data = await res.json();
+
+      const products = data.full ? {} : cache.products;
+      (data.products || []).forEach((p) => {
+        if (p.active) products[p.id] = p;
+        else delete products[p.id];
+      });
+      (data.deleted || []).forEach((id) => delete products[id]);
+      // El stock que ya se vendió sin conexión sigue descontado
+      pendingQty().forEach((qty, id) => {
+        if (products[id]) products[id].stock = Math.max(0, products[id].stock - qty);
+      });
+      save(KEY_CATALOG, { cursor: data.cursor, products });
+      setOffline(false);
+    } catch (_) {
+      setOffline(true);
+    }
+  }
+
+  function pendingQty() {
+    const totals = new Map();
+    load(KEY_QUEUE, []).forEach((t) => {
+      t.items.forEach((it) => totals.set(String(it.id), (totals.get(String(it.id)) || 0) + it.qty));
+    });
+    return totals;
+  }
+
+  // Cola de tickets
+
+  async function syncQueue() {
+    const queue = load(KEY_QUEUE, []);
+    if (!queue.length) return renderBadge();
+
+    const batch = queue.slice(0, SYNC_BATCH);
+    try {
+      const res = await fetch(syncUrl, {
+        method: "POST",
+        headers: { "Content-Type": "application/json", "X-CSRFToken": getCookie("csrftoken") },
+        body: JSON.stringify({ tickets: batch }),
+      });
+      if (!res.ok) throw new Error(String(res.status));
+      const data = await res.json();
+
+      const done = new Set();
+      const rejected = load(KEY_REJECTED, []);
+      (data.results || []).forEach((r) => {
+        if (r.status === "created" || r.status === "duplicate") done.add(r.key);
+        if (r.status === "rejected") {
+          done.add(r.key);
+          rejected.push({ ticket: batch.find((t) => t.key === r.key), error: r.error });
+        }
+      });
+      save(KEY_REJECTED, rejected);
+      // Releer: pudieron entrar tickets nuevos mientras se enviaba
+      save(KEY_QUEUE, load(KEY_QUEUE, []).filter((t) => !done.has(t.key)));
+      setOffline(false);
+      if (done.size === batch.length && queue.length > batch.length) return syncQueue();
+    } catch (_) {
+      setOffline(true);
+    }
+    renderBadge();
+  }
+
+  function renderBadge() {
+    if (!badge) return;
+    const pending = load(KEY_QUEUE, []).length;
+    const rejected = load(KEY_REJECTED, []).length;
+    const parts = [];
+    if (offline) parts.push("Sin conexión");
+    if (pending) parts.push(`${pending} ticket(s) por enviar`);
+    if (rejected) parts.push(`${rejected} rechazado(s)`);
+    badge.textContent = parts.join(" • ");
+    badge.classList.toggle("hidden", !parts.length);
+  }
+
+  function setOffline(value) {
+    offline = value;
+    if (panel) panel.classList.toggle("hidden", !offline);
+    renderBadge();
+  }
+
+  // Venta local
+
+  function catalog() {
+    return load(KEY_CATALOG, { products: {} }).products;
+  }
+
+  function renderResults() {
+    if (!results) return;
+    const q = (inpSearch?.value || "").trim().toLowerCase();
+    results.innerHTML = "";
+    if (q.length < 2) return;
+
+    Object.values(catalog())
+      .filter((p) => p.code?.toLowerCase().startsWith(q) || p.name.toLowerCase().includes(q))
+      .slice(0, 20)
+      .forEach((p) => {
+        const row = document.createElement("div");
+        row.className = "flex items-center justify-between border rounded p-2 text-sm";
+        row.innerHTML = `
+          <span class="truncate">${escapeHtml(p.name)} <span class="text-gray-500">$${p.price} • Stock: ${p.stock}</span></span>
+          <button type="button" class="bg-green-600 text-white px-2 py-1 rounded text-xs">Agregar</button>
+        `;
+        row.querySelector("button").addEventListener("click", () => {
+          cart[p.id] = (cart[p.id] || 0) + 1;
+          renderCart();
+        });
+        results.appendChild(row);
+      });
+  }
+
+  function cartLines() {
+    const products = catalog();
+    return Object.entries(cart)
+      .filter(([id]) => products[id])
+      .map(([id, qty]) => ({ id: Number(id), qty, price: products[id].price, name: products[id].name }));
+  }
+
+  function renderCart() {
+    if (!cartEl) return;
+    const lines = cartLines();
+    cartEl.innerHTML = "";
+    let total = 0;
+    lines.forEach((l) => {
+      total += Number(l.price) * l.qty;
+      const row = document.createElement("div");
+      row.className = "flex justify-between text-sm";
+      row.innerHTML = `<span>${escapeHtml(l.name)} x${l.qty}</span><button type="button" class="text-red-600">✕</button>`;
+      row.querySelector("button").addEventListener("click", () => {
+        delete cart[l.id];
+        renderCart();
+      });
+      cartEl.appendChild(row);
+    });
+    if (totalEl) totalEl.textContent = total.toFixed(2);
+  }
+
+  function cobrarLocal() {
+    const lines = cartLines();
+    const name = (inpName?.value || "").trim();
+    if (!lines.length || !name) {
+      if (msgEl) msgEl.textContent = "Agrega productos y el nombre del cliente.";
+      return;
+    }
+
+    const queue = load(KEY_QUEUE, []);
+    queue.push({
+      key: newKey(),
+      created_at: new Date().toISOString(),
+      items: lines.map(({ id, qty, price }) => ({ id, qty, price })),
+      cliente: { name, phone: (inpPhone?.value || "").trim() },
+      descuento_pct: "0",
+      metodo_pago: selMetodo?.value || "CASH",
+      cantidad_pagada: inpPagado?.value || "",
+    });
+    save(KEY_QUEUE, queue);
+
+    // Descontar en la caché para no vender dos veces la misma pieza
+    const cache = load(KEY_CATALOG, { cursor: null, products: {} });
+    lines.forEach((l) => {
+      const p = cache.products[l.id];
+      if (p) p.stock = Math.max(0, p.stock - l.qty);
+    });
+    save(KEY_CATALOG, cache);
+
+    cart = {};
+    [inpName, inpPhone, inpPagado].forEach((el) => el && (el.value = ""));
+    renderCart();
+    renderResults();
+    if (msgEl) msgEl.textContent = "Venta guardada; se enviará al volver la conexión.";
+    renderBadge();
+    syncQueue();
+  }
+
+  inpSearch?.addEventListener("input", renderResults);
+  btnCobrar?.addEventListener("click", cobrarLocal);
+  window.addEventListener("online", () => {
+    refreshCatalog();
+    syncQueue();
+  });
+  window.addEventListener("offline", () => setOffline(true));
+
+  setOffline(offline);
+  refreshCatalog().then(syncQueue);
+  setInterval(refreshCatalog, CATALOG_EVERY_MS);
+  setInterval(syncQueue, SYNC_EVERY_MS);
+})();
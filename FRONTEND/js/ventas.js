@@ -129,6 +129,14 @@
 
   updateTotals();
 
+  // Un solo envío por ticket (el servidor también lo deduplica con idempotency_key)
+  const formCobrar = btnCobrar?.form;
+  if (formCobrar) {
+    formCobrar.addEventListener("submit", () => {
+      setTimeout(() => setCobrarEnabled(false), 0);
+    });
+  }
+
   // Cliente registrado: buscar y seleccionar
   const clientSearchUrl = $("client_search_url")?.value;
   const clientSelectTpl = $("client_select_url_tpl")?.value;
@@ -173,6 +181,32 @@
     });
   }
 
+  // Typeahead: espera a que se deje de teclear y cancela la petición anterior
+  function debounce(fn, ms) {
+    let t = null;
+    return (...args) => {
+      clearTimeout(t);
+      t = setTimeout(() => fn(...args), ms);
+    };
+  }
+
+  function latestOnly() {
+    let ctrl = null;
+    return async (url) => {
+      if (ctrl) ctrl.abort();
+      ctrl = new AbortController();
+      try {
+        const res = await fetch(url, { credentials: "same-origin", signal: ctrl.signal });
+        return await res.json();
+      } catch (e) {
+        if (e.name === "AbortError") return null;
+        throw e;
+      }
+    };
+  }
+
+  const fetchClients = latestOnly();
+
   async function searchClients() {
     if (!clientSearchUrl || !inpClient) return;
     const q = (inpClient.value || "").trim();
@@ -182,16 +216,114 @@
     }
 
     const url = `${clientSearchUrl}?q=${encodeURIComponent(q)}`;
-    const res = await fetch(url, { credentials: "same-origin" });
-    const data = await res.json();
-    if (data.ok) renderClients(data.results || []);
+    const data = await fetchClients(url);
+    if (data && data.ok) renderClients(data.results || []);
   }
 
   if (btnClient) btnClient.addEventListener("click", searchClients);
-  if (inpClient) inpClient.addEventListener("keydown", (e) => {
-    if (e.key === "Enter") {
-      e.preventDefault();
-      searchClients();
+  if (inpClient) {
+    inpClient.addEventListener("input", debounce(searchClients, 200));
+    inpClient.addEventListener("keydown", (e) => {
+      if (e.key === "Enter") {
+        e.preventDefault();
+        searchClients();
+      }
+    });
+  }
+
+  // Productos: resultados mientras se escribe (Enter sigue mandando el form)
+  const productSearchUrl = $("product_search_url")?.value;
+  const productAddTpl = $("product_add_url_tpl")?.value;
+  const inpProduct = $("inp_product_search");
+  const productResults = $("product_results");
+  const fetchProducts = latestOnly();
+
+  function escapeHtml(v) {
+    const div = document.createElement("div");
+    div.textContent = v ?? "";
+    return div.innerHTML;
+  }
+
+  function renderProducts(items, q) {
+    if (!productResults) return;
+    productResults.innerHTML = "";
+
+    if (!items.length) {
+      if (q) productResults.innerHTML = `<div class="text-sm text-gray-400 mt-3">Sin resultados.</div>`;
+      return;
     }
-  });
+
+    const csrf = getCookie("csrftoken");
+    items.forEach((p) => {
+      const div = document.createElement("div");
+      div.className = "border rounded p-2 flex gap-3 items-center";
+      div.dataset.productId = String(p.id);
+
+      let img = `<span class="text-xs text-gray-400">Sin imagen</span>`;
+      if (p.image_url) {
+        const webp = p.image_webp_url ? `<source srcset="${p.image_webp_url}" type="image/webp">` : "";
+        img = `<picture class="w-full h-full">${webp}<img src="${p.image_url}" alt="${escapeHtml(p.name)}" class="w-full h-full object-cover" loading="lazy" decoding="async" width="56" height="56"></picture>`;
+      }
+
+      div.innerHTML = `
+        <div class="w-14 h-14 bg-gray-100 rounded overflow-hidden flex items-center justify-center shrink-0">${img}</div>
+        <div class="min-w-0 flex-1">
+          <div class="text-sm font-semibold truncate">${escapeHtml(p.name)}</div>
+          <div class="text-xs text-gray-500">$${p.price}${p.stock !== null ? ` • Stock: <span data-stock>${p.stock}</span>` : ""}</div>
+        </div>
+        <form method="post" action="${productAddTpl.replace("999999", String(p.id))}" class="m-0">
+          <input type="hidden" name="csrfmiddlewaretoken" value="${csrf}">
+          <input type="hidden" name="q" value="${escapeHtml(q)}">
+          <button type="submit" data-add-btn class="bg-green-600 hover:bg-green-700 text-white px-3 py-1 rounded text-sm">Agregar</button>
+        </form>
+      `;
+      productResults.appendChild(div);
+    });
+  }
+
+  async function searchProducts() {
+    if (!productSearchUrl || !inpProduct) return;
+    const q = (inpProduct.value || "").trim();
+    if (q.length < 2) {
+      renderProducts([], "");
+      return;
+    }
+
+    const data = await fetchProducts(`${productSearchUrl}?q=${encodeURIComponent(q)}`);
+    if (data && data.ok) renderProducts(data.results || [], q);
+  }
+
+  if (inpProduct) inpProduct.addEventListener("input", debounce(searchProducts, 200));
+
+  // En vivo: stock que cambió en otra terminal (cobros / cancelaciones)
+  function applyStock(item) {
+    document.querySelectorAll(`[data-product-id="${item.id}"]`).forEach((card) => {
+      const stockEl = card.querySelector("[data-stock]");
+      if (stockEl) stockEl.textContent = String(item.stock);
+
+      const btn = card.querySelector("[data-add-btn]");
+      if (!btn) return;
+      const agotado = item.stock <= 0;
+      btn.disabled = agotado;
+      btn.textContent = agotado ? "Agotado" : "Agregar";
+      btn.classList.toggle("opacity-50", agotado);
+      btn.classList.toggle("cursor-not-allowed", agotado);
+    });
+  }
+
+  const liveUrl = $("live_events_url")?.value;
+  const branchId = Number($("branch_id")?.value || 0);
+  if (liveUrl && window.EventSource) {
+    const es = new EventSource(liveUrl);
+    es.addEventListener("stock", (e) => {
+      try {
+        const data = JSON.parse(e.data);
+        // El stock que llega es el de la sucursal donde se vendió
+        if (branchId && data.branch && data.branch !== branchId) return;
+        (data.products || []).forEach(applyStock);
+      } catch (_) {
+        // evento mal formado: se ignora
+      }
+    });
+  }
 })();
@@ -3,6 +3,10 @@ ASGI config for POS project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Las búsquedas del POS (sales:client_search, sales:product_search) son vistas
+async; para aprovecharlas se sirve con un servidor ASGI, p. ej.:
+    uvicorn POS.asgi:application --workers 1
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -0,0 +1,45 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite para varias cajas escribiendo a la vez.
+
+    - journal_mode=WAL: los lectores no bloquean al que escribe.
+    - synchronous=NORMAL: seguro con WAL y mucho más rápido que FULL.
+    - busy_timeout: espera el lock en vez de fallar con "database is locked".
+    - mmap_size: lecturas vía memoria mapeada.
+    - Las transacciones empiezan con BEGIN IMMEDIATE para tomar el lock de
+      escritura al inicio (con BEGIN normal dos cobros pueden leer y luego
+      chocar al querer escribir, y ahí busy_timeout no ayuda).
+
+    Se configura en OPTIONS de settings.DATABASES (ver POS/settings.py).
+    """
+
+    PRAGMA_DEFAULTS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "mmap_size": 64 * 1024 * 1024,
+    }
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        # Estas opciones son nuestras, sqlite3.connect() no las acepta
+        self.pragmas = dict(self.PRAGMA_DEFAULTS)
+        for name in self.PRAGMA_DEFAULTS:
+            if name in params:
+                self.pragmas[name] = params.pop(name)
+        self.transaction_mode = str(params.pop("transaction_mode", "IMMEDIATE")).upper()
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            if value is None:
+                continue
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f"BEGIN {self.transaction_mode}")
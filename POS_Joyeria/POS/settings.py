@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,9 +47,14 @@ INSTALLED_APPS = [
     'client',
     'suppliers',
     'cash_register',
+    'inventory',
+    'sync',
+    'branches',
+    'jobs',
 ]
 
 MIDDLEWARE = [
+    'utils.perf.PerfMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -64,7 +70,8 @@ ROOT_URLCONF = 'POS.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates + tiempo de render por request (utils/perf.py)
+        'BACKEND': 'utils.perf.InstrumentedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -83,14 +90,111 @@ WSGI_APPLICATION = 'POS.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# POS_DB_ENGINE=sqlite (default) o postgres.
+#
+# SQLite usa POS/db_backends/sqlite_wal (WAL + busy_timeout + BEGIN IMMEDIATE)
+# para que varias cajas puedan cobrar al mismo tiempo sin "database is locked".
+# Las pruebas usan un archivo (no memoria) para poder probar concurrencia.
+#
+# PostgreSQL (requiere psycopg): conexiones persistentes (CONN_MAX_AGE) con health checks.
+# Django 4.2 no trae pool propio; para pool se apunta POS_DB_HOST/PORT a
+# PgBouncer (modo transaction) con POS_DB_PGBOUNCER=1.
+
+POS_DB_ENGINE = os.environ.get("POS_DB_ENGINE", "sqlite")
+
+if POS_DB_ENGINE == "postgres":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get("POS_DB_NAME", "pos_joyeria"),
+            'USER': os.environ.get("POS_DB_USER", "pos"),
+            'PASSWORD': os.environ.get("POS_DB_PASSWORD", ""),
+            'HOST': os.environ.get("POS_DB_HOST", "localhost"),
+            'PORT': os.environ.get("POS_DB_PORT", "5432"),
+            'CONN_MAX_AGE': int(os.environ.get("POS_DB_CONN_MAX_AGE", "60")),
+            'CONN_HEALTH_CHECKS': True,
+            # Con PgBouncer en modo transaction no hay cursores del lado del servidor
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get("POS_DB_PGBOUNCER") == "1",
+            'OPTIONS': {
+                'connect_timeout': 5,
+            },
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'POS.db_backends.sqlite_wal',
+            'NAME': os.environ.get("POS_DB_NAME", BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'busy_timeout': int(os.environ.get("POS_DB_BUSY_TIMEOUT", "5000")),
+                'synchronous': "NORMAL",
+                'mmap_size': 64 * 1024 * 1024,
+            },
+            'TEST': {
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
+        }
+    }
+
+# BD aparte para `manage.py loadtest` (mismo motor que default). Se migra
+# apuntando default a ella (POS_DB_NAME=<la misma> manage.py migrate): las
+# migraciones de datos escriben en default. La prueba no corre sin --database
+if os.environ.get("POS_LOADTEST_DB_NAME"):
+    DATABASES["loadtest"] = {
+        **DATABASES["default"],
+        "NAME": os.environ["POS_LOADTEST_DB_NAME"],
+        "TEST": {"MIRROR": "default"},
+    }
+
+
+# Cache
+# POS_CACHE_BACKEND=locmem (default, por proceso) o file (compartida entre
+# procesos del mismo equipo, sin servidor externo). Cada caché con nombre
+# se invalida por versión desde utils/cache.py.
+
+POS_CACHE_BACKEND = os.environ.get("POS_CACHE_BACKEND", "locmem")
+POS_CACHE_DIR = Path(os.environ.get("POS_CACHE_DIR", BASE_DIR / "cache"))
+# Con locmem, m2m_changed sólo limpia los roles del proceso que hizo el cambio:
+# en los demás un permiso quitado dura hasta que expira la entrada (segundos)
+POS_ROLES_LOCAL_TTL = int(os.environ.get("POS_ROLES_LOCAL_TTL", "30"))
+# Versiones de tabla (ETag) en caché: igual que los roles, con locmem los
+# demás procesos pueden responder 304 con la versión vieja hasta que expira
+POS_TABLE_VERSION_LOCAL_TTL = int(os.environ.get("POS_TABLE_VERSION_LOCAL_TTL", "5"))
+
+_CACHE_TIMEOUTS = {
+    "default": 300,
+    "catalog": 60 * 60,   # categorías, materiales, proveedores, productos
+    # grupos del usuario; compartida (file) sí ve las invalidaciones de otros procesos
+    "roles": 10 * 60 if POS_CACHE_BACKEND == "file" else POS_ROLES_LOCAL_TTL,
+    "search": 60,         # búsquedas del POS
+    "reports": 5 * 60,    # reportes / corte
+    "receipts": 24 * 60 * 60,  # tickets ya renderizados (sales/receipts.py)
 }
 
 
+def _cache_config(name, timeout):
+    if POS_CACHE_BACKEND == "file":
+        return {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": str(POS_CACHE_DIR / name),
+            "TIMEOUT": timeout,
+            "OPTIONS": {"MAX_ENTRIES": 5000},
+        }
+    return {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": f"pos-{name}",
+        "TIMEOUT": timeout,
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    }
+
+
+CACHES = {name: _cache_config(name, timeout) for name, timeout in _CACHE_TIMEOUTS.items()}
+
+
+# Pruebas: techos de latencia sólo con --tag perf (POS/test_runner.py)
+TEST_RUNNER = "POS.test_runner.PosTestRunner"
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -138,6 +242,89 @@ STATICFILES_DIRS = [BASE_DIR.parent / "FRONTEND"]
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Servir /media/ desde Django fuera de DEBUG (si no hay nginx enfrente)
+POS_SERVE_MEDIA = os.environ.get("POS_SERVE_MEDIA") == "1"
+
+# Eventos en vivo (utils/events.py): memory | file
+POS_EVENTS_BROKER = os.environ.get("POS_EVENTS_BROKER", "memory")
+POS_EVENTS_FILE = os.environ.get("POS_EVENTS_FILE", str(BASE_DIR / "cache" / "events.jsonl"))
+# Duración de cada conexión SSE; el navegador reconecta solo (Last-Event-ID)
+POS_EVENTS_STREAM_SECONDS = int(os.environ.get("POS_EVENTS_STREAM_SECONDS", "300"))
+# Con WSGI no hay stream: cada cuántos segundos vuelve a preguntar el navegador
+POS_EVENTS_POLL_SECONDS = int(os.environ.get("POS_EVENTS_POLL_SECONDS", "3"))
+
+# Miniaturas de productos (products/images.py): thread | sync | off
+POS_IMAGE_PIPELINE = os.environ.get("POS_IMAGE_PIPELINE", "thread")
+POS_IMAGE_WORKERS = int(os.environ.get("POS_IMAGE_WORKERS", "2"))
+
+# Folios de venta (sales/folios.py): prefijo por terminal, dígitos mínimos y
+# números que cada proceso aparta de una vez. Con varias terminales conviene
+# un prefijo distinto por terminal, ej. POS_FOLIO_PREFIX=V1-
+POS_FOLIO_PREFIX = os.environ.get("POS_FOLIO_PREFIX", "V")
+POS_FOLIO_DIGITS = int(os.environ.get("POS_FOLIO_DIGITS", "6"))
+POS_FOLIO_BLOCK_SIZE = int(os.environ.get("POS_FOLIO_BLOCK_SIZE", "20"))
+
+# Días que se guardan las claves de idempotencia de cobro (sales/idempotency.py)
+POS_CHECKOUT_KEY_DAYS = int(os.environ.get("POS_CHECKOUT_KEY_DAYS", "7"))
+
+# Modo sin conexión (sales/offline.py): tickets por envío
+POS_OFFLINE_SYNC_MAX = int(os.environ.get("POS_OFFLINE_SYNC_MAX", "100"))
+# Cuánto (%) puede quedar un renglón offline por debajo del precio de catálogo,
+# contando el descuento del ticket; más abajo el ticket se rechaza
+POS_OFFLINE_PRICE_TOLERANCE = int(os.environ.get("POS_OFFLINE_PRICE_TOLERANCE", "30"))
+
+# Descargas incrementales (sync/deltas.py): margen (segundos) del cursor y días
+# que se guardan los borrados; un cursor más viejo recibe las tablas completas
+POS_SYNC_CURSOR_OVERLAP = int(os.environ.get("POS_SYNC_CURSOR_OVERLAP", "5"))
+POS_SYNC_TOMBSTONE_DAYS = int(os.environ.get("POS_SYNC_TOMBSTONE_DAYS", "30"))
+
+# Sucursal por defecto (branches): ventas, cajas y stock sin sucursal explícita
+POS_DEFAULT_BRANCH_CODE = os.environ.get("POS_DEFAULT_BRANCH_CODE", "MAT")
+
+# Trabajos en segundo plano (jobs): worker (manage.py run_jobs) | thread | sync.
+# Reintentos con espera creciente desde POS_JOBS_RETRY_SECONDS; un RUNNING sin
+# heartbeat en POS_JOBS_STALE_SECONDS se regresa a la cola.
+POS_JOBS_RUNNER = os.environ.get("POS_JOBS_RUNNER", "worker")
+POS_JOBS_THREADS = int(os.environ.get("POS_JOBS_THREADS", "2"))
+POS_JOBS_POLL_SECONDS = float(os.environ.get("POS_JOBS_POLL_SECONDS", "2"))
+POS_JOBS_RETRY_SECONDS = int(os.environ.get("POS_JOBS_RETRY_SECONDS", "30"))
+POS_JOBS_STALE_SECONDS = int(os.environ.get("POS_JOBS_STALE_SECONDS", "300"))
+POS_JOBS_KEEP_DAYS = int(os.environ.get("POS_JOBS_KEEP_DAYS", "14"))
+POS_JOBS_FILES_DIR = Path(os.environ.get("POS_JOBS_FILES_DIR", BASE_DIR / "exports"))
+# Trabajos que el worker encola solo una vez al día ("HH:MM" local; vacío = apagado)
+POS_JOBS_SCHEDULE = {
+    "home.end_of_day": os.environ.get("POS_EOD_AT", "03:00"),
+}
+
+# Cierre nocturno (home/end_of_day.py): días de resúmenes que se rehacen y
+# fotos de stock que se conservan
+POS_EOD_ROLLUP_DAYS = int(os.environ.get("POS_EOD_ROLLUP_DAYS", "7"))
+POS_EOD_SNAPSHOTS_KEEP = int(os.environ.get("POS_EOD_SNAPSHOTS_KEEP", "60"))
+# Fotos de stock (inventory/ledger.py): segundos hacia atrás en que un movimiento
+# con id menor todavía puede confirmarse después de la foto (cobros en curso)
+POS_SNAPSHOT_OVERLAP_SECONDS = int(os.environ.get("POS_SNAPSHOT_OVERLAP_SECONDS", "300"))
+
+# Archivo de ventas (sales/archive.py): días que se quedan en Sale (0 = el
+# cierre nocturno no archiva) y ventas que se mueven por transacción
+POS_ARCHIVE_DAYS = int(os.environ.get("POS_ARCHIVE_DAYS", "365"))
+POS_ARCHIVE_BATCH = int(os.environ.get("POS_ARCHIVE_BATCH", "500"))
+
+# Tickets (sales/receipts.py): encabezado, pie, columnas (42 = papel de 80 mm,
+# 32 = 58 mm) e impresora ESC/POS de red "host:puerto" (vacío = sin impresora)
+POS_RECEIPT_HEADER = os.environ.get("POS_RECEIPT_HEADER", "JOYERÍA")
+POS_RECEIPT_FOOTER = os.environ.get("POS_RECEIPT_FOOTER", "¡Gracias por su compra!")
+POS_RECEIPT_WIDTH = int(os.environ.get("POS_RECEIPT_WIDTH", "42"))
+POS_RECEIPT_PRINTER = os.environ.get("POS_RECEIPT_PRINTER", "")
+
+# Existencia mínima para productos sin categoría (inventory)
+POS_LOW_STOCK_DEFAULT = int(os.environ.get("POS_LOW_STOCK_DEFAULT", "2"))
+
+# Métricas por request (utils/perf.py, /perf/ para AdminPOS)
+POS_PERF_ENABLED = os.environ.get("POS_PERF_ENABLED", "1") == "1"
+POS_PERF_BUFFER_SIZE = int(os.environ.get("POS_PERF_BUFFER_SIZE", "1000"))
+# Header Server-Timing (visible en las devtools del navegador)
+POS_PERF_SERVER_TIMING = os.environ.get("POS_PERF_SERVER_TIMING", "1" if DEBUG else "0") == "1"
+
 LOGIN_URL = "/login/"
 LOGIN_REDIRECT_URL = "/proveedores/"
 LOGOUT_REDIRECT_URL = "/login/"
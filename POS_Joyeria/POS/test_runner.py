@@ -0,0 +1,16 @@
+import os
+
+from django.test.runner import DiscoverRunner
+
+
+class PosTestRunner(DiscoverRunner):
+    """
+    Runner de la suite: los techos de latencia (assertBudget ms=...) sólo se
+    miden con `manage.py test --tag perf`; en la corrida normal dependen de la
+    máquina y fallan al azar. Los presupuestos de queries siempre se revisan.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if "perf" in self.tags:
+            os.environ.setdefault("POS_PERF_LATENCY_FACTOR", "1")
@@ -1,10 +1,11 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
 
 from django.contrib.auth import views as auth_views
 
+from utils.media import serve_media
+
 urlpatterns = [
     path("admin/", admin.site.urls),
 
@@ -23,6 +24,8 @@ urlpatterns = [
     path("api/suppliers/", include("suppliers.urls")),
     path("api/products/", include("products.urls")),
     path("api/employees/", include("staff.urls")),
+    path("api/sync/", include("sync.urls")),
+    path("api/jobs/", include("jobs.urls")),
     path("corte-caja/", include("cash_register.urls")),
 
     # WEB
@@ -30,9 +33,16 @@ urlpatterns = [
     path("proveedores/", include("suppliers.web_urls")),
     path("productos/", include("products.web_urls")),
     path("personal/", include("staff.web_urls")),
-    path("ventas/", include("sales.web_urls"))
+    path("ventas/", include("sales.web_urls")),
+    path("inventario/", include("inventory.web_urls")),
+    path("sucursales/", include("branches.web_urls")),
+    path("trabajos/", include("jobs.web_urls")),
 
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+if settings.DEBUG or settings.POS_SERVE_MEDIA:
+    # Archivos con huella -> Cache-Control immutable (ver utils/media.py).
+    # Sin static(): ése no monta nada con DEBUG=False
+    urlpatterns += [
+        re_path(rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.*)$", serve_media),
+    ]
@@ -0,0 +1,31 @@
+from django import forms
+from .models import Branch
+
+BASE_INPUT = "border p-2 rounded w-full"
+
+
+class BranchForm(forms.ModelForm):
+    class Meta:
+        model = Branch
+        fields = ["name", "code", "folio_prefix", "address"]
+        labels = {
+            "name": "Nombre",
+            "code": "Clave",
+            "folio_prefix": "Prefijo de folio",
+            "address": "Dirección",
+        }
+        widgets = {
+            "name": forms.TextInput(attrs={"class": BASE_INPUT, "placeholder": "Ej. Centro"}),
+            "code": forms.TextInput(attrs={"class": BASE_INPUT, "placeholder": "Ej. CEN"}),
+            "folio_prefix": forms.TextInput(attrs={"class": BASE_INPUT, "placeholder": "Ej. C (vacío = el general)"}),
+            "address": forms.TextInput(attrs={"class": BASE_INPUT}),
+        }
+
+    def clean_code(self):
+        return (self.cleaned_data.get("code") or "").strip().upper()
+
+    def clean_folio_prefix(self):
+        v = (self.cleaned_data.get("folio_prefix") or "").strip().upper()
+        if v and not v.isalnum():
+            raise forms.ValidationError("Sólo letras y números.")
+        return v
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def create_default_branch(apps, schema_editor):
+    # Todo lo que ya existe (stock, ventas, cajas) queda en la sucursal por defecto
+    Branch = apps.get_model("branches", "Branch")
+    BranchStock = apps.get_model("branches", "BranchStock")
+    Product = apps.get_model("products", "Product")
+
+    code = getattr(settings, "POS_DEFAULT_BRANCH_CODE", "MAT")
+    branch, _ = Branch.objects.get_or_create(code=code, defaults={"name": "Matriz"})
+    BranchStock.objects.bulk_create(
+        [
+            BranchStock(branch=branch, product_id=pid, stock=stock)
+            for pid, stock in Product.objects.values_list("id", "stock").iterator()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_default_branch, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.db import models
+
+from utils.changes import ChangeTrackedModel
+
+
+class Branch(ChangeTrackedModel):
+    """Sucursal. Cada una tiene su stock (BranchStock), su caja y sus ventas."""
+
+    name = models.CharField(max_length=100, unique=True)
+    code = models.CharField(max_length=10, unique=True)
+    # Prefijo de folio propio (contador separado en FolioSequence); vacío = POS_FOLIO_PREFIX
+    folio_prefix = models.CharField(max_length=8, blank=True, default="")
+    address = models.CharField(max_length=200, blank=True, default="")
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.name
+
+
+def default_branch():
+    """Sucursal por defecto (la que crea la migración)."""
+    code = getattr(settings, "POS_DEFAULT_BRANCH_CODE", "MAT")
+    branch, _ = Branch.objects.get_or_create(code=code, defaults={"name": "Matriz"})
+    return branch
+
+
+def default_branch_id():
+    # default de los FK a Branch (ventas y cajas creadas sin sucursal)
+    return default_branch().pk
+
+
+class BranchStock(ChangeTrackedModel):
+    """
+    Existencias de un producto en una sucursal.
+
+    Product.stock sigue siendo el total de todas las sucursales (lo usan el
+    inventario, el kardex y la API); branches/stock.py mantiene ambos iguales.
+    """
+
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, related_name="stock_rows")
+    product = models.ForeignKey("products.Product", on_delete=models.CASCADE, related_name="stock_rows")
+    stock = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["branch", "product"], name="uniq_branch_stock"),
+        ]
+
+    def __str__(self):
+        return f"{self.branch} / {self.product_id}: {self.stock}"
@@ -0,0 +1,39 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_save, pre_save
+
+from products.models import Product
+from utils.bulk import bulk_created
+from .stock import apply_delta, remember_branch, seed_rows
+
+
+def _product_pre_save(sender, instance, raw=False, **kwargs):
+    # Stock antes de guardar (inventory actualiza _loaded_values en su post_save)
+    instance._stock_before_save = getattr(instance, "_loaded_values", {}).get("stock")
+
+
+def _product_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        seed_rows([instance])
+        return
+    before = getattr(instance, "_stock_before_save", None)
+    if before is not None:
+        apply_delta(instance.pk, instance.stock - before)
+
+
+def _products_bulk_created(sender, instances, **kwargs):
+    seed_rows(instances)
+
+
+def _remember_branch(sender, request, user, **kwargs):
+    # La sucursal se resuelve aquí y no en el primer cobro de la sesión
+    if request is not None and hasattr(request, "session"):
+        remember_branch(request.session, user)
+
+
+def connect_signals():
+    pre_save.connect(_product_pre_save, sender=Product, dispatch_uid="branches-product-pre-save")
+    post_save.connect(_product_saved, sender=Product, dispatch_uid="branches-product-save")
+    bulk_created.connect(_products_bulk_created, sender=Product, dispatch_uid="branches-product-bulk")
+    user_logged_in.connect(_remember_branch, dispatch_uid="branches-login")
@@ -0,0 +1,140 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Branch, BranchStock, default_branch, default_branch_id
+
+
+# Stock por sucursal.
+#
+# Product.stock es el total; cada save() que lo cambia (cobro, cancelación,
+# edición del producto, venta sin conexión) aplica la misma diferencia a la
+# fila BranchStock de la sucursal activa (signals.py):
+#
+#     with stock_branch(branch_id):
+#         p.stock -= 1
+#         p.save(update_fields=["stock"])
+#
+# Fuera de un bloque la diferencia va a la sucursal por defecto.
+
+SESSION_BRANCH = "pos_branch"
+
+_branch = ContextVar("branches_stock_branch", default=None)
+
+
+@contextmanager
+def stock_branch(branch_id):
+    token = _branch.set(branch_id)
+    try:
+        yield
+    finally:
+        _branch.reset(token)
+
+
+def active_branch_id():
+    return _branch.get() or default_branch_id()
+
+
+def branch_info(branch):
+    from sales.folios import folio_prefix
+
+    return {"id": branch.pk, "name": branch.name, "folio_prefix": branch.folio_prefix or folio_prefix()}
+
+
+def current_branch(request):
+    """
+    Sucursal de la terminal: {"id", "name", "folio_prefix"}.
+
+    Se resuelve al iniciar sesión (perfil del usuario o la sucursal por
+    defecto, ver signals.py) y se guarda en la sesión; AdminPOS la cambia con
+    switch_branch.
+    """
+    info = request.session.get(SESSION_BRANCH)
+    if isinstance(info, dict) and info.get("user") == request.user.pk:
+        return info
+    return remember_branch(request.session, request.user)
+
+
+def remember_branch(session, user):
+    branch = Branch.objects.filter(staff__user=user).first() or default_branch()
+    return set_current_branch(session, user, branch)
+
+
+def set_current_branch(session, user, branch):
+    info = {**branch_info(branch), "user": user.pk}
+    session[SESSION_BRANCH] = info
+    return info
+
+
+def with_branch_stock(qs, branch_id):
+    """Agrega `branch_stock` (existencias en la sucursal) a un queryset de Product."""
+    rows = BranchStock.objects.filter(branch_id=branch_id, product=OuterRef("pk")).values("stock")[:1]
+    return qs.annotate(branch_stock=Coalesce(Subquery(rows), 0))
+
+
+def branch_stock_of(branch_id, product_ids, lock=False):
+    qs = BranchStock.objects.filter(branch_id=branch_id, product_id__in=product_ids)
+    if lock:
+        qs = qs.select_for_update()
+    return dict(qs.values_list("product_id", "stock"))
+
+
+def apply_delta(product_id, delta, branch_id=None):
+    """Aplica a BranchStock la misma diferencia que tuvo Product.stock."""
+    if not delta:
+        return
+    branch_id = branch_id or active_branch_id()
+    # .update() no pasa por save(): updated_at (sync) va explícito
+    now = timezone.now()
+
+    if delta > 0:
+        if not BranchStock.objects.filter(branch_id=branch_id, product_id=product_id).update(
+            stock=F("stock") + delta, updated_at=now
+        ):
+            BranchStock.objects.create(branch_id=branch_id, product_id=product_id, stock=delta)
+        return
+
+    need = -delta
+    # Caso normal (la sucursal tiene suficiente): un solo UPDATE
+    if BranchStock.objects.filter(branch_id=branch_id, product_id=product_id, stock__gte=need).update(
+        stock=F("stock") - need, updated_at=now
+    ):
+        return
+
+    # Ajuste del total mayor a lo que hay en la sucursal: el resto sale de las demás
+    rows = sorted(
+        BranchStock.objects.select_for_update().filter(product_id=product_id, stock__gt=0),
+        key=lambda r: (r.branch_id != branch_id, -r.stock),
+    )
+    for row in rows:
+        take = min(row.stock, need)
+        row.stock -= take
+        row.save(update_fields=["stock"])
+        need -= take
+        if not need:
+            break
+
+
+def seed_rows(products, branch_id=None):
+    # Altas: el stock inicial queda en la sucursal activa
+    branch_id = branch_id or active_branch_id()
+    BranchStock.objects.bulk_create(
+        [BranchStock(branch_id=branch_id, product_id=p.pk, stock=p.stock) for p in products],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def check_totals():
+    """Productos cuyo Product.stock no coincide con la suma de sus sucursales."""
+    from products.models import Product
+
+    sums = dict(BranchStock.objects.values_list("product_id").annotate(s=Sum("stock")).order_by())
+    return [
+        {"product_id": pid, "total": stock, "branches": sums.get(pid, 0)}
+        for pid, stock in Product.objects.values_list("id", "stock").order_by("id")
+        if sums.get(pid, 0) != stock
+    ]
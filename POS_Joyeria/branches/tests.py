@@ -0,0 +1,190 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import IntegrityError
+from django.test import TestCase
+from django.urls import reverse
+
+from cash_register.models import CashRegister
+from products.models import Category, Product
+from sales.folios import reset_folio_allocator
+from sales.models import Sale
+from sales.web_views import SESSION_KEY
+from staff.models import StaffProfile
+from suppliers.models import Supplier
+from utils.factories import make_products
+from .models import Branch, BranchStock, default_branch_id
+from .stock import SESSION_BRANCH, check_totals, stock_branch
+
+User = get_user_model()
+
+
+def _stock(branch_id, product):
+    return BranchStock.objects.filter(branch_id=branch_id, product=product).values_list("stock", flat=True).first() or 0
+
+
+class BranchStockTest(TestCase):
+    def setUp(self):
+        self.matriz = default_branch_id()
+        self.centro = Branch.objects.create(name="Centro", code="CEN", folio_prefix="C")
+        self.product = Product.objects.create(
+            name="Anillo", purchase_price=100, sale_price=500, weight=1, stock=5,
+            category=Category.objects.create(name="Anillos"),
+            supplier=Supplier.objects.create(name="Prov", code="P01", phone="5550001111", email="p@test.com"),
+        )
+
+    def _move(self, delta, branch_id=None):
+        p = Product.objects.get(pk=self.product.pk)
+        p.stock += delta
+        if branch_id is None:
+            p.save(update_fields=["stock"])
+        else:
+            with stock_branch(branch_id):
+                p.save(update_fields=["stock"])
+
+    def test_alta_queda_en_la_sucursal_por_defecto(self):
+        self.assertEqual(_stock(self.matriz, self.product), 5)
+        self.assertEqual(_stock(self.centro.pk, self.product), 0)
+
+    def test_cambio_de_stock_va_a_la_sucursal_activa(self):
+        self._move(3, self.centro.pk)
+        self._move(-1, self.centro.pk)
+        self.assertEqual(_stock(self.centro.pk, self.product), 2)
+        self.assertEqual(_stock(self.matriz, self.product), 5)
+        self.assertEqual(check_totals(), [])
+
+    def test_venta_mueve_updated_at_para_sync(self):
+        before = BranchStock.objects.get(branch_id=self.matriz, product=self.product).updated_at
+        BranchStock.objects.filter(branch_id=self.matriz).update(updated_at=before - timedelta(hours=1))
+        self._move(-1)
+        row = BranchStock.objects.get(branch_id=self.matriz, product=self.product)
+        self.assertEqual(row.stock, 4)
+        self.assertGreaterEqual(row.updated_at, before)
+
+    def test_ajuste_mayor_que_la_sucursal_toma_de_las_demas(self):
+        self._move(2, self.centro.pk)
+        self._move(-4, self.centro.pk)
+        self.assertEqual(_stock(self.centro.pk, self.product), 0)
+        self.assertEqual(_stock(self.matriz, self.product), 3)
+        self.assertEqual(check_totals(), [])
+
+    def test_alta_masiva_crea_filas(self):
+        products = make_products(3, stock=4)
+        self.assertEqual(BranchStock.objects.filter(product__in=products, branch_id=self.matriz, stock=4).count(), 3)
+        self.assertEqual(check_totals(), [])
+
+
+class BranchSalesTest(TestCase):
+    def setUp(self):
+        reset_folio_allocator()
+        Group.objects.create(name="VendedorPOS")
+        self.centro = Branch.objects.create(name="Centro", code="CEN", folio_prefix="C")
+        self.product = Product.objects.create(
+            name="Anillo", code="AN01", purchase_price=100, sale_price=Decimal("500.00"), weight=1, stock=1,
+            category=Category.objects.create(name="Anillos"),
+            supplier=Supplier.objects.create(name="Prov", code="P01", phone="5550001111", email="p@test.com"),
+        )
+        # 1 pieza en Matriz, 2 en Centro
+        p = Product.objects.get(pk=self.product.pk)
+        p.stock = 3
+        with stock_branch(self.centro.pk):
+            p.save(update_fields=["stock"])
+
+        self.user = User.objects.create_user(username="centro", password="x")
+        self.user.groups.add(Group.objects.get(name="VendedorPOS"))
+        StaffProfile.objects.create(
+            user=self.user, nombre="V", apellido_paterno="C", apellido_materno="C",
+            telefono="5550009999", direccion="x", branch=self.centro,
+        )
+        self.client.force_login(self.user)
+
+    def _cobrar(self, qty):
+        session = self.client.session
+        session[SESSION_KEY] = {
+            "items": {str(self.product.id): qty},
+            "cliente": {"name": "Cliente", "phone": ""},
+            "descuento_pct": "0",
+            "metodo_pago": "CASH",
+            "cantidad_pagada": "5000",
+            "token": f"tok-{qty}-{Sale.objects.count()}",
+        }
+        session.save()
+        return self.client.post(reverse("sales:cobrar"), {"metodo_pago": "CASH", "cantidad_pagada": "5000"})
+
+    def test_login_fija_la_sucursal_del_perfil(self):
+        self.assertEqual(self.client.session[SESSION_BRANCH]["id"], self.centro.pk)
+
+    def test_cobro_descuenta_de_la_sucursal_y_usa_su_folio(self):
+        self._cobrar(2)
+        sale = Sale.objects.get()
+        self.assertEqual(sale.branch_id, self.centro.pk)
+        self.assertTrue(sale.folio.startswith("C"))
+        self.assertEqual(_stock(self.centro.pk, self.product), 0)
+        self.assertEqual(_stock(default_branch_id(), self.product), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 1)
+
+    def test_no_vende_stock_de_otra_sucursal(self):
+        # El total alcanza (3) pero en Centro sólo hay 2
+        self._cobrar(3)
+        self.assertEqual(Sale.objects.count(), 0)
+
+    def test_cancelacion_regresa_a_la_sucursal_de_la_venta(self):
+        self._cobrar(1)
+        admin = User.objects.create_superuser(username="admin", password="x")
+        self.client.force_login(admin)
+        self.client.post(reverse("sales:cancel", args=[Sale.objects.get().id]))
+        self.assertEqual(_stock(self.centro.pk, self.product), 2)
+        self.assertEqual(_stock(default_branch_id(), self.product), 1)
+
+    def test_historial_solo_de_la_sucursal(self):
+        Sale.objects.create(folio="V-OTRA", status=Sale.Status.PAID, total=10)
+        self._cobrar(1)
+        res = self.client.get(reverse("sales:ventas_list"))
+        folios = [s.folio for s in res.context["sales"]]
+        self.assertEqual(len(folios), 1)
+        self.assertTrue(folios[0].startswith("C"))
+
+    def test_cajas_por_sucursal(self):
+        CashRegister.objects.create(opened_by=self.user, opening_amount=0)
+        # El mismo cajero tiene caja en Matriz y puede abrir otra en Centro
+        res = self.client.post(reverse("cash_register_web:open"), {"opening_amount": "100"})
+        self.assertEqual(res.status_code, 302)
+        self.assertEqual(CashRegister.objects.filter(is_closed=False, branch=self.centro).count(), 1)
+        with self.assertRaises(IntegrityError):
+            CashRegister.objects.create(opened_by=self.user, opening_amount=0, branch=self.centro)
+
+    def test_corte_solo_suma_la_sucursal(self):
+        self.client.post(reverse("cash_register_web:open"), {"opening_amount": "0"})
+        Sale.objects.create(folio="V-OTRA", status=Sale.Status.PAID, total=999)
+        self._cobrar(1)
+        res = self.client.get(reverse("cash_register_web:close"))
+        self.assertEqual(res.context["total_sales"], Decimal("500.00"))
+
+
+class BranchViewsTest(TestCase):
+    def setUp(self):
+        self.centro = Branch.objects.create(name="Centro", code="CEN")
+        self.admin = User.objects.create_user(username="admin", password="x")
+        self.admin.groups.add(Group.objects.create(name="AdminPOS"))
+        self.client.force_login(self.admin)
+
+    def test_alta_y_cambio_de_sucursal(self):
+        res = self.client.post(reverse("branches_web:list"), {"name": "Norte", "code": "nor", "folio_prefix": "n"})
+        self.assertEqual(res.status_code, 302)
+        norte = Branch.objects.get(code="NOR")
+        self.assertEqual(norte.folio_prefix, "N")
+
+        self.client.post(reverse("branches_web:switch", args=[norte.pk]))
+        self.assertEqual(self.client.session[SESSION_BRANCH]["id"], norte.pk)
+        self.assertEqual(self.client.session[SESSION_BRANCH]["folio_prefix"], "N")
+
+    def test_vendedor_no_cambia_de_sucursal(self):
+        vendedor = User.objects.create_user(username="v", password="x")
+        vendedor.groups.add(Group.objects.create(name="VendedorPOS"))
+        self.client.force_login(vendedor)
+        before = self.client.session[SESSION_BRANCH]["id"]
+        self.client.post(reverse("branches_web:switch", args=[self.centro.pk]))
+        self.assertEqual(self.client.session[SESSION_BRANCH]["id"], before)
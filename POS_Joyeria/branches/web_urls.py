@@ -0,0 +1,9 @@
+from django.urls import path
+from . import web_views
+
+app_name = "branches_web"
+
+urlpatterns = [
+    path("", web_views.branch_list, name="list"),
+    path("<int:branch_id>/usar/", web_views.switch_branch, name="switch"),
+]
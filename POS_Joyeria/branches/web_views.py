@@ -0,0 +1,43 @@
+from django.contrib import messages
+from django.db.models import Count, Q, Sum
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import require_POST
+
+from utils.roles import role_required
+from .forms import BranchForm
+from .models import Branch
+from .stock import current_branch, set_current_branch
+
+
+@role_required(["AdminPOS"])
+def branch_list(request):
+    form = BranchForm(request.POST or None)
+    if request.method == "POST" and form.is_valid():
+        branch = form.save()
+        messages.success(request, f"Sucursal {branch.name} creada.")
+        return redirect("branches_web:list")
+
+    branches = Branch.objects.annotate(
+        units=Sum("stock_rows__stock"),
+        products=Count("stock_rows", filter=Q(stock_rows__stock__gt=0)),
+    ).order_by("name")
+    return render(request, "branches/lista.html", {
+        "branches": branches,
+        "form": form,
+        "current": current_branch(request),
+    })
+
+
+@require_POST
+@role_required(["AdminPOS"])
+def switch_branch(request, branch_id):
+    # La terminal pasa a trabajar con el stock, caja y ventas de otra sucursal
+    branch = get_object_or_404(Branch, pk=branch_id, is_active=True)
+    set_current_branch(request.session, request.user, branch)
+    messages.success(request, f"Ahora trabajas en {branch.name}.")
+
+    next_url = request.POST.get("next") or ""
+    if next_url and url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        return redirect(next_url)
+    return redirect("branches_web:list")
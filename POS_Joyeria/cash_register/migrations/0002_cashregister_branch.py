@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:41
+
+import branches.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0002_default_branch'),
+        ('cash_register', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cashregister',
+            name='branch',
+            field=models.ForeignKey(default=branches.models.default_branch_id, on_delete=django.db.models.deletion.PROTECT, related_name='cash_registers', to='branches.branch'),
+        ),
+        migrations.AddConstraint(
+            model_name='cashregister',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_closed', False)), fields=('branch',), name='uniq_open_cash_register_per_branch'),
+        ),
+    ]
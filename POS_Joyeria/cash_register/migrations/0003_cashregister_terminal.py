@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_register', '0002_cashregister_branch'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='cashregister',
+            name='uniq_open_cash_register_per_branch',
+        ),
+        migrations.AddField(
+            model_name='cashregister',
+            name='terminal',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddConstraint(
+            model_name='cashregister',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_closed', False)), fields=('branch', 'opened_by'), name='uniq_open_cash_register_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='cashregister',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_closed', False), models.Q(('terminal', ''), _negated=True)), fields=('branch', 'terminal'), name='uniq_open_cash_register_per_terminal'),
+        ),
+    ]
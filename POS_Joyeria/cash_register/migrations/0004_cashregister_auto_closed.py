@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_register', '0003_cashregister_terminal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cashregister',
+            name='auto_closed',
+            field=models.BooleanField(default=False),
+        ),
+    ]
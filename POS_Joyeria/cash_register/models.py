@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from branches.models import default_branch_id
+
 User = get_user_model()
 
 class CashRegister(models.Model):
@@ -64,7 +66,77 @@ class CashRegister(models.Model):
     closed_at = models.DateTimeField(null=True, blank=True)
 
     is_closed = models.BooleanField(default=False)
+    # Cerrada por el cierre nocturno (end_of_day): sin efectivo contado
+    auto_closed = models.BooleanField(default=False)
+
+    branch = models.ForeignKey(
+        "branches.Branch", on_delete=models.PROTECT, default=default_branch_id, related_name="cash_registers"
+    )
+    # Cajón/terminal física ("Caja 1"); opcional
+    terminal = models.CharField(max_length=40, blank=True, default="")
+
+    class Meta:
+        constraints = [
+            # Varias cajas abiertas por sucursal, pero una por cajero y una por terminal
+            models.UniqueConstraint(
+                fields=["branch", "opened_by"], condition=models.Q(is_closed=False),
+                name="uniq_open_cash_register_per_user",
+            ),
+            models.UniqueConstraint(
+                fields=["branch", "terminal"], condition=models.Q(is_closed=False) & ~models.Q(terminal=""),
+                name="uniq_open_cash_register_per_terminal",
+            ),
+        ]
+
+    def sales(self):
+        # Ventas pagadas cobradas en esta caja (índice sale_register_status_idx)
+        from sales.models import Sale
+
+        return Sale.objects.filter(cash_register=self, status=Sale.Status.PAID)
+
+    def compute_totals(self):
+        # Un solo aggregate sobre las ventas de la caja (índice cash_register + status)
+        from decimal import Decimal
+        from django.db.models import Q, Sum
+
+        totals = self.sales().aggregate(
+            cash_total=Sum("total", filter=Q(payment_method="CASH")),
+            card_total=Sum("total", filter=Q(payment_method="CARD")),
+            transfer_total=Sum("total", filter=Q(payment_method="TRANSFER")),
+            total_sales=Sum("total"),
+        )
+        return {k: v or Decimal("0") for k, v in totals.items()}
+
+    def close(self, user, closing_amount, totals=None):
+        """Cierra con los totales del sistema; sin `closing_amount` no hay diferencia que registrar."""
+        from django.utils import timezone
+
+        totals = totals or self.compute_totals()
+        self.cash_total = totals["cash_total"]
+        self.card_total = totals["card_total"]
+        self.transfer_total = totals["transfer_total"]
+        self.total_sales = totals["total_sales"]
+
+        self.closing_amount = closing_amount
+        self.difference = closing_amount - self.cash_total if closing_amount is not None else 0
+
+        self.closed_by = user
+        self.closed_at = timezone.now()
+        self.is_closed = True
+        self.save()
+
+    def live_totals(self):
+        # Totales de la caja (todas sus ventas pagadas)
+        from django.db.models import Count, Sum
+
+        data = self.sales().aggregate(total=Sum("total"), cantidad=Count("id"))
+        return {
+            "cash_id": self.id, "branch": self.branch_id, "total": data["total"] or 0, "cantidad": data["cantidad"],
+        }
 
     def __str__(self):
         estado = "CERRADA" if self.is_closed else "ABIERTA"
-        return f"Caja #{self.id} - {estado}"
+        nombre = f"Caja #{self.id}"
+        if self.terminal:
+            nombre += f" ({self.terminal})"
+        return f"{nombre} - {estado}"
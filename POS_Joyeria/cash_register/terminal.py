@@ -0,0 +1,63 @@
+from django.db.models import Case, IntegerField, Value, When
+
+from branches.stock import current_branch
+from .models import CashRegister
+
+
+# Caja con la que cobra cada sesión.
+#
+# En una sucursal puede haber varias cajas abiertas a la vez (una por cajero
+# y una por terminal). La sesión guarda la suya al abrirla o al elegirla en
+# el estado de caja; si no tiene, se usa la que abrió el usuario y, si en la
+# sucursal sólo hay una abierta, esa (tiendas con un solo cajón). Con varias
+# abiertas y ninguna de la sesión no se adivina: el cobro se rechaza
+# (RegisterRequired) y se manda a elegir caja. Al cerrar no se toca la
+# sesión: una caja cerrada simplemente deja de encontrarse.
+
+SESSION_REGISTER = "pos_cash_register"
+
+
+class RegisterRequired(Exception):
+    """Hay varias cajas abiertas en la sucursal y la sesión no tiene una."""
+
+
+def bind_register(session, cash):
+    session[SESSION_REGISTER] = cash.pk
+
+
+def open_registers(branch_id):
+    return CashRegister.objects.filter(is_closed=False, branch_id=branch_id)
+
+
+def register_for(request, branch_id=None, lock=False, required=False):
+    """
+    Caja abierta de la sesión en su sucursal, o None. Con lock=True (cobro,
+    dentro de la transacción) la fila queda bloqueada hasta el commit, así
+    que no se cierra a media venta. Con required=True, varias cajas abiertas
+    sin una de la sesión lanzan RegisterRequired en vez de regresar None.
+    """
+    if branch_id is None:
+        branch_id = current_branch(request)["id"]
+    qs = open_registers(branch_id)
+    if lock:
+        qs = qs.select_for_update()
+
+    cash_id = request.session.get(SESSION_REGISTER)
+    if cash_id:
+        cash = qs.filter(pk=cash_id).first()
+        if cash is not None:
+            return cash
+
+    # Primero la del usuario; dos filas bastan para saber si hay una sola
+    rows = list(
+        qs.annotate(mine=Case(When(opened_by=request.user, then=Value(1)), default=Value(0), output_field=IntegerField()))
+        .order_by("-mine", "-opened_at")[:2]
+    )
+    if rows and (rows[0].mine or len(rows) == 1):
+        bind_register(request.session, rows[0])
+        return rows[0]
+    if cash_id:
+        request.session.pop(SESSION_REGISTER)
+    if required and rows:
+        raise RegisterRequired("Hay varias cajas abiertas: elige con cuál cobras.")
+    return None
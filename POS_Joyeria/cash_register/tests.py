@@ -1,12 +1,12 @@
 from decimal import Decimal
-from django.test import TestCase
+from django.test import TestCase, tag
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
-from django.utils import timezone
 import uuid
 from cash_register.models import CashRegister
 from sales.models import Sale
+from utils.factories import QueryBudgetMixin, make_products
 
 User = get_user_model()
 
@@ -45,10 +45,11 @@ class CashRegisterViewsTest(TestCase):
     def _open_cash(self, opened_by, opening_amount="100.00"):
         return CashRegister.objects.create(opened_by=opened_by, opening_amount=opening_amount)
 
-    def _sale(self, user, total, method="CASH", status=None, created_at=None):
+    def _sale(self, user, total, method="CASH", status=None, created_at=None, cash=None):
         if status is None:
             status = Sale.Status.PAID
         sale = Sale.objects.create(
+            cash_register=cash,
             user=user,
             total=Decimal(str(total)),
             payment_method=method,
@@ -99,8 +100,8 @@ class CashRegisterViewsTest(TestCase):
         t0 = cash.opened_at
 
 
-        self._sale(self.vendedor1, "50.00", method="CASH", created_at=t0)
-        self._sale(self.vendedor2, "70.00", method="CARD", created_at=t0)
+        self._sale(self.vendedor1, "50.00", method="CASH", created_at=t0, cash=cash)
+        self._sale(self.vendedor2, "70.00", method="CARD", created_at=t0, cash=cash)
 
         self.client.force_login(self.admin)
         res_admin = self.client.get(self.url_status)
@@ -116,6 +117,20 @@ class CashRegisterViewsTest(TestCase):
         self.assertEqual(resumen_v1["cantidad"], 1)
         self.assertEqual(resumen_v1["total"], Decimal("50.00"))
 
+    def test_summary_json_respeta_filtro_por_vendedor(self):
+        url = reverse("cash_register_web:summary")
+        self.client.force_login(self.vendedor1)
+        self.assertFalse(self.client.get(url).json()["open"])
+
+        cash = self._open_cash(self.admin, "100.00")
+        self._sale(self.vendedor1, "50.00", method="CASH", created_at=cash.opened_at, cash=cash)
+        self._sale(self.vendedor2, "70.00", method="CARD", created_at=cash.opened_at, cash=cash)
+
+        data = self.client.get(url).json()
+        self.assertEqual(data["resumen"]["cantidad"], 1)
+        self.assertEqual(Decimal(data["resumen"]["total"]), Decimal("50.00"))
+        self.assertEqual(cash.live_totals()["cantidad"], 2)
+
     def test_close_cash_sin_caja_redirige_a_open(self):
         self.client.force_login(self.admin)
         res = self.client.get(self.url_close)
@@ -126,9 +141,9 @@ class CashRegisterViewsTest(TestCase):
         cash = self._open_cash(self.admin, "100.00")
         t0 = cash.opened_at
 
-        self._sale(self.admin, "10.00", method="CASH", created_at=t0)
-        self._sale(self.admin, "20.00", method="CARD", created_at=t0)
-        self._sale(self.admin, "30.00", method="TRANSFER", created_at=t0)
+        self._sale(self.admin, "10.00", method="CASH", created_at=t0, cash=cash)
+        self._sale(self.admin, "20.00", method="CARD", created_at=t0, cash=cash)
+        self._sale(self.admin, "30.00", method="TRANSFER", created_at=t0, cash=cash)
 
         self.client.force_login(self.admin)
         res = self.client.get(self.url_close)
@@ -157,8 +172,8 @@ class CashRegisterViewsTest(TestCase):
         cash = self._open_cash(self.admin, "100.00")
         t0 = cash.opened_at
 
-        self._sale(self.admin, "60.00", method="CASH", created_at=t0)
-        self._sale(self.admin, "40.00", method="CARD", created_at=t0)
+        self._sale(self.admin, "60.00", method="CASH", created_at=t0, cash=cash)
+        self._sale(self.admin, "40.00", method="CARD", created_at=t0, cash=cash)
 
         self.client.force_login(self.admin)
         res = self.client.post(self.url_close, {"closing_amount": "55.00"})
@@ -176,3 +191,133 @@ class CashRegisterViewsTest(TestCase):
         self.assertEqual(cash.difference, Decimal("-5.00"))
         self.assertEqual(cash.closed_by, self.admin)
         self.assertIsNotNone(cash.closed_at)
+
+
+class MultiRegisterTest(TestCase):
+    """Varias cajas abiertas en la misma sucursal: cada corte sólo suma lo suyo."""
+
+    def setUp(self):
+        g_vendedor = Group.objects.create(name="VendedorPOS")
+        self.g_admin = Group.objects.create(name="AdminPOS")
+        self.v1 = User.objects.create_user(username="v1", password="x")
+        self.v2 = User.objects.create_user(username="v2", password="x")
+        for u in (self.v1, self.v2):
+            u.groups.add(g_vendedor)
+        self.product = make_products(1, stock=10)[0]
+
+    def _abrir(self, user, terminal=""):
+        self.client.force_login(user)
+        self.client.post(reverse("cash_register_web:open"), {"opening_amount": "100", "terminal": terminal})
+        return CashRegister.objects.get(opened_by=user, is_closed=False)
+
+    def _cobrar(self, user):
+        from sales.web_views import SESSION_KEY
+
+        self.client.force_login(user)
+        session = self.client.session
+        session[SESSION_KEY] = {
+            "items": {str(self.product.id): 1},
+            "cliente": {"name": "Cliente", "phone": ""},
+            "descuento_pct": "0",
+            "metodo_pago": "CASH",
+            "cantidad_pagada": "100000",
+            "token": uuid.uuid4().hex,
+        }
+        session.save()
+        self.response = self.client.post(reverse("sales:cobrar"), {"metodo_pago": "CASH", "cantidad_pagada": "100000"})
+        return Sale.objects.order_by("-id").first()
+
+    def test_dos_cajeros_cobran_en_cajas_distintas(self):
+        c1 = self._abrir(self.v1, "Caja 1")
+        c2 = self._abrir(self.v2, "Caja 2")
+
+        self.assertEqual(self._cobrar(self.v1).cash_register, c1)
+        self.assertEqual(self._cobrar(self.v1).cash_register, c1)
+        self.assertEqual(self._cobrar(self.v2).cash_register, c2)
+
+        self.client.force_login(self.v1)
+        res = self.client.get(reverse("cash_register_web:close"))
+        self.assertEqual(res.context["cash"], c1)
+        self.assertEqual(res.context["total_sales"], self.product.sale_price * 2)
+
+        self.client.post(reverse("cash_register_web:close"), {"closing_amount": "0"})
+        c1.refresh_from_db()
+        c2.refresh_from_db()
+        self.assertTrue(c1.is_closed)
+        self.assertFalse(c2.is_closed)
+        self.assertEqual(c2.live_totals()["cantidad"], 1)
+
+    def test_una_caja_abierta_por_terminal(self):
+        self._abrir(self.v1, "Caja 1")
+        self.client.force_login(self.v2)
+        self.client.post(reverse("cash_register_web:open"), {"opening_amount": "100", "terminal": "Caja 1"})
+        self.assertFalse(CashRegister.objects.filter(opened_by=self.v2).exists())
+
+    def test_usar_caja_de_otro(self):
+        c1 = self._abrir(self.v1)
+        self._abrir(self.v2)
+        self.client.force_login(self.v2)
+        self.client.post(reverse("cash_register_web:use", args=[c1.id]))
+        self.assertEqual(self._cobrar(self.v2).cash_register, c1)
+
+    def test_solo_admin_cierra_caja_ajena(self):
+        c1 = self._abrir(self.v1)
+        self._abrir(self.v2)
+        url = reverse("cash_register_web:close_other", args=[c1.id])
+
+        self.client.force_login(self.v2)
+        self.client.post(url, {"closing_amount": "0"})
+        c1.refresh_from_db()
+        self.assertFalse(c1.is_closed)
+
+        admin = User.objects.create_user(username="admin", password="x")
+        admin.groups.add(self.g_admin)
+        self.client.force_login(admin)
+        self.client.post(url, {"closing_amount": "0"})
+        c1.refresh_from_db()
+        self.assertTrue(c1.is_closed)
+        self.assertEqual(c1.closed_by, admin)
+
+    def test_sin_caja_elegida_no_se_cobra(self):
+        # Con dos cajas abiertas y sin elegir, no se adivina a cuál va ni se
+        # guarda una venta que no entraría a ningún corte
+        self._abrir(self.v1)
+        c2 = self._abrir(self.v2)
+        tercero = User.objects.create_user(username="v3", password="x")
+        tercero.groups.add(Group.objects.get(name="VendedorPOS"))
+        self.assertIsNone(self._cobrar(tercero))
+        self.assertEqual(self.response.status_code, 302)
+        self.assertEqual(self.response["Location"], reverse("cash_register_web:status"))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+
+        # Ya con caja elegida, sí
+        self.client.post(reverse("cash_register_web:use", args=[c2.id]))
+        self.assertEqual(self._cobrar(tercero).cash_register, c2)
+
+
+@tag("perf")
+class CashRegisterQueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Los totales de caja son aggregates: el número de queries no crece con las ventas."""
+
+    perf_data = ("sales",)
+    perf_role = "AdminPOS"
+    perf_register = True
+
+    def test_cash_status(self):
+        with self.assertBudget(queries=8, ms=500):
+            res = self.client.get(reverse("cash_register_web:status"))
+        self.assertEqual(res.status_code, 200)
+
+    def test_close_cash_get(self):
+        with self.assertBudget(queries=4, ms=300):
+            res = self.client.get(reverse("cash_register_web:close"))
+        self.assertEqual(res.status_code, 200)
+
+    def test_close_cash_post(self):
+        with self.assertBudget(queries=8, ms=300):
+            res = self.client.post(reverse("cash_register_web:close"), {"closing_amount": "100.00"})
+        self.assertEqual(res.status_code, 302)
+        self.cash.refresh_from_db()
+        self.assertTrue(self.cash.is_closed)
+        self.assertEqual(self.cash.total_sales, sum(s.total for s in Sale.objects.filter(status=Sale.Status.PAID)))
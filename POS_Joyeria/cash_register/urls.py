@@ -5,6 +5,9 @@ app_name = "cash_register_web"
 
 urlpatterns = [
     path("", web_views.cash_status, name="status"),
+    path("resumen/", web_views.cash_summary, name="summary"),
     path("abrir/", web_views.open_cash, name="open"),
     path("cerrar/", web_views.close_cash, name="close"),
+    path("<int:cash_id>/cerrar/", web_views.close_cash, name="close_other"),
+    path("<int:cash_id>/usar/", web_views.use_cash, name="use"),
 ]
@@ -1,10 +1,13 @@
-from django.shortcuts import render, redirect
-from django.utils import timezone
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib import messages
-from django.db.models import Sum, Count
-from sales.models import Sale
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Sum
+from branches.stock import current_branch
 from .models import CashRegister
-from utils.roles import role_required
+from .terminal import bind_register, open_registers, register_for
+from utils.roles import get_user_roles, role_required
 from decimal import Decimal
 
 PAYMENT_LABELS = {
@@ -13,22 +16,22 @@ PAYMENT_LABELS = {
     "TRANSFER": "Transferencia",
 }
 
-#Estado de la caja (abierta/cerrada)
-@role_required(["AdminPOS", "VendedorPOS"])
-def cash_status(request):
-    cash = CashRegister.objects.filter(is_closed=False).first()
+def _open_cash_for(request, cash_id=None):
+    # Sin id: la caja de la sesión. Con id: otra caja abierta de la sucursal,
+    # sólo para AdminPOS o quien la abrió
+    if cash_id is None:
+        return register_for(request)
+    cash = get_object_or_404(open_registers(current_branch(request)["id"]), pk=cash_id)
+    if cash.opened_by_id != request.user.pk and "AdminPOS" not in get_user_roles(request.user):
+        return None
+    return cash
 
-    if not cash:
-        return redirect("cash_register_web:open")
+def _status_summary(cash, user):
+    # Resumen de la caja abierta; el vendedor sólo ve sus ventas
+    sales = cash.sales()
 
-    sales = Sale.objects.filter(
-        status=Sale.Status.PAID,
-        created_at__gte=cash.opened_at,
-        created_at__lte=timezone.now()
-    )
-
-    if not request.user.groups.filter(name="AdminPOS").exists():
-        sales = sales.filter(user=request.user)
+    if "AdminPOS" not in get_user_roles(user):
+        sales = sales.filter(user=user)
 
     resumen = sales.aggregate(
         total=Sum("total"),
@@ -49,75 +52,100 @@ def cash_status(request):
             "cantidad": p["cantidad"],
         })
 
-    por_vendedor = sales.values(
+    por_vendedor = list(sales.values(
         "user__username"
     ).annotate(
         total=Sum("total"),
         cantidad=Count("id")
-    )
+    ))
+
+    return {
+        "resumen": resumen,
+        "por_pago": por_pago,
+        "por_vendedor": por_vendedor,
+    }
+
+#Estado de la caja (abierta/cerrada)
+@role_required(["AdminPOS", "VendedorPOS"])
+def cash_status(request):
+    cash = _open_cash_for(request)
+
+    if not cash:
+        return redirect("cash_register_web:open")
+
+    # Las demás cajas abiertas de la sucursal, para cambiarse a una de ellas
+    others = open_registers(cash.branch_id).exclude(pk=cash.pk).select_related("opened_by").order_by("opened_at")
 
     return render(
         request,
         "cash_register/status.html",
         {
             "cash": cash,
-            "resumen": resumen,
-            "por_pago": por_pago,
-            "por_vendedor": por_vendedor,
+            "others": others,
+            "is_admin": "AdminPOS" in get_user_roles(request.user),
+            **_status_summary(cash, request.user),
         }
     )
 
+# Mismo resumen en JSON; la pantalla lo vuelve a pedir al llegar un evento "cash"
+@role_required(["AdminPOS", "VendedorPOS"])
+def cash_summary(request):
+    cash = _open_cash_for(request)
+    if not cash:
+        return JsonResponse({"ok": False, "open": False})
+
+    return JsonResponse({"ok": True, "open": True, "cash_id": cash.id, **_status_summary(cash, request.user)})
+
 @role_required(["AdminPOS", "VendedorPOS"])
 def open_cash(request):
-    if CashRegister.objects.filter(is_closed=False).exists():
-        messages.warning(request, "Ya hay una caja abierta.")
+    branch = current_branch(request)
+    mine = open_registers(branch["id"]).filter(opened_by=request.user).first()
+    if mine:
+        bind_register(request.session, mine)
+        messages.warning(request, "Ya tienes una caja abierta.")
         return redirect("cash_register_web:status")
 
     if request.method == "POST":
         opening_amount = request.POST.get("opening_amount")
-
-        CashRegister.objects.create(
-            opened_by=request.user,
-            opening_amount=opening_amount
-        )
-
+        terminal = (request.POST.get("terminal") or "").strip()[:40]
+
+        try:
+            with transaction.atomic():
+                cash = CashRegister.objects.create(
+                    opened_by=request.user,
+                    opening_amount=opening_amount,
+                    branch_id=branch["id"],
+                    terminal=terminal,
+                )
+        except IntegrityError:
+            # La terminal ya tiene caja abierta (o doble envío del formulario)
+            messages.warning(request, f"La terminal {terminal} ya tiene una caja abierta." if terminal else "Ya tienes una caja abierta.")
+            return redirect("cash_register_web:status")
+
+        bind_register(request.session, cash)
         messages.success(request, "Caja abierta correctamente.")
         return redirect("cash_register_web:status")
 
     return render(request, "cash_register/open.html")
 
+# Cobrar con otra caja abierta de la sucursal (p. ej. la terminal que abrió el encargado)
+@require_POST
+@role_required(["AdminPOS", "VendedorPOS"])
+def use_cash(request, cash_id: int):
+    cash = get_object_or_404(open_registers(current_branch(request)["id"]), pk=cash_id)
+    bind_register(request.session, cash)
+    messages.success(request, f"Ahora cobras en {cash}.")
+    return redirect("cash_register_web:status")
+
 #Cerrar
 @role_required(["AdminPOS", "VendedorPOS"])
-def close_cash(request):
-    cash = CashRegister.objects.filter(is_closed=False).first()
+def close_cash(request, cash_id=None):
+    cash = _open_cash_for(request, cash_id)
 
     if not cash:
         messages.error(request, "No hay caja abierta.")
         return redirect("cash_register_web:open")
 
-    sales = Sale.objects.filter(
-        status=Sale.Status.PAID,
-        created_at__gte=cash.opened_at,
-        created_at__lte=timezone.now()
-    )
-
-    cash_total = sum(
-        (s.total for s in sales if s.payment_method == "CASH"),
-        Decimal("0")
-    )
-    card_total = sum(
-        (s.total for s in sales if s.payment_method == "CARD"),
-        Decimal("0")
-    )
-    transfer_total = sum(
-        (s.total for s in sales if s.payment_method == "TRANSFER"),
-        Decimal("0")
-    )
-    total_sales = sum(
-        (s.total for s in sales),
-        Decimal("0")
-    )
-
     if request.method == "POST":
         # convertir a dec
         closing_amount = Decimal(
@@ -130,33 +158,29 @@ def close_cash(request):
                 request,
                 "El monto de cierre no puede ser negativo."
             )
-            return redirect("cash_register_web:close")
-
-        # cálculos seguros
-        cash.cash_total = cash_total
-        cash.card_total = card_total
-        cash.transfer_total = transfer_total
-        cash.total_sales = total_sales
-
-        cash.closing_amount = closing_amount
-        cash.difference = closing_amount - cash_total
+            return redirect(request.path)
 
-        cash.closed_by = request.user
-        cash.closed_at = timezone.now()
-        cash.is_closed = True
-        cash.save()
+        # Con la fila bloqueada: un cobro no puede quedar en la caja después
+        # de sumar sus totales (cobrar_sale la lee con el mismo bloqueo)
+        with transaction.atomic():
+            cash = CashRegister.objects.select_for_update().filter(pk=cash.pk, is_closed=False).first()
+            if cash is None:
+                messages.info(request, "La caja ya estaba cerrada.")
+                return redirect("cash_register_web:status")
+            cash.close(request.user, closing_amount)
 
         messages.success(request, "Caja cerrada correctamente.")
         return redirect("cash_register_web:status")
 
+    totals = cash.compute_totals()
     return render(
         request,
         "cash_register/close.html",
         {
             "cash": cash,
-            "cash_total": cash_total,
-            "card_total": card_total,
-            "transfer_total": transfer_total,
-            "total_sales": total_sales,
+            "cash_total": totals["cash_total"],
+            "card_total": totals["card_total"],
+            "transfer_total": totals["transfer_total"],
+            "total_sales": totals["total_sales"],
         }
     )
\ No newline at end of file
@@ -1,11 +1,18 @@
 from django import forms
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
+from utils.uniqueness import find_conflicts
 from .models import Client
 import re
 
 RFC_REGEX = re.compile(r"^[A-ZÑ&0-9]{12,13}$", re.IGNORECASE)
 
+UNIQUE_MESSAGES = {
+    "phone": "Ya existe un cliente con ese teléfono.",
+    "rfc": "Ya existe un cliente registrado con este RFC.",
+    "email": "Ya existe un cliente con ese correo.",
+}
+
 BASE = "border p-2 rounded w-full focus:outline-none focus:ring-2 focus:ring-amber-700/40"
 
 class ClientForm(forms.ModelForm):
@@ -82,12 +89,6 @@ class ClientForm(forms.ModelForm):
             raise ValidationError("El teléfono debe tener al menos 7 dígitos.")
         if len(v) > 15:
             raise ValidationError("El teléfono no debe exceder 15 dígitos.")
-
-        qs = Client.objects.filter(phone=v)
-        if self.instance and self.instance.pk:
-            qs = qs.exclude(pk=self.instance.pk)
-        if qs.exists():
-            raise ValidationError("Ya existe un cliente con ese teléfono.")
         return v
 
     def clean_rfc(self):
@@ -98,12 +99,6 @@ class ClientForm(forms.ModelForm):
 
         if not RFC_REGEX.match(rfc):
             raise ValidationError("El RFC debe tener 12 a 13 caracteres (letras y números).")
-
-        qs = Client.objects.filter(rfc__iexact=rfc)
-        if self.instance and self.instance.pk:
-            qs = qs.exclude(pk=self.instance.pk)
-        if qs.exists():
-            raise ValidationError("Ya existe un cliente registrado con este RFC.")
         return rfc
 
     def clean_email(self):
@@ -116,10 +111,26 @@ class ClientForm(forms.ModelForm):
             validate_email(v)
         except ValidationError:
             raise ValidationError("Ingresa un correo electrónico válido.")
-
-        qs = Client.objects.filter(email__iexact=v)
-        if self.instance and self.instance.pk:
-            qs = qs.exclude(pk=self.instance.pk)
-        if qs.exists():
-            raise ValidationError("Ya existe un cliente con ese correo.")
         return v
+
+    def clean(self):
+        cleaned = super().clean()
+
+        # Unicidad de phone / rfc / email en una sola consulta
+        conflicts = find_conflicts(
+            Client,
+            {
+                "phone": {"phone": cleaned.get("phone")},
+                "rfc": {"rfc__iexact": cleaned.get("rfc")},
+                "email": {"email__iexact": cleaned.get("email")},
+            },
+            exclude_pk=self.instance.pk if self.instance else None,
+        )
+        for field in ("phone", "rfc", "email"):
+            if field in conflicts:
+                self.add_error(field, UNIQUE_MESSAGES[field])
+        return cleaned
+
+    def validate_unique(self):
+        # La unicidad ya se revisó en clean() con una sola consulta
+        pass
@@ -1,6 +1,8 @@
 from django.db import models
 from django.core.validators import RegexValidator
 
+from utils.changes import ChangeTrackedModel
+
 digits_only = RegexValidator(
     regex=r"^\d+$",
     message="Solo se permiten números."
@@ -11,7 +13,7 @@ rfc_simple_12_13 = RegexValidator(
     message="El RFC debe tener 12 a 13 caracteres (letras y números)."
 )
 
-class Client(models.Model):
+class Client(ChangeTrackedModel):
     name = models.CharField(max_length=100)
     apellido_paterno = models.CharField(max_length=70, blank=True, null=True)
     apellido_materno = models.CharField(max_length=70, blank=True, null=True)
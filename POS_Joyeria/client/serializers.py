@@ -1,13 +1,31 @@
 from rest_framework import serializers
+from utils.uniqueness import find_conflicts
 from .models import Client
 import re
 
 RFC_REGEX = re.compile(r"^[A-ZÑ&0-9]{12,13}$", re.IGNORECASE)
+
+UNIQUE_MESSAGES = {
+    "phone": "Ya existe un cliente con ese teléfono.",
+    "rfc": "Ya existe un cliente con este RFC.",
+    "email": "Ya existe un cliente con ese correo.",
+}
+
+
 class ClientSerializer(serializers.ModelSerializer):
+    UNIQUE_MESSAGES = UNIQUE_MESSAGES
+
     class Meta:
         model = Client
         fields = "__all__"
 
+        # La unicidad se revisa en validate() con una sola consulta
+        extra_kwargs = {
+            "phone": {"validators": []},
+            "email": {"validators": []},
+            "rfc": {"validators": []},
+        }
+
     def validate_name(self, value):
         v = (value or "").strip()
         if not v:
@@ -52,25 +70,37 @@ class ClientSerializer(serializers.ModelSerializer):
                 "RFC inválido. Debe tener 12 a 13 caracteres (letras y números)."
             )
 
-        qs = Client.objects.filter(rfc__iexact=v)
-        if self.instance:
-            qs = qs.exclude(pk=self.instance.pk)
-        if qs.exists():
-            raise serializers.ValidationError("Ya existe un cliente con este RFC.")
-
         return v
 
     def validate_email(self, value):
-        # EmailField ya valida el formato; aquí solo cuidamos unicidad case-insensitive
+        # EmailField ya valida el formato
         if not value:
             return value
+        return value.strip()
 
-        v = value.strip()
-        qs = Client.objects.filter(email__iexact=v)
+    @staticmethod
+    def unique_checks(attrs):
+        # phone exacto, rfc/email case-insensitive
+        return {
+            "phone": {"phone": attrs.get("phone")},
+            "rfc": {"rfc__iexact": attrs.get("rfc")},
+            "email": {"email__iexact": attrs.get("email")},
+        }
 
-        if self.instance:
-            qs = qs.exclude(pk=self.instance.pk)
+    def validate(self, attrs):
+        # En alta masiva la unicidad se revisa por lote (utils.bulk)
+        if self.context.get("bulk"):
+            return attrs
 
-        if qs.exists():
-            raise serializers.ValidationError("Ya existe un cliente con ese correo.")
-        return v
+        # Todo en una sola consulta
+        conflicts = find_conflicts(
+            Client,
+            self.unique_checks(attrs),
+            exclude_pk=self.instance.pk if self.instance else None,
+        )
+
+        errors = {field: UNIQUE_MESSAGES[field] for field in conflicts}
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        return attrs
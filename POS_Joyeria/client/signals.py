@@ -0,0 +1,7 @@
+from utils.cache import connect_invalidation
+from .models import Client
+
+
+def connect_signals():
+    # Cambios en clientes -> invalida búsquedas y reportes en caché
+    connect_invalidation(Client)
@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, tag
 from django.urls import reverse, resolve
 from django.db.utils import IntegrityError
 from django.contrib.auth import get_user_model
@@ -8,6 +8,8 @@ from django.urls.exceptions import Resolver404
 from rest_framework.test import APITestCase
 from rest_framework import status
 
+from utils.factories import QueryBudgetMixin
+from utils.uniqueness import find_conflicts, find_conflicts_bulk
 from .models import Client
 from .forms import ClientForm
 from .serializers import ClientSerializer
@@ -201,6 +203,21 @@ class ClientSerializerTest(TestCase):
         s = ClientSerializer(data={"name": "Carlos", "rfc": "ABC9203041H2Z"})
         self.assertTrue(s.is_valid(), s.errors)
 
+    def test_unicidad_rfc_y_email_con_enie_y_acentos(self):
+        Client.objects.create(name="Peña", rfc="PEÑA920304AB1", email="josé@test.com")
+        self.assertEqual(
+            find_conflicts(Client, {"rfc": {"rfc__iexact": "peña920304ab1"}, "email": {"email__iexact": "JOSÉ@TEST.COM"}}),
+            {"rfc", "email"},
+        )
+        self.assertEqual(
+            find_conflicts_bulk(Client, [
+                {"rfc": {"rfc__iexact": "Peña920304ab1"}},
+                {"email": {"email__iexact": "JOSÉ@test.com"}},
+                {"email": {"email__iexact": "jose@test.com"}},
+            ]),
+            [{"rfc"}, {"email"}, set()],
+        )
+
 
 # API TESTS
 
@@ -245,6 +262,17 @@ class ClientApiViewsTest(APITestCase):
         self.activo.refresh_from_db()
         self.assertEqual(self.activo.name, "Activo Edit")
 
+    def test_create_view_acepta_lista(self):
+        data = [
+            {"name": "Cliente Uno", "phone": "5553334444", "email": "uno@test.com"},
+            {"name": "Cliente Dos", "phone": "5551111111"},  # teléfono ya existe
+        ]
+        resp = self.client.post(self.create_url, data, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(resp.data["results"][0]["status"], "created")
+        self.assertIn("phone", resp.data["results"][1]["errors"])
+        self.assertTrue(Client.objects.filter(email="uno@test.com").exists())
+
     @staticmethod
     def _first_existing_path(paths):
         for p in paths:
@@ -412,3 +440,13 @@ class ClientWebViewsTestCase(TestCase):
 
         self.inactivo.refresh_from_db()
         self.assertTrue(self.inactivo.is_active)
+
+
+@tag("perf")
+class ClientQueryBudgetTest(QueryBudgetMixin, TestCase):
+    perf_data = ("clients",)
+
+    def test_api_lista_clientes(self):
+        with self.assertBudget(queries=1, ms=2000):
+            res = self.client.get("/api/clients/list/")
+        self.assertEqual(len(res.json()), self.volumes["clients"])
@@ -3,6 +3,7 @@ from rest_framework import generics, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from .models import Client
+from utils.bulk import BulkCreateMixin
 from .serializers import ClientSerializer
 
 # Listar solo clientes activos /api/clients/list/
@@ -13,8 +14,8 @@ class ClientListView(generics.ListAPIView):
     def get_queryset(self):
         return Client.objects.filter(is_active=True)
 
-# Crear cliente /api/clients/create/
-class ClientCreateView(generics.CreateAPIView):
+# Crear cliente /api/clients/create/ (acepta un objeto o una lista)
+class ClientCreateView(BulkCreateMixin, generics.CreateAPIView):
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
     permission_classes = [] #permissions.IsAuthenticated
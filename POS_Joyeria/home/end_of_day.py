@@ -0,0 +1,127 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+# Cierre nocturno (manage.py end_of_day o el trabajo "home.end_of_day").
+#
+# Cada paso es idempotente y corre aunque falle uno anterior; volver a
+# correrlo el mismo día no duplica nada. `day` es el día que se cierra
+# (default: ayer, porque se programa de madrugada).
+
+
+def close_registers(day):
+    """Cierra con los totales del sistema las cajas que siguen abiertas desde `day` o antes."""
+    from cash_register.models import CashRegister
+    from sales.rollups import day_bounds
+
+    _, cutoff = day_bounds(day)
+    closed = []
+    for cash in CashRegister.objects.filter(is_closed=False, opened_at__lt=cutoff):
+        with transaction.atomic():
+            # Alguien pudo cerrarla mientras tanto
+            cash = CashRegister.objects.select_for_update().filter(pk=cash.pk, is_closed=False).first()
+            if cash is None:
+                continue
+            cash.auto_closed = True
+            cash.close(user=None, closing_amount=None)
+        closed.append(cash.pk)
+    return closed
+
+
+def build_rollups(day):
+    # Se rehacen varios días hacia atrás: cubre noches en que no corrió
+    from sales.rollups import build_daily
+
+    first = day - timedelta(days=settings.POS_EOD_ROLLUP_DAYS - 1)
+    return build_daily(first, day)
+
+
+def archive_old_sales(day):
+    # Después de los resúmenes: archivar no cambia los reportes
+    from sales.archive import archive_sales
+
+    if not settings.POS_ARCHIVE_DAYS:
+        return 0
+    return archive_sales()
+
+
+def refresh_inventory(day):
+    from inventory.ledger import take_snapshot
+    from inventory.valuation import rebuild
+
+    groups = rebuild()
+    snapshot = take_snapshot(keep=settings.POS_EOD_SNAPSHOTS_KEEP)
+    return {"groups": groups, "snapshot": snapshot.pk}
+
+
+def purge_old_rows(day):
+    from jobs.worker import purge_jobs
+    from sales.idempotency import purge_checkout_keys
+    from sync.deltas import purge_tombstones
+
+    return {
+        "checkout_keys": purge_checkout_keys(),
+        "tombstones": purge_tombstones(),
+        "jobs": purge_jobs(),
+    }
+
+
+def compact_database(vacuum=True):
+    """ANALYZE siempre; VACUUM sólo fuera de una transacción (reescribe todo el archivo)."""
+    vendor = connection.vendor
+    can_vacuum = vacuum and not connection.in_atomic_block
+    done = []
+    with connection.cursor() as cursor:
+        if vendor == "sqlite":
+            cursor.execute("ANALYZE")
+            done.append("ANALYZE")
+            if can_vacuum:
+                cursor.execute("VACUUM")
+                # Regresa al tamaño mínimo el archivo -wal
+                cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                done += ["VACUUM", "wal_checkpoint"]
+        elif vendor == "postgresql":
+            cursor.execute("VACUUM ANALYZE" if can_vacuum else "ANALYZE")
+            done.append("VACUUM ANALYZE" if can_vacuum else "ANALYZE")
+    return done
+
+
+STEPS = [
+    ("registers", "Cerrando cajas abiertas", close_registers),
+    ("rollups", "Resúmenes diarios de ventas", build_rollups),
+    ("archive", "Archivando ventas viejas", archive_old_sales),
+    ("inventory", "Valor del inventario y foto de stock", refresh_inventory),
+    ("purge", "Limpiando registros viejos", purge_old_rows),
+]
+
+
+def end_of_day(day=None, vacuum=True, progress=None):
+    """Corre todos los pasos; regresa (resultados, errores) por paso."""
+    day = day or timezone.localdate() - timedelta(days=1)
+    total = len(STEPS) + 1
+    results, errors = {}, {}
+
+    for i, (key, label, step) in enumerate(STEPS):
+        if progress:
+            progress(i, total, label)
+        try:
+            results[key] = step(day)
+        except Exception as e:
+            logger.exception("Cierre nocturno: falló el paso %s", key)
+            errors[key] = str(e)
+
+    if progress:
+        progress(len(STEPS), total, "Compactando la base de datos")
+    try:
+        results["database"] = compact_database(vacuum)
+    except Exception as e:
+        logger.exception("Cierre nocturno: falló la compactación")
+        errors["database"] = str(e)
+
+    return results, errors
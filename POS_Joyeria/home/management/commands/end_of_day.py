@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from home.end_of_day import end_of_day
+from jobs.registry import enqueue
+
+
+class Command(BaseCommand):
+    help = (
+        "Cierre nocturno (para cron, ej. 03:00): cierra cajas abiertas con los totales "
+        "del sistema, arma los resúmenes diarios de ventas, archiva ventas viejas, recalcula el inventario, "
+        "limpia registros viejos y compacta la base de datos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", default=None, help="Día a cerrar, AAAA-MM-DD (default: ayer).")
+        parser.add_argument("--no-vacuum", action="store_true", help="Sólo ANALYZE, sin VACUUM.")
+        parser.add_argument("--enqueue", action="store_true", help="Encolarlo para el worker en vez de correrlo aquí.")
+
+    def handle(self, *args, **options):
+        day = None
+        if options["date"]:
+            day = parse_date(options["date"])
+            if day is None:
+                raise CommandError("--date debe ser AAAA-MM-DD.")
+        vacuum = not options["no_vacuum"]
+
+        if options["enqueue"]:
+            job = enqueue("home.end_of_day", {"day": day.isoformat() if day else None, "vacuum": vacuum})
+            self.stdout.write(self.style.SUCCESS(f"Cierre encolado (trabajo #{job.pk})."))
+            return
+
+        results, errors = end_of_day(day, vacuum=vacuum, progress=lambda i, n, label: self.stdout.write(f"- {label}"))
+
+        registers = results.get("registers")
+        if registers is not None:
+            self.stdout.write(f"Cajas cerradas automáticamente: {len(registers)}")
+        if "rollups" in results:
+            self.stdout.write(f"Resúmenes diarios: {results['rollups']} renglones")
+        if "archive" in results:
+            self.stdout.write(f"Ventas archivadas: {results['archive']}")
+        if "inventory" in results:
+            self.stdout.write(f"Inventario: {results['inventory']['groups']} grupos, foto #{results['inventory']['snapshot']}")
+        if "purge" in results:
+            self.stdout.write("Borrados: " + ", ".join(f"{k} {v}" for k, v in results["purge"].items()))
+        if "database" in results:
+            self.stdout.write("Base de datos: " + (", ".join(results["database"]) or "sin cambios"))
+
+        if errors:
+            raise CommandError("Pasos con error: " + ", ".join(f"{k} ({v})" for k, v in errors.items()))
+        self.stdout.write(self.style.SUCCESS("Cierre nocturno terminado."))
@@ -0,0 +1,358 @@
+import random
+import time
+import unicodedata
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from branches.models import default_branch_id
+from client.models import Client
+from products.models import Category, Material, Product
+from sales.folios import folio_prefix, format_folio, reserve_block
+from sales.models import Sale, SaleItem
+from staff.models import StaffProfile
+from suppliers.models import Supplier
+from utils.bulk import bulk_created
+from utils.cache import invalidate_for_model
+from utils.http_cache import bump_table_version
+
+CATEGORIES = ["Anillos", "Collares", "Aretes", "Pulseras", "Dijes", "Cadenas", "Esclavas", "Relojes", "Broches", "Tobilleras"]
+CATEGORY_SINGULAR = {
+    "Anillos": "Anillo", "Collares": "Collar", "Aretes": "Aretes", "Pulseras": "Pulsera", "Dijes": "Dije",
+    "Cadenas": "Cadena", "Esclavas": "Esclava", "Relojes": "Reloj", "Broches": "Broche", "Tobilleras": "Tobillera",
+}
+# (material, pureza, precio por gramo aprox.)
+MATERIALS = [
+    ("Oro", "10k", 650), ("Oro", "14k", 900), ("Oro", "18k", 1150), ("Oro blanco", "14k", 950),
+    ("Oro rosa", "14k", 920), ("Plata", "925", 28), ("Plata", "950", 32), ("Platino", "950", 900),
+    ("Acero", "316L", 6),
+]
+STYLES = ["clásico", "tejido", "con zirconia", "liso", "diamantado", "vintage", "infinito", "corazón",
+          "trenzado", "con perla", "solitario", "eslabón", "cubano", "veneciano", "florentino"]
+SUPPLIER_NAMES = ["Platería Taxco", "Joyas del Centro", "Oro Fino de Jalisco", "Distribuidora Orfebre",
+                  "Casa Dorada", "Plata Mexicana", "Joyería Monterrey", "Importadora Brillante",
+                  "Talleres Guadalajara", "Metales Preciosos del Bajío"]
+NAMES = ["José", "María", "Juan", "Guadalupe", "Luis", "Ana", "Carlos", "Fernanda", "Jorge", "Sofía",
+         "Miguel", "Valeria", "Alejandro", "Daniela", "Ricardo", "Mariana", "Eduardo", "Ximena",
+         "Francisco", "Gabriela", "Javier", "Patricia", "Roberto", "Lucía", "Fernando", "Paola"]
+SURNAMES = ["Hernández", "García", "Martínez", "López", "González", "Pérez", "Rodríguez", "Sánchez",
+            "Ramírez", "Cruz", "Flores", "Gómez", "Morales", "Vázquez", "Reyes", "Jiménez", "Torres",
+            "Díaz", "Gutiérrez", "Ruiz", "Mendoza", "Aguilar", "Ortiz", "Castillo", "Romero", "Ríos"]
+LADAS = ["55", "33", "81", "222", "442", "477", "999", "664"]
+PAYMENT_WEIGHTS = [("CASH", 50), ("CARD", 35), ("TRANSFER", 15)]
+
+HOMOCLAVE = "ABCDEFGHJKLMNPQRSTUVWXYZ0123456789"
+CENT = Decimal("0.01")
+
+
+def _ascii(text):
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+
+
+def _rfc(rng, name, paterno, materno, birth):
+    """RFC de persona física: 4 letras + AAMMDD + homoclave de 3 (13 caracteres)."""
+    p = _ascii(paterno).upper()
+    vowel = next((c for c in p[1:] if c in "AEIOU"), "X")
+    letters = f"{p[0]}{vowel}{_ascii(materno)[0].upper()}{_ascii(name)[0].upper()}"
+    return f"{letters}{birth:%y%m%d}{''.join(rng.choice(HOMOCLAVE) for _ in range(3))}"
+
+
+def _phone(rng, used):
+    while True:
+        lada = rng.choice(LADAS)
+        phone = lada + "".join(rng.choice("0123456789") for _ in range(10 - len(lada)))
+        if phone not in used:
+            used.add(phone)
+            return phone
+
+
+def _weighted(rng, pairs):
+    return rng.choices([v for v, _ in pairs], weights=[w for _, w in pairs])[0]
+
+
+@contextmanager
+def _manual_created_at():
+    # bulk_create respeta created_at sólo si auto_now_add está apagado
+    field = Sale._meta.get_field("created_at")
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera datos sintéticos de joyería (proveedores, catálogo, productos, clientes, personal "
+        "e historial de ventas) con bulk_create por bloques. Misma --seed sobre la misma BD = mismos datos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--suppliers", type=int, default=8)
+        parser.add_argument("--products", type=int, default=2000)
+        parser.add_argument("--clients", type=int, default=5000)
+        parser.add_argument("--staff", type=int, default=6, help="Usuarios de personal (el primero es AdminPOS).")
+        parser.add_argument("--sales", type=int, default=20000)
+        parser.add_argument("--years", type=float, default=3, help="Años de historial de ventas.")
+        parser.add_argument("--until", default=None, help="Último día del historial (AAAA-MM-DD, default hoy).")
+        parser.add_argument("--chunk", type=int, default=5000, help="Filas por bulk_create / transacción.")
+        parser.add_argument("--password", default="pos12345", help="Contraseña del personal generado.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.chunk = max(100, options["chunk"])
+        self.used_phones = set(Client.objects.exclude(phone=None).values_list("phone", flat=True))
+        self.used_phones |= set(StaffProfile.objects.values_list("telefono", flat=True))
+        self.used_phones |= set(Supplier.objects.values_list("phone", flat=True))
+
+        until = parse_date(options["until"]) if options["until"] else timezone.localdate()
+        if until is None:
+            raise CommandError("--until debe tener formato AAAA-MM-DD.")
+
+        started = time.perf_counter()
+        categories, materials = self._catalog()
+        suppliers = self._suppliers(options["suppliers"])
+        products = self._products(options["products"], categories, materials, suppliers)
+        client_ids = self._clients(options["clients"])
+        staff = self._staff(options["staff"], options["password"])
+        if options["sales"]:
+            if not products or not staff:
+                raise CommandError("Para generar ventas hace falta al menos un producto y un usuario de personal.")
+            self._sales(options["sales"], options["years"], until, products, client_ids, staff)
+
+        for model in (Category, Material, Supplier, Product, Client):
+            bump_table_version(model)
+            invalidate_for_model(model)
+
+        self.stdout.write(self.style.SUCCESS(f"Listo en {time.perf_counter() - started:.1f} s."))
+
+    # Catálogo
+
+    def _catalog(self):
+        categories = [Category.objects.get_or_create(name=name)[0] for name in CATEGORIES]
+        materials = []
+        for name, purity, per_gram in MATERIALS:
+            material = Material.objects.get_or_create(name=name, purity=purity)[0]
+            materials.append((material, Decimal(per_gram)))
+        return categories, materials
+
+    def _suppliers(self, count):
+        existing = set(Supplier.objects.values_list("code", flat=True))
+        new = []
+        for i in range(count):
+            name = SUPPLIER_NAMES[i % len(SUPPLIER_NAMES)]
+            initials = "".join(w[0] for w in _ascii(name).split() if w[0].isupper())[:2]
+            n = i + 1
+            while f"{initials}{n:02d}" in existing:
+                n += count
+            code = f"{initials}{n:02d}"
+            existing.add(code)
+            new.append(Supplier(
+                name=name,
+                code=code,
+                phone=_phone(self.rng, self.used_phones),
+                email=f"ventas.{code.lower()}@proveedor.mx",
+                notes="Generado por seed_data",
+            ))
+        Supplier.objects.bulk_create(new)
+        self.stdout.write(f"Proveedores: {len(new)}")
+        return list(Supplier.objects.filter(code__in=[s.code for s in new]).order_by("id"))
+
+    def _products(self, count, categories, materials, suppliers):
+        if not count:
+            return []
+        if not suppliers:
+            suppliers = list(Supplier.objects.order_by("id")[:10])
+            if not suppliers:
+                raise CommandError("No hay proveedores para asignar a los productos.")
+
+        created = 0
+        for start in range(0, count, self.chunk):
+            batch = []
+            for _ in range(min(self.chunk, count - start)):
+                category = self.rng.choice(categories)
+                material, per_gram = self.rng.choice(materials)
+                weight = Decimal(self.rng.uniform(0.8, 25)).quantize(CENT)
+                purchase = (weight * per_gram * Decimal(self.rng.uniform(0.85, 1.1))).quantize(CENT)
+                margin = Decimal(self.rng.choice([1.6, 1.8, 2.0, 2.2, 2.5]))
+                batch.append(Product(
+                    name=f"{CATEGORY_SINGULAR[category.name]} {self.rng.choice(STYLES)} {material.name} {material.purity}",
+                    category=category,
+                    material=material,
+                    supplier=self.rng.choice(suppliers),
+                    purchase_price=purchase,
+                    sale_price=(purchase * margin).quantize(Decimal("1")),
+                    weight=weight,
+                    stock=self.rng.choice([0, 1, 1, 2, 2, 3, 4, 5, 8, 12, 20]),
+                ))
+            # Mismo formato que generate_code(): proveedor + 3 letras + consecutivo por categoría
+            Product.assign_codes(batch)
+            with transaction.atomic():
+                Product.objects.bulk_create(batch, batch_size=self.chunk)
+                bulk_created.send(sender=Product, instances=batch)
+            created += len(batch)
+        self.stdout.write(f"Productos: {created}")
+        return list(Product.objects.filter(is_active=True).order_by("id").values_list("id", "name", "sale_price"))
+
+    # Personas
+
+    def _clients(self, count):
+        used_rfc = set(Client.objects.exclude(rfc=None).values_list("rfc", flat=True))
+        offset = Client.objects.count()
+        for start in range(0, count, self.chunk):
+            batch = []
+            for i in range(start, min(start + self.chunk, count)):
+                name, paterno, materno = self.rng.choice(NAMES), self.rng.choice(SURNAMES), self.rng.choice(SURNAMES)
+                rfc = None
+                if self.rng.random() < 0.4:
+                    birth = datetime(1950, 1, 1) + timedelta(days=self.rng.randrange(365 * 55))
+                    rfc = _rfc(self.rng, name, paterno, materno, birth)
+                    if rfc in used_rfc:
+                        rfc = None
+                    else:
+                        used_rfc.add(rfc)
+                email = None
+                if self.rng.random() < 0.6:
+                    email = f"{_ascii(name).lower()}.{_ascii(paterno).lower()}{offset + i + 1}@correo.mx"
+                batch.append(Client(
+                    name=name,
+                    apellido_paterno=paterno,
+                    apellido_materno=materno,
+                    phone=_phone(self.rng, self.used_phones),
+                    email=email,
+                    rfc=rfc,
+                    es_mayorista=self.rng.random() < 0.05,
+                ))
+            with transaction.atomic():
+                Client.objects.bulk_create(batch, batch_size=self.chunk)
+        self.stdout.write(f"Clientes: {count}")
+        return list(Client.objects.filter(is_active=True).order_by("id").values_list("id", flat=True))
+
+    def _staff(self, count, password):
+        admin_group, _ = Group.objects.get_or_create(name="AdminPOS")
+        seller_group, _ = Group.objects.get_or_create(name="VendedorPOS")
+        taken = set(User.objects.values_list("username", flat=True))
+        hashed = make_password(password)  # un solo hash: PBKDF2 es lento a propósito
+
+        users, profiles = [], []
+        for i in range(count):
+            role = "admin" if i == 0 else "vendedor"
+            n = i + 1
+            while f"{role}{n}" in taken:
+                n += count
+            username = f"{role}{n}"
+            taken.add(username)
+            name, paterno, materno = self.rng.choice(NAMES), self.rng.choice(SURNAMES), self.rng.choice(SURNAMES)
+            users.append(User(
+                username=username, password=hashed, first_name=name, last_name=paterno, is_staff=(i == 0),
+            ))
+            profiles.append((name, paterno, materno))
+
+        User.objects.bulk_create(users)
+        users = list(User.objects.filter(username__in=[u.username for u in users]).order_by("id"))
+        Through = User.groups.through
+        Through.objects.bulk_create([
+            Through(user_id=u.id, group_id=(admin_group if u.username.startswith("admin") else seller_group).id)
+            for u in users
+        ])
+        StaffProfile.objects.bulk_create([
+            StaffProfile(
+                user=u, nombre=name, apellido_paterno=paterno, apellido_materno=materno,
+                telefono=_phone(self.rng, self.used_phones), direccion="Generado por seed_data",
+            )
+            for u, (name, paterno, materno) in zip(users, profiles)
+        ])
+        if users:
+            self.stdout.write(f"Personal: {len(users)} (contraseña: {password})")
+        return [u.id for u in users] or list(
+            User.objects.filter(groups__name__in=["AdminPOS", "VendedorPOS"]).order_by("id").values_list("id", flat=True)
+        )
+
+    # Historial
+
+    def _sales(self, count, years, until, products, client_ids, staff_ids):
+        tz = timezone.get_current_timezone()
+        end = timezone.make_aware(datetime.combine(until, datetime.max.time()), tz)
+        span = int(timedelta(days=365 * years).total_seconds())
+        # Ordenadas por fecha para que los ids sigan el tiempo, como en la tienda
+        offsets = sorted(self.rng.randrange(span) for _ in range(count))
+
+        next_id = (Sale.objects.aggregate(m=Max("id"))["m"] or 0) + 1
+        # Folios apartados del mismo contador que usa el POS (sin choques con ventas reales)
+        prefix = folio_prefix()
+        folios = iter(reserve_block(prefix, count))
+        # Historial en la sucursal por defecto (sin esto cada Sale() la consulta)
+        self.branch_id = default_branch_id()
+        prices = [(pid, name, Decimal(price)) for pid, name, price in products]
+        started = time.perf_counter()
+
+        with _manual_created_at():
+            for start in range(0, count, self.chunk):
+                sales, items = [], []
+                for offset in offsets[start:start + self.chunk]:
+                    sale, sale_items = self._one_sale(next_id, end - timedelta(seconds=span - offset), prices, client_ids, staff_ids)
+                    sale.folio = format_folio(prefix, next(folios))
+                    sales.append(sale)
+                    items.extend(sale_items)
+                    next_id += 1
+                with transaction.atomic():
+                    Sale.objects.bulk_create(sales, batch_size=self.chunk)
+                    SaleItem.objects.bulk_create(items, batch_size=self.chunk)
+                done = min(start + self.chunk, count)
+                self.stdout.write(f"Ventas: {done}/{count} ({time.perf_counter() - started:.1f} s)")
+
+        # ids explícitos: en PostgreSQL hay que mover la secuencia
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Sale]):
+                cursor.execute(sql)
+
+    def _one_sale(self, sale_id, created_at, prices, client_ids, staff_ids):
+        rng = self.rng
+        lines = []
+        subtotal = Decimal("0")
+        for pid, name, price in rng.sample(prices, min(len(prices), rng.choice([1, 1, 1, 2, 2, 3]))):
+            qty = 1 if rng.random() < 0.9 else 2
+            line_total = price * qty
+            subtotal += line_total
+            lines.append(SaleItem(
+                sale_id=sale_id, product_id=pid, product_name=name, unit_price=price, qty=qty, line_total=line_total,
+            ))
+
+        discount_pct = Decimal(rng.choice([0, 0, 0, 0, 0, 0, 5, 10, 15]))
+        discount = (subtotal * discount_pct / 100).quantize(CENT)
+        total = subtotal - discount
+        method = _weighted(rng, PAYMENT_WEIGHTS)
+        paid = total
+        if method == "CASH":
+            paid = ((total / 100).to_integral_value(rounding="ROUND_CEILING") * 100).quantize(CENT)
+
+        sale = Sale(
+            id=sale_id,
+            status=Sale.Status.CANCELLED if rng.random() < 0.03 else Sale.Status.PAID,
+            user_id=rng.choice(staff_ids),
+            discount_pct=discount_pct,
+            subtotal=subtotal,
+            discount_amount=discount,
+            total=total,
+            payment_method=method,
+            amount_paid=paid,
+            change_amount=paid - total,
+            created_at=created_at,
+            branch_id=self.branch_id,
+        )
+        if client_ids and rng.random() < 0.6:
+            sale.client_id = rng.choice(client_ids)
+        else:
+            sale.quick_client_name = f"{rng.choice(NAMES)} {rng.choice(SURNAMES)}"
+            sale.quick_client_phone = _phone(rng, set())
+        return sale, lines
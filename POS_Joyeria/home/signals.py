@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from utils.cache import roles_cache
+from utils.roles import invalidate_user_roles
+
+
+def _groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        # user.groups.add/remove/clear(...)
+        invalidate_user_roles(instance)
+        return
+    # group.user_set.add(...): no sabemos qué usuarios quedaron -> todo
+    roles_cache.invalidate()
+
+
+def _group_changed(sender, **kwargs):
+    # Renombrar / borrar un grupo afecta a todos sus usuarios
+    roles_cache.invalidate()
+
+
+def connect_signals():
+    User = get_user_model()
+    m2m_changed.connect(_groups_changed, sender=User.groups.through, dispatch_uid="roles-groups-changed")
+    post_save.connect(_group_changed, sender=Group, dispatch_uid="roles-group-save")
+    post_delete.connect(_group_changed, sender=Group, dispatch_uid="roles-group-delete")
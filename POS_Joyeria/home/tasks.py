@@ -0,0 +1,15 @@
+from django.utils.dateparse import parse_date
+
+from jobs.registry import task
+
+from .end_of_day import end_of_day
+
+
+# Programado en POS_JOBS_SCHEDULE; el worker lo encola una vez al día
+@task("home.end_of_day", max_attempts=2)
+def nightly(job, day=None, vacuum=True):
+    results, errors = end_of_day(parse_date(day) if day else None, vacuum=vacuum, progress=job.progress)
+    if errors:
+        # Los pasos son idempotentes: el reintento vuelve a correr todo
+        raise RuntimeError("Pasos con error: " + ", ".join(f"{k} ({v})" for k, v in errors.items()))
+    return results
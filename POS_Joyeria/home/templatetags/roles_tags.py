@@ -1,5 +1,7 @@
 from django import template
 
+from utils.roles import get_user_roles
+
 register = template.Library()
 
 @register.filter(name="in_group")
@@ -8,4 +10,5 @@ def in_group(user, group_name: str) -> bool:
         return False
     if getattr(user, "is_superuser", False):
         return True
-    return user.groups.filter(name=group_name).exists()
+    # Un query por request como máximo (ver utils.roles.get_user_roles)
+    return group_name in get_user_roles(user)
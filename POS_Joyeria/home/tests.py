@@ -1,9 +1,29 @@
-from django.test import TestCase, RequestFactory
+import os
+import re
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, RequestFactory, override_settings
 from django.contrib.auth import get_user_model
-from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.models import AnonymousUser, Group
 from django.contrib.messages.storage.fallback import FallbackStorage
 from django.contrib.sessions.middleware import SessionMiddleware
+from django.template import Context, Template
+from django.urls import reverse
+from django.utils import timezone
 from home.views import login_pos, logout_pos, post_login_redirect
+from client.models import Client
+from products.models import Category, Product
+from sales.models import FolioSequence, Sale, SaleItem
+from suppliers.models import Supplier
+from utils.cache import NamedCache, cache_stats, catalog_cache, reset_cache_stats
+from utils.perf import clear_perf_buffer, percentile, perf_summary, recent_requests
+from utils.roles import get_user_roles
 
 User = get_user_model()
 
@@ -118,3 +138,283 @@ class HomeViewsTest(TestCase):
         self.assertEqual(res.status_code, 302)
         self.assertIn("login", res["Location"])
         self.assertIn("next=/productos/", res["Location"])
+
+
+class CacheLayerTest(TestCase):
+    def setUp(self):
+        reset_cache_stats()
+        self.admin_group = Group.objects.create(name="AdminPOS")
+        self.user = User.objects.create_user(username="admin", password="12345678", is_staff=True)
+
+    def test_named_cache_cuenta_hits_y_misses(self):
+        cache = NamedCache("search")
+        self.assertIsNone(cache.get("q:anillo"))
+        cache.set("q:anillo", [1, 2])
+        self.assertEqual(cache.get("q:anillo"), [1, 2])
+
+        stats = cache_stats()["search"]
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_invalidate_sube_version_y_descarta_entradas(self):
+        catalog_cache.set("lista", ["a"])
+        catalog_cache.invalidate()
+        self.assertIsNone(catalog_cache.get("lista"))
+
+    def test_guardar_modelo_invalida_catalogo(self):
+        catalog_cache.set("lista", ["a"])
+        Category.objects.create(name="Anillos")
+        self.assertIsNone(catalog_cache.get("lista"))
+
+    def test_roles_en_cache_y_se_invalidan_al_cambiar_grupos(self):
+        self.assertEqual(get_user_roles(self.user), frozenset())
+
+        self.user.groups.add(self.admin_group)
+        fresh = User.objects.get(pk=self.user.pk)
+        self.assertEqual(get_user_roles(fresh), frozenset({"AdminPOS"}))
+
+        # Otro request (nuevo objeto user) usa la caché, sin query
+        other = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertIn("AdminPOS", get_user_roles(other))
+
+    def test_roles_de_otro_proceso_caducan_pronto_con_locmem(self):
+        self.assertEqual(get_user_roles(self.user), frozenset())
+        # Otro worker agrega el grupo: aquí no llega m2m_changed
+        User.groups.through.objects.create(user=self.user, group=self.admin_group)
+
+        now = time.time()
+        with patch("time.time", return_value=now + settings.POS_ROLES_LOCAL_TTL - 1):
+            self.assertEqual(get_user_roles(User.objects.get(pk=self.user.pk)), frozenset())
+        with patch("time.time", return_value=now + settings.POS_ROLES_LOCAL_TTL + 1):
+            self.assertEqual(get_user_roles(User.objects.get(pk=self.user.pk)), frozenset({"AdminPOS"}))
+
+    def test_in_group_un_query_por_request(self):
+        self.user.groups.add(self.admin_group)
+        user = User.objects.get(pk=self.user.pk)
+        tpl = Template(
+            "{% load roles_tags %}"
+            "{% if user|in_group:'AdminPOS' %}A{% endif %}"
+            "{% if user|in_group:'VendedorPOS' %}V{% endif %}"
+            "{% if user|in_group:'AdminPOS' %}A{% endif %}"
+        )
+        with self.assertNumQueries(1):
+            out = tpl.render(Context({"user": user}))
+        self.assertEqual(out, "AA")
+
+    def test_cache_stats_view_solo_admin(self):
+        url = reverse("cache_stats")
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.user.groups.add(self.admin_group)
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("catalog", res.json()["caches"])
+
+
+class PerfInstrumentationTest(TestCase):
+    def setUp(self):
+        clear_perf_buffer()
+        self.admin_group = Group.objects.create(name="AdminPOS")
+        self.user = User.objects.create_user(username="admin", password="12345678", is_staff=True)
+        self.user.groups.add(self.admin_group)
+        self.client.force_login(self.user)
+
+    def test_registra_queries_tiempo_y_plantilla_por_vista(self):
+        res = self.client.get(reverse("products_web:list"))
+        self.assertEqual(res.status_code, 200)
+
+        record = recent_requests(limit=1)[0]
+        self.assertEqual(record["view"], "products_web:list")
+        self.assertEqual(record["status"], 200)
+        self.assertGreater(record["queries"], 0)
+        self.assertGreater(record["template_ms"], 0)
+        self.assertGreaterEqual(record["ms"], record["db_ms"])
+
+        summary = perf_summary()
+        self.assertEqual(summary[0]["view"], "products_web:list")
+        self.assertEqual(summary[0]["count"], 1)
+
+    @override_settings(POS_PERF_SERVER_TIMING=True)
+    def test_header_server_timing(self):
+        res = self.client.get(reverse("products_web:list"))
+        self.assertIn("total;dur=", res["Server-Timing"])
+        self.assertIn("db;dur=", res["Server-Timing"])
+
+    @override_settings(POS_PERF_ENABLED=False)
+    def test_desactivado_no_registra(self):
+        self.client.get(reverse("products_web:list"))
+        self.assertEqual(recent_requests(), [])
+
+    def test_middleware_async_no_pasa_por_sync_to_async(self):
+        import asyncio
+
+        from asgiref.sync import iscoroutinefunction, sync_to_async
+        from django.http import HttpResponse
+
+        from utils.perf import PerfMiddleware
+
+        async def view(request):
+            await sync_to_async(lambda: list(Group.objects.all()))()
+            return HttpResponse("ok")
+
+        middleware = PerfMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        res = asyncio.run(middleware(RequestFactory().get("/async/")))
+        self.assertEqual(res.status_code, 200)
+        record = recent_requests(limit=1)[0]
+        self.assertEqual(record["path"], "/async/")
+        self.assertEqual(record["queries"], 1)
+
+    def test_techo_de_latencia_solo_con_tag_perf(self):
+        from POS.test_runner import PosTestRunner
+        from utils.factories import QueryBudgetMixin
+
+        budget = QueryBudgetMixin()
+        budget.fail = self.fail
+        with patch.dict(os.environ):
+            os.environ.pop("POS_PERF_LATENCY_FACTOR", None)
+            # Corrida normal: el tiempo no cuenta, las queries sí
+            with budget.assertBudget(queries=1, ms=1):
+                time.sleep(0.01)
+            with self.assertRaises(AssertionError):
+                with budget.assertBudget(queries=0, ms=1000):
+                    list(Group.objects.all())
+
+            PosTestRunner(tags=["perf"])
+            with self.assertRaises(AssertionError):
+                with budget.assertBudget(queries=1, ms=1):
+                    time.sleep(0.01)
+
+    def test_percentiles(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertIsNone(percentile([], 50))
+
+    def test_tablero_y_json_solo_admin(self):
+        self.client.get(reverse("products_web:list"))
+        res = self.client.get(reverse("perf_json"))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()["views"][0]["view"], "products_web:list")
+        self.assertEqual(self.client.get(reverse("perf_dashboard")).status_code, 200)
+
+        self.user.groups.remove(self.admin_group)
+        user = User.objects.get(pk=self.user.pk)
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse("perf_json")).status_code, 403)
+
+
+class SeedDataCommandTest(TestCase):
+    def test_genera_datos_validos(self):
+        call_command(
+            "seed_data", seed=3, suppliers=2, products=30, clients=20, staff=3, sales=200,
+            years=2, until="2025-06-30", chunk=100, stdout=StringIO(),
+        )
+        self.assertEqual(Product.objects.count(), 30)
+        self.assertEqual(Client.objects.count(), 20)
+        self.assertEqual(Sale.objects.count(), 200)
+        self.assertGreaterEqual(SaleItem.objects.count(), 200)
+
+        # Código con la regla de generate_code(): proveedor + 3 letras + consecutivo
+        p = Product.objects.select_related("supplier", "category").first()
+        self.assertRegex(p.code, rf"^{p.supplier.code}{p.category.name[:3].upper()}\d{{3,}}$")
+
+        for c in Client.objects.all():
+            c.full_clean()
+            self.assertRegex(c.phone, r"^\d{10}$")
+
+        self.assertTrue(User.objects.filter(groups__name="AdminPOS", staff_profile__isnull=False).exists())
+        self.assertEqual(User.objects.filter(groups__name="VendedorPOS").count(), 2)
+
+        first, last = Sale.objects.order_by("created_at").first(), Sale.objects.order_by("created_at").last()
+        self.assertGreater((last.created_at - first.created_at).days, 300)
+        self.assertLessEqual(last.created_at.date().isoformat(), "2025-07-01")
+        self.assertTrue(re.match(r"^V\d{6}$", last.folio))
+        self.assertEqual(last.folio, "V000200")
+
+        # Los ids y folios siguientes no chocan con los generados
+        venta = Sale.objects.create(total=1)
+        self.assertGreater(venta.id, last.id)
+        self.assertEqual(FolioSequence.objects.get(prefix="V").next_value, 201)
+
+    def test_misma_semilla_mismos_datos(self):
+        # Misma semilla y misma BD de partida -> mismos datos
+        options = dict(seed=9, suppliers=1, products=5, clients=0, staff=0, sales=0, stdout=StringIO())
+        call_command("seed_data", **options)
+        first = list(Product.objects.order_by("id").values_list("code", "name", "sale_price"))
+
+        Product.objects.all().delete()
+        Supplier.objects.all().delete()
+        call_command("seed_data", **options)
+        self.assertEqual(list(Product.objects.order_by("id").values_list("code", "name", "sale_price")), first)
+
+
+class EndOfDayTest(TestCase):
+    def setUp(self):
+        from cash_register.models import CashRegister
+
+        self.user = get_user_model().objects.create_user(username="cajero", password="x")
+        self.yesterday = timezone.localdate() - timedelta(days=1)
+        self.old_cash = CashRegister.objects.create(opened_by=self.user, opening_amount=0, terminal="Caja 1")
+        CashRegister.objects.filter(pk=self.old_cash.pk).update(opened_at=timezone.now() - timedelta(days=1, hours=2))
+        otro = get_user_model().objects.create_user(username="cajero2", password="x")
+        self.today_cash = CashRegister.objects.create(opened_by=otro, opening_amount=0, terminal="Caja 2")
+
+        ayer = timezone.now() - timedelta(days=1)
+        for folio, total, status in (("E1", "100.00", Sale.Status.PAID), ("E2", "50.00", Sale.Status.CANCELLED)):
+            sale = Sale.objects.create(
+                folio=folio, status=status, total=Decimal(total), user=self.user, cash_register=self.old_cash
+            )
+            Sale.objects.filter(pk=sale.pk).update(created_at=ayer)
+
+    def test_cierra_cajas_viejas_y_arma_resumenes(self):
+        from cash_register.models import CashRegister
+        from sales.models import DailySales
+
+        out = StringIO()
+        call_command("end_of_day", "--no-vacuum", stdout=out)
+        self.assertIn("Cierre nocturno terminado", out.getvalue())
+        self.assertIn("Cajas cerradas automáticamente: 1", out.getvalue())
+
+        self.old_cash.refresh_from_db()
+        self.assertTrue(self.old_cash.is_closed)
+        self.assertTrue(self.old_cash.auto_closed)
+        self.assertIsNone(self.old_cash.closed_by)
+        self.assertIsNone(self.old_cash.closing_amount)
+        self.assertEqual(self.old_cash.total_sales, Decimal("100.00"))
+        self.assertFalse(CashRegister.objects.get(pk=self.today_cash.pk).is_closed)
+
+        row = DailySales.objects.get(day=self.yesterday)
+        self.assertEqual((row.sales_count, row.total, row.cancelled_count), (1, Decimal("100.00"), 1))
+
+        # Idempotente
+        call_command("end_of_day", "--no-vacuum", stdout=StringIO())
+        self.assertEqual(DailySales.objects.filter(day=self.yesterday).count(), 1)
+
+    def test_encolar_para_el_worker(self):
+        from jobs.models import Job
+        from jobs.worker import run_pending
+
+        call_command("end_of_day", "--no-vacuum", "--enqueue", stdout=StringIO())
+        job = Job.objects.get(name="home.end_of_day")
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.DONE)
+        self.assertEqual(job.result["registers"], [self.old_cash.pk])
+
+    def test_fecha_invalida(self):
+        from django.core.management.base import CommandError
+
+        with self.assertRaises(CommandError):
+            call_command("end_of_day", "--date", "ayer", stdout=StringIO())
+
+
+class CompactDatabaseTest(TransactionTestCase):
+    def test_vacuum_fuera_de_transaccion(self):
+        from home.end_of_day import compact_database
+
+        self.assertIn("ANALYZE", compact_database(vacuum=True)[0])
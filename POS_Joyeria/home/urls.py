@@ -1,8 +1,11 @@
 from django.urls import path
-from .views import login_pos, logout_pos, post_login_redirect
+from .views import cache_stats_view, login_pos, logout_pos, perf_dashboard, perf_json, post_login_redirect
 
 urlpatterns = [
     path("login/", login_pos, name="login_pos"),
     path("logout/", logout_pos, name="logout_pos"),
     path("", post_login_redirect, name="post_login"),
+    path("cache/stats/", cache_stats_view, name="cache_stats"),
+    path("perf/", perf_dashboard, name="perf_dashboard"),
+    path("perf/json/", perf_json, name="perf_json"),
 ]
@@ -1,9 +1,15 @@
+from django.conf import settings
+from django.http import JsonResponse
 from django.shortcuts import redirect, render
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.utils.http import url_has_allowed_host_and_scheme
 from django.urls import reverse
 
+from utils.cache import cache_stats
+from utils.perf import perf_summary, recent_requests
+from utils.roles import role_required
+
 
 def post_login_redirect(request):
     if not request.user.is_authenticated:
@@ -54,3 +60,32 @@ def logout_pos(request):
         return redirect(f"{reverse('login_pos')}?next={next_url}")
 
     return redirect("login_pos")
+
+
+@role_required(["AdminPOS"])
+def cache_stats_view(request):
+    # Métricas de las cachés con nombre (contadores del proceso actual)
+    return JsonResponse({
+        "backend": settings.POS_CACHE_BACKEND,
+        "caches": cache_stats(),
+    })
+
+
+@role_required(["AdminPOS"])
+def perf_dashboard(request):
+    # Percentiles por vista (buffer en memoria de este proceso)
+    return render(request, "home/perf.html", {
+        "views": perf_summary(),
+        "recent": recent_requests(limit=50),
+        "enabled": settings.POS_PERF_ENABLED,
+    })
+
+
+@role_required(["AdminPOS"])
+def perf_json(request):
+    limit = request.GET.get("limit", "")
+    return JsonResponse({
+        "enabled": settings.POS_PERF_ENABLED,
+        "views": perf_summary(),
+        "recent": recent_requests(limit=int(limit) if limit.isdigit() else 100),
+    })
@@ -0,0 +1,263 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q, Subquery, Sum
+from django.utils import timezone
+
+
+# Kardex (StockMovement) y fotos periódicas del stock (StockSnapshot).
+#
+# Cada save() de Product que cambia el stock deja un movimiento (signals.py).
+# Dentro de `with stock_movements(kind, ...)` los movimientos se juntan y se
+# insertan en un solo bulk_create al salir; fuera de un bloque se guardan
+# uno por uno como ajuste. Las diferencias de valuación del bloque también se
+# guardan al salir (valuation.py).
+#
+# Stock en la fecha D = foto más reciente antes de D + movimientos posteriores
+# a esa foto hasta D. Las fotos se toman con `manage.py stock_snapshot`.
+# "Posteriores" no es sólo id > último id de la foto: un cobro que empezó
+# antes puede confirmar un id menor después, así que la foto guarda qué ids
+# de los últimos POS_SNAPSHOT_OVERLAP_SECONDS ya incluye.
+
+_batch = ContextVar("inventory_stock_movements", default=None)
+
+
+class _Batch:
+    def __init__(self, kind, sale=None, user=None, note=""):
+        self.kind = kind
+        self.sale = sale
+        self.user = user
+        self.note = note
+        self.movements = []
+        # Existencias mínimas por categoría, leídas una vez por bloque, y
+        # diferencias de valuación por grupo, un solo INSERT al salir (valuation.py)
+        self.thresholds = None
+        self.valuation = {}
+        # Tablas cambiadas en el bloque: su versión (ETag) sube una vez al salir
+        self.tables = set()
+
+
+def current_batch():
+    # Bloque stock_movements() activo (None fuera de uno)
+    return _batch.get()
+
+
+def _user_id(user):
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+@contextmanager
+def stock_movements(kind, *, sale=None, user=None, note=""):
+    """Junta los movimientos del bloque y los guarda con un solo INSERT."""
+    batch = _Batch(kind, sale, user, note)
+    token = _batch.set(batch)
+    try:
+        yield batch
+    finally:
+        _batch.reset(token)
+    # Si hubo excepción no se llega aquí: la operación no se aplicó
+    flush(batch)
+
+
+def flush(batch):
+    from utils.http_cache import bump_table_version
+
+    from .models import StockMovement
+    from .valuation import save_deltas
+
+    save_deltas(batch.valuation)
+    batch.valuation = {}
+    for model in batch.tables:
+        bump_table_version(model)
+    batch.tables = set()
+    if not batch.movements:
+        return
+    sale_id = batch.sale.pk if batch.sale is not None else None
+    for m in batch.movements:
+        # La venta se crea dentro del bloque: se asigna al final
+        if m.sale_id is None:
+            m.sale_id = sale_id
+    StockMovement.objects.bulk_create(batch.movements)
+    batch.movements = []
+
+
+def record_movement(product_id, qty, kind=None):
+    from .models import StockMovement
+
+    if not qty:
+        return
+    batch = _batch.get()
+    if batch is None:
+        StockMovement.objects.create(product_id=product_id, qty=qty, kind=kind or StockMovement.Kind.ADJUST)
+        return
+    batch.movements.append(StockMovement(
+        product_id=product_id,
+        qty=qty,
+        kind=batch.kind,
+        user_id=_user_id(batch.user),
+        note=batch.note,
+    ))
+
+
+def record_imported(products):
+    # Altas masivas: un renglón IMPORT por producto con stock inicial
+    from .models import StockMovement
+
+    batch = _batch.get()
+    movements = [
+        StockMovement(
+            product_id=p.pk,
+            qty=p.stock,
+            kind=StockMovement.Kind.IMPORT,
+            user_id=_user_id(batch.user) if batch else None,
+            note=batch.note if batch else "",
+        )
+        for p in products
+        if p.stock
+    ]
+    if batch is not None:
+        batch.movements.extend(movements)
+    else:
+        StockMovement.objects.bulk_create(movements, batch_size=1000)
+
+
+# Fotos
+
+def _has_field(model, name):
+    return any(f.name == name for f in model._meta.get_fields())
+
+
+@contextmanager
+def _consistent_read():
+    # Todas las lecturas ven el mismo estado: en SQLite la transacción ya lo
+    # hace (BEGIN IMMEDIATE); en PostgreSQL hace falta REPEATABLE READ
+    outer = connection.in_atomic_block
+    with transaction.atomic():
+        if connection.vendor == "postgresql" and not outer:
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        yield
+
+
+def take_snapshot(apps=None, keep=None):
+    """Guarda el stock actual de todos los productos; `keep` = cuántas fotos conservar."""
+    registry = apps or django_apps
+    Product = registry.get_model("products", "Product")
+    StockMovement = registry.get_model("inventory", "StockMovement")
+    StockSnapshot = registry.get_model("inventory", "StockSnapshot")
+    StockSnapshotLine = registry.get_model("inventory", "StockSnapshotLine")
+
+    now = timezone.now()
+    since = now - timedelta(seconds=settings.POS_SNAPSHOT_OVERLAP_SECONDS)
+    with _consistent_read():
+        last = StockMovement.objects.order_by("-id").values("id")[:1]
+        rows = list(
+            Product.objects.annotate(last_movement=Subquery(last))
+            .values_list("id", "stock", "last_movement").order_by()
+        )
+        # Sin productos no hay stock que guardar: la base es el kardex completo
+        last_id = (rows[0][2] or 0) if rows else 0
+        stock = [(pid, s) for pid, s, _ in rows if s]
+
+        # Movimientos recientes que esta foto ya incluye; uno de la ventana que
+        # no esté aquí se confirmó después y se suma aunque su id sea menor
+        extra = {}
+        if _has_field(StockSnapshot, "seen_ids"):
+            seen = StockMovement.objects.filter(created_at__gte=since, id__lte=last_id).values_list("id", flat=True)
+            extra = {"seen_since": since, "seen_ids": list(seen)}
+
+        snapshot = StockSnapshot.objects.create(taken_at=now, last_movement_id=last_id, products=len(stock), **extra)
+        StockSnapshotLine.objects.bulk_create(
+            [StockSnapshotLine(snapshot=snapshot, product_id=pid, stock=s) for pid, s in stock],
+            batch_size=2000,
+        )
+
+        if keep:
+            old = StockSnapshot.objects.order_by("-taken_at", "-id").values_list("id", flat=True)[keep:]
+            StockSnapshot.objects.filter(id__in=list(old)).delete()
+    return snapshot
+
+
+def _base_snapshot(when):
+    from .models import StockSnapshot
+
+    return StockSnapshot.objects.filter(taken_at__lte=when).order_by("-taken_at", "-id").first()
+
+
+def _movements_after(snapshot, when):
+    from .models import StockMovement
+
+    qs = StockMovement.objects.filter(created_at__lte=when)
+    if snapshot is None:
+        return qs
+    if snapshot.seen_since is None:
+        return qs.filter(id__gt=snapshot.last_movement_id)
+    # Posteriores a la foto + los de la ventana que se confirmaron después de ella
+    return qs.filter(Q(id__gt=snapshot.last_movement_id) | Q(created_at__gte=snapshot.seen_since)).exclude(
+        id__in=snapshot.seen_ids
+    )
+
+
+def stock_at(product_id, when=None):
+    """Stock de un producto en la fecha dada (foto + movimientos posteriores)."""
+    from .models import StockSnapshotLine
+
+    when = when or timezone.now()
+    snapshot = _base_snapshot(when)
+    base = 0
+    if snapshot is not None:
+        base = (
+            StockSnapshotLine.objects.filter(snapshot=snapshot, product_id=product_id)
+            .values_list("stock", flat=True).first()
+            or 0
+        )
+    delta = _movements_after(snapshot, when).filter(product_id=product_id).aggregate(q=Sum("qty"))["q"] or 0
+    return base + delta
+
+
+def stock_levels_at(when=None):
+    """{product_id: stock} de todo el inventario en la fecha dada (sin ceros)."""
+    when = when or timezone.now()
+    snapshot = _base_snapshot(when)
+    levels = dict(snapshot.lines.values_list("product_id", "stock")) if snapshot else {}
+    deltas = _movements_after(snapshot, when).values_list("product_id").annotate(q=Sum("qty")).order_by()
+    for pid, q in deltas:
+        levels[pid] = levels.get(pid, 0) + q
+    return {pid: s for pid, s in levels.items() if s}
+
+
+def reconcile(fix=False, user=None):
+    """
+    Compara Product.stock con lo que dice el kardex. Con fix=True agrega los
+    ajustes que faltan (cambios que no pasaron por save(): update(), SQL...).
+    """
+    from products.models import Product
+    from .models import StockMovement
+
+    expected = stock_levels_at()
+    actual = dict(Product.objects.values_list("id", "stock").order_by())
+
+    mismatches = [
+        {"product_id": pid, "ledger": expected.get(pid, 0), "actual": stock}
+        for pid, stock in actual.items()
+        if expected.get(pid, 0) != stock
+    ]
+    if fix and mismatches:
+        StockMovement.objects.bulk_create(
+            [
+                StockMovement(
+                    product_id=m["product_id"],
+                    qty=m["actual"] - m["ledger"],
+                    kind=StockMovement.Kind.ADJUST,
+                    user_id=_user_id(user),
+                    note="Conciliación",
+                )
+                for m in mismatches
+            ],
+            batch_size=1000,
+        )
+    return mismatches
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventory.valuation import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula desde Product el valor del inventario y las existencias bajas. "
+        "Sólo hace falta después de cargas que no pasan por save() (SQL directo, update(), loaddata)."
+    )
+
+    def handle(self, *args, **options):
+        rows = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Inventario recalculado ({rows} grupos)."))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from inventory.ledger import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el stock de cada producto contra el kardex (foto + movimientos). "
+        "Con --fix registra ajustes para los cambios que no pasaron por save()."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Registrar ajustes de conciliación.")
+
+    def handle(self, *args, **options):
+        mismatches = reconcile(fix=options["fix"])
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("Kardex conciliado: sin diferencias."))
+            return
+
+        for m in mismatches[:50]:
+            self.stdout.write(f"  producto {m['product_id']}: kardex {m['ledger']}, stock {m['actual']}")
+        if len(mismatches) > 50:
+            self.stdout.write(f"  ... y {len(mismatches) - 50} más")
+
+        if options["fix"]:
+            self.stdout.write(self.style.SUCCESS(f"{len(mismatches)} ajustes registrados."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(mismatches)} productos con diferencias (usa --fix)."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.ledger import take_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Toma una foto del stock de todos los productos (para cron, ej. cada noche). "
+        "Las consultas de stock por fecha parten de la foto más reciente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep", type=int, default=None, help="Fotos a conservar (borra las más viejas).")
+
+    def handle(self, *args, **options):
+        keep = options["keep"]
+        if keep is not None and keep < 1:
+            raise CommandError("--keep debe ser mayor a 0.")
+        snapshot = take_snapshot(keep=keep)
+        self.stdout.write(self.style.SUCCESS(
+            f"Foto guardada: {snapshot.products} productos con existencia (movimiento #{snapshot.last_movement_id})."
+        ))
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:13
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('products', '0004_category_low_stock_threshold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryValuation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('category', 'Categoría'), ('material', 'Material'), ('supplier', 'Proveedor')], max_length=10)),
+                ('key', models.BigIntegerField(default=0)),
+                ('products', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('cost_value', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('retail_value', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LowStockItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.PositiveIntegerField()),
+                ('threshold', models.PositiveIntegerField()),
+                ('since', models.DateTimeField(auto_now_add=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='low_stock', to='products.product')),
+            ],
+            options={
+                'ordering': ['stock', 'since'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='inventoryvaluation',
+            constraint=models.UniqueConstraint(fields=('dimension', 'key'), name='uniq_inventory_valuation_group'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def build_snapshot(apps, schema_editor):
+    # Valor y existencias bajas de los productos que ya existen
+    from inventory.valuation import rebuild
+    rebuild(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+        ('products', '0004_category_low_stock_threshold'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_snapshot, migrations.RunPython.noop),
+    ]
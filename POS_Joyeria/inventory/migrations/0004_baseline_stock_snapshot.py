@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def baseline_snapshot(apps, schema_editor):
+    # Punto de partida del kardex: el stock que ya existe
+    from inventory.ledger import take_snapshot
+    take_snapshot(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(baseline_snapshot, migrations.RunPython.noop),
+    ]
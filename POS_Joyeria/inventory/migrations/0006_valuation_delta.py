@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:13
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_stockmovement_sale_no_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryValuationDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('category', 'Categoría'), ('material', 'Material'), ('supplier', 'Proveedor')], max_length=10)),
+                ('key', models.BigIntegerField(default=0)),
+                ('products', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('cost_value', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('retail_value', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,158 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class InventoryValuation(models.Model):
+    """
+    Valor del inventario por categoría / material / proveedor.
+
+    Se mantiene al día con las diferencias de cada cambio de producto
+    (InventoryValuationDelta, ver inventory/valuation.py), así que el tablero
+    lee unas cuantas filas en vez de recorrer Product.
+    key = id del grupo (0 = sin asignar).
+    """
+
+    class Dimension(models.TextChoices):
+        CATEGORY = "category", "Categoría"
+        MATERIAL = "material", "Material"
+        SUPPLIER = "supplier", "Proveedor"
+
+    dimension = models.CharField(max_length=10, choices=Dimension.choices)
+    key = models.BigIntegerField(default=0)
+
+    products = models.IntegerField(default=0)  # productos activos
+    units = models.IntegerField(default=0)  # piezas en existencia
+    cost_value = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    retail_value = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["dimension", "key"], name="uniq_inventory_valuation_group"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_dimension_display()} #{self.key}: {self.units} pzas"
+
+
+class InventoryValuationDelta(models.Model):
+    """
+    Diferencia pendiente de InventoryValuation (sólo se agregan).
+
+    Los cambios de producto no actualizan las filas de InventoryValuation (las
+    comparten todas las cajas y sucursales): dejan aquí su diferencia y
+    valuation.fold_deltas() las suma (tablero, trabajo "inventory.fold_valuation").
+    """
+
+    dimension = models.CharField(max_length=10, choices=InventoryValuation.Dimension.choices)
+    key = models.BigIntegerField(default=0)
+
+    products = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    cost_value = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    retail_value = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.dimension} #{self.key}: {self.units:+d} pzas"
+
+
+class LowStockItem(models.Model):
+    """Productos activos con stock <= existencia mínima de su categoría."""
+
+    product = models.OneToOneField("products.Product", on_delete=models.CASCADE, related_name="low_stock")
+    stock = models.PositiveIntegerField()
+    threshold = models.PositiveIntegerField()
+    since = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["stock", "since"]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.stock} (mín. {self.threshold})"
+
+
+class StockMovement(models.Model):
+    """
+    Kardex: un renglón por cada cambio de stock (sólo se agregan, nunca se editan).
+
+    qty con signo: -2 = salieron dos piezas. Ver inventory/ledger.py.
+    """
+
+    class Kind(models.TextChoices):
+        SALE = "SALE", "Venta"
+        CANCEL = "CANCEL", "Cancelación"
+        ADJUST = "ADJUST", "Ajuste"
+        IMPORT = "IMPORT", "Alta / importación"
+
+    # Sin llave foránea real: borrar un producto no borra su historial
+    product = models.ForeignKey(
+        "products.Product", on_delete=models.DO_NOTHING, db_constraint=False, related_name="movements"
+    )
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    qty = models.IntegerField()
+    # Sin llave foránea real: al archivar la venta (sales/archive.py) el id
+    # se conserva y apunta a ArchivedSale
+    sale = models.ForeignKey(
+        "sales.Sale", null=True, blank=True, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    note = models.CharField(max_length=120, blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["product", "created_at"], name="inv_movement_product_date"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Los movimientos de inventario no se modifican.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.qty:+d} ({self.product_id})"
+
+
+class StockSnapshot(models.Model):
+    """
+    Foto del stock de todos los productos. El stock en una fecha se obtiene de
+    la última foto anterior + los movimientos posteriores a last_movement_id.
+
+    Un id menor puede confirmarse después de la foto (transacciones que se
+    traslapan): por eso se guardan los ids desde seen_since que la foto ya
+    incluye, y lo demás de esa ventana también se suma (ver inventory/ledger.py).
+    """
+
+    taken_at = models.DateTimeField(default=timezone.now, db_index=True)
+    last_movement_id = models.BigIntegerField(default=0)
+    seen_since = models.DateTimeField(null=True, blank=True)
+    seen_ids = models.JSONField(default=list, blank=True)
+    products = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["-taken_at"]
+
+    def __str__(self):
+        return f"Foto {self.taken_at:%Y-%m-%d %H:%M} ({self.products} productos)"
+
+
+class StockSnapshotLine(models.Model):
+    # Sólo productos con stock distinto de 0 (ausente = 0)
+    snapshot = models.ForeignKey(StockSnapshot, on_delete=models.CASCADE, related_name="lines")
+    # Igual que en el kardex: la foto sobrevive al producto
+    product = models.ForeignKey(
+        "products.Product", on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    stock = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["snapshot", "product"], name="uniq_stock_snapshot_line"),
+        ]
@@ -0,0 +1,56 @@
+from django.db.models.signals import post_delete, post_save
+
+from products.models import Category, Product
+from utils.bulk import bulk_created
+from .ledger import record_imported, record_movement
+from .models import StockMovement
+from .valuation import (
+    loaded_values, product_values, recompute_groups, record_changes, record_created, refresh_low_stock,
+    sync_low_stock, value_groups,
+)
+
+
+def _product_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return  # loaddata: se corrige con rebuild_inventory
+    new = product_values(instance)
+    old = None if created else loaded_values(instance)
+
+    # Kardex: basta con conocer el stock anterior
+    if created:
+        record_movement(instance.pk, new["stock"], kind=StockMovement.Kind.IMPORT)
+    elif "stock" in getattr(instance, "_loaded_values", {}):
+        record_movement(instance.pk, new["stock"] - instance._loaded_values["stock"])
+
+    if not created and old is None:
+        # Instancia sin valores previos (ej. .only()): se recalculan sus grupos
+        recompute_groups(value_groups(new))
+    else:
+        record_changes([(old, new)])
+    sync_low_stock(instance.pk, old, new)
+
+    # El siguiente save() de la misma instancia parte de estos valores
+    instance._loaded_values = {**getattr(instance, "_loaded_values", {}), **new}
+
+
+def _product_deleted(sender, instance, **kwargs):
+    # LowStockItem se borra en cascada
+    record_changes([(loaded_values(instance) or product_values(instance), None)])
+
+
+def _products_bulk_created(sender, instances, **kwargs):
+    record_created(instances)
+    record_imported(instances)
+
+
+def _category_saved(sender, instance, created, raw=False, **kwargs):
+    # Cambió (o puede haber cambiado) la existencia mínima
+    if not created and not raw:
+        refresh_low_stock(instance.pk)
+
+
+def connect_signals():
+    post_save.connect(_product_saved, sender=Product, dispatch_uid="inventory-product-save")
+    post_delete.connect(_product_deleted, sender=Product, dispatch_uid="inventory-product-delete")
+    bulk_created.connect(_products_bulk_created, sender=Product, dispatch_uid="inventory-product-bulk")
+    post_save.connect(_category_saved, sender=Category, dispatch_uid="inventory-category-save")
@@ -0,0 +1,24 @@
+from jobs.registry import task
+
+from .ledger import take_snapshot
+from .valuation import fold_deltas, rebuild
+
+
+# Mismo trabajo que `rebuild_inventory` / `stock_snapshot`, pero sin bloquear el request
+
+@task("inventory.rebuild")
+def rebuild_inventory(job):
+    job.progress(0, message="Recalculando valor del inventario")
+    return {"groups": rebuild()}
+
+
+@task("inventory.snapshot")
+def stock_snapshot(job, keep=None):
+    snapshot = take_snapshot(keep=keep)
+    return {"snapshot": snapshot.pk, "products": snapshot.products}
+
+
+@task("inventory.fold_valuation")
+def fold_valuation(job):
+    # Suma las diferencias pendientes (InventoryValuationDelta) fuera de los cobros
+    return {"deltas": fold_deltas()}
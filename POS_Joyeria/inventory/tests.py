@@ -0,0 +1,439 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from io import StringIO
+
+from branches.stock import check_totals
+from client.models import Client
+from products.models import Category, Material, Product
+from sales.models import Sale
+from sales.web_views import SESSION_KEY
+from suppliers.models import Supplier
+from utils.factories import make_products
+from .ledger import reconcile, stock_at, stock_levels_at, stock_movements, take_snapshot
+from .models import InventoryValuation, InventoryValuationDelta, LowStockItem, StockMovement, StockSnapshot
+from .valuation import fold_deltas, rebuild
+
+User = get_user_model()
+
+
+def _snapshot():
+    fold_deltas()
+    return {
+        (r.dimension, r.key): (r.products, r.units, r.cost_value, r.retail_value)
+        for r in InventoryValuation.objects.all()
+        if r.products or r.units
+    }
+
+
+class InventoryBaseTest(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Anillos", low_stock_threshold=3)
+        self.material = Material.objects.create(name="Oro", purity="14k")
+        self.supplier = Supplier.objects.create(
+            name="Proveedor Uno", code="P01", phone="5551112222", email="p1@test.com"
+        )
+
+    def _product(self, **kwargs):
+        data = {
+            "name": "Anillo oro",
+            "category": self.category,
+            "material": self.material,
+            "supplier": self.supplier,
+            "purchase_price": Decimal("100.00"),
+            "sale_price": Decimal("250.00"),
+            "weight": Decimal("2.00"),
+            "stock": 10,
+        }
+        data.update(kwargs)
+        return Product.objects.create(**data)
+
+    def _row(self, dimension, key):
+        fold_deltas()
+        return InventoryValuation.objects.get(dimension=dimension, key=key)
+
+
+class InventoryValuationTest(InventoryBaseTest):
+    def test_alta_suma_en_las_tres_dimensiones(self):
+        self._product(stock=4)
+        for dim, key in (("category", self.category.id), ("material", self.material.id), ("supplier", self.supplier.id)):
+            row = self._row(dim, key)
+            self.assertEqual((row.products, row.units), (1, 4))
+            self.assertEqual(row.cost_value, Decimal("400.00"))
+            self.assertEqual(row.retail_value, Decimal("1000.00"))
+
+    def test_edicion_aplica_solo_la_diferencia(self):
+        p = self._product(stock=10)
+        other = Category.objects.create(name="Collares")
+
+        p = Product.objects.get(pk=p.pk)
+        p.stock = 6
+        p.sale_price = Decimal("300.00")
+        p.category = other
+        p.save()
+
+        self.assertEqual(self._row("category", self.category.id).units, 0)
+        row = self._row("category", other.id)
+        self.assertEqual((row.products, row.units, row.retail_value), (1, 6, Decimal("1800.00")))
+        self.assertEqual(self._row("material", self.material.id).cost_value, Decimal("600.00"))
+
+    def test_guardar_no_vuelve_a_leer_el_producto(self):
+        p = self._product(stock=10)
+        p = Product.objects.get(pk=p.pk)
+        p.stock = 8
+        # La diferencia sale de lo que se leyó (from_db), sin otro SELECT
+        with CaptureQueriesContext(connection) as ctx:
+            p.save(update_fields=["stock"])
+        reads = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("SELECT") and "products_product" in q["sql"]]
+        self.assertEqual(reads, [])
+        self.assertEqual(self._row("category", self.category.id).units, 8)
+        self.assertEqual(stock_at(p.pk), 8)
+        self.assertEqual(check_totals(), [])
+
+    def test_umbrales_se_leen_una_vez_por_bloque(self):
+        products = [self._product(name=f"Anillo {i}", stock=10) for i in range(3)]
+        products = list(Product.objects.filter(pk__in=[p.pk for p in products]))
+        with CaptureQueriesContext(connection) as ctx, stock_movements(StockMovement.Kind.ADJUST):
+            for p in products:
+                p.stock = 1
+                p.save(update_fields=["stock"])
+        versions = [q for q in ctx.captured_queries if "sync_tableversion" in q["sql"]]
+        self.assertLessEqual(len(versions), 1)
+        self.assertEqual(LowStockItem.objects.count(), 3)
+
+    def test_cambios_dejan_diferencias_y_no_tocan_la_valuacion(self):
+        p = self._product(stock=10)
+        fold_deltas()
+        p = Product.objects.get(pk=p.pk)
+
+        with CaptureQueriesContext(connection) as ctx, stock_movements(StockMovement.Kind.ADJUST):
+            p.stock = 7
+            p.save(update_fields=["stock"])
+            p.stock = 6
+            p.save(update_fields=["stock"])
+        self.assertFalse([q for q in ctx.captured_queries if "inventory_inventoryvaluation\"" in q["sql"]])
+        # Un renglón por grupo con lo que cambió en todo el bloque
+        self.assertEqual(
+            sorted(InventoryValuationDelta.objects.values_list("dimension", "units")),
+            [("category", -4), ("material", -4), ("supplier", -4)],
+        )
+
+        self.assertEqual(fold_deltas(), 3)
+        self.assertFalse(InventoryValuationDelta.objects.exists())
+        self.assertEqual(InventoryValuation.objects.get(dimension="category", key=self.category.id).units, 6)
+
+    def test_rebuild_descarta_las_diferencias_pendientes(self):
+        self._product(stock=4)
+        self.assertTrue(InventoryValuationDelta.objects.exists())
+        rebuild()
+        self.assertFalse(InventoryValuationDelta.objects.exists())
+        self.assertEqual(InventoryValuation.objects.get(dimension="category", key=self.category.id).units, 4)
+
+    def test_inactivo_y_borrado_salen_del_valor(self):
+        p1 = self._product(stock=5)
+        p2 = self._product(name="Anillo plata", stock=7)
+
+        p1.is_active = False
+        p1.save()
+        p2.delete()
+
+        row = self._row("supplier", self.supplier.id)
+        self.assertEqual((row.products, row.units, row.cost_value), (0, 0, Decimal("0.00")))
+
+    def test_producto_sin_categoria_va_a_sin_asignar(self):
+        self._product(category=None, code="SINCAT1", stock=2)
+        self.assertEqual(self._row("category", 0).units, 2)
+
+    def test_rebuild_coincide_con_lo_incremental(self):
+        p = self._product(stock=8)
+        self._product(name="Arete", category=None, code="SINCAT2", stock=1)
+        make_products(5, stock=4, code="FAC")
+        p.stock = 3
+        p.save(update_fields=["stock"])
+
+        incremental = _snapshot()
+        low = set(LowStockItem.objects.values_list("product_id", "stock"))
+        rebuild()
+        self.assertEqual(_snapshot(), incremental)
+        self.assertEqual(set(LowStockItem.objects.values_list("product_id", "stock")), low)
+
+    def test_comando_rebuild_inventory(self):
+        self._product(stock=2)
+        InventoryValuation.objects.all().delete()
+        LowStockItem.objects.all().delete()
+
+        out = StringIO()
+        call_command("rebuild_inventory", stdout=out)
+        self.assertEqual(self._row("category", self.category.id).units, 2)
+        self.assertEqual(LowStockItem.objects.count(), 1)
+
+
+class LowStockTest(InventoryBaseTest):
+    def test_entra_y_sale_de_existencias_bajas(self):
+        p = self._product(stock=10)
+        self.assertFalse(LowStockItem.objects.exists())
+
+        p.stock = 3
+        p.save()
+        item = LowStockItem.objects.get(product=p)
+        self.assertEqual((item.stock, item.threshold), (3, 3))
+
+        p.stock = 1
+        p.save()
+        self.assertEqual(LowStockItem.objects.get(product=p).stock, 1)
+
+        p.stock = 20
+        p.save()
+        self.assertFalse(LowStockItem.objects.exists())
+
+    def test_cambiar_minimo_de_la_categoria_recalcula(self):
+        p = self._product(stock=5)
+        self.assertFalse(LowStockItem.objects.exists())
+
+        self.category.low_stock_threshold = 5
+        self.category.save()
+        self.assertTrue(LowStockItem.objects.filter(product=p, threshold=5).exists())
+
+        self.category.low_stock_threshold = 1
+        self.category.save()
+        self.assertFalse(LowStockItem.objects.exists())
+
+    @override_settings(POS_LOW_STOCK_DEFAULT=4)
+    def test_sin_categoria_usa_el_default(self):
+        p = self._product(category=None, code="SINCAT3", stock=4)
+        self.assertEqual(LowStockItem.objects.get(product=p).threshold, 4)
+
+
+class InventorySalesFlowTest(InventoryBaseTest):
+    def setUp(self):
+        super().setUp()
+        self.p = self._product(stock=5)
+        self.cliente = Client.objects.create(
+            name="Ana", apellido_paterno="Pérez", phone="5512345678", email="ana@test.com"
+        )
+        self.admin = User.objects.create_user(username="adminpos", password="pass12345")
+        self.admin.groups.add(Group.objects.create(name="AdminPOS"))
+        self.client.force_login(self.admin)
+
+    def test_cobrar_y_cancelar_actualizan_valuacion_y_existencias_bajas(self):
+        s = self.client.session
+        s[SESSION_KEY] = {
+            "items": {str(self.p.id): 3},
+            "cliente": {"id": self.cliente.id},
+            "descuento_pct": "0",
+            "metodo_pago": "CASH",
+            "cantidad_pagada": "1000",
+        }
+        s.save()
+        res = self.client.post(reverse("sales:cobrar"), {"metodo_pago": "CASH", "cantidad_pagada": "1000"})
+        self.assertIn("/success/", res["Location"])
+
+        self.assertEqual(self._row("category", self.category.id).units, 2)
+        self.assertEqual(LowStockItem.objects.get(product=self.p).stock, 2)
+
+        sale = Sale.objects.get()
+        self.client.post(reverse("sales:cancel", args=[sale.id]))
+        self.assertEqual(self._row("category", self.category.id).units, 5)
+        self.assertFalse(LowStockItem.objects.exists())
+
+        kardex = list(StockMovement.objects.filter(product=self.p).order_by("id").values_list("kind", "qty", "sale_id", "user_id"))
+        self.assertEqual(kardex, [
+            ("IMPORT", 5, None, None),
+            ("SALE", -3, sale.id, self.admin.id),
+            ("CANCEL", 3, sale.id, self.admin.id),
+        ])
+
+
+class StockLedgerTest(InventoryBaseTest):
+    def test_cada_cambio_de_stock_deja_movimiento(self):
+        p = self._product(stock=10)
+        p.stock = 7
+        p.save()
+        p.name = "Anillo oro 14k"
+        p.save()
+
+        self.assertEqual(list(p.movements.order_by("id").values_list("kind", "qty")), [("IMPORT", 10), ("ADJUST", -3)])
+
+    def test_bloque_junta_los_movimientos_en_un_insert(self):
+        products = [self._product(name=f"Anillo {i}", stock=10) for i in range(3)]
+        with stock_movements(StockMovement.Kind.ADJUST, note="Conteo físico"):
+            for p in products:
+                p.stock = 8
+                p.save(update_fields=["stock"])
+            self.assertEqual(StockMovement.objects.filter(note="Conteo físico").count(), 0)
+        self.assertEqual(StockMovement.objects.filter(note="Conteo físico", qty=-2).count(), 3)
+
+    def test_bloque_con_error_no_guarda_movimientos(self):
+        p = self._product(stock=10)
+        with self.assertRaises(RuntimeError):
+            with stock_movements(StockMovement.Kind.ADJUST, note="Falla"):
+                p.stock = 1
+                p.save()
+                raise RuntimeError
+        self.assertFalse(StockMovement.objects.filter(note="Falla").exists())
+
+    def test_stock_en_fecha_con_foto_y_movimientos(self):
+        now = timezone.now()
+        p = self._product(stock=0)
+        ids = {}
+        for days, qty in ((30, 10), (20, -3), (10, -2), (1, 5)):
+            m = StockMovement.objects.create(product=p, qty=qty, kind=StockMovement.Kind.ADJUST, created_at=now - timedelta(days=days))
+            ids[days] = m.id
+
+        self.assertEqual(stock_at(p.pk, now - timedelta(days=25)), 10)
+        self.assertEqual(stock_at(p.pk, now - timedelta(days=15)), 7)
+
+        # Foto de hace 5 días (stock 5): lo posterior sale de los movimientos
+        Product.objects.filter(pk=p.pk).update(stock=5)
+        snapshot = take_snapshot()
+        StockSnapshot.objects.filter(pk=snapshot.pk).update(taken_at=now - timedelta(days=5), last_movement_id=ids[10])
+        snapshot.lines.update(stock=99)  # si se usara la foto de más, el resultado sería otro
+        self.assertEqual(stock_at(p.pk, now - timedelta(days=15)), 7)
+        self.assertEqual(stock_at(p.pk, now - timedelta(days=5)), 99)
+        snapshot.lines.update(stock=5)
+        self.assertEqual(stock_at(p.pk, now - timedelta(days=5)), 5)
+        self.assertEqual(stock_at(p.pk), 10)
+        self.assertEqual(stock_levels_at()[p.pk], 10)
+        self.assertEqual(stock_levels_at(now - timedelta(days=15))[p.pk], 7)
+
+    def test_foto_conserva_solo_las_ultimas(self):
+        self._product(stock=3)
+        for _ in range(3):
+            take_snapshot(keep=2)
+        self.assertEqual(StockSnapshot.objects.count(), 2)
+        self.assertEqual(StockSnapshot.objects.first().lines.get().stock, 3)
+
+    def test_foto_lee_stock_y_kardex_en_una_transaccion(self):
+        p = self._product(stock=3)
+        self._product(stock=0)
+        last = StockMovement.objects.latest("id")
+        with CaptureQueriesContext(connection) as ctx:
+            snapshot = take_snapshot()
+        sql = [q["sql"] for q in ctx.captured_queries]
+        # Stock, último movimiento y los ids recientes salen del mismo estado
+        self.assertTrue(sql[0].startswith("SAVEPOINT"))
+        self.assertEqual(len([q for q in sql if q.startswith("SELECT")]), 2)
+        self.assertEqual(snapshot.last_movement_id, last.id)
+        self.assertEqual(snapshot.seen_ids, [last.id])
+        self.assertEqual(list(snapshot.lines.values_list("product_id", "stock")), [(p.pk, 3)])
+
+    def test_movimiento_con_id_menor_confirmado_despues_de_la_foto(self):
+        p = self._product(stock=10)
+        late = StockMovement.objects.create(product=p, qty=-2, kind=StockMovement.Kind.SALE)
+        StockMovement.objects.create(product=p, qty=-1, kind=StockMovement.Kind.SALE)
+        Product.objects.filter(pk=p.pk).update(stock=9)
+
+        # La foto no ve `late` (su transacción sigue abierta) aunque ya vio uno con id mayor
+        row = StockMovement.objects.filter(pk=late.pk).values().get()
+        StockMovement.objects.filter(pk=late.pk).delete()
+        snapshot = take_snapshot()
+        self.assertGreater(snapshot.last_movement_id, late.pk)
+
+        # Se confirma después: entra al kardex con su id original
+        StockMovement.objects.create(**row)
+        Product.objects.filter(pk=p.pk).update(stock=7)
+        self.assertEqual(stock_at(p.pk), 7)
+        self.assertEqual(stock_levels_at()[p.pk], 7)
+        self.assertEqual(reconcile(), [])
+
+    def test_conciliacion_detecta_y_ajusta(self):
+        p = self._product(stock=4)
+        Product.objects.filter(pk=p.pk).update(stock=9)
+
+        mismatches = reconcile()
+        self.assertEqual(mismatches, [{"product_id": p.pk, "ledger": 4, "actual": 9}])
+
+        out = StringIO()
+        call_command("reconcile_stock", "--fix", stdout=out)
+        self.assertIn("1 ajustes", out.getvalue())
+        self.assertEqual(reconcile(), [])
+        self.assertTrue(StockMovement.objects.filter(product=p, qty=5, note="Conciliación").exists())
+
+    def test_borrar_producto_conserva_kardex_y_fotos(self):
+        p = self._product(stock=5)
+        p.stock = 3
+        p.save(update_fields=["stock"])
+        snapshot = take_snapshot()
+        pk = p.pk
+
+        p.delete()
+        self.assertEqual(
+            list(StockMovement.objects.filter(product_id=pk).order_by("id").values_list("kind", "qty")),
+            [("IMPORT", 5), ("ADJUST", -2)],
+        )
+        self.assertTrue(snapshot.lines.filter(product_id=pk, stock=3).exists())
+
+    def test_movimiento_no_se_edita(self):
+        p = self._product(stock=1)
+        m = p.movements.get()
+        m.qty = 100
+        with self.assertRaises(ValueError):
+            m.save()
+
+
+class InventoryBulkTest(InventoryBaseTest):
+    def test_alta_masiva_por_api(self):
+        from rest_framework.test import APIClient
+
+        base = {
+            "category": self.category.id,
+            "supplier": self.supplier.id,
+            "material": self.material.id,
+            "purchase_price": "100.00",
+            "sale_price": "200.00",
+            "weight": "1.00",
+        }
+        data = [dict(base, name=f"Anillo {i}", stock=i) for i in range(1, 5)]
+        resp = APIClient().post(reverse("product-list-create"), data, format="json")
+        self.assertEqual(resp.data["created"], 4)
+
+        row = self._row("category", self.category.id)
+        self.assertEqual((row.products, row.units, row.cost_value), (4, 10, Decimal("1000.00")))
+        self.assertEqual(LowStockItem.objects.count(), 3)
+        self.assertEqual(StockMovement.objects.filter(kind="IMPORT").count(), 4)
+
+
+class InventoryViewsTest(InventoryBaseTest):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="adminpos", password="pass12345")
+        self.admin.groups.add(Group.objects.create(name="AdminPOS"))
+        self.vendedor = User.objects.create_user(username="vendedor", password="pass12345")
+        self.vendedor.groups.add(Group.objects.create(name="VendedorPOS"))
+        self._product(stock=1)
+
+    def test_tablero_solo_admin(self):
+        self.client.force_login(self.vendedor)
+        self.assertNotEqual(self.client.get(reverse("inventory_web:dashboard")).status_code, 200)
+
+        self.client.force_login(self.admin)
+        res = self.client.get(reverse("inventory_web:dashboard"))
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, "Anillo oro")
+
+    def test_resumen_json(self):
+        self.client.force_login(self.admin)
+        data = self.client.get(reverse("inventory_web:summary")).json()
+        self.assertEqual(data["totals"]["units"], 1)
+        self.assertEqual(data["low_stock_count"], 1)
+        self.assertEqual(data["low_stock"][0]["name"], "Anillo oro")
+
+    def test_kardex_con_saldo(self):
+        p = Product.objects.get()
+        p.stock = 6
+        p.save()
+
+        self.client.force_login(self.admin)
+        res = self.client.get(reverse("inventory_web:kardex", args=[p.pk]), {"fecha": "2000-01-01"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([m.balance for m in res.context["movements"]], [6, 1])
+        self.assertEqual(res.context["stock_en_fecha"], 0)
@@ -0,0 +1,408 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from utils.cache import catalog_cache
+from utils.http_cache import table_version
+from .ledger import current_batch
+
+
+# Inventario materializado: valor por grupo (InventoryValuation) y existencias
+# bajas (LowStockItem). Cada cambio de producto aplica sólo su diferencia:
+#
+#   antes (Product._loaded_values) -> después (valores al guardar)
+#
+# Quien cambia stock con concurrencia (cobro, cancelación, tickets offline)
+# carga los productos con select_for_update en la misma transacción, así que
+# lo que se leyó es lo que hay en la BD.
+#
+# La diferencia no toca InventoryValuation dentro del cobro: esas filas las
+# comparten todas las cajas y sucursales y serializarían los cobros. Se agrega
+# a InventoryValuationDelta (dentro de stock_movements() un solo INSERT por
+# bloque) y fold_deltas() las suma fuera del cobro: al abrir el tablero, con el
+# trabajo "inventory.fold_valuation" y en el cierre nocturno (rebuild).
+# Lo que no pasa por save()/bulk_created (update(), SQL directo) se corrige
+# con `manage.py rebuild_inventory`.
+
+TRACKED_FIELDS = ("category_id", "material_id", "supplier_id", "stock", "purchase_price", "sale_price", "is_active")
+DIMENSION_FIELDS = {"category": "category_id", "material": "material_id", "supplier": "supplier_id"}
+ZERO = Decimal("0.00")
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _models(apps=None):
+    registry = apps or django_apps
+    return (
+        registry.get_model("products", "Product"),
+        registry.get_model("inventory", "InventoryValuation"),
+        registry.get_model("inventory", "LowStockItem"),
+    )
+
+
+def _delta_model(apps=None):
+    # None en migraciones anteriores a InventoryValuationDelta (0002 llama a rebuild)
+    try:
+        return (apps or django_apps).get_model("inventory", "InventoryValuationDelta")
+    except LookupError:
+        return None
+
+
+def product_values(product):
+    return {f: getattr(product, f) for f in TRACKED_FIELDS}
+
+
+def loaded_values(product):
+    # None si la instancia no vino completa de la BD (alta nueva, .only(), etc.)
+    loaded = getattr(product, "_loaded_values", None)
+    if not loaded or any(f not in loaded for f in TRACKED_FIELDS):
+        return None
+    return {f: loaded[f] for f in TRACKED_FIELDS}
+
+
+def value_groups(values):
+    return [(dim, values[field] or 0) for dim, field in DIMENSION_FIELDS.items()]
+
+
+def _vector(values):
+    # (productos, piezas, costo, venta) que aporta un producto
+    if not values["is_active"]:
+        return (0, 0, ZERO, ZERO)
+    stock = int(values["stock"] or 0)
+    return (1, stock, Decimal(values["purchase_price"] or 0) * stock, Decimal(values["sale_price"] or 0) * stock)
+
+
+def _add(deltas, values, sign):
+    vec = _vector(values)
+    for group in value_groups(values):
+        acc = deltas[group]
+        for i, v in enumerate(vec):
+            acc[i] += sign * v
+
+
+def _merge(into, deltas):
+    for group, vec in deltas.items():
+        acc = into.setdefault(group, [0, 0, ZERO, ZERO])
+        for i, v in enumerate(vec):
+            acc[i] += v
+
+
+def save_deltas(deltas):
+    """Guarda las diferencias {(dimensión, key): [productos, piezas, costo, venta]} con un INSERT."""
+    from .models import InventoryValuationDelta
+
+    rows = [
+        InventoryValuationDelta(
+            dimension=dim, key=key, products=vec[0], units=vec[1], cost_value=vec[2], retail_value=vec[3]
+        )
+        for (dim, key), vec in deltas.items()
+        if any(vec)
+    ]
+    if rows:
+        InventoryValuationDelta.objects.bulk_create(rows, batch_size=1000)
+
+
+def _apply(deltas):
+    # En un bloque stock_movements() se juntan y se guardan al salir (ledger.flush)
+    batch = current_batch()
+    if batch is not None:
+        _merge(batch.valuation, deltas)
+    else:
+        save_deltas(deltas)
+
+
+def _update_groups(deltas):
+    from .models import InventoryValuation
+
+    # Grupos con la misma diferencia -> un solo UPDATE (los que suman 0 sólo
+    # se crean si faltan)
+    by_vector = defaultdict(list)
+    for group, vec in deltas.items():
+        by_vector[tuple(vec)].append(group)
+
+    now = timezone.now()
+    for vec, groups in by_vector.items():
+        cond = Q()
+        for dim, key in groups:
+            cond |= Q(dimension=dim, key=key)
+        updated = 0
+        if any(vec):
+            updated = InventoryValuation.objects.filter(cond).update(
+                products=F("products") + vec[0],
+                units=F("units") + vec[1],
+                cost_value=F("cost_value") + vec[2],
+                retail_value=F("retail_value") + vec[3],
+                updated_at=now,
+            )
+        if updated < len(groups):
+            existing = set(InventoryValuation.objects.filter(cond).values_list("dimension", "key"))
+            InventoryValuation.objects.bulk_create(
+                [
+                    InventoryValuation(
+                        dimension=dim, key=key, products=vec[0], units=vec[1], cost_value=vec[2], retail_value=vec[3]
+                    )
+                    for dim, key in groups
+                    if (dim, key) not in existing
+                ],
+                ignore_conflicts=True,
+            )
+
+
+def fold_deltas(batch_size=5000):
+    """Suma a InventoryValuation las diferencias pendientes; regresa cuántas se aplicaron."""
+    from .models import InventoryValuationDelta
+
+    folded = 0
+    while True:
+        # Se borran exactamente los ids que se sumaron: una diferencia que se
+        # confirma después (aunque tenga un id menor) entra en la siguiente vuelta
+        with transaction.atomic():
+            rows = list(
+                InventoryValuationDelta.objects.order_by("id").values_list(
+                    "id", "dimension", "key", "products", "units", "cost_value", "retail_value"
+                )[:batch_size]
+            )
+            if not rows:
+                break
+            deltas = {}
+            for _, dim, key, *vec in rows:
+                _merge(deltas, {(dim, key): vec})
+            _update_groups(deltas)
+            InventoryValuationDelta.objects.filter(id__in=[r[0] for r in rows]).delete()
+        folded += len(rows)
+        if len(rows) < batch_size:
+            break
+    return folded
+
+
+def record_changes(changes):
+    """changes: [(antes, después)] con dicts de product_values(); None = no existía / ya no existe."""
+    deltas = defaultdict(lambda: [0, 0, ZERO, ZERO])
+    for old, new in changes:
+        if old is not None:
+            _add(deltas, old, -1)
+        if new is not None:
+            _add(deltas, new, +1)
+    _apply(deltas)
+
+
+def recompute_groups(groups):
+    # Para cuando no hay valores previos: se recalculan los grupos completos,
+    # así que sus diferencias pendientes ya quedan incluidas
+    Product, InventoryValuation, _ = _models()
+    InventoryValuationDelta = _delta_model()
+    batch = current_batch()
+    for dim, key in groups:
+        if batch is not None:
+            batch.valuation.pop((dim, key), None)
+        InventoryValuationDelta.objects.filter(dimension=dim, key=key).delete()
+        field = DIMENSION_FIELDS[dim]
+        data = Product.objects.filter(is_active=True, **{field: key or None}).aggregate(
+            products=Count("id"),
+            units=Coalesce(Sum("stock"), 0),
+            cost=Coalesce(Sum(F("purchase_price") * F("stock"), output_field=MONEY), ZERO, output_field=MONEY),
+            retail=Coalesce(Sum(F("sale_price") * F("stock"), output_field=MONEY), ZERO, output_field=MONEY),
+        )
+        InventoryValuation.objects.update_or_create(
+            dimension=dim,
+            key=key,
+            defaults={
+                "products": data["products"],
+                "units": data["units"],
+                "cost_value": data["cost"],
+                "retail_value": data["retail"],
+            },
+        )
+
+
+# Existencias bajas
+
+def category_thresholds():
+    from products.models import Category
+
+    # Dentro de un bloque stock_movements() (cobro, cancelación...) se leen una
+    # sola vez para todos los renglones
+    batch = current_batch()
+    if batch is not None and batch.thresholds is not None:
+        return batch.thresholds
+
+    # Llave con la versión de la tabla: cambia al guardar una categoría
+    key = f"inventory:thresholds:{table_version(Category)[0]}"
+    thresholds = catalog_cache.get(key, versioned=False)
+    if thresholds is None:
+        thresholds = dict(Category.objects.values_list("id", "low_stock_threshold"))
+        catalog_cache.set(key, thresholds, versioned=False)
+    if batch is not None:
+        batch.thresholds = thresholds
+    return thresholds
+
+
+def _threshold(values, thresholds):
+    default = getattr(settings, "POS_LOW_STOCK_DEFAULT", 2)
+    return thresholds.get(values["category_id"], default)
+
+
+def _is_low(values, thresholds):
+    return bool(values["is_active"]) and int(values["stock"] or 0) <= _threshold(values, thresholds)
+
+
+def record_created(products):
+    # Altas masivas: un UPDATE por grupo y un solo INSERT de existencias bajas
+    from .models import LowStockItem
+
+    values = [(p.pk, product_values(p)) for p in products]
+    record_changes([(None, v) for _, v in values])
+    thresholds = category_thresholds()
+    LowStockItem.objects.bulk_create(
+        [
+            LowStockItem(product_id=pk, stock=v["stock"], threshold=_threshold(v, thresholds))
+            for pk, v in values
+            if _is_low(v, thresholds)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def sync_low_stock(product_id, old, new):
+    from .models import LowStockItem
+
+    thresholds = category_thresholds()
+    was_low = None if old is None else _is_low(old, thresholds)
+
+    if new is not None and _is_low(new, thresholds):
+        threshold = _threshold(new, thresholds)
+        if was_low and old["stock"] == new["stock"]:
+            return
+        updated = LowStockItem.objects.filter(product_id=product_id).update(stock=new["stock"], threshold=threshold)
+        if not updated:
+            LowStockItem.objects.bulk_create(
+                [LowStockItem(product_id=product_id, stock=new["stock"], threshold=threshold)],
+                ignore_conflicts=True,
+            )
+    elif was_low is not False:
+        LowStockItem.objects.filter(product_id=product_id).delete()
+
+
+def refresh_low_stock(category_id=None, apps=None):
+    """Recalcula la lista de existencias bajas (toda o de una categoría)."""
+    Product, _, LowStockItem = _models(apps)
+    default = getattr(settings, "POS_LOW_STOCK_DEFAULT", 2)
+
+    products = Product.objects.filter(is_active=True)
+    items = LowStockItem.objects.all()
+    if category_id is not None:
+        products = products.filter(category_id=category_id)
+        items = items.filter(product__category_id=category_id)
+
+    low = dict(
+        (pid, (stock, threshold))
+        for pid, stock, threshold in products.annotate(
+            threshold=Coalesce("category__low_stock_threshold", default)
+        ).filter(stock__lte=F("threshold")).values_list("id", "stock", "threshold")
+    )
+
+    with transaction.atomic():
+        items.exclude(product_id__in=low).delete()
+        existing = {i.product_id: i for i in items.filter(product_id__in=low)}
+        for pid, item in existing.items():
+            item.stock, item.threshold = low[pid]
+        LowStockItem.objects.bulk_update(existing.values(), ["stock", "threshold"], batch_size=1000)
+        LowStockItem.objects.bulk_create(
+            [LowStockItem(product_id=pid, stock=s, threshold=t) for pid, (s, t) in low.items() if pid not in existing],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+    return len(low)
+
+
+def rebuild(apps=None):
+    """Recalcula todo desde Product (migración inicial / después de cargas por SQL)."""
+    Product, InventoryValuation, _ = _models(apps)
+    InventoryValuationDelta = _delta_model(apps)
+
+    rows = []
+    active = Product.objects.filter(is_active=True)
+    # Se lee Product y se descartan las diferencias pendientes en la misma
+    # transacción: las que ya se confirmaron están incluidas en lo que se lee
+    with transaction.atomic():
+        for dim, field in DIMENSION_FIELDS.items():
+            for r in active.values(field).annotate(
+                n=Count("id"),
+                units=Sum("stock"),
+                cost=Sum(F("purchase_price") * F("stock"), output_field=MONEY),
+                retail=Sum(F("sale_price") * F("stock"), output_field=MONEY),
+            ).order_by():
+                rows.append(InventoryValuation(
+                    dimension=dim,
+                    key=r[field] or 0,
+                    products=r["n"],
+                    units=r["units"] or 0,
+                    cost_value=r["cost"] or ZERO,
+                    retail_value=r["retail"] or ZERO,
+                ))
+
+        if InventoryValuationDelta is not None:
+            InventoryValuationDelta.objects.all().delete()
+        InventoryValuation.objects.all().delete()
+        InventoryValuation.objects.bulk_create(rows)
+    refresh_low_stock(apps=apps)
+    return len(rows)
+
+
+# Lectura (tablero)
+
+def inventory_summary(low_stock_limit=200):
+    from products.models import Category, Material
+    from suppliers.models import Supplier
+    from .models import InventoryValuation, LowStockItem
+
+    fold_deltas()
+    names = {
+        "category": dict(Category.objects.values_list("id", "name")),
+        "material": {m.id: str(m) for m in Material.objects.all()},
+        "supplier": dict(Supplier.objects.values_list("id", "name")),
+    }
+    groups = {dim: [] for dim in DIMENSION_FIELDS}
+    totals = {"products": 0, "units": 0, "cost_value": ZERO, "retail_value": ZERO}
+
+    for row in InventoryValuation.objects.order_by("-cost_value"):
+        if not row.products and not row.units:
+            continue
+        groups[row.dimension].append({
+            "key": row.key,
+            "name": names[row.dimension].get(row.key, "Sin asignar"),
+            "products": row.products,
+            "units": row.units,
+            "cost_value": row.cost_value,
+            "retail_value": row.retail_value,
+        })
+        if row.dimension == "category":
+            # Cada producto está en exactamente una fila de categoría
+            totals["products"] += row.products
+            totals["units"] += row.units
+            totals["cost_value"] += row.cost_value
+            totals["retail_value"] += row.retail_value
+
+    low_stock = [
+        {
+            "product_id": item.product_id,
+            "code": item.product.code,
+            "name": item.product.name,
+            "category": item.product.category.name if item.product.category else "",
+            "stock": item.stock,
+            "threshold": item.threshold,
+            "since": item.since,
+        }
+        for item in LowStockItem.objects.select_related("product", "product__category")[:low_stock_limit]
+    ]
+    return {
+        "totals": totals,
+        "groups": groups,
+        "low_stock": low_stock,
+        "low_stock_count": LowStockItem.objects.count(),
+    }
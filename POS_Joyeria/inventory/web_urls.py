@@ -0,0 +1,10 @@
+from django.urls import path
+from . import web_views
+
+app_name = "inventory_web"
+
+urlpatterns = [
+    path("", web_views.dashboard, name="dashboard"),
+    path("resumen/", web_views.summary_json, name="summary"),
+    path("kardex/<int:product_id>/", web_views.kardex, name="kardex"),
+]
@@ -0,0 +1,70 @@
+from datetime import datetime, time
+
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from products.models import Product
+from sales.models import ArchivedSale
+from utils.roles import role_required
+from .ledger import stock_at
+from .models import StockMovement
+from .valuation import inventory_summary
+
+KARDEX_LIMIT = 200
+
+
+@role_required(["AdminPOS"])
+def dashboard(request):
+    # Valor del inventario (suma antes las diferencias pendientes) y existencias bajas
+    summary = inventory_summary()
+    summary["sections"] = [
+        ("Por categoría", summary["groups"]["category"]),
+        ("Por material", summary["groups"]["material"]),
+        ("Por proveedor", summary["groups"]["supplier"]),
+    ]
+    return render(request, "inventory/dashboard.html", summary)
+
+
+@role_required(["AdminPOS"])
+def summary_json(request):
+    return JsonResponse(inventory_summary())
+
+
+@role_required(["AdminPOS"])
+def kardex(request, product_id):
+    product = get_object_or_404(Product.objects.select_related("category"), pk=product_id)
+    movements = list(
+        StockMovement.objects.filter(product=product)
+        .select_related("sale", "user")
+        .order_by("-created_at", "-id")[:KARDEX_LIMIT]
+    )
+
+    # Folio de la venta; las archivadas ya no están en Sale (sales/archive.py)
+    archived = [m.sale_id for m in movements if m.sale_id and m.sale is None]
+    folios = dict(ArchivedSale.objects.filter(id__in=archived).values_list("id", "folio")) if archived else {}
+    for m in movements:
+        m.folio = m.sale.folio if m.sale is not None else folios.get(m.sale_id, "")
+
+    # Saldo después de cada movimiento, de adelante hacia atrás
+    ledger_stock = stock_at(product.pk)
+    balance = ledger_stock
+    for m in movements:
+        m.balance = balance
+        balance -= m.qty
+
+    fecha = parse_date(request.GET.get("fecha") or "")
+    stock_en_fecha = None
+    if fecha:
+        when = timezone.make_aware(datetime.combine(fecha, time.max))
+        stock_en_fecha = stock_at(product.pk, when)
+
+    return render(request, "inventory/kardex.html", {
+        "product": product,
+        "movements": movements,
+        "ledger_stock": ledger_stock,
+        "fecha": fecha,
+        "stock_en_fecha": stock_en_fecha,
+        "limit": KARDEX_LIMIT,
+    })
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    name = 'jobs'
+
+    def ready(self):
+        # Cada app registra sus trabajos en su propio tasks.py
+        from django.utils.module_loading import autodiscover_modules
+        autodiscover_modules("tasks")
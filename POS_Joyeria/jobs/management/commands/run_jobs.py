@@ -0,0 +1,72 @@
+import logging
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError
+
+from jobs.schedule import enqueue_due
+from jobs.worker import Worker, purge_jobs, run_pending
+
+logger = logging.getLogger(__name__)
+
+PURGE_EVERY_SECONDS = 3600
+SCHEDULE_EVERY_SECONDS = 60
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de trabajos en segundo plano (exportaciones, recálculos, limpiezas). "
+        "Se corre junto al servidor web, ej. `python manage.py run_jobs --threads 2`; "
+        "también encola los trabajos programados (POS_JOBS_SCHEDULE). "
+        "Con --once corre lo pendiente y termina (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=None, help="Hilos (default POS_JOBS_THREADS).")
+        parser.add_argument("--poll", type=float, default=None, help="Segundos entre revisiones de la cola.")
+        parser.add_argument("--once", action="store_true", help="Corre lo pendiente y termina.")
+
+    def handle(self, *args, **options):
+        threads = options["threads"]
+        if threads is not None and threads < 1:
+            raise CommandError("--threads debe ser mayor a 0.")
+
+        if options["once"]:
+            count = run_pending()
+            self.stdout.write(self.style.SUCCESS(f"Trabajos ejecutados: {count}."))
+            return
+
+        poll = options["poll"] or settings.POS_JOBS_POLL_SECONDS
+        worker = Worker(threads=threads)
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        self.stdout.write(f"Worker {worker.name} con {worker.threads} hilo(s); Ctrl+C para salir.")
+
+        purge_at = schedule_at = 0.0
+        try:
+            while not stop.is_set():
+                try:
+                    if time.monotonic() >= purge_at:
+                        purge_jobs()
+                        purge_at = time.monotonic() + PURGE_EVERY_SECONDS
+                    if time.monotonic() >= schedule_at:
+                        # Trabajos programados (POS_JOBS_SCHEDULE), ej. el cierre nocturno
+                        for job in enqueue_due():
+                            self.stdout.write(f"Programado: {job}")
+                        schedule_at = time.monotonic() + SCHEDULE_EVERY_SECONDS
+                    claimed = worker.tick()
+                except OperationalError:
+                    # BD ocupada: se intenta en la siguiente vuelta
+                    logger.warning("Cola de trabajos ocupada; reintentando", exc_info=True)
+                    claimed = 0
+                if not claimed:
+                    stop.wait(poll)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if worker.busy:
+                self.stdout.write("Esperando a que terminen los trabajos en curso...")
+            worker.shutdown()
@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.db import models
+from django.urls import reverse
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Trabajo en segundo plano (jobs/registry.py). Lo toma el proceso
+    `manage.py run_jobs`; progress/message los va escribiendo la tarea y
+    heartbeat_at lo renueva el worker mientras corre.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "En cola"
+        RUNNING = "RUNNING", "En proceso"
+        DONE = "DONE", "Terminado"
+        FAILED = "FAILED", "Falló"
+
+    name = models.CharField(max_length=80)  # nombre registrado, ej. "sales.export_csv"
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+
+    progress = models.PositiveSmallIntegerField(default=0)  # 0-100
+    message = models.CharField(max_length=200, blank=True, default="")
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+
+    worker = models.CharField(max_length=80, blank=True, default="")
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # El worker busca siempre "pendientes listos para correr"
+            models.Index(fields=["status", "run_after"], name="job_status_run_after_idx"),
+        ]
+
+    @property
+    def finished(self):
+        return self.status in (self.Status.DONE, self.Status.FAILED)
+
+    def as_dict(self):
+        data = {
+            "id": self.pk,
+            "name": self.name,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "result": self.result,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+        if self.status == self.Status.FAILED:
+            # Sólo la última línea: el traceback completo queda en el admin/BD
+            data["error"] = (self.error.strip().splitlines() or [""])[-1]
+        if self.status == self.Status.DONE and isinstance(self.result, dict) and self.result.get("file"):
+            data["download"] = reverse("jobs_web:download", args=[self.pk])
+        return data
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,83 @@
+from dataclasses import dataclass
+from typing import Callable
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+from .models import Job
+
+
+# Trabajos en segundo plano, sin broker externo: la cola es la tabla Job.
+#
+#     # <app>/tasks.py (se importa solo al arrancar, ver apps.py)
+#     @task("sales.export_csv", max_attempts=2)
+#     def export_sales_csv(job, start, end):
+#         for i, row in enumerate(rows):
+#             ...
+#             job.progress(i, total, "Escribiendo ventas")
+#         return {"rows": total}
+#
+#     enqueue("sales.export_csv", {"start": "...", "end": "..."}, user=request.user)
+#
+# El payload y lo que regresa la tarea se guardan como JSON. Una tarea que
+# lanza una excepción se reintenta (con espera creciente) hasta max_attempts.
+
+
+@dataclass(frozen=True)
+class TaskSpec:
+    name: str
+    func: Callable
+    max_attempts: int
+
+
+TASKS = {}
+
+
+def task(name, max_attempts=3):
+    def decorator(func):
+        TASKS[name] = TaskSpec(name=name, func=func, max_attempts=max_attempts)
+        return func
+    return decorator
+
+
+def get_task(name):
+    return TASKS.get(name)
+
+
+def enqueue(name, payload=None, user=None):
+    """Crea el trabajo; lo corre el worker (o este proceso, según POS_JOBS_RUNNER)."""
+    spec = get_task(name)
+    if spec is None:
+        raise ValueError(f"Trabajo desconocido: {name}")
+
+    job = Job.objects.create(
+        name=name,
+        payload=payload or {},
+        max_attempts=spec.max_attempts,
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+    job_id = job.pk
+    transaction.on_commit(lambda: _dispatch(job_id))
+    return job
+
+
+def _dispatch(job_id):
+    """
+    settings.POS_JOBS_RUNNER:
+      "worker" (default) -> lo toma `manage.py run_jobs` (otro proceso)
+      "thread"           -> pool de hilos de este proceso (sin worker aparte)
+      "sync"             -> en el mismo request (pruebas / scripts)
+    """
+    from .worker import run_in_thread, run_now
+
+    mode = getattr(settings, "POS_JOBS_RUNNER", "worker")
+    if mode == "sync":
+        run_now(job_id)
+    elif mode == "thread":
+        run_in_thread(job_id)
+
+
+def job_files():
+    """Archivos que generan los trabajos (exportaciones); fuera de MEDIA, se bajan con sesión."""
+    return FileSystemStorage(location=settings.POS_JOBS_FILES_DIR)
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Job
+from .registry import enqueue
+
+
+def _slot(now, at):
+    hour, minute = (int(x) for x in at.split(":"))
+    return now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+
+def enqueue_due(now=None):
+    """
+    Encola los trabajos de POS_JOBS_SCHEDULE ({"nombre": "HH:MM"}, hora local)
+    una vez al día: si ya pasó la hora y no hay uno creado desde entonces.
+    Un worker que arranca tarde lo encola al arrancar.
+    """
+    now = timezone.localtime(now)
+    created = []
+    for name, at in getattr(settings, "POS_JOBS_SCHEDULE", {}).items():
+        if not at:
+            continue
+        slot = _slot(now, at)
+        if now < slot:
+            continue
+        # En SQLite el atomic toma el candado de escritura (BEGIN IMMEDIATE):
+        # dos workers no lo encolan dos veces
+        with transaction.atomic():
+            if Job.objects.filter(name=name, created_at__gte=slot).exists():
+                continue
+            created.append(enqueue(name))
+    return created
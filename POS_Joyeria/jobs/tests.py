@@ -0,0 +1,196 @@
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import Job
+from .registry import enqueue, job_files, task
+from .worker import claim, purge_jobs, requeue_stale, run_now, run_pending
+
+User = get_user_model()
+
+CALLS = []
+
+
+@task("tests.ok")
+def _ok(job, n=3):
+    for i in range(n):
+        job.progress(i + 1, n, f"Paso {i + 1}")
+    return {"n": n}
+
+
+@task("tests.boom", max_attempts=2)
+def _boom(job):
+    CALLS.append(job.attempt)
+    raise RuntimeError("se rompió")
+
+
+@task("tests.requeued")
+def _requeued(job):
+    # Mientras corre, requeue_stale() lo regresa a la cola y otro worker lo toma
+    Job.objects.filter(pk=job.id).update(status=Job.Status.PENDING, worker="")
+    claim("otro", job_id=job.id)
+    return {"ok": True}
+
+
+@task("tests.slow")
+def _slow(job, seconds=0.3):
+    started = Job.objects.values_list("heartbeat_at", flat=True).get(pk=job.id)
+    time.sleep(seconds)
+    return {"renewed": Job.objects.values_list("heartbeat_at", flat=True).get(pk=job.id) > started}
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_trabajo_desconocido(self):
+        with self.assertRaises(ValueError):
+            enqueue("tests.no_existe")
+
+    def test_corre_y_guarda_resultado(self):
+        job = enqueue("tests.ok", {"n": 4})
+        self.assertEqual(job.status, Job.Status.PENDING)
+
+        self.assertEqual(run_pending("w1"), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.DONE)
+        self.assertEqual(job.progress, 100)
+        self.assertEqual(job.result, {"n": 4})
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.worker, "w1")
+
+    def test_un_solo_worker_toma_cada_trabajo(self):
+        job = enqueue("tests.ok")
+        self.assertEqual(claim("w1"), [job.pk])
+        self.assertEqual(claim("w2"), [])
+
+    def test_reintenta_con_espera_y_luego_falla(self):
+        job = enqueue("tests.boom")
+        with self.assertLogs("jobs.worker", "ERROR"):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.PENDING)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn("se rompió", job.error)
+
+        # Todavía no toca: no se vuelve a correr
+        self.assertEqual(run_pending(), 0)
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs("jobs.worker", "ERROR"):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual(CALLS, [1, 2])
+        self.assertEqual(job.as_dict()["error"], "RuntimeError: se rompió")
+
+    def test_regresa_a_la_cola_si_el_worker_murio(self):
+        job = enqueue("tests.ok")
+        claim("muerto")
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.PENDING)
+
+    def test_no_marca_terminado_un_trabajo_que_ya_es_de_otro(self):
+        job = enqueue("tests.requeued")
+        with self.assertLogs("jobs.worker", "WARNING"):
+            run_pending("w1")
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (Job.Status.RUNNING, "otro"))
+        self.assertIsNone(job.result)
+
+    @override_settings(POS_JOBS_RUNNER="sync")
+    def test_modo_sync_corre_al_confirmar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = enqueue("tests.ok")
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.DONE)
+
+    @override_settings(POS_JOBS_SCHEDULE={"tests.ok": "03:00"})
+    def test_programados_una_vez_al_dia(self):
+        from .schedule import enqueue_due
+
+        madrugada = timezone.localtime().replace(hour=2, minute=59)
+        self.assertEqual(enqueue_due(madrugada), [])
+        despues = madrugada.replace(hour=3, minute=5)
+        with patch("django.utils.timezone.now", return_value=despues):
+            self.assertEqual(len(enqueue_due(despues)), 1)
+        # Ya hay uno desde las 03:00
+        self.assertEqual(enqueue_due(despues.replace(hour=23)), [])
+
+    def test_run_jobs_once(self):
+        enqueue("tests.ok")
+        out = StringIO()
+        call_command("run_jobs", "--once", stdout=out)
+        self.assertIn("Trabajos ejecutados: 1", out.getvalue())
+
+    def test_purga_trabajos_viejos_y_sus_archivos(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(POS_JOBS_FILES_DIR=tmp):
+            name = job_files().save("viejo.csv", ContentFile(b"x"))
+            old = Job.objects.create(
+                name="tests.ok", status=Job.Status.DONE, result={"file": name},
+                finished_at=timezone.now() - timedelta(days=30),
+            )
+            recent = Job.objects.create(name="tests.ok", status=Job.Status.DONE, finished_at=timezone.now())
+
+            self.assertEqual(purge_jobs(days=14), 1)
+            self.assertFalse(Job.objects.filter(pk=old.pk).exists())
+            self.assertTrue(Job.objects.filter(pk=recent.pk).exists())
+            self.assertFalse(job_files().exists(name))
+
+
+class JobHeartbeatTest(TransactionTestCase):
+    @override_settings(POS_JOBS_STALE_SECONDS=0.15)
+    def test_heartbeat_mientras_corre_en_el_proceso(self):
+        job = enqueue("tests.slow")
+        run_now(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.DONE)
+        self.assertEqual(job.result, {"renewed": True})
+        # Ya terminó: requeue_stale no lo toca
+        self.assertEqual(requeue_stale(), 0)
+
+
+class JobStatusViewsTest(TestCase):
+    def setUp(self):
+        self.vendedor = User.objects.create_user(username="v", password="x")
+        self.vendedor.groups.add(Group.objects.create(name="VendedorPOS"))
+        self.admin = User.objects.create_user(username="a", password="x")
+        self.admin.groups.add(Group.objects.create(name="AdminPOS"))
+        self.job = enqueue("tests.ok", user=self.admin)
+
+    def test_estado_web(self):
+        url = reverse("jobs_web:status", args=[self.job.pk])
+        self.client.force_login(self.vendedor)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        self.client.force_login(self.admin)
+        data = self.client.get(url).json()
+        self.assertEqual(data["status"], "PENDING")
+        self.assertEqual(data["progress"], 0)
+
+    def test_api_requiere_autenticacion_y_filtra(self):
+        api = APIClient()
+        self.assertEqual(api.get(reverse("job-detail", args=[self.job.pk])).status_code, 401)
+
+        api.force_authenticate(self.vendedor)
+        self.assertEqual(api.get(reverse("job-detail", args=[self.job.pk])).status_code, 404)
+        self.assertEqual(api.get(reverse("job-list")).json(), [])
+
+        api.force_authenticate(self.admin)
+        self.assertEqual(api.get(reverse("job-detail", args=[self.job.pk])).json()["name"], "tests.ok")
+        self.assertEqual(len(api.get(reverse("job-list"), {"status": "pending"}).json()), 1)
+        self.assertEqual(api.get(reverse("job-list"), {"status": "x"}).status_code, 400)
@@ -0,0 +1,36 @@
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import Job
+
+
+def _visible_jobs(user):
+    # Cada quien ve sus trabajos; staff ve todos
+    qs = Job.objects.order_by("-id")
+    return qs if user.is_staff else qs.filter(created_by=user)
+
+
+# Estado de trabajos: /api/jobs/?status=RUNNING y /api/jobs/<id>/
+class JobListView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        qs = _visible_jobs(request.user)
+        wanted = request.query_params.get("status", "").upper()
+        if wanted:
+            if wanted not in Job.Status.values:
+                return Response({"detail": "Estado inválido."}, status=status.HTTP_400_BAD_REQUEST)
+            qs = qs.filter(status=wanted)
+        return Response([job.as_dict() for job in qs[:100]])
+
+
+class JobDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        job = _visible_jobs(request.user).filter(pk=pk).first()
+        if job is None:
+            return Response({"detail": "No encontrado."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(job.as_dict(), headers={"Cache-Control": "no-store"})
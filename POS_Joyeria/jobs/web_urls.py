@@ -0,0 +1,9 @@
+from django.urls import path
+from . import web_views
+
+app_name = "jobs_web"
+
+urlpatterns = [
+    path("<int:job_id>/", web_views.job_status, name="status"),
+    path("<int:job_id>/archivo/", web_views.job_download, name="download"),
+]
@@ -0,0 +1,32 @@
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+
+from utils.roles import get_user_roles, role_required
+from .models import Job
+from .registry import job_files
+
+
+def _job_for(request, job_id):
+    # AdminPOS ve cualquier trabajo; el vendedor sólo los suyos
+    qs = Job.objects.all()
+    if "AdminPOS" not in get_user_roles(request.user):
+        qs = qs.filter(created_by=request.user)
+    return get_object_or_404(qs, pk=job_id)
+
+
+# Estado para las pantallas (sesión); la barra de avance lo pide cada par de segundos
+@role_required(["AdminPOS", "VendedorPOS"])
+def job_status(request, job_id: int):
+    response = JsonResponse({"ok": True, **_job_for(request, job_id).as_dict()})
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+@role_required(["AdminPOS", "VendedorPOS"])
+def job_download(request, job_id: int):
+    job = _job_for(request, job_id)
+    name = (job.result or {}).get("file") if job.status == Job.Status.DONE else None
+    storage = job_files()
+    if not name or not storage.exists(name):
+        raise Http404("El archivo ya no existe.")
+    return FileResponse(storage.open(name, "rb"), as_attachment=True, filename=name.rsplit("/", 1)[-1])
@@ -0,0 +1,252 @@
+import logging
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+from .registry import get_task, job_files
+
+logger = logging.getLogger(__name__)
+
+Status = Job.Status
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobContext:
+    """Primer argumento de cada tarea: id, intento actual y reporte de avance."""
+
+    def __init__(self, job):
+        self.id = job.pk
+        self.attempt = job.attempts
+        self._last = None
+
+    def progress(self, done, total=None, message=""):
+        # progress(35) -> 35 %; progress(70, 200, "...") -> 35 %
+        pct = done if total is None else (done * 100 // total if total else 100)
+        pct = max(0, min(100, int(pct)))
+        # Sólo se escribe cuando cambia: una tarea puede llamarlo en cada renglón
+        if (pct, message) == self._last:
+            return
+        self._last = (pct, message)
+        Job.objects.filter(pk=self.id, status=Status.RUNNING).update(
+            progress=pct, message=message[:200], heartbeat_at=timezone.now()
+        )
+
+
+def claim(worker_id, limit=1, job_id=None):
+    """Toma hasta `limit` trabajos listos; regresa sus ids."""
+    now = timezone.now()
+    qs = Job.objects.filter(status=Status.PENDING, run_after__lte=now)
+    if job_id is not None:
+        qs = qs.filter(pk=job_id)
+
+    claimed = []
+    for pk in qs.order_by("run_after", "id").values_list("id", flat=True)[:limit]:
+        # Compare-and-set: si otro worker lo tomó primero, update() regresa 0
+        taken = Job.objects.filter(pk=pk, status=Status.PENDING).update(
+            status=Status.RUNNING, worker=worker_id, attempts=F("attempts") + 1,
+            progress=0, started_at=now, heartbeat_at=now,
+        )
+        if taken:
+            claimed.append(pk)
+    return claimed
+
+
+def _retry_or_fail(job, error, qs=None):
+    """Regresa el trabajo a la cola (espera 30 s, 60 s, 120 s...) o lo marca como fallido."""
+    now = timezone.now()
+    qs = Job.objects.filter(pk=job.pk) if qs is None else qs
+    if job.attempts < job.max_attempts:
+        delay = settings.POS_JOBS_RETRY_SECONDS * 2 ** max(job.attempts - 1, 0)
+        return qs.update(
+            status=Status.PENDING, run_after=now + timedelta(seconds=delay), worker="", error=error,
+            message=f"Reintento {job.attempts + 1} de {job.max_attempts}",
+        )
+    return qs.update(status=Status.FAILED, error=error, finished_at=now)
+
+
+class _Heartbeat(threading.Thread):
+    """
+    Renueva heartbeat_at mientras la tarea corre en este proceso (worker,
+    POS_JOBS_RUNNER=thread o sync); sin esto requeue_stale() la tomaría por
+    abandonada a los POS_JOBS_STALE_SECONDS aunque siga viva.
+    """
+
+    def __init__(self, job_id, worker_id):
+        super().__init__(name=f"pos-jobs-heartbeat-{job_id}", daemon=True)
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.interval = max(settings.POS_JOBS_STALE_SECONDS / 3, 0.01)
+        self._done = threading.Event()
+        self._used_db = False
+
+    def beat(self):
+        self._used_db = True
+        return Job.objects.filter(pk=self.job_id, status=Status.RUNNING, worker=self.worker_id).update(
+            heartbeat_at=timezone.now()
+        )
+
+    def run(self):
+        try:
+            while not self._done.wait(self.interval):
+                try:
+                    if not self.beat():
+                        return  # ya no es nuestro (se regresó a la cola)
+                except Exception:
+                    logger.warning("No se pudo renovar el heartbeat del job %s", self.job_id, exc_info=True)
+        finally:
+            if self._used_db:
+                connection.close()
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def execute(job_id):
+    """Corre un trabajo ya tomado (RUNNING) en este hilo."""
+    job = Job.objects.get(pk=job_id)
+    # Lo que se escribe al terminar sólo aplica si el trabajo sigue siendo de
+    # este worker: si se regresó a la cola y lo tomó otro, no se pisa
+    mine = Job.objects.filter(pk=job.pk, status=Status.RUNNING, worker=job.worker)
+    spec = get_task(job.name)
+    if spec is None:
+        mine.update(status=Status.FAILED, error=f"Trabajo desconocido: {job.name}", finished_at=timezone.now())
+        return
+
+    heartbeat = _Heartbeat(job.pk, job.worker)
+    heartbeat.start()
+    try:
+        result = spec.func(JobContext(job), **job.payload)
+    except Exception:
+        logger.exception("Falló el trabajo %s (intento %s de %s)", job, job.attempts, job.max_attempts)
+        _retry_or_fail(job, traceback.format_exc(), mine)
+        return
+    finally:
+        heartbeat.stop()
+
+    now = timezone.now()
+    if not mine.update(status=Status.DONE, progress=100, result=result, error="", finished_at=now, heartbeat_at=now):
+        logger.warning("El trabajo %s terminó pero ya no pertenece a %s; no se marca como terminado", job, job.worker)
+
+
+def requeue_stale():
+    """Trabajos RUNNING cuyo worker dejó de renovar heartbeat_at (proceso muerto, reinicio)."""
+    limit = timezone.now() - timedelta(seconds=settings.POS_JOBS_STALE_SECONDS)
+    count = 0
+    for job in Job.objects.filter(status=Status.RUNNING, heartbeat_at__lt=limit):
+        qs = Job.objects.filter(pk=job.pk, status=Status.RUNNING, heartbeat_at__lt=limit)
+        count += _retry_or_fail(job, "El worker dejó de responder.", qs)
+    return count
+
+
+def run_pending(worker_id=None):
+    """Corre en este hilo todo lo que esté listo (run_jobs --once, pruebas)."""
+    worker_id = worker_id or worker_name()
+    count = 0
+    while True:
+        ids = claim(worker_id)
+        if not ids:
+            return count
+        execute(ids[0])
+        count += 1
+
+
+def run_now(job_id):
+    for pk in claim(worker_name(), job_id=job_id):
+        execute(pk)
+
+
+def _run_claimed(job_id):
+    close_old_connections()
+    try:
+        execute(job_id)
+    except Exception:
+        logger.exception("Error en el worker de trabajos (job %s)", job_id)
+    finally:
+        connection.close()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.POS_JOBS_THREADS, thread_name_prefix="pos-jobs")
+        return _executor
+
+
+def run_in_thread(job_id):
+    def run():
+        close_old_connections()
+        try:
+            ids = claim(worker_name(), job_id=job_id)
+        finally:
+            connection.close()
+        if ids:
+            _run_claimed(ids[0])
+
+    _get_executor().submit(run)
+
+
+def purge_jobs(days=None):
+    """Borra trabajos terminados más viejos que `days` (default POS_JOBS_KEEP_DAYS) y sus archivos."""
+    days = settings.POS_JOBS_KEEP_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    qs = Job.objects.filter(status__in=[Status.DONE, Status.FAILED], finished_at__lt=cutoff)
+
+    storage = job_files()
+    for result in qs.exclude(result=None).values_list("result", flat=True).iterator():
+        name = result.get("file") if isinstance(result, dict) else None
+        if name and storage.exists(name):
+            storage.delete(name)
+    deleted, _ = qs.delete()
+    return deleted
+
+
+class Worker:
+    """
+    Pool de hilos que va tomando trabajos de la tabla (manage.py run_jobs).
+    Cada tick() regresa a la cola lo abandonado por otros workers y llena los
+    hilos libres; el heartbeat de lo que corre lo renueva execute().
+    """
+
+    def __init__(self, threads=None, name=None):
+        self.threads = threads or settings.POS_JOBS_THREADS
+        self.name = name or worker_name()
+        self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="pos-jobs")
+        self._running = {}  # future -> job id
+
+    @property
+    def busy(self):
+        return len(self._running)
+
+    def tick(self):
+        self._running = {f: pk for f, pk in self._running.items() if not f.done()}
+        requeue_stale()
+
+        free = self.threads - len(self._running)
+        if free <= 0:
+            return 0
+        ids = claim(self.name, free)
+        for pk in ids:
+            self._running[self._executor.submit(_run_claimed, pk)] = pk
+        return len(ids)
+
+    def shutdown(self):
+        # Deja terminar lo que ya empezó
+        self._executor.shutdown(wait=True)
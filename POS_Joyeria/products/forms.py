@@ -1,4 +1,5 @@
 from django import forms
+from utils.uniqueness import find_conflicts
 from .models import Category, Material, Product
 
 BASE_INPUT = "border p-2 rounded w-full"
@@ -7,12 +8,17 @@ BASE_INPUT = "border p-2 rounded w-full"
 class CategoryForm(forms.ModelForm):
     class Meta:
         model = Category
-        fields = ["name"]
+        fields = ["name", "low_stock_threshold"]
+        labels = {"low_stock_threshold": "Existencia mínima"}
         widgets = {
             "name": forms.TextInput(attrs={
                 "class": BASE_INPUT,
                 "placeholder": "Ej. Anillos"
             }),
+            "low_stock_threshold": forms.NumberInput(attrs={
+                "class": BASE_INPUT,
+                "min": 0,
+            }),
         }
 
     def clean_name(self):
@@ -23,15 +29,31 @@ class CategoryForm(forms.ModelForm):
         if len(v) < 3:
             raise forms.ValidationError("Debe tener al menos 3 caracteres.")
 
-        qs = Category.objects.filter(name__iexact=v)
-        if self.instance and self.instance.pk:
-            qs = qs.exclude(pk=self.instance.pk)
-
-        if qs.exists():
+        conflicts = find_conflicts(
+            Category,
+            {"name": {"name__iexact": v}},
+            exclude_pk=self.instance.pk if self.instance else None,
+        )
+        if conflicts:
             raise forms.ValidationError("Ya existe una categoría con ese nombre.")
 
         return v
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["low_stock_threshold"].required = False
+
+    def clean_low_stock_threshold(self):
+        # Vacío -> se conserva el valor actual (o el default del modelo)
+        v = self.cleaned_data.get("low_stock_threshold")
+        if v is None:
+            return self.instance.low_stock_threshold
+        return v
+
+    def validate_unique(self):
+        # La unicidad de name ya se revisó en clean_name() (case-insensitive)
+        pass
+
 
 class MaterialForm(forms.ModelForm):
     class Meta:
@@ -56,14 +78,22 @@ class MaterialForm(forms.ModelForm):
         if not name or not purity:
             return cleaned
 
-        qs = Material.objects.filter(name__iexact=name, purity__iexact=purity)
-        if self.instance and self.instance.pk:
-            qs = qs.exclude(pk=self.instance.pk)
-
-        if qs.exists():
+        conflicts = find_conflicts(
+            Material,
+            {"purity": {"name__iexact": name, "purity__iexact": purity}},
+            exclude_pk=self.instance.pk if self.instance else None,
+        )
+        if conflicts:
             self.add_error("purity", "Ya existe ese material con esa pureza.")
         return cleaned
 
+    def _get_validation_exclusions(self):
+        # name + purity ya se validan en clean() (case-insensitive); así el
+        # UniqueConstraint del modelo no repite la consulta
+        exclude = super()._get_validation_exclusions()
+        exclude.update({"name", "purity"})
+        return exclude
+
 
 class ProductForm(forms.ModelForm):
     class Meta:
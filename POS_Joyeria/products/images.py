@@ -0,0 +1,147 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Tamaños (lado mayor en px). "sm" = miniaturas del POS / lista (w-14 a 2x),
+# "md" = vista previa, "lg" = detalle.
+VARIANT_SIZES = {"sm": 128, "md": 320, "lg": 640}
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+VARIANTS_DIR = "products/variants"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "POS_IMAGE_WORKERS", 2),
+                thread_name_prefix="pos-images",
+            )
+        return _executor
+
+
+def _variant_name(digest, size_key, ext):
+    return f"{VARIANTS_DIR}/{digest[:20]}-{size_key}.{ext}"
+
+
+def build_variants(raw_bytes):
+    """
+    Genera las variantes de una imagen (bytes del archivo original).
+
+    Regresa (digest, {"sm": {"webp": nombre, "jpeg": nombre}, ...}).
+    Los nombres salen del hash del contenido: si ya existen no se vuelven
+    a escribir. Al re-codificar se descartan EXIF/GPS (sólo se aplica la
+    orientación antes de quitarlos).
+    """
+    digest = hashlib.sha256(raw_bytes).hexdigest()
+
+    with Image.open(BytesIO(raw_bytes)) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "L"):
+            # JPEG no soporta transparencia: se aplana sobre blanco
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            rgba = img.convert("RGBA")
+            background.paste(rgba, mask=rgba.split()[-1])
+            img = background
+        elif img.mode == "L":
+            img = img.convert("RGB")
+
+        variants = {}
+        for size_key, size in VARIANT_SIZES.items():
+            resized = img.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+
+            variants[size_key] = {}
+            for ext, (fmt, options) in FORMATS.items():
+                name = _variant_name(digest, size_key, ext)
+                if not default_storage.exists(name):
+                    buf = BytesIO()
+                    resized.save(buf, fmt, **options)
+                    default_storage.save(name, ContentFile(buf.getvalue()))
+                variants[size_key][ext] = name
+
+    return digest, variants
+
+
+def process_product_image(product_id):
+    """Procesa la imagen actual del producto y guarda hash + variantes."""
+    from .models import Product
+
+    product = Product.objects.filter(pk=product_id).only("id", "image", "image_variants").first()
+    if product is None or not product.image:
+        return None
+
+    source = product.image.name
+    if product.image_variants.get("source") == source:
+        return product.image_variants
+
+    try:
+        with product.image.open("rb") as f:
+            raw = f.read()
+        digest, variants = build_variants(raw)
+    except (FileNotFoundError, UnidentifiedImageError, OSError) as e:
+        logger.warning("No se pudo procesar la imagen del producto %s (%s): %s", product_id, source, e)
+        return None
+
+    data = {"source": source, "sizes": variants}
+    # update() para no volver a disparar post_save; sólo si no cambió la imagen mientras tanto
+    updated = Product.objects.filter(pk=product_id, image=source).update(image_hash=digest, image_variants=data)
+    if updated:
+        from utils.cache import invalidate_for_model
+        from utils.http_cache import bump_table_version
+        invalidate_for_model(Product)
+        # La lista de la API incluye las miniaturas
+        bump_table_version(Product)
+    return data
+
+
+def _run_in_worker(product_id):
+    close_old_connections()
+    try:
+        process_product_image(product_id)
+    except Exception:
+        logger.exception("Error en el pipeline de imágenes (producto %s)", product_id)
+    finally:
+        connection.close()
+
+
+def schedule_product_image(product):
+    """
+    Programa el procesamiento después del commit.
+
+    settings.POS_IMAGE_PIPELINE:
+      "thread" (default) -> pool de hilos, la respuesta no espera
+      "sync"             -> en el mismo request (pruebas / scripts)
+      "off"              -> no se procesa (se sirve el original)
+    """
+    mode = getattr(settings, "POS_IMAGE_PIPELINE", "thread")
+    if mode == "off" or not product.image:
+        return
+
+    product_id = product.pk
+    if mode == "sync":
+        transaction.on_commit(lambda: process_product_image(product_id))
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_worker, product_id))
+
+
+def needs_processing(product):
+    if not product.image:
+        return False
+    return (product.image_variants or {}).get("source") != product.image.name
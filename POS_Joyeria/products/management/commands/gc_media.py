@@ -0,0 +1,64 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra de media/products/ los archivos que ningún producto usa "
+        "(imágenes de productos eliminados, variantes viejas)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Sólo lista lo que se borraría.")
+        parser.add_argument(
+            "--grace-minutes",
+            type=int,
+            default=60,
+            help="No tocar archivos más nuevos que esto (subidas / miniaturas en proceso).",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        cutoff = time.time() - options["grace_minutes"] * 60
+
+        referenced = set()
+        for image, variants in Product.objects.exclude(image="").exclude(image__isnull=True).values_list(
+            "image", "image_variants"
+        ).iterator(chunk_size=2000):
+            referenced.add(image)
+            for formats in ((variants or {}).get("sizes") or {}).values():
+                referenced.update(formats.values())
+
+        root = os.path.join(settings.MEDIA_ROOT, "products")
+        removed = 0
+        freed = 0
+
+        for dirpath, _dirnames, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, "/")
+                if name in referenced:
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if stat.st_mtime > cutoff:
+                    continue
+
+                removed += 1
+                freed += stat.st_size
+                if dry_run:
+                    self.stdout.write(f"  {name}")
+                else:
+                    os.remove(path)
+
+        accion = "Se borrarían" if dry_run else "Borrados"
+        self.stdout.write(self.style.SUCCESS(
+            f"{accion} {removed} archivos huérfanos ({freed / 1024:.1f} KB)."
+        ))
@@ -1,14 +1,20 @@
 from django.db import models
+from django.db.models import Count
+
+from utils.changes import ChangeTrackedModel
+from utils.media import product_image_storage
 
 #categorias diponibles para los productos
-class Category(models.Model):
+class Category(ChangeTrackedModel):
     name = models.CharField(max_length=100, unique=True)
+    # Alerta de existencias bajas (inventory): stock <= este valor
+    low_stock_threshold = models.PositiveIntegerField(default=2)
 
     def __str__(self):
         return self.name
 
 #materiales de los cuales estan echos los productos
-class Material(models.Model):
+class Material(ChangeTrackedModel):
     name = models.CharField(max_length=100)
     purity = models.CharField(max_length=20)
 
@@ -25,7 +31,7 @@ class Material(models.Model):
         return f"{self.name} {self.purity}"
 
 
-class Product(models.Model):
+class Product(ChangeTrackedModel):
     name = models.CharField(max_length=120)
     category = models.ForeignKey(
         Category,
@@ -56,13 +62,26 @@ class Product(models.Model):
         on_delete=models.PROTECT,
         null=True
     )
+    # Nombre = hash del contenido (fotos repetidas no se duplican)
     image = models.ImageField(
         upload_to="products/",
+        storage=product_image_storage,
         null=True,
         blank=True
     )
+    # Pipeline de imágenes (products/images.py): hash del contenido y
+    # variantes redimensionadas {"source": image.name, "sizes": {"sm": {"webp": ..., "jpeg": ...}}}
+    image_hash = models.CharField(max_length=64, blank=True, default="", editable=False)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valores tal como se leyeron (inventory calcula la diferencia al guardar)
+        instance._loaded_values = dict(zip(field_names, (v for v in values if v is not models.DEFERRED)))
+        return instance
+
     # Funcion para la generacion automatica del codigo
     def generate_code(self):
 
@@ -83,6 +102,28 @@ class Product(models.Model):
         # Formatear como 3 dígitos
         return f"{supplier_code}{category_prefix}{existing:03d}"
 
+    @classmethod
+    def assign_codes(cls, products):
+        # Misma regla que generate_code() para altas masivas:
+        # un solo conteo por categoría y el consecutivo se lleva en memoria
+        pending = [p for p in products if not p.code]
+        category_ids = {p.category_id for p in pending if p.category_id}
+        counts = dict(
+            cls.objects.filter(category_id__in=category_ids)
+            .values_list("category_id")
+            .annotate(n=Count("id"))
+        )
+
+        for p in pending:
+            if not p.supplier or not p.supplier.code:
+                continue
+            if not p.category or not p.category.name:
+                continue
+
+            counts[p.category_id] = counts.get(p.category_id, 0) + 1
+            p.code = f"{p.supplier.code}{p.category.name[:3].upper()}{counts[p.category_id]:03d}"
+        return products
+
     def save(self, *args, **kwargs):
         # Generar código solo si no existe todavía
         if not self.code:
@@ -90,5 +131,26 @@ class Product(models.Model):
 
         super().save(*args, **kwargs)
 
+    def image_variant_url(self, size="sm", fmt="jpeg"):
+        # URL de la variante; si todavía no se procesa, la imagen original
+        if not self.image:
+            return None
+        variants = self.image_variants or {}
+        if variants.get("source") == self.image.name:
+            name = variants.get("sizes", {}).get(size, {}).get(fmt)
+            if name:
+                return self.image.storage.url(name)
+        if fmt == "webp":
+            return None
+        return self.image.url
+
+    @property
+    def thumbnail_url(self):
+        return self.image_variant_url("sm")
+
+    @property
+    def thumbnail_webp_url(self):
+        return self.image_variant_url("sm", "webp")
+
     def __str__(self):
         return self.name
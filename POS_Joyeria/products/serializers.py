@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from utils.bulk import PrefetchedPrimaryKeyRelatedField
 from .models import Category, Material, Product
 
 
@@ -15,6 +16,9 @@ class MaterialSerializer(serializers.ModelSerializer):
 
 
 class ProductSerializer(serializers.ModelSerializer):
+    # En alta masiva los FKs se resuelven desde el contexto (sin un query por fila)
+    serializer_related_field = PrefetchedPrimaryKeyRelatedField
+
     class Meta:
         model = Product
         fields = "__all__"
@@ -65,7 +69,8 @@ class ProductSerializer(serializers.ModelSerializer):
         """
         Validaciones a nivel de objeto:
         - Debe tener categoría, proveedor, material.
-        - Debe tener imagen al dar de alta (POST).
+        - Debe tener imagen al dar de alta (POST), salvo en alta masiva
+          (JSON desde catálogo del proveedor; la imagen se sube después).
         """
         creando = self.instance is None
 
@@ -83,7 +88,7 @@ class ProductSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"material": "Debe tener un material asignado."})
 
         # Validar imagen solo al crear
-        if creando:
+        if creando and not self.context.get("bulk"):
             image = attrs.get("image")
             if not image:
                 raise serializers.ValidationError(
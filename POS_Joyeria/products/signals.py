@@ -0,0 +1,37 @@
+from django.db.models.signals import post_delete, post_save
+
+from inventory.ledger import current_batch
+from utils.cache import connect_invalidation
+from utils.http_cache import bump_on_change
+from .images import needs_processing, schedule_product_image
+from .models import Category, Material, Product
+
+
+def _product_image_changed(sender, instance, **kwargs):
+    # Imagen nueva o reemplazada -> miniaturas en segundo plano
+    if needs_processing(instance):
+        schedule_product_image(instance)
+
+
+def _product_changed(sender, **kwargs):
+    # En un cobro o ajuste (stock_movements) cada pieza guarda su stock: la
+    # versión de la tabla sube una sola vez al salir del bloque
+    batch = current_batch()
+    if batch is not None:
+        batch.tables.add(sender)
+    else:
+        bump_on_change(sender, **kwargs)
+
+
+def connect_signals():
+    # Cambios en catálogos -> nueva versión de la tabla (invalida ETag y caché)
+    for model in (Category, Material):
+        post_save.connect(bump_on_change, sender=model, dispatch_uid=f"tblver-save-{model._meta.label_lower}")
+        post_delete.connect(bump_on_change, sender=model, dispatch_uid=f"tblver-delete-{model._meta.label_lower}")
+    post_save.connect(_product_changed, sender=Product, dispatch_uid="tblver-save-products.product")
+    post_delete.connect(_product_changed, sender=Product, dispatch_uid="tblver-delete-products.product")
+
+    # Cachés con nombre (catalog / search / reports)
+    connect_invalidation(Product, Category, Material)
+
+    post_save.connect(_product_image_changed, sender=Product, dispatch_uid="product-image-pipeline")
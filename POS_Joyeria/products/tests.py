@@ -1,7 +1,14 @@
-from io import BytesIO
+import os
+from io import BytesIO, StringIO
 from PIL import Image
 from django.contrib.messages import get_messages
-from django.test import TestCase
+from django.core.cache import cache, caches
+import shutil
+import tempfile
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
@@ -9,8 +16,12 @@ from django.contrib.auth.models import Group
 from rest_framework.test import APITestCase
 from rest_framework import status
 from suppliers.models import Supplier
+from utils.factories import QueryBudgetMixin
+from utils.media import IMMUTABLE_CACHE_CONTROL, serve_media
+from utils.uniqueness import find_conflicts_bulk
 from .models import Category, Material, Product
 from .forms import CategoryForm, MaterialForm, ProductForm
+from .images import VARIANT_SIZES, process_product_image
 from .serializers import ProductSerializer
 
 
@@ -140,6 +151,13 @@ class CategoryFormTest(TestCase):
         self.assertFalse(form.is_valid())
         self.assertIn("Ya existe una categoría con ese nombre.", form.errors["name"][0])
 
+    def test_unicidad_con_acentos_y_enie(self):
+        # El LOWER de SQLite sólo baja ASCII: "ÍÑ" no se comparaba con "íñ"
+        Category.objects.create(name="JOYERÍA DE PEÑA")
+        form = CategoryForm(data={"name": "joyería de peña"})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(find_conflicts_bulk(Category, [{"name": {"name__iexact": "Joyería de Peña"}}]), [{"name"}])
+
     def test_update_excluye_self(self):
         c = Category.objects.create(name="Anillos")
         form = CategoryForm(data={"name": "ANILLOS"}, instance=c)
@@ -284,6 +302,92 @@ class MaterialAPITest(APITestCase):
         self.assertEqual(len(resp.data), 2)
 
 
+class CatalogoConditionalGetTest(APITestCase):
+    def setUp(self):
+        # La caché no se revierte con la transacción del test
+        cache.clear()
+        caches["catalog"].clear()
+        Category.objects.create(name="Anillos")
+        self.url = reverse("category-list-create")
+
+    def test_etag_vigente_responde_304_sin_consultar_la_bd(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertIn("ETag", resp)
+        self.assertIn("Last-Modified", resp)
+
+        with self.assertNumQueries(0):
+            resp2 = self.client.get(self.url, HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(resp2.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_lista_se_sirve_de_cache_y_se_invalida_al_cambiar(self):
+        resp = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            again = self.client.get(self.url)
+        self.assertEqual(again.data, resp.data)
+
+        Category.objects.create(name="Pulseras")
+        resp3 = self.client.get(self.url, HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(resp3.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(resp3["ETag"], resp["ETag"])
+        self.assertEqual(len(resp3.data), 2)
+
+    def test_version_compartida_entre_procesos(self):
+        resp = self.client.get(self.url)
+        # Otro proceso: su caché local está vacía; la versión sale de la BD
+        caches["catalog"].clear()
+        with self.assertNumQueries(1):
+            again = self.client.get(self.url, HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_bump_confirmado_borra_la_version_en_cache(self):
+        resp = self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="Pulseras")
+            # Otro proceso la vuelve a leer antes del commit: el commit la borra de nuevo
+            self.client.get(self.url)
+        again = self.client.get(self.url, HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(again.data), 2)
+
+    def test_lista_de_productos_cambia_con_el_stock(self):
+        from inventory.ledger import stock_movements
+        from inventory.models import StockMovement
+        from utils.factories import make_products
+
+        products = make_products(2, stock=5)
+        url = reverse("product-list-create")
+        resp = self.client.get(url)
+        self.assertIn("ETag", resp)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=resp["ETag"]).status_code, 304)
+
+        # Dos piezas en un bloque: la versión de productos sube una sola vez
+        with CaptureQueriesContext(connection) as ctx, stock_movements(StockMovement.Kind.SALE):
+            for p in products:
+                p.stock -= 1
+                p.save(update_fields=["stock"])
+        self.assertEqual(sum('"sync_tableversion"' in q["sql"] for q in ctx.captured_queries), 1)
+        resp2 = self.client.get(url, HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(resp2.status_code, status.HTTP_200_OK)
+        self.assertEqual([p["stock"] for p in resp2.data], [4, 4])
+
+    def test_cambio_en_el_mismo_segundo_mueve_last_modified(self):
+        resp = self.client.get(self.url)
+        Category.objects.create(name="Pulseras")
+        resp2 = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=resp["Last-Modified"])
+        self.assertEqual(resp2.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(resp2["Last-Modified"], resp["Last-Modified"])
+
+    def test_borrar_material_invalida_etag(self):
+        m = Material.objects.create(name="Plata", purity="925")
+        url = reverse("material-list-create")
+        resp = self.client.get(url)
+        m.delete()
+        resp2 = self.client.get(url, HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(resp2.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp2.data, [])
+
+
 class ProductAPITest(APITestCase):
     def setUp(self):
         self.category = Category.objects.create(name="Anillos")
@@ -416,6 +520,185 @@ class ProductAPITest(APITestCase):
         self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Product.objects.count(), 0)
 
+    def test_bulk_crea_productos_con_codigos_consecutivos(self):
+        Product.objects.create(
+            name="Anillo previo",
+            category=self.category,
+            purchase_price=500,
+            sale_price=800,
+            weight=10,
+            stock=5,
+            supplier=self.supplier,
+            material=self.material,
+        )
+        base = {
+            "category": self.category.id,
+            "supplier": self.supplier.id,
+            "material": self.material.id,
+            "purchase_price": "100.00",
+            "sale_price": "200.00",
+            "weight": "1.00",
+            "stock": 3,
+        }
+        data = [dict(base, name=f"Anillo {i}") for i in range(3)]
+        data.append(dict(base, name="Sin categoria", category=999999))
+
+        url = reverse("product-list-create")
+        resp = self.client.post(url, data, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(resp.data["created"], 3)
+        self.assertIn("category", resp.data["results"][3]["errors"])
+
+        codes = sorted(Product.objects.exclude(name="Anillo previo").values_list("code", flat=True))
+        self.assertEqual(codes, ["V01ANI002", "V01ANI003", "V01ANI004"])
+
+
+class ProductImagePipelineTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media)
+        self.override.enable()
+
+        self.category = Category.objects.create(name="Anillos")
+        self.material = Material.objects.create(name="Plata", purity="925")
+        self.supplier = Supplier.objects.create(name="Prov", code="V01", phone="5550001111", email="p@test.com")
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media, ignore_errors=True)
+
+    def _photo_with_exif(self):
+        img = Image.new("RGB", (1200, 900), "red")
+        exif = Image.Exif()
+        exif[0x010F] = "Telefono"  # Make
+        f = BytesIO()
+        img.save(f, "JPEG", exif=exif)
+        return SimpleUploadedFile("foto.jpg", f.getvalue(), content_type="image/jpeg")
+
+    def _product(self, **extra):
+        return Product.objects.create(
+            name="Anillo",
+            category=self.category,
+            supplier=self.supplier,
+            material=self.material,
+            purchase_price=100,
+            sale_price=200,
+            weight=1,
+            stock=1,
+            **extra,
+        )
+
+    def test_genera_variantes_con_hash_y_sin_exif(self):
+        p = self._product(image=self._photo_with_exif())
+        data = process_product_image(p.id)
+
+        p.refresh_from_db()
+        self.assertEqual(len(p.image_hash), 64)
+        self.assertEqual(set(data["sizes"]), set(VARIANT_SIZES))
+
+        name = data["sizes"]["sm"]["jpeg"]
+        self.assertIn(p.image_hash[:20], name)
+        with p.image.storage.open(name) as f:
+            thumb = Image.open(f)
+            thumb.load()
+        self.assertLessEqual(max(thumb.size), VARIANT_SIZES["sm"])
+        self.assertEqual(len(thumb.getexif()), 0)
+
+        self.assertTrue(p.thumbnail_url.endswith(".jpeg"))
+        self.assertTrue(p.thumbnail_webp_url.endswith(".webp"))
+
+    def test_misma_imagen_reutiliza_archivos(self):
+        a = self._product(image=make_image_file("a.jpg"))
+        b = self._product(image=make_image_file("b.jpg"))
+        da = process_product_image(a.id)
+        db = process_product_image(b.id)
+        self.assertEqual(da["sizes"], db["sizes"])
+
+    def test_sin_procesar_usa_original(self):
+        p = self._product(image="products/no-existe.jpg")
+        with self.assertLogs("products.images", "WARNING"):
+            self.assertIsNone(process_product_image(p.id))
+        self.assertEqual(p.thumbnail_url, p.image.url)
+        self.assertIsNone(p.thumbnail_webp_url)
+
+    @override_settings(POS_IMAGE_PIPELINE="sync")
+    def test_alta_programa_el_procesamiento(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            p = self._product(image=self._photo_with_exif())
+        p.refresh_from_db()
+        self.assertEqual(p.image_variants["source"], p.image.name)
+
+
+class ContentAddressedMediaTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media)
+        self.override.enable()
+
+        category = Category.objects.create(name="Anillos")
+        material = Material.objects.create(name="Plata", purity="925")
+        supplier = Supplier.objects.create(name="Prov", code="V01", phone="5550001111", email="p@test.com")
+        self.base = dict(
+            category=category, supplier=supplier, material=material,
+            purchase_price=100, sale_price=200, weight=1, stock=1,
+        )
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media, ignore_errors=True)
+
+    def _files(self):
+        out = []
+        for dirpath, _, filenames in os.walk(self.media):
+            out += filenames
+        return out
+
+    def test_misma_foto_se_guarda_una_vez(self):
+        a = Product.objects.create(name="A", image=make_image_file("uno.jpg"), **self.base)
+        b = Product.objects.create(name="B", image=make_image_file("dos.JPG"), **self.base)
+        self.assertEqual(a.image.name, b.image.name)
+        self.assertRegex(a.image.name, r"^products/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$")
+        self.assertEqual(len(self._files()), 1)
+
+    def test_gc_media_borra_solo_huerfanos(self):
+        keep = Product.objects.create(name="A", image=make_image_file(), **self.base)
+        gone = Product.objects.create(name="B", image=self._other_image(), **self.base)
+        gone.delete()
+
+        call_command("gc_media", "--grace-minutes", "0", stdout=StringIO())
+        self.assertTrue(keep.image.storage.exists(keep.image.name))
+        self.assertEqual(len(self._files()), 1)
+
+    def test_media_con_huella_es_inmutable(self):
+        p = Product.objects.create(name="A", image=make_image_file(), **self.base)
+        res = serve_media(RequestFactory().get("/media/x"), p.image.name)
+        self.assertEqual(res["Cache-Control"], IMMUTABLE_CACHE_CONTROL)
+
+    def test_pos_serve_media_sin_debug(self):
+        import importlib
+
+        import POS.urls
+        from django.urls import clear_url_caches
+
+        p = Product.objects.create(name="A", image=make_image_file(), **self.base)
+        try:
+            with override_settings(DEBUG=False, POS_SERVE_MEDIA=True):
+                importlib.reload(POS.urls)
+                clear_url_caches()
+                res = self.client.get(f"/media/{p.image.name}")
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res["Cache-Control"], IMMUTABLE_CACHE_CONTROL)
+        finally:
+            # Las rutas vuelven a armarse con la configuración real
+            importlib.reload(POS.urls)
+            clear_url_caches()
+
+    @staticmethod
+    def _other_image():
+        f = BytesIO()
+        Image.new("RGB", (2, 2), "black").save(f, "JPEG")
+        return SimpleUploadedFile("otra.jpg", f.getvalue(), content_type="image/jpeg")
+
 
 # WEB VIEWS TESTS
 
@@ -590,4 +873,29 @@ def test_supplier_delete_protected_muestra_mensaje(self):
     self.assertEqual(res.status_code, 302)
 
     msgs = [m.message for m in get_messages(res.wsgi_request)]
-    self.assertTrue(any("No se puede eliminar" in m for m in msgs), msgs)
\ No newline at end of file
+    self.assertTrue(any("No se puede eliminar" in m for m in msgs), msgs)
+
+
+@tag("perf")
+class ProductQueryBudgetTest(QueryBudgetMixin, TestCase):
+    perf_data = ("products",)
+    perf_role = "AdminPOS"
+
+    def test_product_list_web(self):
+        with self.assertBudget(queries=4, ms=4000):
+            res = self.client.get(reverse("products_web:list"))
+        self.assertEqual(res.status_code, 200)
+
+    def test_api_productos(self):
+        with self.assertBudget(queries=2, ms=1500):
+            res = self.client.get(reverse("product-list-create"))
+        self.assertEqual(len(res.json()), self.volumes["products"])
+
+        with self.assertBudget(queries=0, ms=100):
+            res = self.client.get(reverse("product-list-create"), HTTP_IF_NONE_MATCH=res["ETag"])
+        self.assertEqual(res.status_code, 304)
+
+    def test_api_categorias_y_materiales(self):
+        with self.assertBudget(queries=4, ms=200):
+            self.client.get(reverse("category-list-create"))
+            self.client.get(reverse("material-list-create"))
@@ -1,4 +1,7 @@
 from rest_framework import generics
+from suppliers.models import Supplier
+from utils.bulk import BulkCreateMixin
+from utils.http_cache import ConditionalListMixin
 from .models import Category, Material, Product
 from .serializers import (
     CategorySerializer,
@@ -9,7 +12,8 @@ from .serializers import (
 
 #CATEGORY
 
-class CategoryListCreateAPIView(generics.ListCreateAPIView):
+class CategoryListCreateAPIView(ConditionalListMixin, generics.ListCreateAPIView):
+    # GET con ETag: si no cambió la tabla responde 304 sin armar la lista
     queryset = Category.objects.all().order_by("name")
     serializer_class = CategorySerializer
 
@@ -21,7 +25,7 @@ class CategoryDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
 
 #MATERIAL
 
-class MaterialListCreateAPIView(generics.ListCreateAPIView):
+class MaterialListCreateAPIView(ConditionalListMixin, generics.ListCreateAPIView):
     queryset = Material.objects.all().order_by("name")
     serializer_class = MaterialSerializer
 
@@ -33,9 +37,14 @@ class MaterialDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
 
 #PRODUCT
 
-class ProductListCreateAPIView(generics.ListCreateAPIView):
+class ProductListCreateAPIView(ConditionalListMixin, BulkCreateMixin, generics.ListCreateAPIView):
+    # POST acepta un objeto o una lista (alta masiva)
     queryset = Product.objects.all().order_by("name")
     serializer_class = ProductSerializer
+    bulk_prefetch = {"category": Category, "supplier": Supplier, "material": Material}
+
+    def prepare_bulk_instances(self, instances):
+        return Product.assign_codes(instances)
 
 
 class ProductDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
@@ -6,6 +6,9 @@ from django.db.models.deletion import ProtectedError
 from .models import Category, Material, Product
 from .forms import CategoryForm, MaterialForm, ProductForm
 from utils.roles import role_required
+from branches.stock import current_branch, stock_branch
+from inventory.ledger import stock_movements
+from inventory.models import StockMovement
 
 
 def _is_adminpos(user):
@@ -174,7 +177,9 @@ def product_create(request):
     form = ProductForm(request.POST or None, request.FILES or None)
 
     if request.method == "POST" and form.is_valid():
-        form.save()
+        # El stock inicial queda en la sucursal de quien lo da de alta
+        with stock_branch(current_branch(request)["id"]), stock_movements(StockMovement.Kind.IMPORT, user=request.user):
+            form.save()
         return redirect("products_web:list")
 
     return render(
@@ -211,7 +216,10 @@ def product_edit(request, pk):
                     },
                 )
 
-        form.save()
+        # Kardex: el cambio de stock queda como ajuste de este usuario (en su sucursal)
+        with stock_branch(current_branch(request)["id"]), \
+                stock_movements(StockMovement.Kind.ADJUST, user=request.user, note="Edición de producto"):
+            form.save()
         return redirect("products_web:list")
 
     return render(
@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ArchivedSale, ArchivedSaleItem, CheckoutKey, DailySales, Sale, SaleItem
+from .rollups import build_days, day_bounds
+
+
+# Archivo de ventas viejas.
+#
+#   archive_sales()  -> mueve a ArchivedSale / ArchivedSaleItem las ventas
+#                       anteriores a POS_ARCHIVE_DAYS (manage.py archive_sales,
+#                       paso del cierre nocturno)
+#   find_sale(id)    -> busca en Sale y, si no está, en el archivo
+#
+# Antes de mover un día se asegura su resumen en DailySales, así los reportes
+# no cambian. Los ids se conservan: /ventas/<id>/ y el kardex siguen sirviendo.
+
+ARCHIVE_STATUSES = (Sale.Status.PAID, Sale.Status.CANCELLED)
+
+SALE_FIELDS = [f.attname for f in ArchivedSale._meta.concrete_fields if f.name != "archived_at"]
+ITEM_FIELDS = [f.attname for f in ArchivedSaleItem._meta.concrete_fields]
+
+
+def archive_cutoff(days=None):
+    """Inicio del primer día que se queda en Sale."""
+    days = settings.POS_ARCHIVE_DAYS if days is None else days
+    # Nunca dentro de la ventana que el cierre nocturno vuelve a resumir
+    days = max(days, settings.POS_EOD_ROLLUP_DAYS + 1)
+    start, _ = day_bounds(timezone.localdate() - timedelta(days=days))
+    return start
+
+
+def _ensure_rollups(qs):
+    """Resume los días (por sucursal) que se van a archivar y no tienen resumen."""
+    tz = timezone.get_current_timezone()
+    pending = set(
+        qs.annotate(day=TruncDate("created_at", tzinfo=tz)).values_list("day", "branch_id").distinct().order_by()
+    )
+    if not pending:
+        return 0
+    days = {day for day, _ in pending}
+    built = set(
+        DailySales.objects.filter(day__in=days).values_list("day", "branch_id").distinct().order_by()
+    )
+    missing = {day for day, branch_id in pending - built}
+    if missing:
+        build_days(missing)
+    return len(missing)
+
+
+def _move(ids):
+    sales = [ArchivedSale(**row) for row in Sale.objects.filter(id__in=ids).values(*SALE_FIELDS)]
+    items = [ArchivedSaleItem(**row) for row in SaleItem.objects.filter(sale_id__in=ids).values(*ITEM_FIELDS)]
+    ArchivedSale.objects.bulk_create(sales)
+    ArchivedSaleItem.objects.bulk_create(items)
+
+    CheckoutKey.objects.filter(sale_id__in=ids).delete()
+    SaleItem.objects.filter(sale_id__in=ids).delete()
+    Sale.objects.filter(id__in=ids).delete()
+    return len(sales)
+
+
+def archive_sales(days=None, batch=None, progress=None):
+    """Mueve en lotes (una transacción corta por lote) las ventas pagadas o canceladas; regresa cuántas."""
+    batch = batch or settings.POS_ARCHIVE_BATCH
+    old = Sale.objects.filter(created_at__lt=archive_cutoff(days), status__in=ARCHIVE_STATUSES)
+    _ensure_rollups(old)
+
+    total = old.count()
+    moved = 0
+    while True:
+        with transaction.atomic():
+            ids = list(old.order_by("id").values_list("id", flat=True)[:batch])
+            if not ids:
+                break
+            moved += _move(ids)
+        if progress:
+            progress(moved, total, f"{moved} de {total} ventas")
+    return moved
+
+
+def find_sale(sale_id):
+    """Venta con sus renglones, cliente, vendedor y sucursal; primero en Sale, luego en el archivo."""
+    for model in (Sale, ArchivedSale):
+        sale = (
+            model.objects.prefetch_related("items").select_related("client", "user", "branch")
+            .filter(id=sale_id).first()
+        )
+        if sale is not None:
+            return sale
+    return None
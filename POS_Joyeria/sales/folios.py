@@ -0,0 +1,134 @@
+import heapq
+import re
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import FolioSequence
+
+
+# Folios de venta: PREFIJO + número con ceros a la izquierda (V000123).
+#
+# Cada proceso reserva un bloque de POS_FOLIO_BLOCK_SIZE números en una
+# transacción corta, y luego los entrega desde memoria. El folio se conoce
+# antes de crear la venta, así que la venta es un solo INSERT.
+#
+# Si la venta falla, el número regresa al bloque y se reutiliza (sin huecos).
+# Sólo quedan huecos si el proceso termina con números sin usar; con
+# POS_FOLIO_BLOCK_SIZE=1 no hay huecos pero cada venta toca el contador.
+# Cada terminal puede usar su propio prefijo (POS_FOLIO_PREFIX) para no
+# compartir ni siquiera el contador.
+
+
+def folio_prefix():
+    return getattr(settings, "POS_FOLIO_PREFIX", "V")
+
+
+def format_folio(prefix, number):
+    digits = getattr(settings, "POS_FOLIO_DIGITS", 6)
+    return f"{prefix}{number:0{digits}d}"
+
+
+def reserve_block(prefix, size):
+    """Aparta `size` números del contador (debe llamarse fuera de otra transacción)."""
+    with transaction.atomic():
+        updated = FolioSequence.objects.filter(prefix=prefix).update(next_value=F("next_value") + size)
+        if not updated:
+            FolioSequence.objects.get_or_create(prefix=prefix)
+            FolioSequence.objects.filter(prefix=prefix).update(next_value=F("next_value") + size)
+        end = FolioSequence.objects.filter(prefix=prefix).values_list("next_value", flat=True).get()
+    return range(end - size, end)
+
+
+class FolioAllocator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._free = {}  # prefijo -> heap de números apartados sin usar
+
+    def take(self, prefix):
+        with self._lock:
+            free = self._free.setdefault(prefix, [])
+            if not free:
+                size = max(1, getattr(settings, "POS_FOLIO_BLOCK_SIZE", 20))
+                free.extend(reserve_block(prefix, size))
+                heapq.heapify(free)
+            return heapq.heappop(free)
+
+    def give_back(self, prefix, number):
+        with self._lock:
+            heapq.heappush(self._free.setdefault(prefix, []), number)
+
+    def discard(self, prefix=None):
+        with self._lock:
+            if prefix is None:
+                self._free.clear()
+            else:
+                self._free.pop(prefix, None)
+
+
+_allocator = FolioAllocator()
+
+
+def reset_folio_allocator():
+    # Olvida los bloques en memoria (pruebas, o después de mover el contador)
+    _allocator.discard()
+
+
+def _folio_used(folio):
+    from .models import Sale
+
+    try:
+        return Sale.objects.filter(folio=folio).exists()
+    except Exception:
+        # Sin poder confirmarlo se pierde el número (hueco) antes que repetirlo
+        return True
+
+
+@contextmanager
+def allocate_folio(prefix=None):
+    """
+    Entrega un folio; si el bloque termina con excepción y la venta no se
+    guardó, el número regresa para la siguiente venta.
+    """
+    prefix = prefix or folio_prefix()
+    number = _allocator.take(prefix)
+    folio = format_folio(prefix, number)
+    try:
+        yield folio
+    except BaseException:
+        # La excepción puede venir de un hook on_commit, con la venta ya
+        # confirmada: ese número ya no se regresa
+        if not _folio_used(folio):
+            _allocator.give_back(prefix, number)
+        raise
+
+
+def sync_sequence(prefix=None, apps=None):
+    """Mueve el contador después del folio más alto ya guardado (cargas masivas, migración)."""
+    if apps is not None:
+        tables = [apps.get_model("sales", "Sale")]
+        Sequence = apps.get_model("sales", "FolioSequence")
+    else:
+        # Los folios archivados tampoco se repiten
+        from .models import ArchivedSale, Sale
+        tables = [Sale, ArchivedSale]
+        Sequence = FolioSequence
+    prefix = prefix or folio_prefix()
+
+    pattern = re.compile(rf"^{re.escape(prefix)}(\d+)$")
+    highest = 0
+    for model in tables:
+        for folio in model.objects.filter(folio__startswith=prefix).values_list("folio", flat=True).iterator():
+            m = pattern.match(folio)
+            if m:
+                highest = max(highest, int(m.group(1)))
+
+    seq, _ = Sequence.objects.get_or_create(prefix=prefix)
+    if seq.next_value <= highest:
+        Sequence.objects.filter(pk=seq.pk).update(next_value=highest + 1)
+    if apps is None:
+        _allocator.discard(prefix)
+    return max(seq.next_value, highest + 1)
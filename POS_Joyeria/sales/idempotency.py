@@ -0,0 +1,52 @@
+import re
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import CheckoutKey
+
+
+# Cobro idempotente: cada ticket lleva un token (ticket["token"]) que el
+# formulario manda como idempotency_key. El cobro guarda la clave en la misma
+# transacción que la venta; una segunda petición con la misma clave regresa la
+# venta original. Si dos llegan a la vez, la UNIQUE (usuario, clave) de
+# CheckoutKey hace que la segunda falle y se resuelva igual.
+
+HEADER = "HTTP_IDEMPOTENCY_KEY"
+_VALID = re.compile(r"^[A-Za-z0-9_\-:.]{8,64}$")
+
+
+def new_token():
+    return uuid.uuid4().hex
+
+
+def checkout_key(request, ticket):
+    """Clave del cobro: campo del formulario, header o token del ticket."""
+    for value in (request.POST.get("idempotency_key"), request.META.get(HEADER)):
+        value = (value or "").strip()
+        if _VALID.match(value):
+            return value
+    if isinstance(ticket, dict):
+        return ticket.get("token") or None
+    return None
+
+
+def find_checkout(key, user):
+    # La clave sólo sirve para el usuario que la usó
+    if not key:
+        return None
+    return CheckoutKey.objects.filter(key=key, user=user).select_related("sale").first()
+
+
+def record_checkout(key, sale, user):
+    if key:
+        CheckoutKey.objects.create(key=key, sale=sale, user=user)
+
+
+def purge_checkout_keys(days=None):
+    """Borra claves viejas (un reintento nunca llega días después)."""
+    days = days if days is not None else getattr(settings, "POS_CHECKOUT_KEY_DAYS", 7)
+    deleted, _ = CheckoutKey.objects.filter(created_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
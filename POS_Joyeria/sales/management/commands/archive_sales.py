@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.registry import enqueue
+from sales.archive import archive_cutoff, archive_sales
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve las ventas pagadas o canceladas más viejas que POS_ARCHIVE_DAYS a las tablas "
+        "de archivo (ArchivedSale). Los reportes y el detalle de la venta no cambian."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Días que se quedan en Sale (default POS_ARCHIVE_DAYS).")
+        parser.add_argument("--batch", type=int, default=None, help="Ventas por transacción (default POS_ARCHIVE_BATCH).")
+        parser.add_argument("--enqueue", action="store_true", help="Encolarlo para el worker en vez de correrlo aquí.")
+
+    def handle(self, *args, **options):
+        days = options["days"]
+        if days is not None and days < 1:
+            raise CommandError("--days debe ser mayor que 0.")
+        if options["batch"] is not None and options["batch"] < 1:
+            raise CommandError("--batch debe ser mayor que 0.")
+
+        if options["enqueue"]:
+            job = enqueue("sales.archive", {"days": days})
+            self.stdout.write(self.style.SUCCESS(f"Archivo encolado (trabajo #{job.pk})."))
+            return
+
+        cutoff = archive_cutoff(days)
+        moved = archive_sales(days, batch=options["batch"])
+        self.stdout.write(self.style.SUCCESS(f"Ventas archivadas: {moved} (anteriores al {cutoff:%Y-%m-%d})."))
@@ -0,0 +1,337 @@
+import json
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections
+from django.db.models import Sum
+from django.test import Client as HttpClient
+from django.urls import reverse
+
+from inventory.models import StockMovement, StockSnapshotLine
+from products.models import Product
+from sales.models import Sale, SaleItem
+from suppliers.models import Supplier
+from utils.factories import make_products
+from utils.perf import percentile
+
+STEPS = ("search", "add", "cobrar", "ticket")
+
+
+class _Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {step: [] for step in STEPS}
+        self.sales = 0
+        self.requests = 0
+        self.errors = {"lock": 0, "stock": 0, "http": 0, "other": 0}
+        self.samples = []
+
+    def timing(self, step, ms):
+        with self.lock:
+            self.latencies[step].append(ms)
+            self.requests += 1
+
+    def error(self, kind, detail=""):
+        with self.lock:
+            self.errors[kind] += 1
+            if detail and len(self.samples) < 10:
+                self.samples.append(f"{kind}: {detail}")
+
+    def sale(self):
+        with self.lock:
+            self.sales += 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga: N vendedores en paralelo (hilos + cliente de pruebas de Django) "
+        "haciendo búsqueda -> agregar -> cobrar contra la BD de --database (ya migrada). "
+        "Reporta throughput, percentiles de latencia, errores de bloqueo y la consistencia del stock."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            help='Alias de settings.DATABASES; "loadtest" existe con POS_LOADTEST_DB_NAME.',
+        )
+        parser.add_argument(
+            "--i-know", action="store_true", help="Permite correr contra la BD default (la de la tienda)."
+        )
+        parser.add_argument("--sellers", type=int, default=4, help="Vendedores simultáneos (hilos).")
+        parser.add_argument("--duration", type=float, default=20.0, help="Segundos de carga.")
+        parser.add_argument("--products", type=int, default=50, help="Productos de prueba a crear.")
+        parser.add_argument("--stock", type=int, default=500, help="Stock inicial de cada producto.")
+        parser.add_argument("--items", type=int, default=2, help="Piezas por venta.")
+        parser.add_argument("--hot", type=int, default=10, help="Productos 'populares' (más contención).")
+        parser.add_argument("--think-ms", type=int, default=0, help="Pausa entre pasos de cada vendedor.")
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--keep", action="store_true", help="No borrar los datos creados.")
+        parser.add_argument("--json", action="store_true", help="Reporte en JSON (para comparar perfiles de BD).")
+
+    def handle(self, *args, **options):
+        if options["sellers"] < 1 or options["products"] < 1 or options["items"] < 1:
+            raise CommandError("--sellers, --products e --items deben ser mayores a 0.")
+
+        alias = options["database"]
+        if not alias:
+            raise CommandError("Indica la BD con --database (ej. POS_LOADTEST_DB_NAME=... y --database loadtest).")
+        if alias not in settings.DATABASES:
+            raise CommandError(f'No existe la BD "{alias}" en settings.DATABASES.')
+        if _is_default(alias) and not options["i_know"]:
+            raise CommandError(
+                "La prueba crea y borra ventas, productos y usuarios: no corre contra la BD default "
+                "sin --i-know."
+            )
+
+        with _as_default(alias):
+            self._run(options)
+
+    def _run(self, options):
+        self.rng = random.Random(options["seed"])
+        run_id = uuid.uuid4().hex[:6].upper()
+        code = f"LT{run_id}"
+
+        products = make_products(options["products"], stock=options["stock"], code=code, name=f"Carga {run_id}")
+        users = self._make_sellers(run_id, options["sellers"])
+        initial_stock = {p.id: p.stock for p in products}
+
+        results = _Results()
+        deadline = time.monotonic() + options["duration"]
+        threads = [
+            threading.Thread(
+                target=self._seller_loop,
+                args=(user, products, options, deadline, results, random.Random(self.rng.random())),
+                name=f"loadtest-{i}",
+            )
+            for i, user in enumerate(users)
+        ]
+
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        report = self._report(results, elapsed, options)
+        report["consistency"] = self._check_consistency(initial_stock, users, results)
+
+        if not options["keep"]:
+            self._cleanup(code, users)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._print(report)
+
+        if not report["consistency"]["ok"]:
+            raise CommandError("El stock quedó inconsistente (ver reporte).")
+
+    # Preparación
+
+    def _make_sellers(self, run_id, count):
+        group, _ = Group.objects.get_or_create(name="VendedorPOS")
+        User = get_user_model()
+        users = []
+        for i in range(count):
+            user = User.objects.create_user(username=f"carga_{run_id.lower()}_{i}", password=None)
+            user.groups.add(group)
+            users.append(user)
+        return users
+
+    def _http_client(self):
+        hosts = [h for h in settings.ALLOWED_HOSTS if h not in ("*",) and not h.startswith(".")]
+        return HttpClient(HTTP_HOST=hosts[0] if hosts else "localhost")
+
+    # Un vendedor
+
+    def _seller_loop(self, user, products, options, deadline, results, rng):
+        client = self._http_client()
+        client.force_login(user)
+        hot = products[: max(1, options["hot"])]
+        think = options["think_ms"] / 1000
+
+        try:
+            while time.monotonic() < deadline:
+                self._one_sale(client, hot, products, options["items"], results, rng)
+                if think:
+                    time.sleep(think)
+        finally:
+            connections.close_all()
+
+    def _timed(self, results, step, fn):
+        start = time.perf_counter()
+        try:
+            response = fn()
+        except OperationalError as e:
+            kind = "lock" if "lock" in str(e).lower() else "other"
+            results.error(kind, str(e))
+            return None
+        except Exception as e:
+            results.error("other", repr(e))
+            return None
+        results.timing(step, (time.perf_counter() - start) * 1000)
+        if response.status_code >= 500:
+            results.error("http", f"{step} -> {response.status_code}")
+            return None
+        return response
+
+    def _one_sale(self, client, hot, products, items, results, rng):
+        picks = [rng.choice(hot if rng.random() < 0.7 else products) for _ in range(items)]
+
+        token = picks[0].name.split()[-1]
+        if self._timed(results, "search", lambda: client.get(reverse("sales:product_search"), {"q": picks[0].name})) is None:
+            return
+        for p in picks:
+            if self._timed(results, "add", lambda p=p: client.post(reverse("sales:add", args=[p.id]))) is None:
+                self._clear_ticket(client, picks)
+                return
+
+        client.post(reverse("sales:client_quick"), {"name": f"Cliente carga {token}", "phone": "5500000000"})
+        response = self._timed(
+            results,
+            "cobrar",
+            lambda: client.post(reverse("sales:cobrar"), {"metodo_pago": "CASH", "cantidad_pagada": "999999"}),
+        )
+        if response is None:
+            self._clear_ticket(client, picks)
+            return
+
+        location = response.get("Location", "")
+        if "/success/" in location:
+            results.sale()
+            # El cajero ve el ticket (consume los mensajes de la sesión)
+            self._timed(results, "ticket", lambda: client.get(location))
+        else:
+            # Regresó al POS: stock insuficiente u otro error de validación
+            results.error("stock", location)
+            client.get(reverse("sales:pos"))
+            self._clear_ticket(client, picks)
+
+    def _clear_ticket(self, client, picks):
+        for p in {p.id for p in picks}:
+            client.post(reverse("sales:remove", args=[p]))
+
+    # Reporte
+
+    def _check_consistency(self, initial_stock, users, results):
+        sold = dict(
+            SaleItem.objects.filter(
+                sale__user__in=users, sale__status=Sale.Status.PAID, product_id__in=initial_stock
+            ).values_list("product_id").annotate(q=Sum("qty"))
+        )
+        current = dict(Product.objects.filter(id__in=initial_stock).values_list("id", "stock"))
+
+        mismatches = []
+        for pid, start in initial_stock.items():
+            expected = start - (sold.get(pid) or 0)
+            if current.get(pid) != expected or current.get(pid, 0) < 0:
+                mismatches.append({"product_id": pid, "expected": expected, "actual": current.get(pid)})
+
+        sales_in_db = Sale.objects.filter(user__in=users, status=Sale.Status.PAID).count()
+        return {
+            "ok": not mismatches and sales_in_db == results.sales,
+            "sales_reported": results.sales,
+            "sales_in_db": sales_in_db,
+            "stock_mismatches": mismatches[:20],
+        }
+
+    def _report(self, results, elapsed, options):
+        steps = {}
+        for step, values in results.latencies.items():
+            values = sorted(values)
+            steps[step] = {
+                "count": len(values),
+                "p50": _round(percentile(values, 50)),
+                "p95": _round(percentile(values, 95)),
+                "p99": _round(percentile(values, 99)),
+                "max": _round(values[-1] if values else None),
+            }
+        db = settings.DATABASES["default"]
+        return {
+            "database": {"vendor": connection.vendor, "engine": db["ENGINE"], "options": db.get("OPTIONS", {})},
+            "sellers": options["sellers"],
+            "seconds": round(elapsed, 2),
+            "sales": results.sales,
+            "sales_per_second": round(results.sales / elapsed, 2) if elapsed else 0,
+            "requests_per_second": round(results.requests / elapsed, 2) if elapsed else 0,
+            "latency_ms": steps,
+            "errors": results.errors,
+            "error_samples": results.samples,
+        }
+
+    def _print(self, report):
+        w = self.stdout.write
+        w(f"BD: {report['database']['engine']} {report['database']['options']}")
+        w(f"{report['sellers']} vendedores, {report['seconds']} s")
+        w(f"Ventas: {report['sales']} ({report['sales_per_second']}/s), requests/s: {report['requests_per_second']}")
+        w("Latencia (ms)      n      p50      p95      p99      max")
+        for step, s in report["latency_ms"].items():
+            w(f"  {step:<10} {s['count']:>7} {_fmt(s['p50'])} {_fmt(s['p95'])} {_fmt(s['p99'])} {_fmt(s['max'])}")
+        w(f"Errores: {report['errors']}")
+        for sample in report["error_samples"]:
+            w(f"  {sample}")
+
+        c = report["consistency"]
+        if c["ok"]:
+            w(self.style.SUCCESS(f"Stock consistente ({c['sales_in_db']} ventas en BD)."))
+        else:
+            w(self.style.ERROR(
+                f"Inconsistencia: {c['sales_reported']} ventas reportadas, {c['sales_in_db']} en BD, "
+                f"{len(c['stock_mismatches'])} productos con stock distinto."
+            ))
+
+    def _cleanup(self, code, users):
+        product_ids = list(Product.objects.filter(supplier__code=code).values_list("id", flat=True))
+        Sale.objects.filter(user__in=users).delete()
+        Product.objects.filter(id__in=product_ids).delete()
+        # El kardex y las fotos no se borran con el producto (inventory/models.py)
+        StockMovement.objects.filter(product_id__in=product_ids).delete()
+        StockSnapshotLine.objects.filter(product_id__in=product_ids).delete()
+        Supplier.objects.filter(code=code).delete()
+        get_user_model().objects.filter(pk__in=[u.pk for u in users]).delete()
+
+
+def _is_default(alias):
+    # Otro alias con el mismo NAME también es la BD de la tienda
+    databases = settings.DATABASES
+    return alias == DEFAULT_DB_ALIAS or databases[alias]["NAME"] == databases[DEFAULT_DB_ALIAS]["NAME"]
+
+
+@contextmanager
+def _as_default(alias):
+    """Las vistas y los hilos usan "default": mientras dura la prueba apunta a `alias`."""
+    if alias == DEFAULT_DB_ALIAS:
+        yield
+        return
+    original = connections.settings[DEFAULT_DB_ALIAS]
+    _point_default(connections.settings[alias])
+    try:
+        yield
+    finally:
+        _point_default(original)
+
+
+def _point_default(db_settings):
+    # La conexión ya abierta de este hilo guarda la configuración anterior: se descarta
+    connections.close_all()
+    try:
+        del connections[DEFAULT_DB_ALIAS]
+    except AttributeError:
+        pass
+    connections.settings[DEFAULT_DB_ALIAS] = db_settings
+
+
+def _round(value):
+    return round(value, 1) if value is not None else None
+
+
+def _fmt(value):
+    return f"{value:>8.1f}" if value is not None else "       -"
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:23
+
+from django.db import migrations, models
+
+
+def init_sequence(apps, schema_editor):
+    # El contador arranca después del folio más alto que ya existe
+    from sales.folios import sync_sequence
+    sync_sequence(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FolioSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=16, unique=True)),
+                ('next_value', models.BigIntegerField(default=1)),
+            ],
+        ),
+        migrations.RunPython(init_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:41
+
+import branches.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('branches', '0002_default_branch'),
+        ('sales', '0003_checkout_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='branch',
+            field=models.ForeignKey(default=branches.models.default_branch_id, on_delete=django.db.models.deletion.PROTECT, related_name='sales', to='branches.branch'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['branch', 'created_at'], name='sale_branch_created_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def stamp_registers(apps, schema_editor):
+    # Antes el corte sumaba por ventana de tiempo: cada venta va a la caja
+    # de su sucursal que estaba abierta cuando se cobró
+    CashRegister = apps.get_model("cash_register", "CashRegister")
+    Sale = apps.get_model("sales", "Sale")
+
+    for cash in CashRegister.objects.order_by("opened_at").iterator():
+        qs = Sale.objects.filter(cash_register__isnull=True, branch_id=cash.branch_id, created_at__gte=cash.opened_at)
+        if cash.closed_at:
+            qs = qs.filter(created_at__lte=cash.closed_at)
+        qs.update(cash_register=cash)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_register', '0003_cashregister_terminal'),
+        ('sales', '0004_sale_branch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='cash_register',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='register_sales', to='cash_register.cashregister'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['cash_register', 'status'], name='sale_register_status_idx'),
+        ),
+        migrations.RunPython(stamp_registers, migrations.RunPython.noop),
+    ]
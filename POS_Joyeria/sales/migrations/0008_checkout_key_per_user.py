@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0007_archived_sales'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='checkoutkey',
+            name='key',
+            field=models.CharField(max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='checkoutkey',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='uniq_checkout_key_per_user'),
+        ),
+    ]
@@ -2,6 +2,8 @@ from decimal import Decimal
 from django.conf import settings
 from django.db import models
 
+from branches.models import default_branch_id
+
 
 class Sale(models.Model):
     class Status(models.TextChoices):
@@ -14,6 +16,9 @@ class Sale(models.Model):
         CARD = "CARD", "Tarjeta"
         TRANSFER = "TRANSFER", "Transferencia"
 
+    # ArchivedSale lo tiene en True; el ticket lee de cualquiera de las dos
+    is_archived = False
+
     folio = models.CharField(max_length=32, unique=True, blank=True)
     status = models.CharField(max_length=12, choices=Status.choices, default=Status.OPEN)
 
@@ -34,6 +39,22 @@ class Sale(models.Model):
     change_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
 
     created_at = models.DateTimeField(auto_now_add=True)
+    branch = models.ForeignKey(
+        "branches.Branch", on_delete=models.PROTECT, default=default_branch_id, related_name="sales"
+    )
+    # Caja donde se cobró; el corte y los totales en vivo suman por aquí.
+    # Sin índice propio: lo cubre sale_register_status_idx.
+    cash_register = models.ForeignKey(
+        "cash_register.CashRegister", on_delete=models.PROTECT, null=True, blank=True,
+        related_name="register_sales", db_index=False,
+    )
+
+    class Meta:
+        indexes = [
+            # Listas siempre van por sucursal + fecha
+            models.Index(fields=["branch", "created_at"], name="sale_branch_created_idx"),
+            models.Index(fields=["cash_register", "status"], name="sale_register_status_idx"),
+        ]
 
     def __str__(self):
         return self.folio or f"Venta #{self.pk}"
@@ -50,3 +71,135 @@ class SaleItem(models.Model):
 
     def __str__(self):
         return f"{self.product_name} x{self.qty}"
+
+
+class FolioSequence(models.Model):
+    """
+    Contador de folios por prefijo (una fila por caja / sucursal).
+
+    next_value = siguiente número libre. Cada proceso reserva bloques de
+    números de una vez (ver sales/folios.py), así que la fila sólo se toca
+    una vez por bloque y no en cada venta.
+    """
+
+    prefix = models.CharField(max_length=16, unique=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.prefix}: {self.next_value}"
+
+
+class CheckoutKey(models.Model):
+    """
+    Clave de idempotencia de un cobro (token del ticket o header Idempotency-Key).
+
+    Si el mismo cobro llega dos veces (doble clic, reintento de red) la segunda
+    petición encuentra la clave y regresa la venta original sin repetir nada.
+    """
+
+    key = models.CharField(max_length=64)
+    sale = models.OneToOneField(Sale, on_delete=models.CASCADE, related_name="checkout_key")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            # Única por usuario: la misma clave de otro usuario es otro cobro
+            models.UniqueConstraint(fields=["user", "key"], name="uniq_checkout_key_per_user"),
+        ]
+
+    def __str__(self):
+        return f"{self.key} -> {self.sale_id}"
+
+
+class DailySales(models.Model):
+    """
+    Resumen diario por sucursal y método de pago (sales/rollups.py).
+
+    Lo arma el cierre nocturno (end_of_day); los reportes leen de aquí en vez
+    de sumar las ventas renglón por renglón. Cancelar una venta de un día ya
+    resumido borra el resumen de ese día, que se vuelve a calcular al vuelo.
+    """
+
+    day = models.DateField()
+    branch = models.ForeignKey("branches.Branch", on_delete=models.CASCADE, related_name="daily_sales")
+    payment_method = models.CharField(max_length=12, choices=Sale.PaymentMethod.choices)
+
+    sales_count = models.PositiveIntegerField(default=0)
+    items = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    discount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    cancelled_count = models.PositiveIntegerField(default=0)
+    cancelled_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["branch", "day", "payment_method"], name="uniq_daily_sales"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.branch_id} {self.payment_method}: {self.total}"
+
+
+class ArchivedSale(models.Model):
+    """
+    Venta vieja movida fuera de Sale (ver sales/archive.py).
+
+    Mismas columnas y mismo id que tenía en Sale, así que el ticket y los
+    links del kardex siguen funcionando; Sale y su índice se quedan con lo
+    reciente. Una venta archivada ya no se cancela ni se edita.
+    """
+
+    Status = Sale.Status
+    PaymentMethod = Sale.PaymentMethod
+    is_archived = True
+
+    id = models.BigIntegerField(primary_key=True)
+    folio = models.CharField(max_length=32, unique=True, blank=True)
+    status = models.CharField(max_length=12, choices=Status.choices)
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, null=True, blank=True, related_name="+")
+    client = models.ForeignKey("client.Client", null=True, blank=True, on_delete=models.PROTECT, related_name="+")
+    quick_client_name = models.CharField(max_length=150, blank=True, default="")
+    quick_client_phone = models.CharField(max_length=30, blank=True, default="")
+
+    discount_pct = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal("0.00"))
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    discount_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+
+    payment_method = models.CharField(max_length=12, choices=PaymentMethod.choices)
+    amount_paid = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    change_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+
+    created_at = models.DateTimeField(db_index=True)
+    branch = models.ForeignKey("branches.Branch", on_delete=models.PROTECT, related_name="+")
+    cash_register = models.ForeignKey(
+        "cash_register.CashRegister", on_delete=models.PROTECT, null=True, blank=True, related_name="+",
+    )
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["branch", "created_at"], name="archsale_branch_created_idx"),
+        ]
+
+    def __str__(self):
+        return self.folio or f"Venta #{self.pk}"
+
+
+class ArchivedSaleItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    sale = models.ForeignKey(ArchivedSale, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey("products.Product", on_delete=models.PROTECT, related_name="+")
+
+    product_name = models.CharField(max_length=200)
+    unit_price = models.DecimalField(max_digits=12, decimal_places=2)
+    qty = models.PositiveIntegerField()
+    line_total = models.DecimalField(max_digits=12, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.product_name} x{self.qty}"
@@ -0,0 +1,266 @@
+import logging
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from branches.stock import branch_stock_of, stock_branch, with_branch_stock
+from cash_register.models import CashRegister
+from client.models import Client
+from inventory.ledger import stock_movements
+from inventory.models import StockMovement
+from products.models import Product
+from sync.deltas import deleted_since, needs_full, window_start
+from .folios import allocate_folio
+from .idempotency import find_checkout, record_checkout
+from .models import Sale, SaleItem
+from .rollups import archived_through, day_bounds, invalidate_day
+
+logger = logging.getLogger(__name__)
+
+
+# Modo sin conexión de la terminal (FRONTEND/js/offline.js):
+#
+#   catalog_snapshot(since, branch_id) -> productos cambiados desde el cursor (o todos)
+#   sync_tickets(user, tickets, branch, cash_id) -> registra los tickets que se cobraron sin red
+#
+# Cada ticket trae su propia clave (CheckoutKey), así que reenviar un lote
+# completo no duplica ventas. El cobro ya ocurrió en el mostrador: si el stock
+# de la sucursal no alcanza, la venta se registra igual, el stock queda en 0 y
+# se reporta el conflicto para revisarlo en el kardex. Un precio distinto al del
+# catálogo también se reporta; si queda por debajo de POS_OFFLINE_PRICE_TOLERANCE
+# el ticket se rechaza.
+
+CENT = Decimal("0.01")
+PAYMENT_METHODS = {c for c, _ in Sale.PaymentMethod.choices}
+
+
+def catalog_snapshot(since=None, branch_id=None):
+    """Productos para la caché de la terminal; con `since` sólo los que cambiaron."""
+    # El cursor se toma antes de leer: lo que cambie durante la lectura vuelve a llegar
+    cursor = timezone.now()
+    full = needs_full(since, cursor)
+    qs = Product.objects.order_by("id")
+    stock_field = "stock"
+    if branch_id is not None:
+        # Existencias de la sucursal; cualquier cambio en ellas también mueve Product.updated_at
+        qs = with_branch_stock(qs, branch_id)
+        stock_field = "branch_stock"
+    deleted = []
+    if full:
+        qs = qs.filter(is_active=True)
+    else:
+        start = window_start(since)
+        qs = qs.filter(updated_at__gte=start)
+        deleted = deleted_since(Product._meta.label_lower, start)
+
+    products = [
+        {
+            "id": r["id"],
+            "code": r["code"],
+            "name": r["name"],
+            "category": r["category__name"] or "",
+            "price": str(r["sale_price"]),
+            "stock": r[stock_field],
+            "active": r["is_active"],
+        }
+        for r in qs.values("id", "code", "name", "category__name", "sale_price", stock_field, "is_active")
+    ]
+    return {"cursor": cursor.isoformat(), "full": full, "products": products, "deleted": deleted}
+
+
+class TicketRejected(Exception):
+    pass
+
+
+def _dec(value, default="0"):
+    try:
+        return Decimal(str(value if value not in (None, "") else default))
+    except (InvalidOperation, ValueError):
+        raise TicketRejected(f"Cantidad inválida: {value!r}")
+
+
+def _parse_lines(ticket):
+    lines = {}
+    for line in ticket.get("items") or []:
+        try:
+            pid, qty = int(line["id"]), int(line["qty"])
+        except (KeyError, TypeError, ValueError):
+            raise TicketRejected("Renglón inválido.")
+        if qty <= 0:
+            raise TicketRejected("Cantidad inválida.")
+        price = line.get("price")
+        prev = lines.get(pid)
+        lines[pid] = {
+            "qty": qty + (prev["qty"] if prev else 0),
+            "price": _dec(price).quantize(CENT) if price not in (None, "") else None,
+        }
+    if not lines:
+        raise TicketRejected("El ticket está vacío.")
+    return lines
+
+
+def _cliente(ticket):
+    c = ticket.get("cliente")
+    if not isinstance(c, dict):
+        raise TicketRejected("El ticket no tiene cliente.")
+    if c.get("id"):
+        try:
+            client_id = int(c["id"])
+        except (TypeError, ValueError):
+            raise TicketRejected("Cliente inválido.")
+        if Client.objects.filter(id=client_id).exists():
+            return {"client_id": client_id}
+        # Cliente borrado mientras la terminal estaba sin red: queda como cliente rápido
+        return {"quick_client_name": (c.get("name") or f"Cliente {client_id}").strip()}
+    name = (c.get("name") or "").strip()
+    if not name:
+        raise TicketRejected("El ticket no tiene cliente.")
+    return {"quick_client_name": name, "quick_client_phone": (c.get("phone") or "").strip()}
+
+
+def _created_at(ticket):
+    when = parse_datetime(str(ticket.get("created_at") or ""))
+    now = timezone.now()
+    if when is None:
+        return now
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when)
+    return min(when, now)
+
+
+def _apply_ticket(user, key, ticket, branch, cash_id):
+    from .web_views import _publish_sale_events
+
+    lines = _parse_lines(ticket)
+    cliente = _cliente(ticket)
+    metodo = str(ticket.get("metodo_pago") or "CASH").upper()
+    if metodo not in PAYMENT_METHODS:
+        metodo = "CASH"
+    pct = min(max(_dec(ticket.get("descuento_pct")), Decimal("0")), Decimal("100"))
+    created_at = _created_at(ticket)
+    frozen = archived_through()
+    if frozen is not None and timezone.localdate(created_at) <= frozen:
+        # Día ya archivado: su resumen no se rehace, la venta cuenta en el primer día abierto
+        created_at = day_bounds(frozen + timedelta(days=1))[0]
+
+    conflicts = []
+    stock_changes = []
+    with allocate_folio(branch["folio_prefix"]) as folio, transaction.atomic(), stock_branch(branch["id"]), \
+            stock_movements(StockMovement.Kind.SALE, user=user, note="Venta sin conexión") as movements:
+        products = {p.id: p for p in Product.objects.select_for_update().filter(id__in=lines)}
+        missing = set(lines) - set(products)
+        if missing:
+            raise TicketRejected(f"Productos inexistentes: {sorted(missing)}")
+        available = branch_stock_of(branch["id"], list(lines), lock=True)
+        # Misma regla que el cobro en línea: la caja se bloquea y, si se cerró
+        # mientras tanto, la venta no se le carga
+        if cash_id and not CashRegister.objects.select_for_update().filter(pk=cash_id, is_closed=False).exists():
+            cash_id = None
+
+        # Precio cobrado en la terminal (lo que pagó el cliente); si no viene, el actual.
+        # Si difiere del catálogo se reporta; por debajo de la tolerancia (con el
+        # descuento del ticket) se rechaza y queda en la terminal para revisarlo
+        floor = 1 - Decimal(settings.POS_OFFLINE_PRICE_TOLERANCE) / 100
+        subtotal = Decimal("0")
+        for pid, line in lines.items():
+            catalog = products[pid].sale_price
+            if line["price"] is None:
+                line["price"] = catalog
+            elif line["price"] != catalog:
+                conflicts.append({"product_id": pid, "price": line["price"], "catalog_price": catalog})
+            if line["price"] * (1 - pct / 100) < catalog * floor:
+                raise TicketRejected(f"Precio fuera de tolerancia para {products[pid].name}.")
+            line["total"] = (line["price"] * line["qty"]).quantize(CENT)
+            subtotal += line["total"]
+        discount = (subtotal * pct / 100).quantize(CENT)
+        total = subtotal - discount
+        paid = _dec(ticket.get("cantidad_pagada"), default=total).quantize(CENT)
+
+        sale = Sale.objects.create(
+            folio=folio,
+            user=user,
+            status=Sale.Status.PAID,
+            discount_pct=pct,
+            subtotal=subtotal,
+            discount_amount=discount,
+            total=total,
+            payment_method=metodo,
+            amount_paid=paid,
+            change_amount=max(paid - total, Decimal("0.00")),
+            branch_id=branch["id"],
+            cash_register_id=cash_id,
+            **cliente,
+        )
+        movements.sale = sale
+        record_checkout(key, sale, user)
+        # auto_now_add: la hora real del cobro se pone después
+        Sale.objects.filter(pk=sale.pk).update(created_at=created_at)
+        # Cobro de un día que ya pudo resumirse: su DailySales se vuelve a calcular
+        if timezone.localdate(created_at) < timezone.localdate():
+            invalidate_day(created_at, branch["id"])
+
+        SaleItem.objects.bulk_create([
+            SaleItem(
+                sale=sale, product=products[pid], product_name=products[pid].name,
+                unit_price=line["price"], qty=line["qty"], line_total=line["total"],
+            )
+            for pid, line in lines.items()
+        ])
+
+        for pid, line in lines.items():
+            p = products[pid]
+            # Lo que hay en la sucursal, sin pasar del total del producto
+            stock = max(min(available.get(pid, 0), p.stock), 0)
+            if line["qty"] > stock:
+                conflicts.append({"product_id": pid, "requested": line["qty"], "available": stock})
+            # Sólo se descuenta lo que había
+            taken = min(line["qty"], stock)
+            if taken:
+                p.stock -= taken
+                p.save(update_fields=["stock"])
+                stock_changes.append({"id": pid, "stock": stock - taken, "delta": -taken})
+
+        transaction.on_commit(
+            lambda: _publish_sale_events("sale", folio, stock_changes, branch["id"], cash_id), robust=True
+        )
+
+    return {"status": "created", "sale_id": sale.id, "folio": sale.folio, "conflicts": conflicts}
+
+
+def sync_tickets(user, tickets, branch, cash_id=None):
+    """
+    Registra un lote de tickets offline de la sucursal en la caja `cash_id`
+    (la de la terminal al sincronizar); cada uno en su propia transacción.
+    """
+    results = []
+    for ticket in tickets:
+        key = str((ticket or {}).get("key") or "").strip() if isinstance(ticket, dict) else ""
+        if not 8 <= len(key) <= 64:
+            results.append({"key": key, "status": "rejected", "error": "Falta la clave del ticket."})
+            continue
+
+        previa = find_checkout(key, user)
+        if previa is not None:
+            results.append({"key": key, "status": "duplicate", "sale_id": previa.sale_id, "folio": previa.sale.folio})
+            continue
+
+        try:
+            result = _apply_ticket(user, key, ticket, branch, cash_id)
+        except TicketRejected as e:
+            result = {"status": "rejected", "error": str(e)}
+        except IntegrityError:
+            previa = find_checkout(key, user)
+            if previa is None:
+                logger.exception("No se pudo registrar el ticket offline %s", key)
+                result = {"status": "rejected", "error": "No se pudo registrar el ticket."}
+            else:
+                result = {"status": "duplicate", "sale_id": previa.sale_id, "folio": previa.sale.folio}
+        except OperationalError:
+            # BD ocupada: la terminal lo reintenta en el siguiente envío
+            result = {"status": "retry"}
+        results.append({"key": key, **result})
+    return results
@@ -0,0 +1,166 @@
+import socket
+
+from django.conf import settings
+from django.template.loader import get_template
+from django.utils import timezone
+
+from utils.cache import receipts_cache
+from utils.textpdf import text_pdf
+from .archive import find_sale
+from .models import ArchivedSale, Sale
+
+
+# Tickets de venta: texto, ESC/POS (impresora térmica) y PDF.
+#
+#   get_receipt(sale_id, "txt" | "escpos" | "pdf") -> bytes (None si no existe)
+#   invalidate_receipt(sale_id)  -> al cancelar la venta
+#   send_to_printer(data)        -> ESC/POS crudo a POS_RECEIPT_PRINTER
+#
+# Una venta pagada ya no cambia (salvo cancelarla), así que cada formato se
+# arma una vez y se guarda en la caché "receipts" por venta y estado;
+# reimprimir sólo lee el estado de la venta.
+# Las tres salidas vienen del mismo texto (sales/ticket.txt).
+
+FORMATS = {
+    "txt": "text/plain; charset=utf-8",
+    "escpos": "application/octet-stream",
+    "pdf": "application/pdf",
+}
+
+# ESC/POS
+ESC_INIT = b"\x1b@"
+ESC_CODEPAGE = b"\x1bt\x02"  # PC850: acentos y ñ
+ESC_FEED_CUT = b"\n" * 4 + b"\x1dV\x01"  # avanza el papel y corte parcial
+PRINTER_PORT = 9100
+PRINTER_TIMEOUT = 5
+
+_template = None
+
+
+def _ticket_template():
+    # Compilada una vez por proceso
+    global _template
+    if _template is None:
+        _template = get_template("sales/ticket.txt")
+    return _template
+
+
+def client_display(sale):
+    """(nombre, teléfono) del cliente registrado o rápido."""
+    if sale.client_id:
+        c = sale.client
+        name = " ".join([x for x in [c.name, c.apellido_paterno, c.apellido_materno] if x]).strip()
+        return name, c.phone or ""
+    return sale.quick_client_name or "Sin cliente", sale.quick_client_phone or ""
+
+
+def _money(value):
+    return f"${value:,.2f}"
+
+
+def _cols(left, right, width):
+    room = max(width - len(right) - 1, 0)
+    return left[:room].ljust(room) + " " + right
+
+
+def render_text(sale, width=None):
+    width = width or settings.POS_RECEIPT_WIDTH
+    items = [
+        {
+            "name": it.product_name[:width],
+            "detail": _cols(f"  {it.qty} x {_money(it.unit_price)}", _money(it.line_total), width),
+        }
+        for it in sale.items.all()
+    ]
+
+    totals = [_cols("Subtotal", _money(sale.subtotal), width)]
+    if sale.discount_amount:
+        totals.append(_cols(f"Descuento {sale.discount_pct:g}%", "-" + _money(sale.discount_amount), width))
+    totals += [
+        _cols("TOTAL", _money(sale.total), width),
+        _cols("Pago", sale.get_payment_method_display(), width),
+    ]
+    if sale.amount_paid:
+        totals += [
+            _cols("Pagado", _money(sale.amount_paid), width),
+            _cols("Cambio", _money(sale.change_amount), width),
+        ]
+
+    return _ticket_template().render({
+        "width": width,
+        "rule": "-" * width,
+        "header": settings.POS_RECEIPT_HEADER,
+        "footer": settings.POS_RECEIPT_FOOTER,
+        "branch": sale.branch.name if sale.branch_id else "",
+        "folio": sale.folio or f"#{sale.pk}",
+        "fecha": timezone.localtime(sale.created_at).strftime("%d/%m/%Y %H:%M"),
+        "cajero": sale.user.username if sale.user_id else "",
+        "cliente": client_display(sale)[0],
+        "items": items,
+        "totals": totals,
+        "cancelled": sale.status == Sale.Status.CANCELLED,
+    })
+
+
+def escpos(text):
+    return ESC_INIT + ESC_CODEPAGE + text.encode("cp850", errors="replace") + ESC_FEED_CUT
+
+
+RENDERERS = {
+    "txt": lambda text: text.encode("utf-8"),
+    "escpos": escpos,
+    "pdf": lambda text: text_pdf(text.splitlines(), columns=settings.POS_RECEIPT_WIDTH),
+}
+
+
+def _key(sale_id, status, fmt):
+    return f"receipt:{sale_id}:{status}:{fmt}"
+
+
+def _status(sale_id):
+    for model in (Sale, ArchivedSale):
+        status = model.objects.filter(id=sale_id).values_list("status", flat=True).first()
+        if status is not None:
+            return status
+    return None
+
+
+def get_receipt(sale_id, fmt="txt"):
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato de ticket desconocido: {fmt}")
+    # El estado va en la llave: con una caché por proceso (locmem) otro worker
+    # que no vio la cancelación tampoco puede servir el ticket "pagada"
+    status = _status(sale_id)
+    if status is None:
+        return None
+    # Un ticket abierto todavía puede cambiar: no se guarda
+    cacheable = status != Sale.Status.OPEN
+    if cacheable:
+        data = receipts_cache.get(_key(sale_id, status, fmt))
+        if data is not None:
+            return data
+
+    sale = find_sale(sale_id)
+    if sale is None:
+        return None
+    data = RENDERERS[fmt](render_text(sale))
+    if cacheable and sale.status == status:
+        receipts_cache.set(_key(sale_id, status, fmt), data)
+    return data
+
+
+def invalidate_receipt(sale_id):
+    # Libera el ticket "pagada" de esta caché; los demás procesos ya no lo
+    # piden porque la llave lleva el estado
+    for fmt in FORMATS:
+        receipts_cache.delete(_key(sale_id, Sale.Status.PAID, fmt))
+
+
+def send_to_printer(data, printer=None):
+    """Manda bytes ESC/POS al puerto RAW de una impresora de red ("host" o "host:puerto")."""
+    host, _, port = (printer or settings.POS_RECEIPT_PRINTER).partition(":")
+    if not host:
+        raise ValueError("No hay impresora de tickets configurada (POS_RECEIPT_PRINTER).")
+    with socket.create_connection((host, int(port or PRINTER_PORT)), timeout=PRINTER_TIMEOUT) as conn:
+        conn.sendall(data)
+    return len(data)
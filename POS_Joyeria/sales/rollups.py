@@ -0,0 +1,150 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ArchivedSale, DailySales, Sale, SaleItem
+
+
+# Resúmenes diarios de ventas (DailySales).
+#
+#   build_daily(desde, hasta) -> rehace los resúmenes de esos días (end_of_day)
+#   build_days([días])        -> lo mismo para días sueltos (al archivar)
+#   daily_report(desde, hasta, branch_id) -> un renglón por día para reportes
+#   invalidate_day(created_at, branch_id) -> al cancelar una venta de un día ya resumido
+#
+# Los días sin resumen (hoy, o uno invalidado) se calculan al vuelo sólo para
+# esos días, así que el reporte siempre cuadra con las ventas.
+
+METRICS = ("sales_count", "items", "subtotal", "discount", "total", "cancelled_count", "cancelled_total")
+PAID = Q(status=Sale.Status.PAID)
+CANCELLED = Q(status=Sale.Status.CANCELLED)
+
+
+def day_bounds(day):
+    """[inicio, fin) del día en hora local."""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def _days(first, last):
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+def _aggregate(days, branch_id=None):
+    """{(día, sucursal, método): {métricas}} calculado de las ventas de esos días."""
+    if not days:
+        return {}
+    tz = timezone.get_current_timezone()
+    # Un rango por día: cada uno usa el índice (branch, created_at)
+    ranges = reduce(or_, (Q(created_at__gte=s, created_at__lt=e) for s, e in map(day_bounds, days)))
+
+    sales = Sale.objects.filter(ranges)
+    items = SaleItem.objects.filter(
+        reduce(or_, (Q(sale__created_at__gte=s, sale__created_at__lt=e) for s, e in map(day_bounds, days))),
+        sale__status=Sale.Status.PAID,
+    )
+    if branch_id is not None:
+        sales = sales.filter(branch_id=branch_id)
+        items = items.filter(sale__branch_id=branch_id)
+
+    rows = {}
+    for r in (
+        sales.annotate(day=TruncDate("created_at", tzinfo=tz))
+        .values("day", "branch_id", "payment_method")
+        # Alias r_*: los nombres de las métricas chocan con campos de Sale
+        .annotate(
+            r_sales_count=Count("id", filter=PAID),
+            r_subtotal=Sum("subtotal", filter=PAID),
+            r_discount=Sum("discount_amount", filter=PAID),
+            r_total=Sum("total", filter=PAID),
+            r_cancelled_count=Count("id", filter=CANCELLED),
+            r_cancelled_total=Sum("total", filter=CANCELLED),
+        )
+        .order_by()
+    ):
+        if not r["r_sales_count"] and not r["r_cancelled_count"]:
+            continue  # sólo tickets abiertos
+        key = (r["day"], r["branch_id"], r["payment_method"])
+        rows[key] = {m: r[f"r_{m}"] or 0 for m in METRICS if m != "items"}
+        rows[key]["items"] = 0
+
+    for r in (
+        items.annotate(day=TruncDate("sale__created_at", tzinfo=tz))
+        .values("day", "sale__branch_id", "sale__payment_method")
+        .annotate(items=Sum("qty"))
+        .order_by()
+    ):
+        key = (r["day"], r["sale__branch_id"], r["sale__payment_method"])
+        if key in rows:
+            rows[key]["items"] = r["items"] or 0
+    return rows
+
+
+def archived_through():
+    """Último día ya archivado (sales/archive.py) o None; sus resúmenes ya no se pueden rehacer."""
+    last = ArchivedSale.objects.order_by("-created_at").values_list("created_at", flat=True).first()
+    return timezone.localdate(last) if last else None
+
+
+def build_days(days):
+    """Rehace los resúmenes de esos días (todas las sucursales); idempotente."""
+    # Las ventas de días archivados ya no están en Sale: se conserva su resumen
+    frozen = archived_through()
+    days = sorted(d for d in set(days) if frozen is None or d > frozen)
+    rows = _aggregate(days)
+    with transaction.atomic():
+        DailySales.objects.filter(day__in=days).delete()
+        DailySales.objects.bulk_create([
+            DailySales(day=day, branch_id=branch_id, payment_method=method, **values)
+            for (day, branch_id, method), values in rows.items()
+        ])
+    return len(rows)
+
+
+def build_daily(first_day, last_day=None):
+    """Rehace los resúmenes de [first_day, last_day]."""
+    return build_days(_days(first_day, last_day or first_day))
+
+
+def invalidate_day(created_at, branch_id):
+    DailySales.objects.filter(day=timezone.localdate(created_at), branch_id=branch_id).delete()
+
+
+def daily_report(first_day, last_day, branch_id):
+    """
+    Un renglón por día con los totales de la sucursal y el total por método
+    de pago; días resumidos desde DailySales, el resto al vuelo.
+    """
+    report = {
+        day: {"day": day, **{m: 0 for m in METRICS}, "by_method": {}, "live": False}
+        for day in _days(first_day, last_day)
+    }
+
+    def add(day, method, values):
+        row = report[day]
+        for m in METRICS:
+            row[m] += values[m]
+        row["by_method"][method] = row["by_method"].get(method, Decimal("0")) + values["total"]
+
+    stored = DailySales.objects.filter(branch_id=branch_id, day__gte=first_day, day__lte=last_day)
+    summarized = set()
+    for r in stored.values("day", "payment_method", *METRICS):
+        summarized.add(r["day"])
+        add(r["day"], r["payment_method"], r)
+
+    # Días sin resumen: hoy, días invalidados o que nunca corrió el cierre
+    pending = [d for d in report if d not in summarized]
+    for (day, _, method), values in _aggregate(pending, branch_id).items():
+        add(day, method, values)
+    for day in pending:
+        report[day]["live"] = True
+
+    return [report[d] for d in sorted(report)]
@@ -0,0 +1,62 @@
+import csv
+import io
+import tempfile
+
+from django.core.files import File
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from jobs.registry import job_files, task
+from .archive import archive_sales
+from .models import Sale
+from .receipts import get_receipt, send_to_printer
+
+EXPORT_CHUNK = 500
+EXPORT_HEADER = ["folio", "fecha", "vendedor", "cliente", "metodo_pago", "subtotal", "descuento", "total", "estado"]
+
+
+@task("sales.export_csv", max_attempts=2)
+def export_sales_csv(job, branch_id, start, end):
+    """Ventas de la sucursal entre dos fechas (inclusive) a CSV; el archivo se baja en /trabajos/<id>/archivo/."""
+    d1, d2 = parse_date(start), parse_date(end)
+    qs = (
+        Sale.objects.filter(branch_id=branch_id, created_at__date__gte=d1, created_at__date__lte=d2)
+        .select_related("user", "client")
+        .order_by("id")
+    )
+    total = qs.count()
+
+    with tempfile.TemporaryFile(mode="w+b") as tmp:
+        text = io.TextIOWrapper(tmp, encoding="utf-8-sig", newline="")
+        writer = csv.writer(text)
+        writer.writerow(EXPORT_HEADER)
+        for i, s in enumerate(qs.iterator(chunk_size=EXPORT_CHUNK), start=1):
+            cliente = str(s.client) if s.client_id else s.quick_client_name
+            writer.writerow([
+                s.folio, timezone.localtime(s.created_at).strftime("%Y-%m-%d %H:%M"),
+                s.user.username if s.user_id else "", cliente, s.get_payment_method_display(),
+                s.subtotal, s.discount_amount, s.total, s.get_status_display(),
+            ])
+            if i % EXPORT_CHUNK == 0:
+                job.progress(i, total, f"{i} de {total} ventas")
+        text.flush()
+        tmp.seek(0)
+        name = job_files().save(f"ventas/ventas-{start}-{end}-{job.id}.csv", File(tmp))
+        text.detach()
+
+    return {"file": name, "rows": total}
+
+
+@task("sales.archive")
+def archive_old_sales(job, days=None):
+    """Mismo trabajo que `manage.py archive_sales`; cada lote es su propia transacción, reintentar es seguro."""
+    return {"archived": archive_sales(days, progress=job.progress)}
+
+
+@task("sales.print_receipt")
+def print_receipt(job, sale_id, printer=None):
+    """Ticket ESC/POS a la impresora de red; si está apagada se reintenta."""
+    data = get_receipt(sale_id, "escpos")
+    if data is None:
+        raise ValueError(f"Venta no encontrada: {sale_id}")
+    return {"bytes": send_to_printer(data, printer)}
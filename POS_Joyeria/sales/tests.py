@@ -1,15 +1,35 @@
 from decimal import Decimal
 from datetime import timedelta
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import Group, User
-from django.test import TestCase
+from django.contrib.messages import get_messages
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import Client as HttpClient, TestCase, TransactionTestCase, override_settings, tag
 from django.urls import reverse
 from django.utils import timezone
+from io import StringIO
 from unittest.mock import patch
 
+from branches.models import BranchStock, default_branch_id
 from client.models import Client
+from inventory.models import StockMovement
 from products.models import Category, Material, Product
 from suppliers.models import Supplier
-from .models import Sale, SaleItem
+from utils.cache import receipts_cache
+from utils.events import FileBroker, InProcessBroker, get_broker, reset_broker
+from utils.factories import QueryBudgetMixin, make_products
+from .folios import allocate_folio, reset_folio_allocator, sync_sequence
+from .idempotency import purge_checkout_keys
+from .models import CheckoutKey, FolioSequence, Sale, SaleItem
 from .web_views import (
     SESSION_KEY,
     _d, _init_ticket, _is_adminpos,
@@ -418,6 +438,35 @@ class SalesWebViewsTest(TestCase):
         self.assertEqual(r3.status_code, 200)
         self.assertTrue(len(r3.json()["results"]) >= 1)
 
+    def test_product_search_json(self):
+        self._login(self.user_vendedor)
+        res = self.client.get(reverse("sales:product_search"), data={"q": "ANP"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([r["id"] for r in res.json()["results"]], [self.p1.id])
+
+        res = self.client.get(reverse("sales:product_search"), data={"q": "anillo"})
+        self.assertEqual(len(res.json()["results"]), 2)
+
+    def test_product_search_requiere_rol(self):
+        self._login(self.user_sin_rol)
+        res = self.client.get(reverse("sales:product_search"), data={"q": "ANP"})
+        self.assertEqual(res.status_code, 403)
+
+        self.client.logout()
+        res = self.client.get(reverse("sales:product_search"), data={"q": "ANP"})
+        self.assertEqual(res.status_code, 302)
+
+    async def test_busquedas_async_concurrentes(self):
+        await sync_to_async(self.async_client.force_login)(self.user_vendedor)
+
+        responses = await asyncio.gather(
+            self.async_client.get(reverse("sales:client_search"), {"q": "Juan"}),
+            self.async_client.get(reverse("sales:product_search"), {"q": "anillo"}),
+            self.async_client.get(reverse("sales:client_search"), {"q": "999"}),
+        )
+        self.assertEqual([r.status_code for r in responses], [200, 200, 200])
+        self.assertEqual(responses[0].json()["results"][0]["name"], "Juan Pérez Gómez")
+
     def test_cobrar_ticket_invalido(self):
         self._login(self.user_vendedor)
         s = self.client.session
@@ -597,6 +646,31 @@ class SalesWebViewsTest(TestCase):
         self.assertNotContains(res, "V000002")
 
 
+    def test_exportar_csv_en_segundo_plano(self):
+        from jobs.models import Job
+        from jobs.worker import run_pending
+
+        Sale.objects.create(user=self.user_vendedor, status=Sale.Status.PAID, folio="V000001", total=Decimal("10.00"))
+
+        self._login(self.user_vendedor)
+        self.assertEqual(self.client.post(reverse("sales:export"), {"periodo": "hoy"}).status_code, 403)
+
+        self._login(self.user_admin)
+        with tempfile.TemporaryDirectory() as tmp, override_settings(POS_JOBS_FILES_DIR=tmp):
+            res = self.client.post(reverse("sales:export"), {"periodo": "hoy"})
+            job = Job.objects.get(name="sales.export_csv")
+            self.assertRedirects(res, f"{reverse('sales:ventas_list')}?periodo=hoy&job={job.pk}")
+            self.assertContains(self.client.get(res["Location"]), reverse("jobs_web:status", args=[job.pk]))
+
+            run_pending()
+            data = self.client.get(reverse("jobs_web:status", args=[job.pk])).json()
+            self.assertEqual(data["status"], "DONE")
+            self.assertEqual(data["result"]["rows"], 1)
+
+            csv_text = b"".join(self.client.get(data["download"]).streaming_content).decode("utf-8-sig")
+            self.assertIn("folio,fecha", csv_text)
+            self.assertIn("V000001", csv_text)
+
     def test_add_to_ticket_producto_no_existe_redirige_pos(self):
         self._login(self.user_vendedor)
         res = self.client.post(reverse("sales:add", args=[999999]), data={"q": ""})
@@ -816,3 +890,817 @@ class SalesCancelTest(TestCase):
             self.sale.refresh_from_db()
             self.assertEqual(self.sale.status, Sale.Status.PAID)
             self.assertEqual(Product.objects.get(id=self.p1.id).stock, stock_before)
+
+
+class DailyRollupsTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username="admin", password="x")
+        self.admin.groups.add(Group.objects.create(name="AdminPOS"))
+        self.product = make_products(1, stock=10)[0]
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+
+    def _sale(self, folio, total, method="CASH", days_ago=0, status=Sale.Status.PAID, qty=1):
+        sale = Sale.objects.create(folio=folio, status=status, total=Decimal(total), payment_method=method)
+        SaleItem.objects.create(
+            sale=sale, product=self.product, product_name="x", unit_price=Decimal(total), qty=qty, line_total=Decimal(total)
+        )
+        if days_ago:
+            Sale.objects.filter(pk=sale.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return sale
+
+    def test_resumen_por_metodo_y_reporte(self):
+        from .models import DailySales
+        from .rollups import build_daily, daily_report
+
+        self._sale("R1", "100.00", days_ago=1, qty=2)
+        self._sale("R2", "40.00", "CARD", days_ago=1)
+        self._sale("R3", "5.00", days_ago=1, status=Sale.Status.CANCELLED)
+        self._sale("R4", "7.00")
+
+        self.assertEqual(build_daily(self.yesterday), 2)
+        cash = DailySales.objects.get(day=self.yesterday, payment_method="CASH")
+        self.assertEqual((cash.sales_count, cash.items, cash.total, cash.cancelled_count), (1, 2, Decimal("100.00"), 1))
+
+        rows = daily_report(self.yesterday, self.today, Sale.objects.get(folio="R1").branch_id)
+        self.assertEqual([r["live"] for r in rows], [False, True])
+        self.assertEqual(rows[0]["total"], Decimal("140.00"))
+        self.assertEqual(rows[0]["by_method"]["CARD"], Decimal("40.00"))
+        self.assertEqual(rows[1]["total"], Decimal("7.00"))
+
+    def test_cancelar_venta_de_dia_resumido_invalida_el_resumen(self):
+        from .models import DailySales
+        from .rollups import build_daily
+
+        sale = self._sale("R1", "100.00", days_ago=1)
+        build_daily(self.yesterday)
+        self.client.force_login(self.admin)
+        self.client.post(reverse("sales:cancel", args=[sale.id]))
+        self.assertFalse(DailySales.objects.filter(day=self.yesterday).exists())
+
+        res = self.client.get(reverse("sales:daily_report"), {"mes": self.yesterday.strftime("%Y-%m")})
+        row = next(r for r in res.context["rows"] if r["day"] == self.yesterday)
+        self.assertEqual((row["sales_count"], row["cancelled_count"]), (0, 1))
+
+
+class SaleArchiveTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username="admin", password="x")
+        self.admin.groups.add(Group.objects.create(name="AdminPOS"))
+        self.product = make_products(1, stock=10)[0]
+
+    def _sale(self, folio, total, days_ago, status=Sale.Status.PAID):
+        sale = Sale.objects.create(folio=folio, status=status, total=Decimal(total), user=self.admin)
+        SaleItem.objects.create(
+            sale=sale, product=self.product, product_name="Anillo", unit_price=Decimal(total), qty=1, line_total=Decimal(total)
+        )
+        StockMovement.objects.create(product=self.product, kind=StockMovement.Kind.SALE, qty=-1, sale=sale)
+        Sale.objects.filter(pk=sale.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return sale
+
+    @override_settings(POS_ARCHIVE_DAYS=30, POS_ARCHIVE_BATCH=1)
+    def test_archiva_viejas_y_conserva_reportes(self):
+        from .archive import archive_sales
+        from .models import ArchivedSale, ArchivedSaleItem
+        from .rollups import build_daily, daily_report
+
+        old = self._sale("A1", "100.00", days_ago=40)
+        self._sale("A2", "30.00", days_ago=40, status=Sale.Status.CANCELLED)
+        abierta = self._sale("A3", "5.00", days_ago=40, status=Sale.Status.OPEN)
+        recent = self._sale("A4", "8.00", days_ago=2)
+        day = timezone.localdate(Sale.objects.get(pk=old.pk).created_at)
+        before = daily_report(day, day, old.branch_id)[0]
+
+        self.assertEqual(archive_sales(), 2)
+        self.assertEqual(set(Sale.objects.values_list("folio", flat=True)), {"A3", "A4"})
+        self.assertEqual(ArchivedSale.objects.get(pk=old.pk).folio, "A1")
+        self.assertEqual(ArchivedSaleItem.objects.filter(sale_id=old.pk).count(), 1)
+        # El kardex sigue apuntando a la venta
+        self.assertTrue(StockMovement.objects.filter(sale_id=old.pk).exists())
+
+        after = daily_report(day, day, old.branch_id)[0]
+        self.assertFalse(after["live"])
+        self.assertEqual((after["total"], after["cancelled_count"]), (before["total"], 1))
+
+        # Un resumen de días ya archivados no se rehace en ceros
+        build_daily(day)
+        self.assertEqual(daily_report(day, day, old.branch_id)[0]["total"], Decimal("100.00"))
+
+        self.assertEqual(archive_sales(), 0)
+        self.assertEqual(Sale.objects.filter(pk__in=[abierta.pk, recent.pk]).count(), 2)
+
+    @override_settings(POS_ARCHIVE_DAYS=30)
+    def test_detalle_lee_del_archivo_y_no_se_cancela(self):
+        from .archive import archive_sales
+
+        sale = self._sale("A1", "100.00", days_ago=40)
+        archive_sales()
+        self.client.force_login(self.admin)
+
+        res = self.client.get(reverse("sales:success", args=[sale.pk]))
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, "Archivada")
+        self.assertContains(res, "Anillo")
+        # El kardex muestra el folio archivado
+        self.assertContains(self.client.get(reverse("inventory_web:kardex", args=[self.product.pk])), "A1")
+
+        res = self.client.post(reverse("sales:cancel", args=[sale.pk]))
+        self.assertRedirects(res, reverse("sales:ventas_list"), fetch_redirect_response=False)
+        self.assertEqual(self.client.get(reverse("sales:success", args=[999999])).status_code, 404)
+
+    @override_settings(POS_ARCHIVE_DAYS=30)
+    def test_folios_archivados_no_se_repiten(self):
+        from .archive import archive_sales
+
+        self._sale("T-0000009", "1.00", days_ago=40)
+        archive_sales()
+        self.assertEqual(sync_sequence("T-"), 10)
+
+    def test_comando(self):
+        self._sale("A1", "1.00", days_ago=400)
+        out = StringIO()
+        call_command("archive_sales", "--days", "90", stdout=out)
+        self.assertIn("Ventas archivadas: 1", out.getvalue())
+        self.assertFalse(Sale.objects.exists())
+
+class ReceiptTest(TestCase):
+    def setUp(self):
+        receipts_cache.invalidate()
+        self.user = User.objects.create_user(username="cajera", password="x")
+        self.user.groups.add(Group.objects.create(name="AdminPOS"))
+        self.product = make_products(1, stock=10)[0]
+        self.sale = Sale.objects.create(
+            folio="T000001", status=Sale.Status.PAID, user=self.user, subtotal=Decimal("250.00"),
+            total=Decimal("250.00"), amount_paid=Decimal("300.00"), change_amount=Decimal("50.00"),
+        )
+        SaleItem.objects.create(
+            sale=self.sale, product=self.product, product_name="Anillo de plata", unit_price=Decimal("125.00"),
+            qty=2, line_total=Decimal("250.00"),
+        )
+
+    def test_formatos(self):
+        from .receipts import get_receipt
+
+        text = get_receipt(self.sale.pk, "txt").decode()
+        self.assertIn("T000001", text)
+        self.assertIn("Anillo de plata", text)
+        self.assertIn("$250.00", text)
+        self.assertTrue(all(len(line) <= 42 for line in text.splitlines()))
+
+        pdf = get_receipt(self.sale.pk, "pdf")
+        self.assertTrue(pdf.startswith(b"%PDF-1.4"))
+        self.assertTrue(pdf.rstrip().endswith(b"%%EOF"))
+
+        raw = get_receipt(self.sale.pk, "escpos")
+        self.assertTrue(raw.startswith(b"\x1b@"))
+        self.assertTrue(raw.endswith(b"\x1dV\x01"))
+
+        with self.assertRaises(ValueError):
+            get_receipt(self.sale.pk, "html")
+        self.assertIsNone(get_receipt(999999))
+
+    def test_reimprimir_sale_de_cache_y_cancelar_invalida(self):
+        from .receipts import get_receipt
+
+        get_receipt(self.sale.pk)
+        # Sólo el estado de la venta
+        with self.assertNumQueries(1):
+            self.assertNotIn("CANCELADA", get_receipt(self.sale.pk).decode())
+
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("sales:cancel", args=[self.sale.pk]))
+        self.assertIn("CANCELADA", get_receipt(self.sale.pk).decode())
+
+    def test_ticket_abierto_no_se_guarda(self):
+        from .receipts import get_receipt
+
+        Sale.objects.filter(pk=self.sale.pk).update(status=Sale.Status.OPEN)
+        get_receipt(self.sale.pk)
+        with self.assertNumQueries(3):
+            get_receipt(self.sale.pk)
+
+    def test_otro_proceso_no_sirve_el_ticket_pagado_despues_de_cancelar(self):
+        from .receipts import get_receipt
+
+        get_receipt(self.sale.pk)
+        # Cancelada en otro worker: esta caché no recibió invalidate_receipt
+        Sale.objects.filter(pk=self.sale.pk).update(status=Sale.Status.CANCELLED)
+        self.assertIn("CANCELADA", get_receipt(self.sale.pk).decode())
+
+    def test_vista_ticket(self):
+        self.client.force_login(self.user)
+        res = self.client.get(reverse("sales:receipt", args=[self.sale.pk, "pdf"]))
+        self.assertEqual(res["Content-Type"], "application/pdf")
+        self.assertEqual(self.client.get(reverse("sales:receipt", args=[self.sale.pk, "doc"])).status_code, 404)
+        self.assertContains(self.client.get(reverse("sales:detail", args=[self.sale.pk])), "Ticket PDF")
+
+    def test_imprimir_en_segundo_plano(self):
+        from jobs.models import Job
+        from jobs.worker import run_pending
+
+        self.client.force_login(self.user)
+        url = reverse("sales:print_receipt", args=[self.sale.pk])
+        self.assertEqual(self.client.post(url).status_code, 400)
+
+        with override_settings(POS_RECEIPT_PRINTER="10.0.0.9"):
+            self.assertTrue(self.client.post(url).json()["ok"])
+            with patch("sales.receipts.socket.create_connection") as connect:
+                run_pending()
+        connect.assert_called_once_with(("10.0.0.9", 9100), timeout=5)
+        sent = connect.return_value.__enter__.return_value.sendall.call_args.args[0]
+        self.assertIn("Anillo de plata".encode("cp850"), sent)
+        self.assertEqual(Job.objects.get().status, Job.Status.DONE)
+
+class FolioAllocatorTest(TestCase):
+    def setUp(self):
+        reset_folio_allocator()
+
+    def test_folios_consecutivos_con_un_bloque(self):
+        with override_settings(POS_FOLIO_BLOCK_SIZE=5):
+            folios = []
+            for _ in range(3):
+                with allocate_folio() as folio:
+                    folios.append(folio)
+        self.assertEqual(folios, ["V000001", "V000002", "V000003"])
+        # Un solo bloque apartado para las tres
+        self.assertEqual(FolioSequence.objects.get(prefix="V").next_value, 6)
+
+    def test_folio_de_venta_fallida_se_reutiliza(self):
+        with self.assertRaises(ValueError):
+            with allocate_folio():
+                raise ValueError("stock")
+        with allocate_folio() as folio:
+            self.assertEqual(folio, "V000001")
+
+    def test_folio_ya_guardado_no_regresa(self):
+        # Excepción después del commit (ej. un hook on_commit): la venta ya usa el folio
+        with self.assertRaises(OSError):
+            with allocate_folio() as folio:
+                Sale.objects.create(folio=folio)
+                raise OSError("caché")
+        with allocate_folio() as folio:
+            self.assertEqual(folio, "V000002")
+
+    @override_settings(POS_FOLIO_PREFIX="C2-", POS_FOLIO_DIGITS=4, POS_FOLIO_BLOCK_SIZE=1)
+    def test_prefijo_por_terminal(self):
+        with allocate_folio() as folio:
+            self.assertEqual(folio, "C2-0001")
+        self.assertEqual(FolioSequence.objects.get(prefix="C2-").next_value, 2)
+        self.assertEqual(FolioSequence.objects.get(prefix="V").next_value, 1)
+
+    def test_sync_sequence_salta_folios_existentes(self):
+        Sale.objects.create(folio="V000150")
+        Sale.objects.create(folio="VHOY")
+        self.assertEqual(sync_sequence("V"), 151)
+        with allocate_folio() as folio:
+            self.assertEqual(folio, "V000151")
+
+    def test_cobro_rechazado_no_deja_hueco(self):
+        group = Group.objects.create(name="VendedorPOS")
+        user = User.objects.create_user(username="caja", password="x")
+        user.groups.add(group)
+        product = Product.objects.create(
+            name="Anillo", code="AN01", purchase_price=100, sale_price=Decimal("500.00"), weight=1, stock=1,
+            category=Category.objects.create(name="Anillos"),
+            supplier=Supplier.objects.create(name="Prov", code="P01", phone="5550001111", email="p@test.com"),
+        )
+        self.client.force_login(user)
+
+        def cobrar(qty):
+            s = self.client.session
+            s[SESSION_KEY] = {
+                "items": {str(product.id): qty},
+                "cliente": {"name": "Cliente"},
+                "descuento_pct": "0",
+                "metodo_pago": "CASH",
+                "cantidad_pagada": "5000",
+            }
+            s.save()
+            return self.client.post(reverse("sales:cobrar"), {"metodo_pago": "CASH", "cantidad_pagada": "5000"})
+
+        def rechazado():
+            res = cobrar(1)
+            self.assertNotIn("/success/", res["Location"])
+            self.assertIn("Stock insuficiente", str(list(get_messages(res.wsgi_request))[0]))
+
+        # Sin existencias en la sucursal
+        BranchStock.objects.filter(product=product).update(stock=0)
+        rechazado()
+        # La sucursal dice 1 pero el total del producto es 0
+        BranchStock.objects.filter(product=product).update(stock=1)
+        Product.objects.filter(pk=product.pk).update(stock=0)
+        rechazado()
+
+        Product.objects.filter(pk=product.pk).update(stock=1)
+        self.assertIn("/success/", cobrar(1)["Location"])
+        self.assertEqual(list(Sale.objects.values_list("folio", flat=True)), ["V000001"])
+
+
+class CobrarConcurrenteTest(TransactionTestCase):
+    """Varias cajas cobrando a la vez (corre con el perfil de BD configurado)."""
+
+    CAJAS = 4
+
+    def setUp(self):
+        # flush() de TransactionTestCase reinicia el contador: sin bloques viejos en memoria
+        reset_folio_allocator()
+        group = Group.objects.create(name="VendedorPOS")
+        category = Category.objects.create(name="Anillos")
+        material = Material.objects.create(name="Plata", purity="925")
+        supplier = Supplier.objects.create(name="Prov", code="P01", phone="5550001111", email="p@test.com")
+        self.product = Product.objects.create(
+            name="Anillo", code="AN01", category=category, material=material, supplier=supplier,
+            purchase_price=100, sale_price=Decimal("500.00"), weight=1, stock=self.CAJAS + 1,
+        )
+        self.clients = []
+        for i in range(self.CAJAS):
+            user = User.objects.create_user(username=f"caja{i}", password="x", is_staff=True)
+            user.groups.add(group)
+            c = HttpClient()
+            c.force_login(user)
+            s = c.session
+            s[SESSION_KEY] = {
+                "items": {str(self.product.id): 1},
+                "cliente": {"name": f"Cliente {i}"},
+                "descuento_pct": "0",
+                "metodo_pago": "CASH",
+                "cantidad_pagada": "500",
+            }
+            s.save()
+            self.clients.append(c)
+
+    def _cobrar(self, c, results, barrier):
+        try:
+            barrier.wait()
+            res = c.post(reverse("sales:cobrar"), data={
+                "descuento_pct": "0", "metodo_pago": "CASH", "cantidad_pagada": "500"
+            })
+            results.append(res.status_code)
+        except Exception as e:  # noqa: BLE001 - se reporta en el assert
+            results.append(e)
+        finally:
+            connection.close()
+
+    def test_cobros_simultaneos_no_se_bloquean_ni_pierden_stock(self):
+        results = []
+        barrier = threading.Barrier(self.CAJAS)
+        threads = [threading.Thread(target=self._cobrar, args=(c, results, barrier)) for c in self.clients]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, [302] * self.CAJAS)
+        self.assertEqual(Sale.objects.count(), self.CAJAS)
+        self.assertEqual(Product.objects.get(id=self.product.id).stock, 1)
+        folios = set(Sale.objects.values_list("folio", flat=True))
+        self.assertEqual(len(folios), self.CAJAS)
+
+    def test_mismo_cobro_dos_veces_a_la_vez_crea_una_venta(self):
+        # Dos pestañas / reintentos del mismo vendedor con la misma clave
+        user = User.objects.get(username="caja0")
+        otra = HttpClient()
+        otra.force_login(user)
+        s = otra.session
+        s[SESSION_KEY] = self.clients[0].session[SESSION_KEY]
+        s.save()
+
+        responses = []
+        barrier = threading.Barrier(2)
+
+        def cobrar(c):
+            try:
+                barrier.wait()
+                responses.append(c.post(reverse("sales:cobrar"), data={
+                    "metodo_pago": "CASH", "cantidad_pagada": "500", "idempotency_key": "clave-doble-0001",
+                }))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=cobrar, args=(c,)) for c in (self.clients[0], otra)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        sale = Sale.objects.get()
+        self.assertEqual([r["Location"] for r in responses], [reverse("sales:success", args=[sale.id])] * 2)
+        self.assertEqual(Product.objects.get(id=self.product.id).stock, self.CAJAS)
+
+
+class CheckoutIdempotencyTest(TestCase):
+    def setUp(self):
+        group = Group.objects.create(name="VendedorPOS")
+        self.user = User.objects.create_user(username="caja", password="x")
+        self.user.groups.add(group)
+        self.product = Product.objects.create(
+            name="Anillo", code="AN01", purchase_price=100, sale_price=Decimal("500.00"), weight=1, stock=5,
+            category=Category.objects.create(name="Anillos"),
+            supplier=Supplier.objects.create(name="Prov", code="P01", phone="5550001111", email="p@test.com"),
+        )
+        self.client.force_login(self.user)
+
+    def _ticket(self):
+        self.client.get(reverse("sales:pos"))
+        self.client.post(reverse("sales:add", args=[self.product.id]))
+        self.client.post(reverse("sales:client_quick"), {"name": "Cliente", "phone": "5500000000"})
+        return self.client.session[SESSION_KEY]["token"]
+
+    def test_pos_manda_el_token_del_ticket(self):
+        token = self._ticket()
+        res = self.client.get(reverse("sales:pos"))
+        self.assertContains(res, f'name="idempotency_key" value="{token}"')
+
+    def test_doble_envio_regresa_la_misma_venta(self):
+        token = self._ticket()
+        data = {"metodo_pago": "CASH", "cantidad_pagada": "500", "idempotency_key": token}
+
+        first = self.client.post(reverse("sales:cobrar"), data)
+        second = self.client.post(reverse("sales:cobrar"), data)
+
+        sale = Sale.objects.get()
+        self.assertEqual(first["Location"], second["Location"])
+        self.assertEqual(second["Location"], reverse("sales:success", args=[sale.id]))
+        self.assertEqual(Product.objects.get(id=self.product.id).stock, 4)
+        self.assertEqual(CheckoutKey.objects.get().sale, sale)
+        # El ticket nuevo trae otra clave
+        self.assertNotEqual(self.client.session[SESSION_KEY]["token"], token)
+
+    def test_reintento_con_header(self):
+        self._ticket()
+        data = {"metodo_pago": "CASH", "cantidad_pagada": "500"}
+        self.client.post(reverse("sales:cobrar"), data, HTTP_IDEMPOTENCY_KEY="reintento-0001")
+        self._ticket()
+        res = self.client.post(reverse("sales:cobrar"), data, HTTP_IDEMPOTENCY_KEY="reintento-0001")
+
+        self.assertEqual(Sale.objects.count(), 1)
+        self.assertEqual(res["Location"], reverse("sales:success", args=[Sale.objects.get().id]))
+
+    def test_clave_de_otro_usuario_es_otro_cobro(self):
+        token = self._ticket()
+        self.client.post(reverse("sales:cobrar"), {"metodo_pago": "CASH", "cantidad_pagada": "500", "idempotency_key": token})
+
+        otro = User.objects.create_user(username="otro", password="x")
+        otro.groups.add(Group.objects.get(name="VendedorPOS"))
+        self.client.force_login(otro)
+        self._ticket()
+        res = self.client.post(reverse("sales:cobrar"), {"metodo_pago": "CASH", "cantidad_pagada": "500", "idempotency_key": token})
+
+        sale = Sale.objects.get(user=otro)
+        self.assertEqual(res["Location"], reverse("sales:success", args=[sale.id]))
+        self.assertEqual(Sale.objects.count(), 2)
+        self.assertEqual(CheckoutKey.objects.filter(key=token).count(), 2)
+        self.assertEqual(Product.objects.get(id=self.product.id).stock, 3)
+
+    def test_purga_de_claves_viejas(self):
+        token = self._ticket()
+        self.client.post(reverse("sales:cobrar"), {"metodo_pago": "CASH", "cantidad_pagada": "500", "idempotency_key": token})
+        CheckoutKey.objects.update(created_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(purge_checkout_keys(days=7), 1)
+        self.assertEqual(Sale.objects.count(), 1)
+
+
+class OfflineSyncTest(TestCase):
+    def setUp(self):
+        group = Group.objects.create(name="VendedorPOS")
+        self.user = User.objects.create_user(username="caja", password="x")
+        self.user.groups.add(group)
+        cat = Category.objects.create(name="Anillos")
+        sup = Supplier.objects.create(name="Prov", code="P01", phone="5550001111", email="p@test.com")
+        self.p1 = Product.objects.create(
+            name="Anillo", code="AN01", purchase_price=100, sale_price=Decimal("500.00"), weight=1, stock=5,
+            category=cat, supplier=sup,
+        )
+        self.p2 = Product.objects.create(
+            name="Arete", code="AN02", purchase_price=50, sale_price=Decimal("200.00"), weight=1, stock=1,
+            category=cat, supplier=sup,
+        )
+        self.client.force_login(self.user)
+
+    def _sync(self, *tickets):
+        res = self.client.post(
+            reverse("sales:offline_sync"), data=json.dumps({"tickets": list(tickets)}), content_type="application/json"
+        )
+        self.assertEqual(res.status_code, 200)
+        return res.json()["results"]
+
+    def _ticket(self, key="ticket-0001", items=None, **extra):
+        return {
+            "key": key,
+            "created_at": "2026-01-10T12:30:00-06:00",
+            "items": items or [{"id": self.p1.id, "qty": 2, "price": "450.00"}],
+            "cliente": {"name": "Cliente", "phone": "5500000000"},
+            "metodo_pago": "CASH",
+            "cantidad_pagada": "1000",
+            **extra,
+        }
+
+    def test_catalogo_completo_y_delta(self):
+        full = self.client.get(reverse("sales:offline_catalog")).json()
+        self.assertTrue(full["full"])
+        self.assertEqual({p["id"] for p in full["products"]}, {self.p1.id, self.p2.id})
+
+        # Sin cambios: sólo lo que cae en el margen del cursor
+        Product.objects.update(updated_at=timezone.now() - timedelta(minutes=5))
+        delta = self.client.get(reverse("sales:offline_catalog"), {"since": full["cursor"]}).json()
+        self.assertFalse(delta["full"])
+        self.assertEqual(delta["products"], [])
+
+        self.p2.stock = 3
+        self.p2.save(update_fields=["stock"])
+        delta = self.client.get(reverse("sales:offline_catalog"), {"since": full["cursor"]}).json()
+        self.assertEqual([(p["id"], p["stock"]) for p in delta["products"]], [(self.p2.id, 3)])
+
+        # Borrado físico -> llega como "deleted" (sync.Tombstone)
+        borrado = self.p2.id
+        self.p2.delete()
+        delta = self.client.get(reverse("sales:offline_catalog"), {"since": full["cursor"]}).json()
+        self.assertEqual(delta["products"], [])
+        self.assertEqual(delta["deleted"], [borrado])
+
+    def test_catalogo_cursor_invalido(self):
+        res = self.client.get(reverse("sales:offline_catalog"), {"since": "ayer"})
+        self.assertEqual(res.status_code, 400)
+
+    def test_sync_crea_venta_con_precio_y_hora_de_la_terminal(self):
+        results = self._sync(self._ticket())
+        self.assertEqual(results[0]["status"], "created")
+        # 450 contra 500 de catálogo: se respeta lo cobrado y se reporta
+        self.assertEqual(
+            results[0]["conflicts"], [{"product_id": self.p1.id, "price": "450.00", "catalog_price": "500.00"}]
+        )
+
+        sale = Sale.objects.get(id=results[0]["sale_id"])
+        self.assertEqual(sale.total, Decimal("900.00"))
+        self.assertEqual(sale.change_amount, Decimal("100.00"))
+        self.assertEqual(sale.quick_client_name, "Cliente")
+        self.assertEqual(sale.created_at.date().isoformat(), "2026-01-10")
+        self.p1.refresh_from_db()
+        self.assertEqual(self.p1.stock, 3)
+        self.assertTrue(sale.items.filter(product=self.p1, qty=2, unit_price=Decimal("450.00")).exists())
+        self.assertTrue(StockMovement.objects.filter(sale=sale, kind=StockMovement.Kind.SALE, qty=-2).exists())
+
+    def test_precio_o_descuento_fuera_de_tolerancia_se_rechaza(self):
+        results = self._sync(
+            self._ticket(key="ticket-barato", items=[{"id": self.p1.id, "qty": 1, "price": "1.00"}]),
+            self._ticket(key="ticket-descuento", descuento_pct="90"),
+            self._ticket(key="ticket-catalogo", items=[{"id": self.p1.id, "qty": 1, "price": "500.00"}]),
+        )
+        self.assertEqual([r["status"] for r in results], ["rejected", "rejected", "created"])
+        self.assertIn("Precio fuera de tolerancia", results[0]["error"])
+        self.assertEqual(results[2]["conflicts"], [])
+        self.assertEqual(Sale.objects.count(), 1)
+
+    def test_reenvio_no_duplica(self):
+        first = self._sync(self._ticket())
+        again = self._sync(self._ticket())
+        self.assertEqual(again[0]["status"], "duplicate")
+        self.assertEqual(again[0]["sale_id"], first[0]["sale_id"])
+        self.assertEqual(Sale.objects.count(), 1)
+
+    def test_sobreventa_deja_stock_en_cero_y_reporta(self):
+        results = self._sync(self._ticket(items=[{"id": self.p2.id, "qty": 3}]))
+        self.assertEqual(results[0]["status"], "created")
+        self.assertEqual(results[0]["conflicts"], [{"product_id": self.p2.id, "requested": 3, "available": 1}])
+        self.p2.refresh_from_db()
+        self.assertEqual(self.p2.stock, 0)
+
+    def test_total_menor_que_la_sucursal_no_queda_negativo(self):
+        # La sucursal dice 1 pero el total ya se vendió en otro lado
+        Product.objects.filter(pk=self.p2.pk).update(stock=0)
+        results = self._sync(self._ticket(items=[{"id": self.p2.id, "qty": 1}]))
+        self.assertEqual(results[0]["conflicts"], [{"product_id": self.p2.id, "requested": 1, "available": 0}])
+        self.p2.refresh_from_db()
+        self.assertEqual(self.p2.stock, 0)
+
+    def test_ticket_de_dia_ya_resumido_rehace_el_resumen(self):
+        from .models import DailySales
+        from .rollups import build_daily, daily_report
+
+        ayer = timezone.localtime() - timedelta(days=1)
+        day = ayer.date()
+        previa = Sale.objects.create(folio="PREVIA", status=Sale.Status.PAID, total=Decimal("100.00"))
+        Sale.objects.filter(pk=previa.pk).update(created_at=ayer)
+        build_daily(day)
+        self.assertTrue(DailySales.objects.filter(day=day).exists())
+
+        results = self._sync(self._ticket(created_at=ayer.isoformat()))
+        self.assertEqual(results[0]["status"], "created")
+        self.assertFalse(DailySales.objects.filter(day=day).exists())
+        self.assertEqual(daily_report(day, day, default_branch_id())[0]["total"], Decimal("1000.00"))
+
+    def test_ticket_invalido_se_rechaza_sin_afectar_el_lote(self):
+        results = self._sync(
+            self._ticket(key="ticket-malo1", items=[{"id": 999999, "qty": 1}]),
+            self._ticket(key="ticket-bueno"),
+            {"items": []},
+        )
+        self.assertEqual([r["status"] for r in results], ["rejected", "created", "rejected"])
+        self.assertEqual(Sale.objects.count(), 1)
+        self.assertFalse(CheckoutKey.objects.filter(key="ticket-malo1").exists())
+
+    def test_json_invalido(self):
+        res = self.client.post(reverse("sales:offline_sync"), data="{no", content_type="application/json")
+        self.assertEqual(res.status_code, 400)
+
+    def test_requiere_rol(self):
+        self.client.logout()
+        res = self.client.get(reverse("sales:offline_catalog"))
+        self.assertEqual(res.status_code, 302)
+
+
+class LiveEventsTest(TestCase):
+    def setUp(self):
+        reset_broker()
+        self.grp_vendedor = Group.objects.create(name="VendedorPOS")
+        self.user = User.objects.create_user(username="vend", password="12345678")
+        self.user.groups.add(self.grp_vendedor)
+
+        category = Category.objects.create(name="Anillos")
+        material = Material.objects.create(name="Plata", purity="925")
+        supplier = Supplier.objects.create(name="Prov", code="V01", phone="5550001111", email="p@test.com")
+        self.product = Product.objects.create(
+            name="Anillo", code="AN01", category=category, material=material, supplier=supplier,
+            purchase_price=100, sale_price=Decimal("500.00"), weight=1, stock=3,
+        )
+
+    def tearDown(self):
+        reset_broker()
+
+    def test_broker_en_memoria_entrega_a_otro_hilo_y_reenvia_historial(self):
+        broker = InProcessBroker()
+        listener = broker.listen({"stock"}, last_id=None, timeout=2)
+        received = []
+        ready = threading.Event()
+
+        def consume():
+            ready.set()
+            received.append(next(listener))
+
+        t = threading.Thread(target=consume)
+        t.start()
+        ready.wait()
+        # el suscriptor se registra al empezar a iterar
+        for _ in range(50):
+            if broker._subscribers:
+                break
+            time.sleep(0.01)
+        first = broker.publish("stock", {"id": 1})
+        t.join()
+        listener.close()
+
+        self.assertEqual(received[0].data, {"id": 1})
+        replay = broker.listen({"stock"}, last_id=0)
+        self.assertEqual(next(replay).id, first.id)
+        replay.close()
+
+    def test_file_broker_entre_procesos(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "events.jsonl")
+            publisher = FileBroker(path)
+            subscriber = FileBroker(path, poll_interval=0.01)
+
+            publisher.publish("cash", {"total": "10.00"})
+            publisher.publish("stock", {"id": 7})
+
+            events = subscriber.listen({"stock"}, last_id=0, timeout=0.05)
+            self.assertEqual(next(events).data, {"id": 7})
+            events.close()
+
+            # Cursor para la respuesta corta de WSGI (sse_poll)
+            cursor = subscriber.position()
+            last = publisher.publish("stock", {"id": 8})
+            self.assertEqual([e.id for e in subscriber.since({"stock"}, cursor)], [last.id])
+
+    def test_cobrar_publica_stock_al_confirmar(self):
+        self.client.force_login(self.user)
+        s = self.client.session
+        s[SESSION_KEY] = {
+            "items": {str(self.product.id): 2},
+            "cliente": {"name": "Mostrador"},
+            "descuento_pct": "0",
+            "metodo_pago": "CASH",
+            "cantidad_pagada": "1000",
+        }
+        s.save()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("sales:cobrar"), data={
+                "descuento_pct": "0", "metodo_pago": "CASH", "cantidad_pagada": "1000"
+            })
+
+        events = get_broker().listen({"stock"}, last_id=0)
+        event = next(events)
+        events.close()
+        self.assertEqual(event.data["action"], "sale")
+        self.assertEqual(event.data["products"], [{"id": self.product.id, "stock": 1, "delta": -2}])
+
+    def test_endpoint_sse_reenvia_desde_last_event_id(self):
+        get_broker().publish("stock", {"products": [{"id": self.product.id, "stock": 0}]})
+
+        self.client.force_login(self.user)
+        res = self.client.get(reverse("sales:live"), HTTP_LAST_EVENT_ID="0")
+        self.assertEqual(res["Content-Type"], "text/event-stream")
+        body = res.content.decode()
+        self.assertIn("event: stock", body)
+        self.assertIn('"stock": 0', body)
+
+    @override_settings(POS_EVENTS_POLL_SECONDS=2)
+    def test_endpoint_sse_en_wsgi_responde_sin_esperar(self):
+        broker = get_broker()
+        broker.publish("stock", {"products": []})
+        self.client.force_login(self.user)
+
+        # Primera conexión: no se queda escuchando, sólo manda el cursor y cuándo volver
+        started = time.monotonic()
+        body = self.client.get(reverse("sales:live")).content.decode()
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertIn("retry: 2000", body)
+        self.assertIn(f"id: {broker.position()}", body)
+        self.assertNotIn("event:", body)
+
+        # Al volver con ese cursor recibe lo publicado mientras tanto
+        cursor = broker.position()
+        broker.publish("stock", {"products": [{"id": self.product.id, "stock": 7}]})
+        body = self.client.get(reverse("sales:live"), HTTP_LAST_EVENT_ID=str(cursor)).content.decode()
+        self.assertEqual(body.count("event: stock"), 1)
+        self.assertIn('"stock": 7', body)
+
+
+@tag("perf")
+@override_settings(POS_IMAGE_PIPELINE="off")
+class SalesQueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Presupuestos de queries/latencia con volumen (POS_PERF_SCALE=full para 10k/100k/50k)."""
+
+    perf_data = ("products", "clients", "sales")
+    perf_role = "VendedorPOS"
+
+    def _ticket(self, n_items):
+        ticket = _init_ticket()
+        ticket["items"] = {str(p.id): 1 for p in self.products[:n_items]}
+        ticket["cliente"] = {"id": self.clients[0].id}
+        session = self.client.session
+        session[SESSION_KEY] = ticket
+        session.save()
+
+    def test_pos_view_con_busqueda_y_ticket(self):
+        self._ticket(5)
+        with self.assertBudget(queries=6, ms=500):
+            res = self.client.get(reverse("sales:pos"), {"q": "anillo perf"})
+        self.assertEqual(res.status_code, 200)
+
+    def test_cobrar_sale(self):
+        reset_folio_allocator()
+        # El primer cobro aparta el bloque de folios; el medido ya no
+        self._ticket(1)
+        self.client.post(reverse("sales:cobrar"), {"metodo_pago": "CASH", "cantidad_pagada": "5000"})
+
+        self._ticket(3)
+        with self.assertBudget(queries=26, ms=500):
+            res = self.client.post(reverse("sales:cobrar"), {"metodo_pago": "CASH", "cantidad_pagada": "5000"})
+        self.assertEqual(res.status_code, 302)
+        self.assertIn("/success/", res["Location"])
+
+    def test_client_search(self):
+        with self.assertBudget(queries=3, ms=300):
+            res = self.client.get(reverse("sales:client_search"), {"q": "Cliente 1"})
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.json()["results"])
+
+
+class LoadTestCommandTest(TransactionTestCase):
+    # Los hilos usan sus propias conexiones: los datos tienen que estar confirmados
+
+    def setUp(self):
+        reset_folio_allocator()
+
+    @override_settings(POS_IMAGE_PIPELINE="off")
+    def test_loadtest_reporta_y_limpia(self):
+        out = StringIO()
+        call_command(
+            "loadtest", sellers=2, duration=0.5, products=3, stock=5, items=1, seed=7, json=True, stdout=out,
+            database="default", i_know=True,
+        )
+        report = json.loads(out.getvalue())
+
+        self.assertGreater(report["sales"], 0)
+        self.assertTrue(report["consistency"]["ok"])
+        self.assertEqual(report["consistency"]["sales_in_db"], report["sales"])
+        self.assertEqual(report["errors"]["lock"], 0)
+        self.assertIn("p95", report["latency_ms"]["cobrar"])
+
+        # Sin --keep no deja datos de la prueba
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(Sale.objects.exists())
+        self.assertFalse(User.objects.filter(username__startswith="carga_").exists())
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_loadtest_pide_la_bd_y_no_toca_default_sin_confirmar(self):
+        with self.assertRaisesMessage(CommandError, "--database"):
+            call_command("loadtest", stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, "--i-know"):
+            call_command("loadtest", database="default", stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, "No existe"):
+            call_command("loadtest", database="otra", stdout=StringIO())
+        self.assertFalse(Product.objects.exists())
@@ -7,12 +7,20 @@ from .web_views import (
     ajax_update_ticket,
     cobrar_sale,
     sale_success,
+    sale_receipt,
+    print_sale_receipt,
     client_search,
+    product_search,
     client_select,
     client_quick,
     client_clear,
     sales_list,
+    export_sales,
+    daily_sales_report,
     cancel_sale,
+    live_events,
+    offline_catalog,
+    offline_sync,
 )
 app_name = "sales"
 urlpatterns = [
@@ -21,6 +29,9 @@ urlpatterns = [
     path("dec/<int:product_id>/", dec_ticket_item, name="dec"),
     path("remove/<int:product_id>/", remove_from_ticket, name="remove"),
     path("ajax/update/", ajax_update_ticket, name="ajax_update"),
+    path("products/search/", product_search, name="product_search"),
+    # Eventos en vivo (SSE)
+    path("live/", live_events, name="live"),
     # Cliente
     path("client/search/", client_search, name="client_search"),
     path("client/select/<int:client_id>/", client_select, name="client_select"),
@@ -28,12 +39,22 @@ urlpatterns = [
     path("client/clear/", client_clear, name="client_clear"),
     # Cobro
     path("cobrar/", cobrar_sale, name="cobrar"),
+    # Modo sin conexión: caché del catálogo y envío de tickets pendientes
+    path("offline/catalogo/", offline_catalog, name="offline_catalog"),
+    path("offline/sync/", offline_sync, name="offline_sync"),
     # Confirmación/detalle
     path("success/<int:sale_id>/", sale_success, name="success"),
     #Listado ventas
     path("ventas/", sales_list, name="ventas_list"),
+    # Exportar a CSV (en segundo plano)
+    path("ventas/exportar/", export_sales, name="export"),
+    # Reporte diario (resúmenes del cierre nocturno)
+    path("ventas/reporte/", daily_sales_report, name="daily_report"),
     #Detalle desde listado
     path("ventas/<int:sale_id>/", sale_success, name="detail"),
+    # Ticket: txt, escpos o pdf; imprimir en la térmica
+    path("ventas/<int:sale_id>/ticket.<str:fmt>", sale_receipt, name="receipt"),
+    path("ventas/<int:sale_id>/imprimir/", print_sale_receipt, name="print_receipt"),
     #Cancelar una venta
     path("ventas/<int:sale_id>/cancel/", cancel_sale, name="cancel"),
 ]
@@ -1,20 +1,42 @@
+import json
+import logging
 from decimal import Decimal
+from django.conf import settings
 from django.contrib import messages
-from django.db import transaction
-from django.http import JsonResponse
+from django.db import IntegrityError, transaction
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import reverse
 from django.views.decorators.http import require_POST
 from django.db.models import Q
 from django.utils.dateparse import parse_date
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
+from utils.events import asse_stream, publish, sse_poll
 from utils.roles import role_required
+from inventory.ledger import stock_movements
+from inventory.models import StockMovement
+from jobs.registry import enqueue
+from branches.stock import branch_stock_of, current_branch, stock_branch, with_branch_stock
+from cash_register.models import CashRegister
+from cash_register.terminal import RegisterRequired, register_for
 from products.models import Product
 from client.models import Client
-from .models import Sale, SaleItem
+from sync.deltas import parse_cursor
+from .archive import find_sale
+from .folios import allocate_folio
+from .offline import catalog_snapshot, sync_tickets
+from .receipts import FORMATS as RECEIPT_FORMATS, client_display, get_receipt, invalidate_receipt
+from .rollups import daily_report, invalidate_day
+from .idempotency import checkout_key, find_checkout, new_token, record_checkout
+from .models import ArchivedSale, Sale, SaleItem
 
 SESSION_KEY = "pos_ticket"
+LIVE_CHANNELS = ("stock", "cash")
+
+logger = logging.getLogger(__name__)
 
 
 def _d(v, default="0"):
@@ -31,6 +53,7 @@ def _init_ticket():
         "descuento_pct": "0",
         "metodo_pago": "CASH",     # CASH / CARD / TRANSFER
         "cantidad_pagada": "",
+        "token": new_token(),      # clave de idempotencia del cobro
     }
 
 def _is_adminpos(user):
@@ -54,6 +77,9 @@ def _get_product_name(p):
     return name or str(p)
 
 def _get_product_stock(p):
+    # Con with_branch_stock() manda el stock de la sucursal
+    if hasattr(p, "branch_stock"):
+        return int(p.branch_stock or 0)
     for attr in ("stock", "existencias", "quantity", "cantidad"):
         if hasattr(p, attr):
             try:
@@ -69,7 +95,28 @@ def _set_product_stock(p, new_value: int):
             return attr
     return None
 
-def _get_product_image_url(p):
+def _publish_sale_events(action, folio, stock_changes, branch_id, cash_id=None):
+    # Después del commit: stock nuevo de cada producto en la sucursal + totales de la caja
+    # donde se cobró. Un fallo aquí nunca debe romper el cobro/cancelación.
+    try:
+        publish("stock", {"action": action, "folio": folio, "branch": branch_id, "products": stock_changes})
+        cash = CashRegister.objects.filter(pk=cash_id, is_closed=False).first() if cash_id else None
+        if cash:
+            publish("cash", {"action": action, "folio": folio, **cash.live_totals()})
+    except Exception:
+        logger.exception("No se pudieron publicar los eventos de la venta %s", folio)
+
+def _get_product_image_url(p, fmt="jpeg"):
+    # Miniatura del pipeline de imágenes si ya existe; si no, el original
+    variant_url = getattr(p, "image_variant_url", None)
+    if callable(variant_url):
+        try:
+            return variant_url("sm", fmt)
+        except Exception:
+            return None
+    if fmt != "jpeg":
+        return None
+
     img = getattr(p, "image", None)
     if img is None:
         img = getattr(p, "imagen", None)
@@ -170,45 +217,80 @@ def _build_ticket_context(ticket):
         "has_items": has_items,
     }
 
-def _search_products(q):
+def _product_search_querysets(q, branch_id=None):
+    # (por código, por nombre): se usa el de nombre sólo si el de código no trae nada
     q = (q or "").strip()
     if not q:
-        return []
+        return None, None
     qs = Product.objects.all()
+    if branch_id is not None:
+        qs = with_branch_stock(qs, branch_id)
     q_up = q.upper()
     is_digits_only = q.isdigit()
     has_letters = any(ch.isalpha() for ch in q)
-    results = []
+
+    code_qs = None
     if has_letters and not is_digits_only:
         if hasattr(Product, "code"):
-            results = list(qs.filter(code__istartswith=q_up)[:20])
+            code_qs = qs.filter(code__istartswith=q_up)
         elif hasattr(Product, "codigo"):
-            results = list(qs.filter(codigo__istartswith=q_up)[:20])
+            code_qs = qs.filter(codigo__istartswith=q_up)
+
+    tokens = [t.strip() for t in q.split() if len(t.strip()) >= 3] or [t.strip() for t in q.split() if len(t.strip()) >= 2]
+    if not tokens:
+        return code_qs, None
+
+    name_q = Q()
+    for t in tokens:
+        if hasattr(Product, "name"):
+            name_q |= Q(name__icontains=t)
+        if hasattr(Product, "nombre"):
+            name_q |= Q(nombre__icontains=t)
+
+    return code_qs, qs.filter(name_q)
+
+def _product_result(p):
+    return {
+        "id": p.id,
+        "name": _get_product_name(p),
+        "price": _get_product_price(p).quantize(Decimal("0.01")),
+        "stock": _get_product_stock(p),
+        "image_url": _get_product_image_url(p),
+        "image_webp_url": _get_product_image_url(p, "webp"),
+    }
+
+def _search_products(q, branch_id=None):
+    code_qs, name_qs = _product_search_querysets(q, branch_id)
+    results = list(code_qs[:20]) if code_qs is not None else []
 
     if not results:
-        tokens = [t.strip() for t in q.split() if len(t.strip()) >= 3] or [t.strip() for t in q.split() if len(t.strip()) >= 2]
-        if not tokens:
+        if name_qs is None:
             return []
+        results = list(name_qs[:20])
 
-        name_q = Q()
-        for t in tokens:
-            if hasattr(Product, "name"):
-                name_q |= Q(name__icontains=t)
-            if hasattr(Product, "nombre"):
-                name_q |= Q(nombre__icontains=t)
+    return [_product_result(p) for p in results]
 
-        results = list(qs.filter(name_q)[:20])
+async def _asearch_products(q, branch_id=None):
+    # Misma búsqueda que _search_products, con el ORM async (para typeahead)
+    code_qs, name_qs = _product_search_querysets(q, branch_id)
+    results = []
+    if code_qs is not None:
+        results = [p async for p in code_qs[:20].aiterator()]
 
-    out = []
-    for p in results:
-        out.append({
-            "id": p.id,
-            "name": _get_product_name(p),
-            "price": _get_product_price(p).quantize(Decimal("0.01")),
-            "stock": _get_product_stock(p),
-            "image_url": _get_product_image_url(p),
-        })
-    return out
+    if not results:
+        if name_qs is None:
+            return []
+        results = [p async for p in name_qs[:20].aiterator()]
+
+    return [_product_result(p) for p in results]
+
+@role_required(["AdminPOS", "VendedorPOS"])
+async def product_search(request):
+    # Typeahead del POS (JSON); la página completa sigue usando pos_view
+    q = (request.GET.get("q") or "").strip()
+    branch = await sync_to_async(current_branch)(request)
+    results = await _asearch_products(q, branch["id"])
+    return JsonResponse({"ok": True, "q": q, "results": results})
 
 @role_required(["AdminPOS", "VendedorPOS"])
 def pos_view(request):
@@ -217,16 +299,23 @@ def pos_view(request):
         ticket = _init_ticket()
         request.session[SESSION_KEY] = ticket
         request.session.modified = True
+    elif not ticket.get("token"):
+        # Tickets guardados antes de las claves de idempotencia
+        ticket["token"] = new_token()
+        request.session.modified = True
 
     q = (request.GET.get("q") or "").strip()
-    search_results = _search_products(q)
+    branch = current_branch(request)
+    search_results = _search_products(q, branch["id"])
     tc = _build_ticket_context(ticket)
 
     context = {
         "is_adminpos": _is_adminpos(request.user),
+        "branch": branch,
         "sale_number": "Pendiente",
         "q": q,
         "search_results": search_results,
+        "checkout_token": ticket["token"],
         **tc,
     }
     return render(request, "sales/pos.html", context)
@@ -245,7 +334,7 @@ def add_to_ticket(request, product_id: int):
     new_qty = current + 1
 
     try:
-        p = Product.objects.get(id=product_id)
+        p = with_branch_stock(Product.objects.all(), current_branch(request)["id"]).get(id=product_id)
         stock = _get_product_stock(p)
 
         if stock is not None:
@@ -388,11 +477,10 @@ def client_clear(request):
     messages.success(request, "Cliente removido.")
     return _redirect_pos_with_q(request)
 
-@role_required(["AdminPOS", "VendedorPOS"])
-def client_search(request):
-    q = (request.GET.get("q") or "").strip()
+def _client_search_queryset(q):
+    q = (q or "").strip()
     if not q or len(q) < 2:
-        return JsonResponse({"ok": True, "results": []})
+        return None
 
     q_digits = "".join(ch for ch in q if ch.isdigit())
     has_phone_query = len(q_digits) >= 3
@@ -412,11 +500,23 @@ def client_search(request):
         qq |= Q(phone__icontains=q_digits)
 
     if qq == Q():
+        return None
+
+    return (
+        Client.objects.filter(qq, is_active=True)
+        .only("id", "name", "apellido_paterno", "apellido_materno", "phone")
+        .order_by("name")[:20]
+    )
+
+@role_required(["AdminPOS", "VendedorPOS"])
+async def client_search(request):
+    # Async: se llama en cada tecla, el worker no se bloquea esperando la BD
+    clients = _client_search_queryset(request.GET.get("q"))
+    if clients is None:
         return JsonResponse({"ok": True, "results": []})
 
-    clients = Client.objects.filter(qq, is_active=True).order_by("name")[:20]
     out = []
-    for c in clients:
+    async for c in clients.aiterator():
         full_name = " ".join(x for x in [c.name, c.apellido_paterno, c.apellido_materno] if x).strip()
         out.append({
             "id": c.id,
@@ -445,6 +545,13 @@ def client_select(request, client_id: int):
 @role_required(["AdminPOS", "VendedorPOS"])
 def cobrar_sale(request):
     ticket = request.session.get(SESSION_KEY)
+
+    # Doble clic / reintento: la venta ya existe, se regresa la misma
+    key = checkout_key(request, ticket)
+    previa = find_checkout(key, request.user)
+    if previa is not None:
+        return _redirect_checkout_repetido(request, previa)
+
     if not isinstance(ticket, dict) or "items" not in ticket:
         messages.error(request, "El ticket no es válido.")
         return redirect(reverse("sales:pos"))
@@ -485,23 +592,45 @@ def cobrar_sale(request):
         return redirect(reverse("sales:pos"))
 
     items = tc["ticket_items"]
+    stock_changes = []
+    branch = current_branch(request)
 
     try:
-        with transaction.atomic():
+        # El folio se aparta antes de abrir la transacción (ver sales/folios.py);
+        # el stock se descuenta de la sucursal de la terminal (branches/stock.py)
+        with allocate_folio(branch["folio_prefix"]) as folio, transaction.atomic(), stock_branch(branch["id"]), \
+                stock_movements(StockMovement.Kind.SALE, user=request.user) as movements:
             product_ids = [it["id"] for it in items]
             products = list(Product.objects.select_for_update().filter(id__in=product_ids))
             products_by_id = {p.id: p for p in products}
+            available = branch_stock_of(branch["id"], product_ids, lock=True)
+            # Caja de la terminal; se lee dentro de la transacción para no cobrar en una ya cerrada.
+            # Con varias abiertas y ninguna elegida no se cobra: la venta no entraría a ningún corte
+            cash = register_for(request, branch["id"], lock=True, required=True)
 
             for it in items:
                 p = products_by_id.get(it["id"])
                 if not p:
                     raise ValueError("Producto no encontrado.")
 
-                stock = _get_product_stock(p)
-                if stock is not None and it["qty"] > stock:
+                # Lo que hay en la sucursal, sin pasar del total del producto
+                stock = available.get(p.id, 0)
+                total = _get_product_stock(p)
+                if total is not None:
+                    stock = min(stock, total)
+                if it["qty"] > stock:
                     raise ValueError(f"Stock insuficiente para: {_get_product_name(p)} (disp: {stock}).")
 
+            if c.get("id"):
+                cliente = {"client_id": int(c["id"])}
+            else:
+                cliente = {
+                    "quick_client_name": (c.get("name") or "").strip(),
+                    "quick_client_phone": (c.get("phone") or "").strip(),
+                }
+
             sale = Sale.objects.create(
+                folio=folio,
                 user=request.user,
                 status=Sale.Status.PAID,
                 discount_pct=tc["descuento_pct"],
@@ -511,14 +640,12 @@ def cobrar_sale(request):
                 payment_method=tc["metodo_pago"],
                 amount_paid=tc["cantidad_pagada"],
                 change_amount=tc["cambio"],
+                branch_id=branch["id"],
+                cash_register=cash,
+                **cliente,
             )
-
-            if c.get("id"):
-                sale.client_id = int(c["id"])
-            else:
-                sale.quick_client_name = (c.get("name") or "").strip()
-                sale.quick_client_phone = (c.get("phone") or "").strip()
-            sale.save(update_fields=["client", "quick_client_name", "quick_client_phone"])
+            movements.sale = sale
+            record_checkout(key, sale, request.user)
 
             for it in items:
                 p = products_by_id[it["id"]]
@@ -540,30 +667,52 @@ def cobrar_sale(request):
                     stock_field = _set_product_stock(p, new_stock)
                     if stock_field:
                         p.save(update_fields=[stock_field])
+                        stock_changes.append(
+                            {"id": p.id, "stock": available[p.id] - int(it["qty"]), "delta": -int(it["qty"])}
+                        )
 
-            sale.folio = f"V{sale.id:06d}"
-            sale.save(update_fields=["folio"])
+            cash_id = cash.pk if cash else None
+            transaction.on_commit(
+                lambda: _publish_sale_events("sale", folio, stock_changes, branch["id"], cash_id), robust=True
+            )
 
+    except RegisterRequired as e:
+        messages.error(request, str(e))
+        return redirect(reverse("cash_register_web:status"))
     except ValueError as e:
         messages.error(request, str(e))
         return redirect(reverse("sales:pos"))
+    except IntegrityError:
+        # Sólo es un reintento si otra petición con la misma clave ya guardó su venta
+        previa = find_checkout(key, request.user) if key else None
+        if previa is None:
+            logger.exception("No se pudo registrar el cobro")
+            messages.error(request, "No se pudo registrar el cobro. Intenta de nuevo.")
+            return redirect(reverse("sales:pos"))
+        return _redirect_checkout_repetido(request, previa)
 
     request.session[SESSION_KEY] = _init_ticket()
     request.session.modified = True
 
     return redirect(reverse("sales:success", args=[sale.id]))
 
+
+def _redirect_checkout_repetido(request, previa):
+    ticket = request.session.get(SESSION_KEY)
+    if isinstance(ticket, dict) and ticket.get("token") == previa.key:
+        request.session[SESSION_KEY] = _init_ticket()
+        request.session.modified = True
+    messages.info(request, f"La venta {previa.sale.folio} ya estaba registrada.")
+    return redirect(reverse("sales:success", args=[previa.sale_id]))
+
 @role_required(["AdminPOS", "VendedorPOS"])
 def sale_success(request, sale_id: int):
-    sale = get_object_or_404(Sale.objects.prefetch_related("items").select_related("client", "user"), id=sale_id)
+    # Las ventas viejas se leen del archivo (sales/archive.py)
+    sale = find_sale(sale_id)
+    if sale is None:
+        raise Http404("Venta no encontrada.")
 
-    if sale.client_id:
-        c = sale.client
-        cliente_display = " ".join([x for x in [c.name, c.apellido_paterno, c.apellido_materno] if x]).strip()
-        cliente_phone = c.phone or ""
-    else:
-        cliente_display = sale.quick_client_name or "Sin cliente"
-        cliente_phone = sale.quick_client_phone or ""
+    cliente_display, cliente_phone = client_display(sale)
 
     back_to_list = request.GET.get("from") == "list"
     back_url = reverse("sales:ventas_list") if back_to_list else reverse("sales:pos")
@@ -575,12 +724,40 @@ def sale_success(request, sale_id: int):
         "cliente_phone": cliente_phone,
         "back_url": back_url,
         "back_label": back_label,
+        "printer": bool(settings.POS_RECEIPT_PRINTER),
     })
 
 
+# Ticket ya renderizado (caché por venta, ver sales/receipts.py)
+@role_required(["AdminPOS", "VendedorPOS"])
+def sale_receipt(request, sale_id: int, fmt: str):
+    if fmt not in RECEIPT_FORMATS:
+        raise Http404("Formato no disponible.")
+    data = get_receipt(sale_id, fmt)
+    if data is None:
+        raise Http404("Venta no encontrada.")
+
+    response = HttpResponse(data, content_type=RECEIPT_FORMATS[fmt])
+    disposition = "attachment" if fmt == "escpos" else "inline"
+    response["Content-Disposition"] = f'{disposition}; filename="ticket-{sale_id}.{fmt}"'
+    return response
+
+# Imprimir en la impresora térmica sin esperar a que responda (trabajo en segundo plano)
+@require_POST
+@role_required(["AdminPOS", "VendedorPOS"])
+def print_sale_receipt(request, sale_id: int):
+    if not settings.POS_RECEIPT_PRINTER:
+        return JsonResponse({"ok": False, "error": "No hay impresora de tickets configurada."}, status=400)
+    if not (Sale.objects.filter(id=sale_id).exists() or ArchivedSale.objects.filter(id=sale_id).exists()):
+        return JsonResponse({"ok": False, "error": "Venta no encontrada."}, status=404)
+
+    job = enqueue("sales.print_receipt", {"sale_id": sale_id}, user=request.user)
+    return JsonResponse({"ok": True, "job": job.pk, "status_url": reverse("jobs_web:status", args=[job.pk])})
+
+
 @role_required(["AdminPOS", "VendedorPOS"])
 def sales_list(request):
-    qs = Sale.objects.select_related("user").order_by("-created_at")
+    qs = Sale.objects.filter(branch_id=current_branch(request)["id"]).select_related("user").order_by("-created_at")
 
     folio = (request.GET.get("folio") or "").strip()
     vendedor = (request.GET.get("vendedor") or "").strip()
@@ -606,9 +783,27 @@ def sales_list(request):
         "filters": {"folio": folio, "vendedor": vendedor, "from": date_from, "to": date_to},
     })
 
+def _periodo_range(periodo):
+    # hoy|ayer|semana|mes -> (periodo, desde, hasta), fechas locales inclusive
+    today = timezone.localtime(timezone.now()).date()
+
+    if periodo == "ayer":
+        d = today - timedelta(days=1)
+        return periodo, d, d
+
+    if periodo == "semana":
+        # inicio de semana (lunes)
+        return periodo, today - timedelta(days=today.weekday()), today
+
+    if periodo == "mes":
+        return periodo, today.replace(day=1), today
+
+    # hoy (default)
+    return "hoy", today, today
+
 @role_required(["AdminPOS", "VendedorPOS"])
 def sales_list(request):
-    qs = Sale.objects.select_related("user").order_by("-created_at")
+    qs = Sale.objects.filter(branch_id=current_branch(request)["id"]).select_related("user").order_by("-created_at")
 
     vendedor = (request.GET.get("vendedor") or "").strip()
     periodo = (request.GET.get("periodo") or "hoy").strip()  # hoy|ayer|semana|mes
@@ -617,39 +812,68 @@ def sales_list(request):
         qs = qs.filter(user__username__icontains=vendedor)
 
     # Filtro periodo
-    now = timezone.localtime(timezone.now())
-    today = now.date()
-
-    if periodo == "ayer":
-        d = today - timedelta(days=1)
-        qs = qs.filter(created_at__date=d)
-
-    elif periodo == "semana":
-        # inicio de semana (lunes)
-        start = today - timedelta(days=today.weekday())
-        qs = qs.filter(created_at__date__gte=start, created_at__date__lte=today)
+    periodo, start, end = _periodo_range(periodo)
+    qs = qs.filter(created_at__date__gte=start, created_at__date__lte=end)
 
-    elif periodo == "mes":
-        start = today.replace(day=1)
-        qs = qs.filter(created_at__date__gte=start, created_at__date__lte=today)
-
-    else:
-        # hoy (default)
-        qs = qs.filter(created_at__date=today)
-        periodo = "hoy"
+    # Exportación en curso (ver export_sales)
+    job_id = (request.GET.get("job") or "").strip()
 
     return render(request, "sales/lista_ventas.html", {
         "sales": qs[:500],
         "filters": {"vendedor": vendedor, "periodo": periodo},
+        "job_id": int(job_id) if job_id.isdigit() else None,
+    })
+
+# Exportar el periodo a CSV en segundo plano (sales/tasks.py); la lista muestra el avance
+@require_POST
+@role_required(["AdminPOS"])
+def export_sales(request):
+    periodo, start, end = _periodo_range((request.POST.get("periodo") or "hoy").strip())
+    job = enqueue(
+        "sales.export_csv",
+        {"branch_id": current_branch(request)["id"], "start": start.isoformat(), "end": end.isoformat()},
+        user=request.user,
+    )
+    messages.info(request, "Exportando ventas; el archivo aparecerá aquí cuando esté listo.")
+    return redirect(f"{reverse('sales:ventas_list')}?periodo={periodo}&job={job.pk}")
+
+# Reporte diario del mes: días ya cerrados desde DailySales, hoy al vuelo
+@role_required(["AdminPOS"])
+def daily_sales_report(request):
+    today = timezone.localdate()
+    try:
+        first = datetime.strptime((request.GET.get("mes") or "").strip(), "%Y-%m").date()
+    except ValueError:
+        first = today.replace(day=1)
+    next_month = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+    last = min(next_month - timedelta(days=1), today)
+
+    rows = daily_report(first, last, current_branch(request)["id"]) if first <= today else []
+    methods = Sale.PaymentMethod.choices
+    for r in rows:
+        r["methods"] = [r["by_method"].get(code, 0) for code, _ in methods]
+    totals = {m: sum(r[m] for r in rows) for m in ("sales_count", "items", "discount", "total", "cancelled_count")}
+    totals["methods"] = [sum(r["methods"][i] for r in rows) for i in range(len(methods))]
+
+    return render(request, "sales/reporte_diario.html", {
+        "rows": rows,
+        "totals": totals,
+        "methods": [label for _, label in methods],
+        "mes": first.strftime("%Y-%m"),
     })
 
 @require_POST
 @role_required(["AdminPOS"])
 def cancel_sale(request, sale_id: int):
-    sale = get_object_or_404(
-        Sale.objects.select_related("user").prefetch_related("items__product"),
-        id=sale_id
+    sale = (
+        Sale.objects.select_related("user").prefetch_related("items__product")
+        .filter(id=sale_id).first()
     )
+    if sale is None:
+        if ArchivedSale.objects.filter(id=sale_id).exists():
+            messages.error(request, "La venta está archivada y ya no se puede cancelar.")
+            return redirect(reverse("sales:ventas_list"))
+        raise Http404("Venta no encontrada.")
 
     if sale.status == Sale.Status.CANCELLED:
         messages.info(request, "Esta venta ya estaba cancelada.")
@@ -669,22 +893,89 @@ def cancel_sale(request, sale_id: int):
 
             items = list(SaleItem.objects.select_related("product").select_for_update().filter(sale=sale))
 
-            # Regresar stock por cada item
-            for it in items:
-                p = it.product
-                stock = _get_product_stock(p)
+            # Regresar stock por cada item (a la sucursal donde se vendió)
+            stock_changes = []
+            with stock_branch(sale.branch_id), stock_movements(StockMovement.Kind.CANCEL, sale=sale, user=request.user):
+                for it in items:
+                    p = it.product
+                    stock = _get_product_stock(p)
 
-                if stock is not None:
-                    new_stock = int(stock) + int(it.qty)
-                    stock_field = _set_product_stock(p, new_stock)
-                    if stock_field:
-                        p.save(update_fields=[stock_field])
+                    if stock is not None:
+                        new_stock = int(stock) + int(it.qty)
+                        stock_field = _set_product_stock(p, new_stock)
+                        if stock_field:
+                            p.save(update_fields=[stock_field])
+                            stock_changes.append({"id": p.id, "delta": int(it.qty)})
+
+            levels = branch_stock_of(sale.branch_id, [c["id"] for c in stock_changes])
+            for c in stock_changes:
+                c["stock"] = levels.get(c["id"], 0)
 
             sale.status = Sale.Status.CANCELLED
             sale.save(update_fields=["status"])
+            # El resumen diario de ese día ya no cuadra (sales/rollups.py)
+            if timezone.localdate(sale.created_at) < timezone.localdate():
+                invalidate_day(sale.created_at, sale.branch_id)
+
+            folio = sale.folio or str(sale.id)
+            branch_id, cash_id = sale.branch_id, sale.cash_register_id
+            transaction.on_commit(lambda: _publish_sale_events("cancel", folio, stock_changes, branch_id, cash_id))
+            # El ticket guardado todavía dice "pagada"
+            transaction.on_commit(lambda: invalidate_receipt(sale_id))
 
         messages.success(request, f"Venta {sale.folio or sale.id} cancelada y stock restaurado.")
     except Exception:
         messages.error(request, "No se pudo cancelar la venta. Intenta de nuevo.")
 
     return redirect(reverse("sales:ventas_list"))
+
+@role_required(["AdminPOS", "VendedorPOS"])
+def offline_catalog(request):
+    # Catálogo para la caché de la terminal (?since=<cursor> -> sólo cambios)
+    try:
+        since = parse_cursor(request.GET.get("since"))
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "Cursor inválido."}, status=400)
+    return JsonResponse({"ok": True, **catalog_snapshot(since, current_branch(request)["id"])})
+
+@require_POST
+@role_required(["AdminPOS", "VendedorPOS"])
+def offline_sync(request):
+    # Tickets cobrados sin conexión: {"tickets": [{"key", "created_at", "items", "cliente", ...}]}
+    try:
+        payload = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "JSON inválido."}, status=400)
+
+    tickets = payload.get("tickets") if isinstance(payload, dict) else None
+    if not isinstance(tickets, list):
+        return JsonResponse({"ok": False, "error": "Falta la lista de tickets."}, status=400)
+    limit = getattr(settings, "POS_OFFLINE_SYNC_MAX", 100)
+    if len(tickets) > limit:
+        return JsonResponse({"ok": False, "error": f"Máximo {limit} tickets por envío."}, status=400)
+
+    branch = current_branch(request)
+    cash = register_for(request, branch["id"])
+    return JsonResponse({"ok": True, "results": sync_tickets(request.user, tickets, branch, cash.pk if cash else None)})
+
+@role_required(["AdminPOS", "VendedorPOS"])
+def live_events(request):
+    # SSE: stock y totales de caja en vivo (EventSource en ventas.js / corte de caja)
+    requested = (request.GET.get("channels") or ",".join(LIVE_CHANNELS)).split(",")
+    channels = {c for c in requested if c in LIVE_CHANNELS} or set(LIVE_CHANNELS)
+
+    last_id = request.headers.get("Last-Event-ID") or request.GET.get("last_id")
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+
+    # ASGI: generador async (no ocupa un hilo por terminal); WSGI: respuesta
+    # corta, un stream largo dejaría el worker ocupado hasta 5 minutos
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(asse_stream(channels, last_id), content_type="text/event-stream")
+    else:
+        response = HttpResponse(sse_poll(channels, last_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
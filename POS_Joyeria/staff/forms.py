@@ -1,5 +1,7 @@
 from django import forms
 from django.contrib.auth.models import User, Group
+from branches.models import Branch
+from utils.uniqueness import find_conflicts
 from .models import StaffProfile
 
 BASE_INPUT = "border p-2 rounded w-full"
@@ -57,6 +59,13 @@ class StaffCreateForm(forms.Form):
         widget=forms.Select(attrs={"class": BASE_INPUT, "id": "st-rol"})
     )
 
+    branch = forms.ModelChoiceField(
+        queryset=Branch.objects.filter(is_active=True).order_by("name"),
+        required=False,
+        empty_label="Sucursal por defecto",
+        widget=forms.Select(attrs={"class": BASE_INPUT, "id": "st-sucursal"})
+    )
+
     def __init__(self, *args, request_user=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.request_user = request_user
@@ -68,16 +77,12 @@ class StaffCreateForm(forms.Form):
             raise forms.ValidationError("El usuario es obligatorio.")
         if len(v) < 3:
             raise forms.ValidationError("El usuario debe tener al menos 3 caracteres.")
-        if User.objects.filter(username__iexact=v).exists():
-            raise forms.ValidationError("Ese usuario ya existe.")
         return v
 
     def clean_email(self):
         v = (self.cleaned_data.get("email") or "").strip().lower()
         if not v:
             raise forms.ValidationError("El correo es obligatorio.")
-        if User.objects.filter(email__iexact=v).exists():
-            raise forms.ValidationError("Ese correo ya está registrado.")
         return v
 
     def clean_telefono(self):
@@ -103,6 +108,20 @@ class StaffCreateForm(forms.Form):
 
     def clean(self):
         cleaned = super().clean()
+
+        # username y email en una sola consulta
+        conflicts = find_conflicts(
+            User,
+            {
+                "username": {"username__iexact": cleaned.get("username")},
+                "email": {"email__iexact": cleaned.get("email")},
+            },
+        )
+        if "username" in conflicts:
+            self.add_error("username", "Ese usuario ya existe.")
+        if "email" in conflicts:
+            self.add_error("email", "Ese correo ya está registrado.")
+
         p1 = cleaned.get("password1")
         p2 = cleaned.get("password2")
         if p1 and len(p1) < 6:
@@ -133,6 +152,7 @@ class StaffCreateForm(forms.Form):
             apellido_materno=cd["apellido_materno"],
             telefono=cd["telefono"],
             direccion=cd["direccion"],
+            branch=cd.get("branch"),
         )
         return u
 
@@ -148,13 +168,14 @@ class StaffEditForm(forms.ModelForm):
 
     class Meta:
         model = StaffProfile
-        fields = ["nombre", "apellido_paterno", "apellido_materno", "telefono", "direccion"]
+        fields = ["nombre", "apellido_paterno", "apellido_materno", "telefono", "direccion", "branch"]
         widgets = {
             "nombre": forms.TextInput(attrs={"class": BASE_INPUT, "id": "st-nombre"}),
             "apellido_paterno": forms.TextInput(attrs={"class": BASE_INPUT, "id": "st-ap"}),
             "apellido_materno": forms.TextInput(attrs={"class": BASE_INPUT, "id": "st-am"}),
             "telefono": forms.TextInput(attrs={"class": BASE_INPUT, "id": "st-telefono"}),
             "direccion": forms.TextInput(attrs={"class": BASE_INPUT, "id": "st-direccion"}),
+            "branch": forms.Select(attrs={"class": BASE_INPUT, "id": "st-sucursal"}),
         }
 
     def __init__(self, *args, **kwargs):
@@ -162,6 +183,9 @@ class StaffEditForm(forms.ModelForm):
         self.request_user = kwargs.pop("request_user", None)
         super().__init__(*args, **kwargs)
 
+        self.fields["branch"].queryset = Branch.objects.filter(is_active=True).order_by("name")
+        self.fields["branch"].empty_label = "Sucursal por defecto"
+
         self.fields["rol"].choices = allowed_role_choices_for(self.request_user)
 
         if self.user_instance:
@@ -8,6 +8,10 @@ class StaffProfile(models.Model):
     apellido_materno = models.CharField(max_length=100)
     telefono = models.CharField(max_length=15, unique=True)
     direccion = models.CharField(max_length=200)
+    # Sucursal donde trabaja (vacío = la sucursal por defecto)
+    branch = models.ForeignKey(
+        "branches.Branch", on_delete=models.SET_NULL, null=True, blank=True, related_name="staff"
+    )
 
     def __str__(self):
         return f"{self.user.username} - {self.nombre} {self.apellido_paterno}"
@@ -1,5 +1,7 @@
 from django import forms
+from utils.uniqueness import find_conflicts
 from .models import Supplier
+from .serializers import UNIQUE_MESSAGES
 
 BASE_INPUT = "border p-2 rounded w-full"
 BASE_TEXTAREA = "border p-2 rounded w-full resize-y"
@@ -28,3 +30,25 @@ class SupplierForm(forms.ModelForm):
                 "rows": 4
             }),
         }
+
+    def clean(self):
+        cleaned = super().clean()
+
+        # Mismas reglas que el serializer: code/email case-insensitive, phone exacto
+        conflicts = find_conflicts(
+            Supplier,
+            {
+                "code": {"code__iexact": cleaned.get("code")},
+                "phone": {"phone": cleaned.get("phone")},
+                "email": {"email__iexact": cleaned.get("email")},
+            },
+            exclude_pk=self.instance.pk if self.instance else None,
+        )
+        for field in ("code", "phone", "email"):
+            if field in conflicts:
+                self.add_error(field, UNIQUE_MESSAGES[field])
+        return cleaned
+
+    def validate_unique(self):
+        # La unicidad ya se revisó en clean() con una sola consulta
+        pass
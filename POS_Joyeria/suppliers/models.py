@@ -1,8 +1,10 @@
 from django.db import models
 from django.core.validators import RegexValidator
 
+from utils.changes import ChangeTrackedModel
+
 solo_digitos = RegexValidator(regex=r'^\d+$',message="El teléfono solo debe contener números.")
-class Supplier(models.Model):
+class Supplier(ChangeTrackedModel):
     name = models.CharField(max_length=100)
     code = models.CharField(max_length=30, unique=True) # valor unico
     phone = models.CharField(max_length=15,unique=True,validators=[solo_digitos]) #valor unico
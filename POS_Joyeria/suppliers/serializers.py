@@ -1,9 +1,18 @@
 # suppliers/serializers.py
 from rest_framework import serializers
+from utils.uniqueness import find_conflicts
 from .models import Supplier
 
+UNIQUE_MESSAGES = {
+    "code": "Ya existe un proveedor con ese código.",
+    "phone": "Ya existe un proveedor con este número telefónico.",
+    "email": "Ya existe un proveedor con este correo electrónico.",
+}
+
 
 class SupplierSerializer(serializers.ModelSerializer):
+    UNIQUE_MESSAGES = UNIQUE_MESSAGES
+
     # name obligatorio
     name = serializers.CharField(
         required=True,
@@ -73,38 +82,30 @@ class SupplierSerializer(serializers.ModelSerializer):
         return (value or "").strip()
 
     # -------- Validación cruzada (unicidad) --------
+    @staticmethod
+    def unique_checks(attrs):
+        # code/email case-insensitive, phone exacto
+        return {
+            "code": {"code__iexact": attrs.get("code")},
+            "phone": {"phone": attrs.get("phone")},
+            "email": {"email__iexact": attrs.get("email")},
+        }
+
     def validate(self, attrs):
-        code = attrs.get("code")
-        phone = attrs.get("phone")
-        email = attrs.get("email")
+        # En alta masiva la unicidad se revisa por lote (utils.bulk)
+        if self.context.get("bulk"):
+            return attrs
 
         instance = getattr(self, "instance", None)
-        errors = {}
-
-        # code único (case-insensitive)
-        if code:
-            qs = Supplier.objects.filter(code__iexact=code)
-            if instance:
-                qs = qs.exclude(pk=instance.pk)
-            if qs.exists():
-                errors["code"] = "Ya existe un proveedor con ese código."
-
-        # phone único
-        if phone:
-            qs = Supplier.objects.filter(phone=phone)
-            if instance:
-                qs = qs.exclude(pk=instance.pk)
-            if qs.exists():
-                errors["phone"] = "Ya existe un proveedor con este número telefónico."
-
-        # email único (case-insensitive)
-        if email:
-            qs = Supplier.objects.filter(email__iexact=email)
-            if instance:
-                qs = qs.exclude(pk=instance.pk)
-            if qs.exists():
-                errors["email"] = "Ya existe un proveedor con este correo electrónico."
 
+        # Todo en una sola consulta
+        conflicts = find_conflicts(
+            Supplier,
+            self.unique_checks(attrs),
+            exclude_pk=instance.pk if instance else None,
+        )
+
+        errors = {field: UNIQUE_MESSAGES[field] for field in conflicts}
         if errors:
             raise serializers.ValidationError(errors)
 
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+
+from utils.cache import connect_invalidation
+from utils.http_cache import bump_on_change
+from .models import Supplier
+
+
+def connect_signals():
+    # Cambios en proveedores -> nueva versión de la tabla (invalida ETag y caché)
+    post_save.connect(bump_on_change, sender=Supplier, dispatch_uid="tblver-save-suppliers.supplier")
+    post_delete.connect(bump_on_change, sender=Supplier, dispatch_uid="tblver-delete-suppliers.supplier")
+    connect_invalidation(Supplier)
@@ -1,4 +1,6 @@
-from django.test import TestCase
+from unittest.mock import patch
+
+from django.test import TestCase, tag
 from django.db.utils import IntegrityError
 from django.core.exceptions import ValidationError
 from django.urls import reverse
@@ -9,6 +11,8 @@ from rest_framework import status
 from .models import Supplier
 from .forms import SupplierForm
 from .serializers import SupplierSerializer
+from utils.factories import QueryBudgetMixin
+from utils.uniqueness import find_conflicts, find_conflicts_bulk
 from decimal import Decimal
 from django.contrib.messages import get_messages
 
@@ -206,6 +210,42 @@ class SupplierSerializerTest(TestCase):
         self.assertTrue(s.is_valid(), s.errors)
 
 
+# UNICIDAD (utils.uniqueness)
+
+class UniquenessHelperTest(TestCase):
+    def setUp(self):
+        Supplier.objects.create(name="Base", code="P01", phone="5550001111", email="prov1@test.com")
+
+    def test_serializer_valida_unicidad_con_una_consulta(self):
+        s = SupplierSerializer(data={
+            "name": "Otro Proveedor",
+            "code": "P02",
+            "phone": "5550002222",
+            "email": "prov2@test.com",
+        })
+        with self.assertNumQueries(1):
+            self.assertTrue(s.is_valid(), s.errors)
+
+    def test_find_conflicts_mapea_por_campo(self):
+        conflicts = find_conflicts(Supplier, {
+            "code": {"code__iexact": "p01"},
+            "phone": {"phone": "5559999999"},
+            "email": {"email__iexact": "PROV1@test.com"},
+        })
+        self.assertEqual(conflicts, {"code", "email"})
+
+    def test_find_conflicts_bulk_bd_y_duplicados_en_lote(self):
+        rows = [
+            {"code": {"code__iexact": "P01"}, "phone": {"phone": "5551"}},
+            {"code": {"code__iexact": "N01"}, "phone": {"phone": "5550001111"}},
+            {"code": {"code__iexact": "n01"}, "phone": {"phone": "5552"}},
+            {"code": {"code__iexact": "N02"}, "phone": {"phone": ""}},
+        ]
+        with self.assertNumQueries(2):
+            results = find_conflicts_bulk(Supplier, rows)
+        self.assertEqual(results, [{"code"}, {"phone"}, {"code"}, set()])
+
+
 # API TESTS (DRF)
 
 class SupplierAPITestCase(APITestCase):
@@ -296,6 +336,73 @@ class SupplierAPITestCase(APITestCase):
         self.assertEqual(r3.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Supplier.objects.filter(id=prov.id).exists())
 
+    def test_bulk_crea_lista_y_reporta_por_elemento(self):
+        Supplier.objects.create(name="Base", code="P01", phone="5550001111", email="prov1@test.com")
+        data = [
+            {"name": "Proveedor Dos", "code": "P02", "phone": "5550002222", "email": "p2@test.com"},
+            {"name": "Duplicado BD", "code": "p01", "phone": "5550003333", "email": "p3@test.com"},
+            {"name": "Proveedor Tres", "code": "P03", "phone": "5550004444", "email": "p4@test.com"},
+            {"name": "Dup lote", "code": "P03", "phone": "5550005555", "email": "p5@test.com"},
+            {"name": "", "code": "P06", "phone": "5550006666", "email": "p6@test.com"},
+        ]
+        response = self.client.post(self.url_list, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data["created"], 2)
+
+        estados = [r["status"] for r in response.data["results"]]
+        self.assertEqual(estados, ["created", "error", "created", "error", "error"])
+        self.assertIn("code", response.data["results"][1]["errors"])
+        self.assertIn("code", response.data["results"][3]["errors"])
+        self.assertIn("name", response.data["results"][4]["errors"])
+        self.assertEqual(Supplier.objects.count(), 3)
+
+    def test_bulk_todos_validos_201(self):
+        data = [
+            {"name": f"Proveedor {i}", "code": f"B{i:02d}", "phone": f"55500{i:05d}", "email": f"b{i}@test.com"}
+            for i in range(20)
+        ]
+        # 3 de unicidad por lote + insert (con savepoint) + versión de la tabla
+        # (UPDATE; sin versión previa, también el INSERT); no depende de N
+        with self.assertNumQueries(8):
+            response = self.client.post(self.url_list, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Supplier.objects.count(), 20)
+
+    def test_bulk_carrera_con_otra_alta_responde_409(self):
+        data = [
+            {"name": "Uno", "code": "C01", "phone": "5557770001", "email": "c1@test.com"},
+            {"name": "Dos", "code": "C02", "phone": "5557770002", "email": "c2@test.com"},
+        ]
+        real = find_conflicts_bulk
+        calls = []
+
+        def revision_antes_de_la_otra_alta(*args, **kwargs):
+            result = real(*args, **kwargs)
+            if not calls:
+                # Otra petición guarda C02 justo después de la primera revisión
+                Supplier.objects.create(name="Otro", code="C02", phone="5557779999", email="otro@test.com")
+            calls.append(1)
+            return result
+
+        with patch("utils.bulk.find_conflicts_bulk", side_effect=revision_antes_de_la_otra_alta), \
+                self.assertLogs("utils.bulk", "WARNING"):
+            response = self.client.post(self.url_list, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["created"], 0)
+        results = response.data["results"]
+        self.assertIn("non_field_errors", results[0]["errors"])
+        self.assertIn("code", results[1]["errors"])
+        self.assertFalse(Supplier.objects.filter(code="C01").exists())
+
+    def test_bulk_invalida_etag_de_la_lista(self):
+        resp = self.client.get(self.url_list)
+        data = [{"name": "Nuevo", "code": "N01", "phone": "5559990000", "email": "n1@test.com"}]
+        self.client.post(self.url_list, data, format="json")
+        resp2 = self.client.get(self.url_list, HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(resp2.status_code, status.HTTP_200_OK)
+        self.assertTrue(any(s["code"] == "N01" for s in resp2.data))
+
 
 # WEB VIEWS TESTS (role_required AdminPOS)
 
@@ -425,3 +532,13 @@ class SupplierWebViewsTestCase(TestCase):
 
         def setUp(self):
             self.client.force_login(self.admin)
+
+
+@tag("perf")
+class SupplierQueryBudgetTest(QueryBudgetMixin, TestCase):
+    perf_data = ("suppliers",)
+
+    def test_api_lista_proveedores(self):
+        with self.assertBudget(queries=2, ms=500):
+            res = self.client.get(reverse("supplier-list-create"))
+        self.assertEqual(len(res.json()), self.volumes["suppliers"])
@@ -1,12 +1,14 @@
 # suppliers/views.py
 from rest_framework import generics
+from utils.bulk import BulkCreateMixin
+from utils.http_cache import ConditionalListMixin
 from .models import Supplier
 from .serializers import SupplierSerializer
 
 
-class SupplierListCreateAPIView(generics.ListCreateAPIView):
-    # GET: lista proveedores
-    # POST: crea proveedor
+class SupplierListCreateAPIView(ConditionalListMixin, BulkCreateMixin, generics.ListCreateAPIView):
+    # GET: lista proveedores (con ETag / 304)
+    # POST: crea proveedor (o varios si se manda una lista)
     queryset = Supplier.objects.all().order_by("-id")
     serializer_class = SupplierSerializer
 
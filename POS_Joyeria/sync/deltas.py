@@ -0,0 +1,109 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Tombstone
+
+
+# Descargas incrementales: "¿qué cambió desde el cursor X?"
+#
+#   changes_since(since) -> {"cursor", "full", "tables": {nombre: {"fields", "rows", "deleted"}}}
+#
+# Los renglones van como listas en el orden de "fields" (el nombre de cada
+# columna no se repite por fila). El cursor es la hora del servidor tomada
+# antes de leer; el siguiente pedido lo manda en ?since= y recibe lo que tenga
+# updated_at >= cursor - margen (POS_SYNC_CURSOR_OVERLAP) más los borrados
+# (Tombstone). Algunos renglones pueden llegar dos veces: aplicarlos es
+# idempotente, perderlos no.
+
+SYNC_TABLES = {
+    "categories": ("products.category", ("id", "name", "low_stock_threshold")),
+    "materials": ("products.material", ("id", "name", "purity")),
+    "suppliers": ("suppliers.supplier", ("id", "name", "code", "phone", "email")),
+    "products": (
+        "products.product",
+        ("id", "code", "name", "category_id", "material_id", "supplier_id", "sale_price", "weight", "stock", "is_active"),
+    ),
+    "clients": (
+        "client.client",
+        ("id", "name", "apellido_paterno", "apellido_materno", "phone", "email", "es_mayorista", "is_active"),
+    ),
+    "branches": ("branches.branch", ("id", "name", "code", "is_active")),
+    "branch_stock": ("branches.branchstock", ("id", "branch_id", "product_id", "stock")),
+}
+
+TRACKED_LABELS = [label for label, _ in SYNC_TABLES.values()]
+
+
+def parse_cursor(raw):
+    """Cursor de ?since= -> datetime (None si no viene); ValueError si es inválido."""
+    # "+00:00" sin codificar llega como espacio
+    raw = (raw or "").strip().replace(" ", "+")
+    if not raw:
+        return None
+    since = parse_datetime(raw)
+    if since is None:
+        raise ValueError(raw)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def needs_full(since, now=None):
+    # Sin cursor, o tan viejo que sus borrados ya se purgaron
+    if since is None:
+        return True
+    now = now or timezone.now()
+    return since < now - timedelta(days=getattr(settings, "POS_SYNC_TOMBSTONE_DAYS", 30))
+
+
+def window_start(since):
+    # Margen para transacciones que confirmaron tarde con un updated_at anterior
+    return since - timedelta(seconds=getattr(settings, "POS_SYNC_CURSOR_OVERLAP", 5))
+
+
+def deleted_since(label, start):
+    return list(
+        Tombstone.objects.filter(model=label, deleted_at__gte=start)
+        .values_list("object_id", flat=True).distinct().order_by("object_id")
+    )
+
+
+def _plain(value):
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def changes_since(since=None, tables=None):
+    """Cambios por tabla desde `since`; sin cursor (o vencido) manda todo."""
+    cursor = timezone.now()
+    full = needs_full(since, cursor)
+    start = None if full else window_start(since)
+
+    out = {}
+    for name in tables or SYNC_TABLES:
+        label, fields = SYNC_TABLES[name]
+        qs = apps.get_model(label)._default_manager.order_by("id")
+        if start is not None:
+            qs = qs.filter(updated_at__gte=start)
+        out[name] = {
+            "fields": list(fields),
+            "rows": [[_plain(v) for v in row] for row in qs.values_list(*fields)],
+            "deleted": [] if start is None else deleted_since(label, start),
+        }
+    return {"cursor": cursor.isoformat(), "full": full, "tables": out}
+
+
+def record_deleted(sender, instance, **kwargs):
+    # Receiver de post_delete para las tablas de SYNC_TABLES
+    Tombstone.objects.create(model=sender._meta.label_lower, object_id=instance.pk)
+
+
+def purge_tombstones(days=None):
+    """Borra los registros de borrado más viejos que POS_SYNC_TOMBSTONE_DAYS."""
+    days = getattr(settings, "POS_SYNC_TOMBSTONE_DAYS", 30) if days is None else days
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sync.deltas import purge_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra los registros de borrado (Tombstone) viejos. Los clientes con un "
+        "cursor anterior a la purga reciben las tablas completas en /api/sync/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Días a conservar (default POS_SYNC_TOMBSTONE_DAYS).")
+
+    def handle(self, *args, **options):
+        days = options["days"]
+        if days is not None and days < 1:
+            raise CommandError("--days debe ser mayor a 0.")
+        deleted = purge_tombstones(days)
+        self.stdout.write(self.style.SUCCESS(f"Registros de borrado eliminados: {deleted}."))
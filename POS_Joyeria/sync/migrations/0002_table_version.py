@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sync', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('model', models.CharField(max_length=60, primary_key=True, serialize=False)),
+                ('token', models.CharField(max_length=12)),
+                ('modified', models.BigIntegerField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Tombstone(models.Model):
+    """
+    Registro de un borrado físico, para que /api/sync/ pueda avisar a quien
+    tenga el renglón en su copia local. Se purgan después de
+    POS_SYNC_TOMBSTONE_DAYS; un cursor más viejo recibe la tabla completa.
+    """
+
+    model = models.CharField(max_length=60)  # label_lower, ej. "products.product"
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["model", "deleted_at"])]
+
+    def __str__(self):
+        return f"{self.model}#{self.object_id}"
+
+
+class TableVersion(models.Model):
+    """
+    Versión de una tabla para ETag / Last-Modified (utils/http_cache.py).
+
+    Vive en la BD para que todos los procesos vean el mismo valor;
+    `modified` (segundos epoch) avanza al menos 1 en cada cambio.
+    """
+
+    model = models.CharField(max_length=60, primary_key=True)  # label_lower
+    token = models.CharField(max_length=12)
+    modified = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.model}@{self.token}"
@@ -0,0 +1,10 @@
+from django.apps import apps
+from django.db.models.signals import post_delete
+
+from .deltas import TRACKED_LABELS, record_deleted
+
+
+def connect_signals():
+    # Borrados físicos -> Tombstone (los desactivados ya viajan por updated_at)
+    for label in TRACKED_LABELS:
+        post_delete.connect(record_deleted, sender=apps.get_model(label), dispatch_uid=f"tombstone-{label}")
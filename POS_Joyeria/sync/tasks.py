@@ -0,0 +1,8 @@
+from jobs.registry import task
+
+from .deltas import purge_tombstones
+
+
+@task("sync.purge_tombstones")
+def purge(job, days=None):
+    return {"deleted": purge_tombstones(days)}
@@ -0,0 +1,102 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from client.models import Client
+from products.models import Category, Material, Product
+from suppliers.models import Supplier
+from .deltas import changes_since, parse_cursor, purge_tombstones
+from .models import Tombstone
+
+
+def _rows(data, table):
+    t = data["tables"][table]
+    return [dict(zip(t["fields"], row)) for row in t["rows"]]
+
+
+class SyncDeltasTest(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Anillos")
+        self.material = Material.objects.create(name="Oro", purity="14k")
+        self.supplier = Supplier.objects.create(name="Prov", code="P01", phone="5550001111", email="p@test.com")
+        self.product = Product.objects.create(
+            name="Anillo", purchase_price=100, sale_price="500.00", weight=1, stock=5,
+            category=self.category, material=self.material, supplier=self.supplier,
+        )
+        self.cliente = Client.objects.create(name="Ana", phone="5512345678")
+
+    def _age_everything(self):
+        # Todo lo creado en setUp queda fuera del margen del cursor
+        old = timezone.now() - timedelta(minutes=5)
+        for model in (Category, Material, Supplier, Product, Client):
+            model.objects.update(updated_at=old)
+
+    def test_completo_trae_todas_las_tablas(self):
+        data = changes_since()
+        self.assertTrue(data["full"])
+        self.assertEqual(
+            set(data["tables"]),
+            {"categories", "materials", "suppliers", "products", "clients", "branches", "branch_stock"},
+        )
+        product = _rows(data, "products")[0]
+        self.assertEqual(product["sale_price"], "500.00")
+        self.assertEqual(product["category_id"], self.category.id)
+        self.assertNotIn("purchase_price", product)
+
+    def test_delta_solo_trae_cambios_y_borrados(self):
+        self._age_everything()
+        cursor = parse_cursor(changes_since()["cursor"])
+
+        self.product.stock = 4
+        self.product.save(update_fields=["stock"])
+        self.cliente.is_active = False
+        self.cliente.save(update_fields=["is_active"])
+        otro = Material.objects.create(name="Plata", purity="925")
+        borrado = otro.id
+        otro.delete()
+
+        data = changes_since(cursor)
+        self.assertFalse(data["full"])
+        self.assertEqual([(r["id"], r["stock"]) for r in _rows(data, "products")], [(self.product.id, 4)])
+        self.assertEqual([(r["id"], r["is_active"]) for r in _rows(data, "clients")], [(self.cliente.id, False)])
+        self.assertEqual(data["tables"]["materials"], {"fields": ["id", "name", "purity"], "rows": [], "deleted": [borrado]})
+        self.assertEqual(_rows(data, "categories"), [])
+
+    @override_settings(POS_SYNC_TOMBSTONE_DAYS=7)
+    def test_cursor_vencido_recibe_todo(self):
+        data = changes_since(timezone.now() - timedelta(days=8))
+        self.assertTrue(data["full"])
+        self.assertEqual(len(_rows(data, "products")), 1)
+
+    def test_purga_de_borrados(self):
+        Supplier.objects.create(name="Otro", code="P02", phone="5550002222", email="o@test.com").delete()
+        Tombstone.objects.update(deleted_at=timezone.now() - timedelta(days=40))
+        self.assertEqual(purge_tombstones(days=30), 1)
+
+        Supplier.objects.create(name="Otro", code="P03", phone="5550003333", email="o3@test.com").delete()
+        out = StringIO()
+        call_command("purge_tombstones", "--days", "30", stdout=out)
+        self.assertIn("0", out.getvalue())
+        self.assertEqual(Tombstone.objects.count(), 1)
+
+
+class SyncApiTest(TestCase):
+    def setUp(self):
+        Category.objects.create(name="Anillos")
+
+    def test_api_filtra_tablas_y_valida(self):
+        res = self.client.get("/api/sync/", {"tables": "categories"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(list(res.json()["tables"]), ["categories"])
+
+        cursor = res.json()["cursor"]
+        # "+" sin codificar en la URL llega como espacio
+        res = self.client.get(f"/api/sync/?since={cursor}&tables=categories")
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(res.json()["full"])
+
+        self.assertEqual(self.client.get("/api/sync/", {"since": "ayer"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/sync/", {"tables": "ventas"}).status_code, 400)
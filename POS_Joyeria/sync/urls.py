@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import SyncChangesView
+
+urlpatterns = [
+    path("", SyncChangesView.as_view(), name="sync-changes"),
+]
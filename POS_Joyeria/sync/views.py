@@ -0,0 +1,26 @@
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .deltas import SYNC_TABLES, changes_since, parse_cursor
+
+
+# Cambios incrementales /api/sync/?since=<cursor>&tables=products,clients
+class SyncChangesView(APIView):
+
+    def get(self, request):
+        try:
+            since = parse_cursor(request.query_params.get("since"))
+        except ValueError:
+            return Response({"detail": "Cursor inválido."}, status=status.HTTP_400_BAD_REQUEST)
+
+        raw = request.query_params.get("tables", "")
+        tables = [t.strip() for t in raw.split(",") if t.strip()] or list(SYNC_TABLES)
+        unknown = [t for t in tables if t not in SYNC_TABLES]
+        if unknown:
+            return Response(
+                {"detail": f"Tablas desconocidas: {', '.join(unknown)}."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Siempre se revalida: el cursor ya hace que la respuesta sea chica
+        return Response(changes_since(since, tables), headers={"Cache-Control": "private, no-cache"})
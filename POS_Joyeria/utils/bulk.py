@@ -0,0 +1,186 @@
+import logging
+
+from django.db import IntegrityError, transaction
+from django.dispatch import Signal
+from rest_framework import serializers, status
+from rest_framework.response import Response
+
+from utils.cache import invalidate_for_model
+from utils.http_cache import bump_table_version
+from utils.uniqueness import find_conflicts_bulk
+
+logger = logging.getLogger(__name__)
+
+# bulk_create no manda post_save; quien necesite enterarse de las altas
+# masivas (ej. inventory) escucha esta señal: sender=modelo, instances=[...]
+bulk_created = Signal()
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField que, en alta masiva, resuelve el pk desde un dict
+    precargado en el contexto ({"prefetched": {"category": {1: obj}}}) en vez
+    de hacer un .get() por cada fila.
+    """
+
+    def to_internal_value(self, data):
+        cache = self.context.get("prefetched", {}).get(self.field_name)
+        if cache is None:
+            return super().to_internal_value(data)
+
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+        obj = cache.get(pk)
+        if obj is None:
+            self.fail("does_not_exist", pk_value=data)
+        return obj
+
+
+class BulkCreateMixin:
+    """
+    Permite que el POST de una vista de alta reciba una lista de objetos.
+
+    - Un objeto (dict) -> comportamiento normal de DRF.
+    - Una lista -> se valida todo en una pasada, la unicidad se revisa por
+      lote (find_conflicts_bulk), se insertan los válidos con bulk_create en
+      una sola transacción y se regresa un resultado por elemento.
+    - Si la BD rechaza el lote (otra alta con los mismos valores entró
+      después de la revisión), no se guarda nada y se responde 409 con las
+      filas que chocan.
+
+    El serializer recibe `bulk=True` en el contexto para saltarse sus
+    consultas de unicidad por fila; si define `unique_checks(attrs)` y
+    `UNIQUE_MESSAGES`, aquí se usan para la revisión por lote.
+    """
+
+    bulk_max_items = 5000
+    bulk_batch_size = 500
+    # {"campo_fk": Modelo} -> se precargan con in_bulk() antes de validar
+    bulk_prefetch = {}
+
+    def create(self, request, *args, **kwargs):
+        if isinstance(request.data, list):
+            return self.bulk_create(request, request.data)
+        return super().create(request, *args, **kwargs)
+
+    def get_bulk_serializer_context(self, items):
+        context = self.get_serializer_context()
+        context["bulk"] = True
+
+        prefetched = {}
+        for field, model in self.bulk_prefetch.items():
+            ids = set()
+            for item in items:
+                value = item.get(field) if isinstance(item, dict) else None
+                try:
+                    ids.add(int(value))
+                except (TypeError, ValueError):
+                    continue
+            prefetched[field] = model._default_manager.in_bulk(ids) if ids else {}
+        context["prefetched"] = prefetched
+        return context
+
+    def prepare_bulk_instances(self, instances):
+        """Hook para completar campos calculados antes del bulk_create."""
+        return instances
+
+    @staticmethod
+    def _check_bulk_unique(serializer_class, valid, results):
+        # Marca en `results` las filas que chocan; regresa las que siguen válidas
+        unique_checks = getattr(serializer_class, "unique_checks", None)
+        if not unique_checks or not valid:
+            return valid
+        messages = getattr(serializer_class, "UNIQUE_MESSAGES", {})
+        conflicts = find_conflicts_bulk(
+            serializer_class.Meta.model,
+            [unique_checks(s.validated_data) for _, s in valid],
+        )
+        still_valid = []
+        for (i, s), fields in zip(valid, conflicts):
+            if fields:
+                errors = {f: [messages.get(f, "Valor duplicado.")] for f in sorted(fields)}
+                results[i] = {"index": i, "status": "error", "errors": errors}
+            else:
+                still_valid.append((i, s))
+        return still_valid
+
+    def bulk_create(self, request, items):
+        if not items:
+            return Response({"detail": "La lista está vacía."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.bulk_max_items:
+            return Response(
+                {"detail": f"Máximo {self.bulk_max_items} elementos por solicitud."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer_class = self.get_serializer_class()
+        context = self.get_bulk_serializer_context(items)
+
+        results = [None] * len(items)
+        valid = []  # (index, serializer)
+
+        for i, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[i] = {"index": i, "status": "error", "errors": {"non_field_errors": ["Se esperaba un objeto."]}}
+                continue
+            s = serializer_class(data=item, context=context)
+            if s.is_valid():
+                valid.append((i, s))
+            else:
+                results[i] = {"index": i, "status": "error", "errors": s.errors}
+
+        # Unicidad por lote (contra la BD y dentro del mismo lote)
+        valid = self._check_bulk_unique(serializer_class, valid, results)
+
+        created = 0
+        if valid:
+            model = serializer_class.Meta.model
+            instances = [model(**s.validated_data) for _, s in valid]
+
+            try:
+                with transaction.atomic():
+                    instances = self.prepare_bulk_instances(instances)
+                    instances = model._default_manager.bulk_create(instances, batch_size=self.bulk_batch_size)
+                    bulk_created.send(sender=model, instances=instances)
+                    # bulk_create no dispara post_save
+                    bump_table_version(model)
+                    invalidate_for_model(model)
+                    transaction.on_commit(lambda: invalidate_for_model(model), robust=True)
+            except IntegrityError:
+                # Otra petición guardó los mismos valores después de la revisión
+                # (o chocó una restricción que unique_checks no cubre): no se
+                # guardó nada del lote; se vuelve a revisar para señalar las filas
+                logger.warning("Alta masiva de %s rechazada por la BD", model._meta.label, exc_info=True)
+                retry = ["No se guardó: el lote chocó con datos existentes. Vuelve a enviarlo."]
+                for i, _ in self._check_bulk_unique(serializer_class, valid, results):
+                    results[i] = {"index": i, "status": "error", "errors": {"non_field_errors": retry}}
+                return Response(
+                    {"created": 0, "errors": len(items), "results": results},
+                    status=status.HTTP_409_CONFLICT,
+                )
+
+            for (i, s), obj in zip(valid, instances):
+                results[i] = {
+                    "index": i,
+                    "status": "created",
+                    "id": obj.pk,
+                    "data": serializer_class(obj, context=context).data,
+                }
+            created = len(instances)
+
+        if created == len(items):
+            code = status.HTTP_201_CREATED
+        elif created:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+
+        return Response(
+            {"created": created, "errors": len(items) - created, "results": results},
+            status=code,
+        )
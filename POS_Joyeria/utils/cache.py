@@ -0,0 +1,147 @@
+import threading
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from utils.perf import record_cache
+
+
+# Cachés con nombre definidas en settings.CACHES
+CACHE_NAMES = ("catalog", "roles", "search", "reports", "receipts")
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def _count(alias, field):
+    with _stats_lock:
+        entry = _stats.setdefault(alias, {"hits": 0, "misses": 0, "sets": 0, "invalidations": 0})
+        entry[field] += 1
+    record_cache(field)
+
+
+def cache_stats():
+    """Hits / misses por caché (contadores de este proceso)."""
+    with _stats_lock:
+        out = {}
+        for alias in CACHE_NAMES:
+            entry = dict(_stats.get(alias, {"hits": 0, "misses": 0, "sets": 0, "invalidations": 0}))
+            total = entry["hits"] + entry["misses"]
+            entry["hit_ratio"] = round(entry["hits"] / total, 3) if total else None
+            out[alias] = entry
+        return out
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+_MISSING = object()
+
+
+class NamedCache:
+    """
+    Envoltura de una caché de settings.CACHES con versión explícita.
+
+    Todas las llaves se guardan con `version=<versión actual>`; invalidar
+    es subir la versión (las entradas viejas quedan huérfanas y expiran
+    solas), así funciona igual en locmem y en archivo sin borrar por patrón.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def _version_key(self):
+        return f"__version__:{self.alias}"
+
+    def version(self):
+        v = self.backend.get(self._version_key(), version=0)
+        if v is None:
+            v = 1
+            self.backend.add(self._version_key(), v, None, version=0)
+        return v
+
+    def _key_version(self, versioned):
+        # versioned=False: la llave ya trae su propia versión (ej. token de tabla)
+        return self.version() if versioned else 0
+
+    def get(self, key, default=None, versioned=True):
+        value = self.backend.get(key, _MISSING, version=self._key_version(versioned))
+        if value is _MISSING:
+            _count(self.alias, "misses")
+            return default
+        _count(self.alias, "hits")
+        return value
+
+    def set(self, key, value, timeout=None, versioned=True):
+        _count(self.alias, "sets")
+        kwargs = {"version": self._key_version(versioned)}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        self.backend.set(key, value, **kwargs)
+
+    def get_or_set(self, key, producer, timeout=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = producer()
+            self.set(key, value, timeout)
+        return value
+
+    def delete(self, key, versioned=True):
+        self.backend.delete(key, version=self._key_version(versioned))
+
+    def invalidate(self):
+        _count(self.alias, "invalidations")
+        try:
+            self.backend.incr(self._version_key(), version=0)
+        except ValueError:
+            # No había versión registrada: cualquier valor distinto de 1 sirve
+            self.backend.set(self._version_key(), 2, None, version=0)
+
+
+catalog_cache = NamedCache("catalog")
+roles_cache = NamedCache("roles")
+search_cache = NamedCache("search")
+reports_cache = NamedCache("reports")
+receipts_cache = NamedCache("receipts")
+
+_BY_ALIAS = {c.alias: c for c in (catalog_cache, roles_cache, search_cache, reports_cache, receipts_cache)}
+
+
+def get_cache(alias):
+    return _BY_ALIAS[alias]
+
+
+# Qué cachés dependen de cada modelo (label_lower -> aliases)
+MODEL_DEPENDENCIES = {
+    "products.product": ("catalog", "search", "reports"),
+    "products.category": ("catalog", "search", "reports"),
+    "products.material": ("catalog", "search", "reports"),
+    "suppliers.supplier": ("catalog", "search", "reports"),
+    "client.client": ("search", "reports"),
+}
+
+
+def invalidate_for_model(model):
+    aliases = MODEL_DEPENDENCIES.get(model._meta.label_lower, ())
+    for alias in aliases:
+        _BY_ALIAS[alias].invalidate()
+
+
+def _invalidate_receiver(sender, **kwargs):
+    # Ya y al confirmar (igual que la versión de tabla de http_cache)
+    invalidate_for_model(sender)
+    transaction.on_commit(lambda: invalidate_for_model(sender), robust=True)
+
+
+def connect_invalidation(*models):
+    for model in models:
+        label = model._meta.label_lower
+        post_save.connect(_invalidate_receiver, sender=model, dispatch_uid=f"cache-save-{label}")
+        post_delete.connect(_invalidate_receiver, sender=model, dispatch_uid=f"cache-delete-{label}")
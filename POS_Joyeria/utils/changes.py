@@ -0,0 +1,21 @@
+from django.db import models
+
+
+class ChangeTrackedModel(models.Model):
+    """
+    updated_at para descargas incrementales (/api/sync/, terminales sin conexión).
+
+    save(update_fields=[...]) también mueve updated_at; los .update() de
+    QuerySet no pasan por aquí y deben incluirlo a mano si el cambio importa.
+    """
+
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "updated_at" not in update_fields:
+            kwargs["update_fields"] = [*update_fields, "updated_at"]
+        super().save(*args, **kwargs)
@@ -0,0 +1,331 @@
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import aclosing
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+# Eventos en vivo (SSE) para el POS y el corte de caja.
+#
+#   publish("stock", {...})  -> desde las vistas (después del commit)
+#   alisten                  -> stream SSE en ASGI
+#   sse_poll                 -> respuesta corta en WSGI (EventSource vuelve a preguntar)
+#
+# settings.POS_EVENTS_BROKER:
+#   "memory" (default) -> en el proceso; sirve con un solo proceso (runserver, uvicorn -w 1)
+#   "file"             -> archivo compartido (POS_EVENTS_FILE); equivale a un broker
+#                         para varios procesos en el mismo equipo sin servidor externo
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    channel: str
+    data: dict
+
+    def to_json(self):
+        return json.dumps({"id": self.id, "channel": self.channel, "data": self.data}, cls=DjangoJSONEncoder)
+
+    @classmethod
+    def from_json(cls, line):
+        raw = json.loads(line)
+        return cls(id=int(raw["id"]), channel=raw["channel"], data=raw["data"])
+
+
+class _SyncSubscriber:
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            pass  # cliente lento: pierde eventos y se resincroniza al recargar
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class _AsyncSubscriber:
+    def __init__(self, maxsize):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+    def put(self, event):
+        # publish() corre en el hilo de la vista, no en el loop del stream
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class InProcessBroker:
+    """Pub/sub en memoria con historial corto para reconexiones (Last-Event-ID)."""
+
+    def __init__(self, history=500, queue_size=1000):
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._queue_size = queue_size
+
+    def publish(self, channel, data):
+        with self._lock:
+            self._seq += 1
+            event = Event(self._seq, channel, data)
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+
+        for sub in subscribers:
+            try:
+                sub.put(event)
+            except RuntimeError:
+                # El loop del suscriptor ya cerró
+                self._remove(sub)
+        return event
+
+    def _register(self, sub, channels, last_id):
+        with self._lock:
+            self._subscribers.add(sub)
+            if last_id is None:
+                return []
+            return [e for e in self._history if e.id > last_id and e.channel in channels]
+
+    def _remove(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def position(self):
+        return self._seq
+
+    def since(self, channels, last_id):
+        with self._lock:
+            return [e for e in self._history if e.id > last_id and e.channel in channels]
+
+    def listen(self, channels, last_id=None, timeout=15.0):
+        sub = _SyncSubscriber(self._queue_size)
+        backlog = self._register(sub, channels, last_id)
+        try:
+            yield from backlog
+            while True:
+                event = sub.get(timeout)
+                if event is None or event.channel in channels:
+                    yield event
+        finally:
+            self._remove(sub)
+
+    async def alisten(self, channels, last_id=None, timeout=15.0):
+        sub = _AsyncSubscriber(self._queue_size)
+        backlog = self._register(sub, channels, last_id)
+        try:
+            for event in backlog:
+                yield event
+            while True:
+                event = await sub.get(timeout)
+                if event is None or event.channel in channels:
+                    yield event
+        finally:
+            self._remove(sub)
+
+
+class FileBroker:
+    """
+    Broker entre procesos usando un archivo JSON-lines (append atómico).
+    Los suscriptores leen lo nuevo cada `poll_interval`; el id es time_ns.
+    """
+
+    def __init__(self, path, poll_interval=0.25, max_bytes=5 * 1024 * 1024):
+        self.path = str(path)
+        self.poll_interval = poll_interval
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._last_id = 0
+
+    def _next_id(self):
+        with self._lock:
+            self._last_id = max(time.time_ns(), self._last_id + 1)
+            return self._last_id
+
+    def publish(self, channel, data):
+        event = Event(self._next_id(), channel, data)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        line = (event.to_json() + "\n").encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size > self.max_bytes:
+                os.ftruncate(fd, 0)
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+        return event
+
+    def _size(self):
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def _read_from(self, offset):
+        # -> (eventos nuevos, nuevo offset)
+        size = self._size()
+        if size < offset:
+            offset = 0  # se truncó
+        if size == offset:
+            return [], offset
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            chunk = f.read(size - offset)
+        end = chunk.rfind(b"\n") + 1  # sólo líneas completas
+        events = []
+        for line in chunk[:end].splitlines():
+            try:
+                events.append(Event.from_json(line))
+            except (ValueError, KeyError):
+                continue
+        return events, offset + end
+
+    def position(self):
+        # Id del último evento escrito (0 si no hay): basta leer el final del archivo
+        size = self._size()
+        if not size:
+            return 0
+        with open(self.path, "rb") as f:
+            f.seek(max(size - 64 * 1024, 0))
+            lines = f.read().splitlines()
+        for line in reversed(lines):
+            try:
+                return Event.from_json(line).id
+            except (ValueError, KeyError):
+                continue
+        return 0
+
+    def since(self, channels, last_id):
+        return self._start(channels, last_id)[0]
+
+    def _start(self, channels, last_id):
+        if last_id is None:
+            return [], self._size()
+        events, offset = self._read_from(0)
+        return [e for e in events if e.id > last_id and e.channel in channels], offset
+
+    def listen(self, channels, last_id=None, timeout=15.0):
+        backlog, offset = self._start(channels, last_id)
+        yield from backlog
+        idle = 0.0
+        while True:
+            events, offset = self._read_from(offset)
+            events = [e for e in events if e.channel in channels]
+            if events:
+                idle = 0.0
+                yield from events
+                continue
+            time.sleep(self.poll_interval)
+            idle += self.poll_interval
+            if idle >= timeout:
+                idle = 0.0
+                yield None
+
+    async def alisten(self, channels, last_id=None, timeout=15.0):
+        backlog, offset = self._start(channels, last_id)
+        for event in backlog:
+            yield event
+        idle = 0.0
+        while True:
+            events, offset = self._read_from(offset)
+            events = [e for e in events if e.channel in channels]
+            if events:
+                idle = 0.0
+                for event in events:
+                    yield event
+                continue
+            await asyncio.sleep(self.poll_interval)
+            idle += self.poll_interval
+            if idle >= timeout:
+                idle = 0.0
+                yield None
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            if getattr(settings, "POS_EVENTS_BROKER", "memory") == "file":
+                _broker = FileBroker(settings.POS_EVENTS_FILE)
+            else:
+                _broker = InProcessBroker()
+        return _broker
+
+
+def reset_broker():
+    # Para pruebas / cambio de settings
+    global _broker
+    with _broker_lock:
+        _broker = None
+
+
+def publish(channel, data):
+    return get_broker().publish(channel, data)
+
+
+# SSE
+
+def _format(event):
+    if event is None:
+        return b": ping\n\n"
+    payload = json.dumps(event.data, cls=DjangoJSONEncoder)
+    return f"id: {event.id}\nevent: {event.channel}\ndata: {payload}\n\n".encode()
+
+
+def sse_poll(channels, last_id=None, retry=None):
+    """
+    Respuesta SSE corta (WSGI): lo pendiente desde last_id y cuándo volver.
+
+    Un stream largo ocuparía un worker síncrono por terminal; así la conexión
+    termina enseguida y EventSource reconecta a los `retry` segundos mandando
+    Last-Event-ID.
+    """
+    broker = get_broker()
+    retry = retry or settings.POS_EVENTS_POLL_SECONDS
+    out = [b"retry: %d\n\n" % (retry * 1000)]
+    if last_id is None:
+        # Primera conexión: sólo el cursor, para que el navegador lo mande al volver
+        out.append(b"id: %d\n\n" % broker.position())
+    else:
+        out += [_format(event) for event in broker.since(channels, last_id)]
+    return b"".join(out)
+
+
+async def asse_stream(channels, last_id=None, max_seconds=None, heartbeat=15.0):
+    """Generador async (ASGI): no ocupa un hilo por cliente conectado."""
+    broker = get_broker()
+    max_seconds = max_seconds or settings.POS_EVENTS_STREAM_SECONDS
+    deadline = time.monotonic() + max_seconds
+    yield b"retry: 3000\n\n"
+    async with aclosing(broker.alisten(channels, last_id, timeout=min(heartbeat, max_seconds))) as events:
+        async for event in events:
+            yield _format(event)
+            if time.monotonic() >= deadline:
+                return
@@ -0,0 +1,234 @@
+import os
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from utils.bulk import bulk_created
+
+
+# Datos masivos para las pruebas de rendimiento (presupuestos de queries).
+#
+#   POS_PERF_SCALE=ci   (default) -> volúmenes chicos, la suite sigue rápida
+#   POS_PERF_SCALE=full           -> volúmenes de tienda real (10k / 100k / 50k)
+#
+#   POS_PERF_LATENCY_FACTOR multiplica los techos de latencia (0 = no medir tiempo);
+#   sin él sólo se miden con --tag perf (POS/test_runner.py)
+#
+# Sólo bulk_create: sin post_save (ni pipeline de imágenes ni invalidación de
+# cachés); los productos sí mandan bulk_created para que inventory los cuente.
+
+PERF_VOLUMES = {
+    "ci": {"products": 300, "sales": 600, "clients": 300, "suppliers": 200},
+    "full": {"products": 10_000, "sales": 100_000, "clients": 50_000, "suppliers": 2_000},
+}
+
+BATCH_SIZE = 2000
+
+
+def perf_volumes():
+    return PERF_VOLUMES.get(os.environ.get("POS_PERF_SCALE", "ci"), PERF_VOLUMES["ci"])
+
+
+def make_catalog(code="PRF"):
+    from products.models import Category, Material
+    from suppliers.models import Supplier
+
+    category, _ = Category.objects.get_or_create(name="Anillos")
+    material, _ = Material.objects.get_or_create(name="Plata", purity="925")
+    supplier, _ = Supplier.objects.get_or_create(
+        code=code,
+        defaults={
+            "name": f"Proveedor {code}",
+            "phone": f"55{zlib.crc32(code.encode()) % 10**8:08d}",
+            "email": f"{code.lower()}@perf.test",
+        },
+    )
+    return category, material, supplier
+
+
+def make_products(n, stock=50, code="PRF", name="Anillo perf"):
+    from products.models import Product
+
+    category, material, supplier = make_catalog(code)
+    prefix = f"{supplier.code}{category.name[:3].upper()}"
+    products = [
+        Product(
+            name=f"{name} {i}",
+            code=f"{prefix}{i:06d}",
+            category=category,
+            material=material,
+            supplier=supplier,
+            purchase_price=Decimal("100.00"),
+            sale_price=Decimal("250.00") + i % 50,
+            weight=Decimal("5.00"),
+            stock=stock,
+        )
+        for i in range(1, n + 1)
+    ]
+    products = Product.objects.bulk_create(products, batch_size=BATCH_SIZE)
+    bulk_created.send(sender=Product, instances=products)
+    return products
+
+
+def make_suppliers(n):
+    from suppliers.models import Supplier
+
+    suppliers = [
+        Supplier(name=f"Proveedor {i}", code=f"PRV{i:05d}", phone=f"55{i:08d}", email=f"prv{i}@perf.test")
+        for i in range(1, n + 1)
+    ]
+    return Supplier.objects.bulk_create(suppliers, batch_size=BATCH_SIZE)
+
+
+def make_clients(n):
+    from client.models import Client
+
+    clients = [
+        Client(
+            name=f"Cliente {i}",
+            apellido_paterno="Perf",
+            phone=f"55{i:08d}",
+            email=f"cliente{i}@perf.test",
+        )
+        for i in range(1, n + 1)
+    ]
+    return Client.objects.bulk_create(clients, batch_size=BATCH_SIZE)
+
+
+def make_sales(n, user, products, clients=(), folio_prefix="P", cash_register=None):
+    """Ventas pagadas de una pieza cada una (folio P0000001...), opcionalmente en una caja."""
+    from branches.models import default_branch_id
+    from sales.models import Sale, SaleItem
+
+    methods = [c for c, _ in Sale.PaymentMethod.choices]
+    branch_id = default_branch_id()
+    sales = []
+    for i in range(n):
+        product = products[i % len(products)]
+        sales.append(Sale(
+            folio=f"{folio_prefix}{i + 1:07d}",
+            status=Sale.Status.PAID,
+            user=user,
+            client=clients[i % len(clients)] if clients else None,
+            subtotal=product.sale_price,
+            total=product.sale_price,
+            payment_method=methods[i % len(methods)],
+            amount_paid=product.sale_price,
+            branch_id=branch_id,
+            cash_register=cash_register,
+        ))
+    sales = Sale.objects.bulk_create(sales, batch_size=BATCH_SIZE)
+
+    items = [
+        SaleItem(
+            sale=sale,
+            product=products[i % len(products)],
+            product_name=products[i % len(products)].name,
+            unit_price=sale.total,
+            qty=1,
+            line_total=sale.total,
+        )
+        for i, sale in enumerate(sales)
+    ]
+    SaleItem.objects.bulk_create(items, batch_size=BATCH_SIZE)
+    return sales
+
+
+class QueryBudgetMixin:
+    """
+    Base de las pruebas de presupuesto (@tag("perf")): siembra los datos con
+    volumen y deja la sesión lista; cada app sólo escribe sus assertBudget.
+
+      perf_data     -> qué se siembra: "products", "clients", "suppliers", "sales"
+      perf_role     -> grupo de self.user ("AdminPOS", "VendedorPOS"); con
+                       usuario, cada prueba empieza con sesión y roles en caché
+      perf_register -> caja abierta (self.cash) ligada a la sesión; las ventas
+                       sembradas entran en ella
+
+    assertBudget(queries, ms): falla si el bloque rebasa el número de queries
+    o el tiempo (el tiempo sólo con --tag perf). Si se rebasa, el mensaje
+    lista el SQL: los presupuestos no llevan la cuenta en comentarios.
+    """
+
+    perf_data = ()
+    perf_role = None
+    perf_register = False
+
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth import get_user_model
+        from django.contrib.auth.models import Group
+
+        from cash_register.models import CashRegister
+        from client.models import Client
+        from products.models import Product
+        from suppliers.models import Supplier
+        from utils.http_cache import table_version
+
+        super().setUpTestData()
+        cls.volumes = volumes = perf_volumes()
+        cls.user = cls.cash = None
+        cls.products, cls.clients, cls.suppliers, cls.sales = [], [], [], []
+
+        if cls.perf_role:
+            cls.user = get_user_model().objects.create_user(username="perf", password="perf12345")
+            cls.user.groups.add(Group.objects.get_or_create(name=cls.perf_role)[0])
+        if cls.perf_register:
+            cls.cash = CashRegister.objects.create(opened_by=cls.user, opening_amount="100.00")
+            # Abierta desde hace una hora: las ventas sembradas caen en su corte
+            CashRegister.objects.filter(pk=cls.cash.pk).update(opened_at=timezone.now() - timedelta(hours=1))
+
+        if {"products", "sales"} & set(cls.perf_data):
+            cls.products = make_products(volumes["products"])
+        if "clients" in cls.perf_data:
+            cls.clients = make_clients(volumes["clients"])
+        if "suppliers" in cls.perf_data:
+            cls.suppliers = make_suppliers(volumes["suppliers"])
+        if "sales" in cls.perf_data:
+            cls.sales = make_sales(volumes["sales"], cls.user, cls.products, cls.clients, cash_register=cls.cash)
+
+        # bulk_create no registra versión de tabla; una BD en uso ya la tiene
+        for model in (Product, Client, Supplier):
+            table_version(model)
+
+    def setUp(self):
+        from cash_register.terminal import bind_register
+        from utils.roles import get_user_roles
+
+        super().setUp()
+        # Cachés vacías: el conteo no depende del orden de las pruebas
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        if self.user is not None:
+            self.client.force_login(self.user)
+            if self.cash is not None:
+                session = self.client.session
+                bind_register(session, self.cash)
+                session.save()
+            # Roles en caché, como después del primer request
+            get_user_roles(self.user)
+
+    def assertBudget(self, queries, ms=None):
+        return self._budget(queries, ms)
+
+    @contextmanager
+    def _budget(self, queries, ms):
+        factor = float(os.environ.get("POS_PERF_LATENCY_FACTOR", "0"))
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            yield ctx
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+        if len(ctx) > queries:
+            sql = "\n".join(f"  {q['sql']}" for q in ctx.captured_queries)
+            self.fail(f"{len(ctx)} queries, presupuesto {queries}:\n{sql}")
+        if ms is not None and factor > 0 and elapsed_ms > ms * factor:
+            self.fail(f"{elapsed_ms:.0f} ms, techo {ms * factor:.0f} ms")
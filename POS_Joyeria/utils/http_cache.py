@@ -0,0 +1,137 @@
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from sync.models import TableVersion
+from utils.cache import catalog_cache
+
+
+# Versión por tabla: (token, timestamp), guardada en sync.TableVersion para que
+# todos los procesos la compartan. Cambia cada vez que la tabla se modifica
+# (señales post_save/post_delete o bump manual después de un bulk_create).
+#
+# Se escribe en la misma transacción que el cambio: los demás la ven cambiar
+# al confirmar y, si se revierte, la versión tampoco cambia.
+#
+# Se lee de la caché "catalog" (un 304 no consulta la BD); la BD es el
+# respaldo cuando no está. Cada bump la borra ya y al confirmar; una
+# lectura que se cruce con el commit puede dejar la vieja, por eso expira
+# pronto (POS_TABLE_VERSION_LOCAL_TTL con locmem, un minuto compartida).
+
+
+def _version_key(label):
+    return f"tblver:{label}"
+
+
+def _version_ttl():
+    return 60 if settings.POS_CACHE_BACKEND == "file" else settings.POS_TABLE_VERSION_LOCAL_TTL
+
+
+def _forget_version(label):
+    catalog_cache.delete(_version_key(label), versioned=False)
+
+
+def _create(label, token, modified):
+    # INSERT sin savepoint; si otro proceso la creó primero se queda la suya
+    TableVersion.objects.bulk_create(
+        [TableVersion(model=label, token=token, modified=modified)], ignore_conflicts=True
+    )
+
+
+def bump_table_version(model):
+    label = model._meta.label_lower
+    token = uuid.uuid4().hex[:12]
+    now = int(time.time())
+    # Last-Modified sólo tiene segundos: dos cambios en el mismo segundo
+    # no deben compartir fecha, así que cada versión avanza al menos 1
+    if not TableVersion.objects.filter(model=label).update(
+        token=token, modified=Greatest(Value(now), F("modified") + 1)
+    ):
+        _create(label, token, now)
+    _forget_version(label)
+    transaction.on_commit(lambda: _forget_version(label), robust=True)
+
+
+def table_version(model):
+    label = model._meta.label_lower
+    value = catalog_cache.get(_version_key(label), versioned=False)
+    if value is not None:
+        return value
+
+    rows = TableVersion.objects.filter(model=label).values_list("token", "modified")
+    value = rows.first()
+    if value is None:
+        # Sin versión registrada (tabla nueva): se crea una
+        _create(label, uuid.uuid4().hex[:12], int(time.time()))
+        value = rows.first()
+    catalog_cache.set(_version_key(label), value, _version_ttl(), versioned=False)
+    return value
+
+
+def bump_on_change(sender, **kwargs):
+    # Receiver genérico para post_save / post_delete
+    bump_table_version(sender)
+
+
+class ConditionalListMixin:
+    """
+    GET de listas con ETag / Last-Modified y respuesta serializada en caché.
+
+    - El ETag sale de la versión de la tabla + query string, así que si el
+      cliente manda If-None-Match vigente se responde 304 sin tocar la BD
+      (la versión sale de la caché; si no está, una consulta).
+    - Si no, se usa el JSON ya serializado de la caché (por versión) y sólo
+      se consulta la BD cuando la tabla cambió.
+    """
+
+    list_cache_timeout = 60 * 60
+
+    def get_cache_model(self):
+        return self.get_queryset().model
+
+    def list(self, request, *args, **kwargs):
+        model = self.get_cache_model()
+        token, modified = table_version(model)
+
+        query = request.META.get("QUERY_STRING", "")
+        variant = hashlib.md5(query.encode()).hexdigest()[:8]
+        etag = quote_etag(f"{model._meta.label_lower}-{token}-{variant}")
+
+        headers = {
+            "ETag": etag,
+            "Last-Modified": http_date(modified),
+            # El navegador guarda la respuesta pero siempre revalida
+            "Cache-Control": "private, no-cache",
+        }
+
+        if self._not_modified(request, etag, modified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        key = f"list:{model._meta.label_lower}:{token}:{variant}"
+        # La llave ya incluye el token de la tabla (no depende de la versión
+        # general de "catalog", que cambia con cada venta por el stock)
+        data = catalog_cache.get(key, versioned=False)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            catalog_cache.set(key, data, self.list_cache_timeout, versioned=False)
+
+        return Response(data, headers=headers)
+
+    @staticmethod
+    def _not_modified(request, etag, modified):
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if if_none_match:
+            tags = [t.strip() for t in if_none_match.split(",")]
+            # Se acepta la forma débil (W/"...") que agregan algunos proxies
+            return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+        since = parse_http_date_safe(request.META.get("HTTP_IF_MODIFIED_SINCE", ""))
+        return since is not None and modified <= since
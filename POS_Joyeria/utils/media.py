@@ -0,0 +1,75 @@
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.views.static import serve
+
+# Nombres con huella (sha256 en hex): el contenido nunca cambia para esa URL
+FINGERPRINT_RE = re.compile(r"[0-9a-f]{20,64}")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Guarda cada archivo con el hash de su contenido como nombre:
+      products/foto.jpg -> products/3f/3fa9...e1.jpg
+
+    Subir la misma foto dos veces no crea otra copia (se reutiliza el
+    archivo), y la URL sirve siempre el mismo contenido, así que se puede
+    mandar con caché "immutable". Ojo: por eso mismo borrar un producto
+    NO borra su archivo; los huérfanos los limpia `manage.py gc_media`.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+
+        digest = self._digest(content)
+        directory = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        hashed = os.path.join(directory, digest[:2], f"{digest}{ext}").replace("\\", "/")
+
+        if self.exists(hashed):
+            return hashed
+        return super().save(hashed, content, max_length=max_length)
+
+    def _save(self, name, content):
+        # Dos subidas iguales al mismo tiempo: la segunda reutiliza el archivo
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+    @staticmethod
+    def _digest(content):
+        h = hashlib.sha256()
+        if hasattr(content, "seek"):
+            content.seek(0)
+        for chunk in content.chunks():
+            h.update(chunk)
+        if hasattr(content, "seek"):
+            content.seek(0)
+        return h.hexdigest()
+
+
+def product_image_storage():
+    return ContentAddressedStorage()
+
+
+def is_fingerprinted(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return bool(FINGERPRINT_RE.match(stem))
+
+
+def serve_media(request, path):
+    # Igual que django.views.static.serve, pero los archivos con huella
+    # se marcan como inmutables (el navegador no vuelve a pedirlos)
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if response.status_code == 200 and is_fingerprinted(path):
+        response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
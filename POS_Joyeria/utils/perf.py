@@ -0,0 +1,237 @@
+import math
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+
+# Métricas por request: tiempo total, queries (número y tiempo), caché y plantillas.
+# Se guardan en un buffer circular en memoria (por proceso) y se resumen en
+# percentiles por vista. Ver home/views.py (perf_dashboard / perf_json).
+
+_current = ContextVar("pos_perf_stats", default=None)
+
+_buffer_lock = threading.Lock()
+_buffer = deque(maxlen=1000)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_ms", "cache_hits", "cache_misses", "template_ms")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_ms = 0.0
+
+
+def record_cache(field):
+    # Llamado desde utils.cache (hits / misses)
+    stats = _current.get()
+    if stats is None:
+        return
+    if field == "hits":
+        stats.cache_hits += 1
+    elif field == "misses":
+        stats.cache_misses += 1
+
+
+def _buffer_size():
+    return getattr(settings, "POS_PERF_BUFFER_SIZE", 1000)
+
+
+def _store(record):
+    global _buffer
+    with _buffer_lock:
+        if _buffer.maxlen != _buffer_size():
+            _buffer = deque(_buffer, maxlen=_buffer_size())
+        _buffer.append(record)
+
+
+def recent_requests(limit=None):
+    with _buffer_lock:
+        items = list(_buffer)
+    items.reverse()
+    return items[:limit] if limit else items
+
+
+def clear_perf_buffer():
+    with _buffer_lock:
+        _buffer.clear()
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank: suficiente para un tablero
+    if not sorted_values:
+        return None
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[max(0, min(rank, len(sorted_values)) - 1)]
+
+
+def perf_summary():
+    """Resumen por vista: conteo y p50/p95/p99 de tiempo, queries y plantillas."""
+    by_view = {}
+    for r in recent_requests():
+        by_view.setdefault(r["view"], []).append(r)
+
+    out = []
+    for view, rows in by_view.items():
+        ms = sorted(r["ms"] for r in rows)
+        queries = sorted(r["queries"] for r in rows)
+        db_ms = sorted(r["db_ms"] for r in rows)
+        tpl_ms = sorted(r["template_ms"] for r in rows)
+        hits = sum(r["cache_hits"] for r in rows)
+        misses = sum(r["cache_misses"] for r in rows)
+        out.append({
+            "view": view,
+            "count": len(rows),
+            "ms": {"p50": percentile(ms, 50), "p95": percentile(ms, 95), "p99": percentile(ms, 99)},
+            "queries": {"p50": percentile(queries, 50), "p95": percentile(queries, 95), "max": queries[-1]},
+            "db_ms": {"p50": percentile(db_ms, 50), "p95": percentile(db_ms, 95)},
+            "template_ms": {"p50": percentile(tpl_ms, 50), "p95": percentile(tpl_ms, 95)},
+            "cache_hit_ratio": round(hits / (hits + misses), 3) if hits + misses else None,
+        })
+    out.sort(key=lambda v: v["ms"]["p95"] or 0, reverse=True)
+    return out
+
+
+def _timed_execute(execute, sql, params, many, context):
+    # Suma al request del contexto actual (también dentro de sync_to_async)
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_ms += (time.perf_counter() - start) * 1000
+
+
+def _install_timer(conn):
+    # Una vez por conexión; se cuenta al request de _current, no al que la instaló
+    if _timed_execute not in conn.execute_wrappers:
+        conn.execute_wrappers.append(_timed_execute)
+
+
+def _connection_created(sender, connection, **kwargs):
+    # Con ASGI las queries corren en los hilos de sync_to_async, con su propia conexión
+    _install_timer(connection)
+
+
+class PerfMiddleware:
+    """
+    Mide cada request (POS_PERF_ENABLED). Con POS_PERF_SERVER_TIMING agrega el
+    header Server-Timing para verlo en las devtools del navegador.
+
+    Sirve en WSGI y en ASGI: con ASGI no obliga a Django a pasar el resto de
+    la cadena (vistas async, SSE) por sync_to_async.
+    """
+
+    SKIP_PREFIXES = ("/static/", "/media/", "/perf/")
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        connection_created.connect(_connection_created, dispatch_uid="pos-perf-timer")
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _skip(self, request):
+        return not getattr(settings, "POS_PERF_ENABLED", True) or request.path.startswith(self.SKIP_PREFIXES)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if self._skip(request):
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            _install_timer(connection)
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, start)
+
+    async def __acall__(self, request):
+        if self._skip(request):
+            return await self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, start)
+
+    @staticmethod
+    def _finish(request, response, stats, start):
+        total_ms = (time.perf_counter() - start) * 1000
+
+        match = getattr(request, "resolver_match", None)
+        record = {
+            "ts": time.time(),
+            "method": request.method,
+            "path": request.path,
+            "view": (match.view_name if match else None) or request.path,
+            "status": response.status_code,
+            "ms": round(total_ms, 2),
+            "queries": stats.queries,
+            "db_ms": round(stats.db_ms, 2),
+            "cache_hits": stats.cache_hits,
+            "cache_misses": stats.cache_misses,
+            "template_ms": round(stats.template_ms, 2),
+        }
+        _store(record)
+
+        if getattr(settings, "POS_PERF_SERVER_TIMING", False):
+            response["Server-Timing"] = (
+                f'total;dur={record["ms"]}, '
+                f'db;dur={record["db_ms"]};desc="{stats.queries} queries", '
+                f'tpl;dur={record["template_ms"]}, '
+                f'cache;desc="hits={stats.cache_hits} misses={stats.cache_misses}"'
+            )
+        return response
+
+
+class _InstrumentedTemplate:
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return self._template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self._template.render(context, request)
+        finally:
+            stats.template_ms += (time.perf_counter() - start) * 1000
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Backend de plantillas de Django que suma el tiempo de render al request actual."""
+
+    def from_string(self, template_code):
+        return _InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _InstrumentedTemplate(super().get_template(template_name))
+
@@ -1,7 +1,43 @@
 from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
 from django.shortcuts import redirect, render
 from django.urls import reverse
 
+from utils.cache import roles_cache
+
+
+def _roles_key(user):
+    # date_joined evita reusar la entrada si se recrea un usuario con el mismo id
+    joined = user.date_joined.timestamp() if getattr(user, "date_joined", None) else 0
+    return f"user:{user.pk}:{joined}"
+
+
+def get_user_roles(user):
+    """
+    Nombres de los grupos del usuario (frozenset).
+    Se guarda en el request (user) y en la caché "roles"; se invalida con
+    m2m_changed de user.groups (ver home/signals.py). Con locmem eso sólo
+    limpia este proceso; en los demás la entrada dura POS_ROLES_LOCAL_TTL.
+    """
+    if not user or not getattr(user, "is_authenticated", False):
+        return frozenset()
+
+    roles = getattr(user, "_pos_roles", None)
+    if roles is None:
+        roles = roles_cache.get_or_set(
+            _roles_key(user),
+            lambda: frozenset(user.groups.values_list("name", flat=True)),
+        )
+        user._pos_roles = roles
+    return roles
+
+
+def invalidate_user_roles(user):
+    roles_cache.delete(_roles_key(user))
+    if hasattr(user, "_pos_roles"):
+        del user._pos_roles
+
 
 def role_required(allowed_roles):
     """
@@ -9,28 +45,45 @@ def role_required(allowed_roles):
       ["AdminPOS"] o ["AdminPOS", "VendedorPOS"]
     """
 
-    def decorator(view_func):
-        @wraps(view_func)
-        def _wrapped_view(request, *args, **kwargs):
+    def _denied_response(request):
+        # None si puede pasar; si no, la respuesta (login o no_permisos)
+        next_url = request.get_full_path()
 
-            next_url = request.get_full_path()
+        # 1) No autenticado -> login con next
+        if not request.user.is_authenticated:
+            login_url = reverse("login_pos")
+            return redirect(f"{login_url}?next={next_url}")
 
-            # 1) No autenticado -> login con next
-            if not request.user.is_authenticated:
-                login_url = reverse("login_pos")
-                return redirect(f"{login_url}?next={next_url}")
+        # 2) Superuser siempre pasa
+        if request.user.is_superuser:
+            return None
 
-            # 2) Superuser siempre pasa
-            if request.user.is_superuser:
-                return view_func(request, *args, **kwargs)
+        # 3) Roles por grupos
+        user_roles = get_user_roles(request.user)
+        if any(role in allowed_roles for role in user_roles):
+            return None
 
-            # 3) Roles por grupos
-            user_roles = request.user.groups.values_list("name", flat=True)
-            if any(role in allowed_roles for role in user_roles):
-                return view_func(request, *args, **kwargs)
+        # 4) Sin permisos -> pantalla no_permisos (pasamos next)
+        return render(request, "home/no_permisos.html", {"next": next_url}, status=403)
 
-            # 4) Sin permisos -> pantalla no_permisos (pasamos next)
-            return render(request, "home/no_permisos.html", {"next": next_url}, status=403)
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            # Vistas async: la sesión/usuario se resuelven con el ORM síncrono
+            @wraps(view_func)
+            async def _wrapped_async_view(request, *args, **kwargs):
+                denied = await sync_to_async(_denied_response)(request)
+                if denied is not None:
+                    return denied
+                return await view_func(request, *args, **kwargs)
+
+            return _wrapped_async_view
+
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            denied = _denied_response(request)
+            if denied is not None:
+                return denied
+            return view_func(request, *args, **kwargs)
 
         return _wrapped_view
 
@@ -0,0 +1,50 @@
+# PDF de una sola página con texto monoespaciado (tickets), sin dependencias.
+#
+#     text_pdf(["JOYERÍA", "Folio V000123", ...])  -> bytes
+#
+# Courier con WinAnsiEncoding: cubre acentos y ñ. El ancho de la hoja sale
+# del renglón más largo, así un ticket de 42 columnas mide ~80 mm.
+
+MARGIN = 12  # pt
+COURIER_ADVANCE = 0.6  # ancho de cada carácter en Courier, en fracción del tamaño
+
+
+def _escape(line):
+    data = line.encode("cp1252", errors="replace")
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def text_pdf(lines, font_size=8, columns=None):
+    lines = list(lines) or [""]
+    leading = font_size * 1.2
+    columns = columns or max(len(line) for line in lines)
+    width = round(columns * font_size * COURIER_ADVANCE + 2 * MARGIN, 2)
+    height = round(len(lines) * leading + 2 * MARGIN, 2)
+
+    text = [b"BT", b"/F1 %g Tf" % font_size, b"%g TL" % leading, b"%g %g Td" % (MARGIN, height - MARGIN - font_size)]
+    for line in lines:
+        text.append(b"(" + _escape(line) + b") Tj T*")
+    text.append(b"ET")
+    stream = b"\n".join(text)
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %g %g] /Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>"
+        % (width, height),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+    ]
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
@@ -0,0 +1,166 @@
+from django.db import models
+from django.db.models import Q, Transform
+
+
+def _py_lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+class UnicodeLower(Transform):
+    """
+    LOWER() que coincide con str.lower(): el de SQLite sólo baja ASCII, así
+    "PEÑA" quedaba "peÑa" y no chocaba con "peña". En SQLite se usa una
+    función registrada en la conexión; los demás motores ya bajan Unicode.
+    """
+
+    lookup_name = "ulower"
+    function = "LOWER"
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        connection.ensure_connection()
+        connection.connection.create_function("POS_LOWER", 1, _py_lower, deterministic=True)
+        return self.as_sql(compiler, connection, function="POS_LOWER", **extra_context)
+
+
+models.CharField.register_lookup(UnicodeLower)
+models.TextField.register_lookup(UnicodeLower)
+
+
+def _split_lookup(lookup):
+    # "code__iexact" -> ("code", True) / "phone" -> ("phone", False)
+    field, _, suffix = lookup.partition("__")
+    if suffix not in ("", "exact", "iexact"):
+        raise ValueError(f"Lookup no soportado para unicidad: {lookup}")
+    return field, suffix == "iexact"
+
+
+def _norm(value, insensitive):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value.lower() if insensitive else value
+
+
+def _active_checks(checks):
+    # Se ignoran los checks con algún valor vacío (campos opcionales)
+    out = {}
+    for key, lookups in checks.items():
+        if lookups and all(v not in (None, "") for v in lookups.values()):
+            out[key] = lookups
+    return out
+
+
+def _filter(field, insensitive, value):
+    # Mismo criterio en SQL y en Python (_norm): iexact -> ambos lados en minúsculas
+    return {f"{field}__ulower": value} if insensitive else {field: value}
+
+
+def _row_matches(row, lookups):
+    for lookup, value in lookups.items():
+        field, insensitive = _split_lookup(lookup)
+        if _norm(row.get(field), insensitive) != _norm(value, insensitive):
+            return False
+    return True
+
+
+def find_conflicts(model, checks, exclude_pk=None):
+    """
+    Revisa varias reglas de unicidad con UNA sola consulta (OR).
+
+    checks: {"campo_error": {"lookup": valor, ...}, ...}
+      ej. {"code": {"code__iexact": "V01"}, "phone": {"phone": "555"}}
+      Los lookups dentro de un mismo check se combinan con AND
+      (sirve para llaves compuestas como name + purity).
+
+    Regresa el set de llaves de `checks` que ya existen en la BD.
+    """
+    checks = _active_checks(checks)
+    if not checks:
+        return set()
+
+    q = Q()
+    fields = set()
+    for lookups in checks.values():
+        check = {}
+        for lookup, value in lookups.items():
+            field, insensitive = _split_lookup(lookup)
+            check.update(_filter(field, insensitive, _norm(value, insensitive)))
+            fields.add(field)
+        q |= Q(**check)
+
+    qs = model._default_manager.filter(q)
+    if exclude_pk is not None:
+        qs = qs.exclude(pk=exclude_pk)
+
+    conflicts = set()
+    for row in qs.values(*fields):
+        for key, lookups in checks.items():
+            if key not in conflicts and _row_matches(row, lookups):
+                conflicts.add(key)
+        if len(conflicts) == len(checks):
+            break
+    return conflicts
+
+
+def find_conflicts_bulk(model, rows, chunk_size=500):
+    """
+    Modo lote (importaciones): `rows` es una lista de `checks` con el mismo
+    formato que find_conflicts. Regresa una lista de sets, uno por fila.
+
+    Los checks de un solo campo se resuelven con `__in` por bloques, así que
+    el número de consultas depende de los campos, no de las filas. También
+    marca duplicados dentro del mismo lote (la segunda aparición choca).
+    """
+    rows = [_active_checks(checks) for checks in rows]
+    results = [set() for _ in rows]
+
+    # Agrupar por (llave de error, lookups) -> valores normalizados
+    groups = {}
+    for i, checks in enumerate(rows):
+        for key, lookups in checks.items():
+            signature = (key, tuple(sorted(lookups)))
+            groups.setdefault(signature, []).append(i)
+
+    for (key, lookup_names), idxs in groups.items():
+        parsed = [_split_lookup(lk) for lk in lookup_names]
+
+        def norm_values(i):
+            lookups = rows[i][key]
+            return tuple(_norm(lookups[lk], ins) for lk, (_, ins) in zip(lookup_names, parsed))
+
+        # Duplicados dentro del lote
+        seen = set()
+        for i in idxs:
+            val = norm_values(i)
+            if val in seen:
+                results[i].add(key)
+            seen.add(val)
+
+        # Existentes en la BD
+        existing = set()
+        wanted = list(seen)
+        for start in range(0, len(wanted), chunk_size):
+            chunk = wanted[start:start + chunk_size]
+            qs = model._default_manager.all()
+
+            if len(parsed) == 1:
+                field, insensitive = parsed[0]
+                lookup = f"{field}__ulower__in" if insensitive else f"{field}__in"
+                qs = qs.filter(**{lookup: [v[0] for v in chunk]})
+            else:
+                q = Q()
+                for val in chunk:
+                    check = {}
+                    for (field, insensitive), v in zip(parsed, val):
+                        check.update(_filter(field, insensitive, v))
+                    q |= Q(**check)
+                qs = qs.filter(q)
+
+            for row in qs.values_list(*[f for f, _ in parsed]):
+                existing.add(tuple(_norm(v, ins) for v, (_, ins) in zip(row, parsed)))
+
+        for i in idxs:
+            if norm_values(i) in existing:
+                results[i].add(key)
+
+    return results